@@ -1,10 +1,285 @@
-from django.contrib import admin
-from .models import UserInfo, Spot, UserRegister, SpotRecord, Avatar
+import os
+
+from django import forms
+from django.contrib import admin, messages
+from django.http import HttpResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html, format_html_join
+
+from .models import UserInfo, Spot, UserRegister, SpotRecord, Avatar, SpotRecommendation, JobRun, \
+    RequestProfile, AccountDeletion, Reconciliation, GameEvent, DailyStats, Campus, StoredImage
+from .deletion import deletion_worker
+from .images import store, image_url, sources
+from .importer import read_rows, guess_format, IMPORTERS
+from .profiling import SORTS, report, collapsed_stacks
+
+MAX_REPORTED_ERRORS = 20  # Stops a badly formatted file flooding the admin page with messages
+
+
+class ImportFileForm(forms.Form):
+    file = forms.FileField(help_text="A .csv file with a header row, or a .json file containing a list of objects")
+
+
+class BulkImportAdmin(admin.ModelAdmin):
+    """Adds an 'Import' button to a model's admin page, which bulk imports records from an uploaded CSV or JSON file
+
+    Attributes:
+        importer (str): The key in importer.IMPORTERS used to import this model
+        import_columns (str): The columns the file should contain, shown on the upload page
+    """
+    change_list_template = 'admin/exSeed/import_change_list.html'
+    importer = None
+    import_columns = ''
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='%s_%s_import' % info),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request) or not self.has_change_permission(request):
+            messages.error(request, "You do not have permission to import %s" % self.model._meta.verbose_name_plural)
+            return redirect(reverse('admin:%s_%s_changelist' % (self.model._meta.app_label, self.model._meta.model_name)))
+
+        if request.method == 'POST':
+            form = ImportFileForm(request.POST, request.FILES)
+            if form.is_valid():
+                upload = form.cleaned_data['file']
+                try:
+                    rows = read_rows(upload, guess_format(upload.name))
+                except ValueError as e:
+                    form.add_error('file', str(e))
+                else:
+                    result = IMPORTERS[self.importer](rows)
+                    messages.success(request, "Import finished: %s" % result)
+                    for row_number, error in result.errors[:MAX_REPORTED_ERRORS]:
+                        messages.warning(request, "Row %d: %s" % (row_number, error))
+                    if len(result.errors) > MAX_REPORTED_ERRORS:
+                        messages.warning(request, "...and %d more rejected rows" % (len(result.errors) - MAX_REPORTED_ERRORS))
+                    return redirect(reverse('admin:%s_%s_changelist' % (self.model._meta.app_label, self.model._meta.model_name)))
+        else:
+            form = ImportFileForm()
+
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': "Import %s" % self.model._meta.verbose_name_plural,
+            'form': form,
+            'import_columns': self.import_columns,
+        }
+        return TemplateResponse(request, 'admin/exSeed/import_form.html', context)
+
+
+class ImageUploadForm(forms.ModelForm):
+    """The form for a model with an imageName link, which also takes an uploaded image. The upload is kept on this site
+    (see images.py) and linked to in place of the link given
+    """
+    upload = forms.FileField(required=False, help_text="An image to keep on this site, instead of linking to one")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['imageName'].required = False
+
+    def clean(self):
+        cleaned_data = super().clean()
+        upload = cleaned_data.get('upload')
+        if upload is not None:
+            try:
+                cleaned_data['imageName'] = store(upload.read())
+            except ValueError as e:
+                self.add_error('upload', str(e))
+        elif not cleaned_data.get('imageName') and not self._meta.model._meta.get_field('imageName').blank:
+            self.add_error('imageName', "Give a link to the image, or upload one")
+        return cleaned_data
+
+
+class SpotAdmin(BulkImportAdmin):
+    importer = 'spots'
+    import_columns = 'name, desc, latitude, longitude, imageName (new spots are added to the default campus)'
+    list_filter = ('campus',)
+    form = ImageUploadForm
+
+
+class AvatarAdmin(BulkImportAdmin):
+    importer = 'avatars'
+    import_columns = 'avatarTitle, imageName'
+    form = ImageUploadForm
+
+
+class StoredImageAdmin(admin.ModelAdmin):
+    """The images kept on this site (see images.py). Images are stored by uploading them on an avatar or spot, or with
+    the store_images command, so they can't be added or edited here
+    """
+    list_display = ('name', 'preview', 'width', 'source', 'storedAt')
+    search_fields = ('name', 'source')
+    readonly_fields = ('name', 'preview', 'width', 'source', 'storedAt')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Image")
+    def preview(self, obj):
+        return format_html('<img src="{}" style="max-height: 96px">', sources(image_url() + obj.name, 96)['src'])
+
+
+class JobRunAdmin(admin.ModelAdmin):
+    """The scheduled jobs' run log. Runs are only made by the scheduler, so they can't be added or edited here"""
+    list_display = ('name', 'scheduledFor', 'status', 'startedAt', 'finishedAt')
+    list_filter = ('name', 'status')
+    readonly_fields = ('name', 'scheduledFor', 'status', 'startedAt', 'finishedAt', 'output')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class AccountDeletionAdmin(admin.ModelAdmin):
+    """The queue and log of account deletions (see deletion.py), showing how far along each one is. Deletions are only
+    made by the delete view, so they can't be added or edited here, but failed ones can be tried again
+    """
+    list_display = ('username', 'status', 'progress', 'requestedBy', 'requestedAt', 'finishedAt')
+    list_filter = ('status',)
+    search_fields = ('username',)
+    readonly_fields = ('username', 'userId', 'requestedBy', 'requestedAt', 'startedAt', 'updatedAt', 'finishedAt',
+                       'status', 'rowsTotal', 'rowsDeleted', 'output')
+    actions = ['retry']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Progress")
+    def progress(self, obj):
+        if not obj.rowsTotal:
+            return "-"
+        return "%d of %d rows (%d%%)" % (obj.rowsDeleted, obj.rowsTotal, 100 * obj.rowsDeleted // obj.rowsTotal)
+
+    @admin.action(description="Try the selected failed deletions again")
+    def retry(self, request, queryset):
+        retried = queryset.filter(status=AccountDeletion.FAILED).update(status=AccountDeletion.QUEUED, output='')
+        if retried:
+            deletion_worker.start()
+        self.message_user(request, "Queued %d deletions again" % retried)
+
+
+class ReconciliationAdmin(admin.ModelAdmin):
+    """The checks of the denormalised stats (see reconcile.py), made with the reconcile_stats command"""
+    list_display = ('startedAt', 'day', 'fix', 'phase', 'checked', 'found', 'fixed', 'finishedAt')
+    list_filter = ('phase', 'fix')
+    readonly_fields = ('startedAt', 'updatedAt', 'finishedAt', 'day', 'fix', 'phase', 'position', 'checked', 'found',
+                       'fixed', 'state')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class GameEventAdmin(admin.ModelAdmin):
+    """The append-only log of game events (see events.py). Events can't be added, edited or removed here"""
+    list_display = ('pk', 'kind', 'user', 'day', 'value', 'text')
+    list_filter = ('kind',)
+    search_fields = ('user__username',)
+    readonly_fields = ('kind', 'user', 'day', 'value', 'text')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class DailyStatsAdmin(admin.ModelAdmin):
+    """The daily rollup projected from the event log. It is rebuilt with the replay_events command"""
+    list_display = ('day', 'registers', 'points', 'streakResets', 'streakDaysLost')
+    readonly_fields = ('day', 'registers', 'points', 'streakResets', 'streakDaysLost')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """The requests profiled by staff (see profiling.py). Each one's report is shown on its page, which links to the
+    report in other orders and to its collapsed stacks for flame graph tools
+    """
+    list_display = ('path', 'view', 'mode', 'duration', 'user', 'createdAt')
+    list_filter = ('view', 'mode')
+    readonly_fields = ('path', 'view', 'mode', 'duration', 'user', 'createdAt', 'downloads', 'profile_report')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        info = self.model._meta.app_label, self.model._meta.model_name
+        return [
+            path('<path:object_id>/report/', self.admin_site.admin_view(self.report_view),
+                 name='%s_%s_report' % info),
+            path('<path:object_id>/collapsed/', self.admin_site.admin_view(self.collapsed_view),
+                 name='%s_%s_collapsed' % info),
+        ] + super().get_urls()
+
+    @admin.display(description="Downloads")
+    def downloads(self, obj):
+        links = [(reverse('admin:exSeed_requestprofile_report', args=[obj.pk]) + '?sort=' + sort,
+                  "Report by %s" % description.lower()) for sort, (_, description) in SORTS.items()]
+        links.append((reverse('admin:exSeed_requestprofile_collapsed', args=[obj.pk]), "Collapsed stacks"))
+        return format_html_join(' | ', '<a href="{}">{}</a>', links)
+
+    @admin.display(description="Report")
+    def profile_report(self, obj):
+        try:
+            return format_html('<pre>{}</pre>', report(obj))
+        except OSError:
+            return "The profile's file is missing"
+
+    def report_view(self, request, object_id):
+        profile = get_object_or_404(RequestProfile, pk=object_id)
+        if not self.has_view_permission(request, profile):
+            return redirect(reverse('admin:index'))
+        return HttpResponse(report(profile, request.GET.get('sort', 'cumulative')), content_type='text/plain')
+
+    def collapsed_view(self, request, object_id):
+        profile = get_object_or_404(RequestProfile, pk=object_id)
+        if not self.has_view_permission(request, profile):
+            return redirect(reverse('admin:index'))
+        response = HttpResponse(collapsed_stacks(profile), content_type='text/plain')
+        response['Content-Disposition'] = 'attachment; filename="%s.folded"' % os.path.splitext(profile.fileName)[0]
+        return response
+
 
 # Register your models here.
 # These lines allow for the viewing and editing of these custom models in the admin page
+admin.site.register(Campus)
 admin.site.register(UserInfo)
-admin.site.register(Spot)
+admin.site.register(Spot, SpotAdmin)
 admin.site.register(UserRegister)
 admin.site.register(SpotRecord)
-admin.site.register(Avatar)
+admin.site.register(Avatar, AvatarAdmin)
+admin.site.register(SpotRecommendation)
+admin.site.register(JobRun, JobRunAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
+admin.site.register(AccountDeletion, AccountDeletionAdmin)
+admin.site.register(Reconciliation, ReconciliationAdmin)
+admin.site.register(GameEvent, GameEventAdmin)
+admin.site.register(DailyStats, DailyStatsAdmin)
+admin.site.register(StoredImage, StoredImageAdmin)
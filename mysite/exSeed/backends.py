@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+"""
+Developer note:
+Django loads the logged in user from the database on every request. CachedModelBackend keeps each user in the cache
+instead, so with cached sessions (see SESSION_ENGINE in settings.py) a page view doesn't need any queries to find out
+who is asking. The cached copy is removed whenever the user is saved or deleted (see signals.py), so a changed password
+still logs out other sessions and a deactivated user is still locked out.
+"""
+
+USER_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 60)
+USER_KEY_PREFIX = 'exseed:auth-user:'
+
+
+def forget_user(user_pk):
+    """Removes a user from the cache, so they are loaded from the database on their next request"""
+    cache.delete(USER_KEY_PREFIX + str(user_pk))
+
+
+class CachedModelBackend(ModelBackend):
+    """The default username and password backend, with the user loaded on each request cached"""
+
+    def get_user(self, user_id):
+        """Gets the user for a session from the cache, loading them from the database if they aren't cached
+
+        Args:
+            user_id: The primary key stored in the session
+
+        Returns:
+            User: The user, or None if they don't exist or are inactive
+        """
+        key = USER_KEY_PREFIX + str(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_CACHE_TIMEOUT)
+        return user
@@ -0,0 +1,9 @@
+"""
+Developer note:
+Benchmarks of the views against a synthetic dataset the size of a busy season, so changes can be measured before they
+are deployed. Use a copy of the database rather than the live one, as the dataset is added alongside what is there:
+    python manage.py seed_benchmark --users 2000 --spots 60 --days 200     (see dataset.py)
+    python manage.py benchmark_views --output before.json                  (see runner.py)
+    ...change something...
+    python manage.py benchmark_views --output after.json --compare before.json
+"""
@@ -0,0 +1,220 @@
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+from .. import clock, events
+from ..backends import USER_KEY_PREFIX
+from ..caching import bump_version
+from ..geo import invalidate_spot_index
+from ..models import Avatar, Spot, SpotRecord, UserInfo, UserRegister, default_campus_id
+from ..signals import deletions_unsignalled
+
+"""
+Developer note:
+Builds a season of play with bulk_create, so a dataset of thousands of users and a hundred thousand registers takes
+seconds rather than the hours saving each row would. The season ends today, so today's spot of the day is already
+assigned and some users have registered at it.
+
+Each user is given an engagement (the chance they go to the spot on a given day) from a skewed distribution, so most
+users play now and then and a few play nearly every day, and some stop playing part way through the season. Points
+follow addScore: the first four users at a spot each day get 5, 4, 3 and 2 points and everyone after them gets 1, so
+plenty of users end up tied. Each spot has a quality that its ratings are spread around. The spots and users are all on
+the default campus.
+"""
+
+CAMPUS = (Decimal('50.7360'), Decimal('-3.5340'))  # Spots are scattered within about a kilometre of here
+SPOT_PREFIX = "Benchmark spot "
+PASSWORD = 'benchmark'
+BATCH_SIZE = 1000
+
+
+class SeedResult:
+    """What seed() added
+
+    Attributes:
+        users (int): Users (each with a UserInfo)
+        spots (int): Spots
+        records (int): Days of the season, each with a SpotRecord
+        registers (int): UserRegister rows
+    """
+
+    def __init__(self, users=0, spots=0, records=0, registers=0):
+        self.users = users
+        self.spots = spots
+        self.records = records
+        self.registers = registers
+
+    def __str__(self):
+        return "%d users, %d spots, %d days, %d registers" % (self.users, self.spots, self.records, self.registers)
+
+
+def clear(prefix):
+    """Removes a dataset made by seed(). Its spot records and registers go with its users and spots
+
+    Args:
+        prefix (str): The dataset's username prefix
+    """
+    users = User.objects.filter(username__startswith=prefix)
+    user_keys = [USER_KEY_PREFIX + str(pk) for pk in users.values_list('pk', flat=True)]
+    with deletions_unsignalled(), transaction.atomic():
+        users.delete()
+        Spot.objects.filter(name__startswith=SPOT_PREFIX).delete()
+    cache.delete_many(user_keys)
+    invalidate_spot_index()
+    bump_version('spot', 'scoreboard')
+
+
+def engagement(rng) -> float:
+    """The chance a user goes to the spot on a given day. Most users play now and then, and a few nearly every day"""
+    return min(0.95, rng.betavariate(0.7, 2.0))
+
+
+def _default_avatar():
+    return Avatar.objects.order_by('pk').first() or Avatar.objects.create(imageName='avatar1.png', avatarTitle='Sprout')
+
+
+def _add_spots(spots, rng, campus) -> list[int]:
+    Spot.objects.bulk_create([
+        Spot(name=SPOT_PREFIX + str(number), desc="A spot made for benchmarking", campus_id=campus,
+             latitude=CAMPUS[0] + Decimal(rng.randint(-9000, 9000)) / 1000000,
+             longitude=CAMPUS[1] + Decimal(rng.randint(-9000, 9000)) / 1000000)
+        for number in range(spots)], batch_size=BATCH_SIZE)
+    return list(Spot.objects.filter(name__startswith=SPOT_PREFIX).order_by('pk').values_list('pk', flat=True))
+
+
+def _add_users(users, prefix) -> list[int]:
+    # Every user shares one password hash, as hashing thousands of passwords would take minutes
+    password = make_password(PASSWORD)
+    names = [prefix + str(number) for number in range(users)]
+    User.objects.bulk_create([User(username=name, password=password, email=name + '@example.com')
+                              for name in names], batch_size=BATCH_SIZE)
+    return list(User.objects.filter(username__in=names).order_by('pk').values_list('pk', flat=True))
+
+
+def _check_unused(prefix):
+    if User.objects.filter(username__startswith=prefix).exists():
+        raise ValueError("There are already users whose names start with '%s'" % prefix)
+
+
+def add_players(users, spots, prefix='bench', random_seed=1) -> tuple[list[int], list[int]]:
+    """Adds spots and users who have taken the pledge but not played yet, to play a season from the start
+
+    Args:
+        users (int): How many users to add, named prefix0, prefix1, ... (all with the password 'benchmark')
+        spots (int): How many spots to add
+        prefix (str): The start of every username
+        random_seed (int): The same seed always gives the same spots
+
+    Returns:
+        tuple[list[int], list[int]]: The user IDs and spot IDs
+
+    Raises:
+        ValueError: If the usernames are taken
+    """
+    _check_unused(prefix)
+    rng = random.Random(random_seed)
+    with transaction.atomic():
+        avatar = _default_avatar()
+        campus = default_campus_id()
+        spot_ids = _add_spots(spots, rng, campus)
+        user_ids = _add_users(users, prefix)
+        UserInfo.objects.bulk_create([UserInfo(user_id=user_id, avatarId=avatar, title='Sapling', hasTakenPledge=True,
+                                               campus_id=campus) for user_id in user_ids], batch_size=BATCH_SIZE)
+    invalidate_spot_index()
+    bump_version('spot', 'scoreboard')
+    return user_ids, spot_ids
+
+
+def seed(users, spots, days, prefix='bench', random_seed=1, today=None) -> SeedResult:
+    """Adds a synthetic season of play to the database
+
+    Args:
+        users (int): How many users to add, named prefix0, prefix1, ... (all with the password 'benchmark')
+        spots (int): How many spots to add
+        days (int): How many days the season lasts, ending today
+        prefix (str): The start of every username
+        random_seed (int): The same seed always gives the same dataset
+        today (datetime.date): The last day of the season. Defaults to today
+
+    Returns:
+        SeedResult: What was added
+
+    Raises:
+        ValueError: If the days of the season already have spots of the day, or the usernames are taken
+    """
+    rng = random.Random(random_seed)
+    today = today or clock.today()
+    first_day = today - datetime.timedelta(days=days - 1)
+    campus = default_campus_id()
+    if SpotRecord.objects.filter(campus_id=campus, spotDay__gte=first_day, spotDay__lte=today).exists():
+        raise ValueError("There are already spots of the day between %s and %s" % (first_day, today))
+    _check_unused(prefix)
+
+    with transaction.atomic():
+        avatar = _default_avatar()
+        spot_ids = _add_spots(spots, rng, campus)
+        quality = {spot_id: rng.uniform(1.5, 4.8) for spot_id in spot_ids}
+        user_ids = _add_users(users, prefix)
+
+        players = []  # (user ID, engagement, first day, last day) as day numbers
+        for user_id in user_ids:
+            start = rng.randrange(days // 4 + 1)  # Some users join after the start of the season
+            stop = days - 1 if rng.random() < 0.7 else rng.randrange(start, days)  # Some give up part way through
+            players.append((user_id, engagement(rng), start, stop))
+
+        records, registers = [], []
+        points = dict.fromkeys(user_ids, 0)
+        last_day = dict.fromkeys(user_ids)
+        streak = dict.fromkeys(user_ids, 0)
+        recent_spots = []  # A spot isn't used again within a week, if there are enough of them
+        window = min(7, len(spot_ids) - 1)
+        for day_number in range(days):
+            day = first_day + datetime.timedelta(days=day_number)
+            spot_id = rng.choice([spot for spot in spot_ids if spot not in recent_spots] or spot_ids)
+            recent_spots = (recent_spots + [spot_id])[-window:] if window else []
+            attendees = [user_id for user_id, chance, start, stop in players
+                         if start <= day_number <= stop and rng.random() < chance]
+            rng.shuffle(attendees)  # The order they arrived in
+            record = SpotRecord(sId_id=spot_id, campus_id=campus, attendance=len(attendees), spotDay=day)
+            records.append(record)
+            for position, user_id in enumerate(attendees):
+                points[user_id] += 1 + max(0, 4 - position)
+                yesterday = day - datetime.timedelta(days=1)
+                streak[user_id] = streak[user_id] + 1 if last_day[user_id] == yesterday else 1
+                last_day[user_id] = day
+                rating = min(5, max(1, round(rng.gauss(quality[spot_id], 0.9))))
+                time = datetime.time(rng.randint(9, 16), rng.randrange(60), rng.randrange(60))
+                registers.append((user_id, day, rating, time))
+
+        SpotRecord.objects.bulk_create(records, batch_size=BATCH_SIZE)
+        record_ids = dict(SpotRecord.objects.filter(campus_id=campus, spotDay__gte=first_day, spotDay__lte=today)
+                          .values_list('spotDay', 'pk'))
+        UserRegister.objects.bulk_create([
+            UserRegister(uId_id=user_id, srId_id=record_ids[day], spotNiceness=rating, registerTimeEditable=time)
+            for user_id, day, rating, time in registers], batch_size=BATCH_SIZE)
+
+        # A streak only lasts if the user went yesterday or today, as the midnight job resets the others
+        yesterday = today - datetime.timedelta(days=1)
+        UserInfo.objects.bulk_create([
+            UserInfo(user_id=user_id, avatarId=avatar, title='Sapling', hasTakenPledge=True, campus_id=campus,
+                     totalPoints=min(points[user_id], 32767), lastSpotRegister=last_day[user_id],
+                     currentStreak=streak[user_id] if last_day[user_id] in (yesterday, today) else 0)
+            for user_id in user_ids], batch_size=BATCH_SIZE)
+
+        for spot_id in spot_ids:  # Averaged over the past days, as the attendance_averages job does
+            attendances = [record.attendance for record in records
+                           if record.sId_id == spot_id and record.spotDay < today]
+            if attendances:
+                Spot.objects.filter(pk=spot_id).update(average_attendance=round(sum(attendances) / len(attendances)))
+
+        events.backfill(user_ids, today)  # The season's event log, as the users' stats already include it
+
+    # bulk_create sends no signals, so the cached pages and the spot index are refreshed here
+    invalidate_spot_index()
+    bump_version('spot', 'scoreboard')
+    return SeedResult(len(user_ids), len(spot_ids), len(records), len(registers))
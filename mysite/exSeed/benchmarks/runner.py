@@ -0,0 +1,217 @@
+import datetime
+import platform
+import statistics
+import subprocess
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, override_settings
+
+from .. import clock
+from ..metrics import process_metrics
+from ..models import SpotRecord, UserInfo, UserRegister, default_campus_id
+
+"""
+Developer note:
+Times each view through the test client, so the whole request is measured: middleware, the view, its queries and its
+template. Each view is timed with an empty cache (as if the data behind the page had just changed) and a warm one.
+
+addScore can only be timed in registering hours (on the game clock, see clock.py), and needs users who haven't
+registered today. Each addScore request is made by a different such user inside a transaction that is then rolled
+back, so the dataset is the same after a run as before it.
+"""
+
+MOBILE_AGENT = ("Mozilla/5.0 (iPhone; CPU iPhone OS 16_3 like Mac OS X) AppleWebKit/605.1.15 "
+                "(KHTML, like Gecko) Version/16.3 Mobile/15E148 Safari/604.1")
+# A cache local to this process, so the benchmark neither reads nor fills the shared cache
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+PAGES = {  # name: path
+    'home_page': '/',
+    'leaderboard_streak': '/leaderboard?q=streak',
+    'leaderboard_total': '/leaderboard?q=total',
+    'profile_page': '/profile',
+    'compass': '/compass',
+}
+
+
+class Skipped(Exception):
+    """Raised when a view can't be timed in the current state of the database (e.g. outside registering hours)"""
+
+
+def _summary(durations, queries) -> dict:
+    durations = sorted(durations)
+    return {
+        'requests': len(durations),
+        'median_ms': round(statistics.median(durations) * 1000, 3),
+        'mean_ms': round(statistics.fmean(durations) * 1000, 3),
+        'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 3),
+        'queries': queries,
+    }
+
+
+def queries_made() -> int:
+    """How many database queries this process has made while handling requests. Counted by the metrics middleware,
+    which (unlike CaptureQueriesContext) includes the queries async views make on other threads' connections
+    """
+    return sum(total for (name, _), total in process_metrics.snapshot_counters().items()
+               if name == 'exseed_db_queries_total')
+
+
+def git_commit():
+    """The commit being benchmarked, or None if it can't be found"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=settings.BASE_DIR).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class ViewBenchmark:
+    """Times the views as one user
+
+    Attributes:
+        user (User): The user the pages are requested as
+        repeat (int): How many times each view is timed, for each cache state
+    """
+
+    def __init__(self, user, repeat=20):
+        self.user = user
+        self.repeat = repeat
+        self.client = Client(HTTP_USER_AGENT=MOBILE_AGENT)
+        self.client.force_login(user)
+
+    def _get(self, path):
+        start = time.perf_counter()
+        response = self.client.get(path)
+        duration = time.perf_counter() - start
+        if response.status_code != 200:
+            raise Skipped("%s returned %d" % (path, response.status_code))
+        return duration
+
+    def time_page(self, path) -> dict:
+        """Times a page with an empty cache and with a warm one
+
+        Returns:
+            dict: {'cold': summary, 'warm': summary}, each with the median, mean and 95th percentile time and queries
+        """
+        results = {}
+        for state in ('cold', 'warm'):
+            cache.clear()
+            self._get(path)  # Warms the cache, and anything else loaded on first use
+            if state == 'cold':
+                cache.clear()
+            before = queries_made()
+            self._get(path)
+            queries = queries_made() - before
+            durations = []
+            for _ in range(self.repeat):
+                if state == 'cold':
+                    cache.clear()
+                durations.append(self._get(path))
+            results[state] = _summary(durations, queries)
+        return results
+
+    def time_add_score(self) -> dict:
+        """Times registering at today's spot, as users who haven't registered today
+
+        Returns:
+            dict: {'cold': summary}
+
+        Raises:
+            Skipped: Outside registering hours, or if there is no spot of the day or too few users left to register
+        """
+        now = clock.now()
+        if not clock.registering_open(now.time()):
+            raise Skipped("users can only register from %d:00 to %d:59" % (clock.FIRST_REGISTER_HOUR,
+                                                                          clock.LAST_REGISTER_HOUR))
+        record = SpotRecord.objects.select_related('sId').filter(campus_id=default_campus_id(),
+                                                                 spotDay=now.date()).first()
+        if record is None:
+            raise Skipped("there is no spot of the day")
+        registered = UserRegister.objects.filter(srId=record).values('uId')
+        users = list(User.objects.filter(userinfo__hasTakenPledge=True).exclude(pk__in=registered)[:self.repeat + 1])
+        if len(users) <= self.repeat:
+            raise Skipped("fewer than %d users haven't registered today" % (self.repeat + 1))
+
+        data = {'star': 4, 'latitude': str(record.sId.latitude), 'longitude': str(record.sId.longitude)}
+        durations = []
+        before = queries_made()
+        for user in users:
+            client = Client(HTTP_USER_AGENT=MOBILE_AGENT)
+            client.force_login(user)
+            with transaction.atomic():
+                start = time.perf_counter()
+                response = client.post('/addScore', data)
+                durations.append(time.perf_counter() - start)
+                transaction.set_rollback(True)
+            if response.status_code != 302:
+                raise Skipped("addScore returned %d" % response.status_code)
+        queries = round((queries_made() - before) / len(users))
+        return {'cold': _summary(durations[1:], queries)}  # The first request is a warm up
+
+    def run(self, pages=None) -> dict:
+        """Times every page in PAGES (or the given names), then addScore
+
+        Returns:
+            dict: Each view's results, by name. A view that couldn't be timed has {'skipped': reason}
+        """
+        results = {}
+        for name in pages or list(PAGES) + ['addScore']:
+            try:
+                results[name] = self.time_add_score() if name == 'addScore' else self.time_page(PAGES[name])
+            except Skipped as reason:
+                results[name] = {'skipped': str(reason)}
+        return results
+
+
+def run_benchmarks(username, repeat=20, pages=None) -> dict:
+    """Times the views as a user, with a cache local to this process
+
+    Args:
+        username (str): The user to request the pages as
+        repeat (int): How many times each view is timed, for each cache state
+        pages (list[str]): The views to time (keys of PAGES, or 'addScore'). Defaults to all of them
+
+    Returns:
+        dict: The results, with what was benchmarked, ready to be saved as JSON
+    """
+    user = User.objects.get(username=username)
+    hosts = settings.ALLOWED_HOSTS + ['testserver']  # The test client's host name
+    # The rate limits are turned off, as the benchmark makes requests far faster than users do
+    with override_settings(CACHES=LOCAL_CACHE, ALLOWED_HOSTS=hosts, DEBUG=False, RATE_LIMITS={}):
+        results = ViewBenchmark(user, repeat).run(pages)
+    return {
+        'commit': git_commit(),
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'dataset': {
+            'users': UserInfo.objects.count(),
+            'registers': UserRegister.objects.count(),
+            'days': SpotRecord.objects.count(),
+        },
+        'user': username,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+def compare(before, after) -> list[tuple[str, str, float, float]]:
+    """Compares two sets of results from run_benchmarks()
+
+    Returns:
+        list[tuple[str, str, float, float]]: (view, cache state, median before, median after) in milliseconds, for each
+            view and cache state timed in both
+    """
+    rows = []
+    for name, states in after['results'].items():
+        for state, summary in states.items():
+            previous = before['results'].get(name, {}).get(state)
+            if isinstance(summary, dict) and isinstance(previous, dict):
+                rows.append((name, state, previous['median_ms'], summary['median_ms']))
+    return rows
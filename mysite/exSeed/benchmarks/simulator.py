@@ -0,0 +1,207 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from ..clock import SimulatedClock, use_clock, FIRST_REGISTER_HOUR, LAST_REGISTER_HOUR
+from ..models import SpotRecord, default_campus_id
+from ..scheduler import due_runs, run_job
+from .dataset import add_players, engagement
+from .runner import LOCAL_CACHE, MOBILE_AGENT, queries_made
+
+"""
+Developer note:
+Plays a season day by day on a simulated game clock (see clock.py), so months of play take minutes, and measures what
+each day costs as the season's history grows. Each simulated day:
+    midnight  - the clock is set to midnight and the due jobs are run, as the scheduler would run them: averaging
+                yesterday's attendance, resetting streaks and choosing the spot of the day
+    opening   - at the start of registering hours one user loads the home page, which nobody has seen that day
+    the day   - each user goes to the spot with the chance given by their engagement, and registers through addScore
+                at a random time in registering hours, in the order they arrived
+Everything goes through the same code the server runs (the jobs' run log, the views, their middleware and signals), so
+a change to any of it shows up in the costs. A cache local to this process is used, so nothing is shared with a
+running server. The rate limits are turned off, as a simulated day's requests are made far faster than real ones.
+
+The season is played in whatever database is in use. The simulate_season command makes a throwaway one for it, as the
+jobs reset the streaks of, and choose spots from, everything in the database.
+"""
+
+
+class DayCost:
+    """What one simulated day cost
+
+    Attributes:
+        day (datetime.date): The day
+        jobs (dict): {job name: (seconds, queries)} for each midnight job
+        home (tuple[float, int]): (seconds, queries) for the first home page of the day
+        registers (list[tuple[float, int]]): (seconds, queries) for each addScore request
+        total_registers (int): Registers in the database by the end of the day
+    """
+
+    def __init__(self, day):
+        self.day = day
+        self.jobs = {}
+        self.home = (0.0, 0)
+        self.registers = []
+        self.total_registers = 0
+
+    @property
+    def rollover_ms(self) -> float:
+        return sum(seconds for seconds, _ in self.jobs.values()) * 1000
+
+    @property
+    def register_ms(self) -> float:
+        """The median addScore time, in milliseconds"""
+        return statistics.median(seconds for seconds, _ in self.registers) * 1000 if self.registers else 0.0
+
+    @property
+    def register_queries(self) -> float:
+        return statistics.fmean(queries for _, queries in self.registers) if self.registers else 0.0
+
+    def row(self) -> dict:
+        """The day's costs as one flat row, e.g. for a CSV file. Times are in milliseconds"""
+        row = {'day': self.day.isoformat(), 'rollover_ms': round(self.rollover_ms, 3)}
+        for name, (seconds, queries) in self.jobs.items():
+            row[name + '_ms'] = round(seconds * 1000, 3)
+            row[name + '_queries'] = queries
+        row.update({
+            'home_ms': round(self.home[0] * 1000, 3),
+            'home_queries': self.home[1],
+            'registers': len(self.registers),
+            'register_median_ms': round(self.register_ms, 3),
+            'register_queries': round(self.register_queries, 2),
+            'register_total_ms': round(sum(seconds for seconds, _ in self.registers) * 1000, 3),
+            'total_registers': self.total_registers,
+        })
+        return row
+
+
+def _timed_job(scheduled, fire) -> tuple[float, int]:
+    """Runs a job, returning how long it took and how many queries it made"""
+    with CaptureQueriesContext(connection) as queries:
+        start = time.perf_counter()
+        run_job(scheduled, fire)
+        duration = time.perf_counter() - start
+    return duration, len(queries.captured_queries)
+
+
+def _timed_request(method, *args):
+    """Makes a request with the test client, returning the response with how long it took and how many queries it
+    made (counted by the metrics middleware, which also counts the queries async views make on other threads)
+    """
+    before = queries_made()
+    start = time.perf_counter()
+    response = method(*args)
+    return response, time.perf_counter() - start, int(queries_made() - before)
+
+
+class SeasonSimulator:
+    """Plays a season of synthetic users on a simulated clock
+
+    Attributes:
+        clock (SimulatedClock): The clock the views and jobs read while the season is played
+        players (list[tuple[User, float]]): Each user, with the chance they go to the spot on a given day
+    """
+
+    def __init__(self, users, spots, start, prefix='sim', random_seed=1):
+        self.rng = random.Random(random_seed)
+        user_ids, _ = add_players(users, spots, prefix=prefix, random_seed=random_seed)
+        by_pk = User.objects.in_bulk(user_ids)
+        self.players = [(by_pk[pk], engagement(self.rng)) for pk in user_ids]
+        self.clock = SimulatedClock(datetime.datetime.combine(start, datetime.time()))
+        self._clients = {}
+        self.registers = 0
+
+    def client(self, user) -> Client:
+        """A logged in client for a user, made the first time they play and kept, as their phone keeps its session"""
+        if user.pk not in self._clients:
+            self._clients[user.pk] = Client(HTTP_USER_AGENT=MOBILE_AGENT)
+            self._clients[user.pk].force_login(user)
+        return self._clients[user.pk]
+
+    def midnight(self, cost):
+        """Runs the jobs due at midnight, as the scheduler would"""
+        for scheduled, fire in due_runs(self.clock.now()):
+            cost.jobs[scheduled.name] = _timed_job(scheduled, fire)
+
+    def arrivals(self, day) -> list[tuple[datetime.datetime, User]]:
+        """Who goes to the spot on a day, and when, in the order they arrive"""
+        opening = datetime.datetime.combine(day, datetime.time(FIRST_REGISTER_HOUR))
+        seconds_open = (LAST_REGISTER_HOUR + 1 - FIRST_REGISTER_HOUR) * 3600
+        return sorted(((opening + datetime.timedelta(seconds=self.rng.randrange(seconds_open)), user)
+                       for user, chance in self.players if self.rng.random() < chance), key=lambda arrival: arrival[0])
+
+    def play_day(self, day) -> DayCost:
+        """Plays one day, from midnight to the last user registering
+
+        Raises:
+            RuntimeError: If a request fails, as the costs after it would mean nothing
+        """
+        cost = DayCost(day)
+        self.clock.set(datetime.datetime.combine(day, datetime.time()))
+        self.midnight(cost)
+
+        record = SpotRecord.objects.select_related('sId').get(campus_id=default_campus_id(), spotDay=day)
+        self.clock.set(datetime.datetime.combine(day, datetime.time(FIRST_REGISTER_HOUR)))
+        response, seconds, queries = _timed_request(self.client(self.players[0][0]).get, '/')
+        if response.status_code != 200:
+            raise RuntimeError("The home page returned %d on %s" % (response.status_code, day))
+        cost.home = (seconds, queries)
+
+        position = {'latitude': str(record.sId.latitude), 'longitude': str(record.sId.longitude)}
+        for arrival, user in self.arrivals(day):
+            self.clock.set(arrival)
+            data = {'star': self.rng.randint(1, 5), **position}
+            response, seconds, queries = _timed_request(self.client(user).post, '/addScore', data)
+            if response.status_code != 302:
+                raise RuntimeError("addScore returned %d for %s on %s" % (response.status_code, user, day))
+            cost.registers.append((seconds, queries))
+        self.registers += len(cost.registers)
+        cost.total_registers = self.registers
+        return cost
+
+    def play(self, days, progress=None) -> list[DayCost]:
+        """Plays the season
+
+        Args:
+            days (int): How many days to play, from the clock's start
+            progress (function): Called with each day's DayCost as it finishes
+
+        Returns:
+            list[DayCost]: Each day's costs
+        """
+        first_day = self.clock.today()
+        hosts = settings.ALLOWED_HOSTS + ['testserver']  # The test client's host name
+        costs = []
+        overrides = {'CACHES': LOCAL_CACHE, 'ALLOWED_HOSTS': hosts, 'DEBUG': False, 'RATE_LIMITS': {}}
+        with use_clock(self.clock), override_settings(**overrides):
+            for number in range(days):
+                costs.append(self.play_day(first_day + datetime.timedelta(days=number)))
+                if progress is not None:
+                    progress(costs[-1])
+        return costs
+
+
+def simulate(days, users, spots, start=None, prefix='sim', random_seed=1, progress=None) -> list[DayCost]:
+    """Adds users and spots, and plays a season with them. See SeasonSimulator
+
+    Args:
+        days (int): How many days to play
+        users (int): How many users play
+        spots (int): How many spots there are to choose from
+        start (datetime.date): The first day of the season. Defaults to today
+        prefix (str): The start of every username
+        random_seed (int): The same seed always plays the same season
+        progress (function): Called with each day's DayCost as it finishes
+
+    Returns:
+        list[DayCost]: Each day's costs
+    """
+    simulator = SeasonSimulator(users, spots, start or datetime.date.today(), prefix, random_seed)
+    return simulator.play(days, progress)
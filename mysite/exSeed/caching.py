@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import time
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import clock
+
+"""
+Developer note:
+Pages are cached per user, under a key made from the view, the user, their device and the current 'version' of every
+piece of data the page is built from. Versions are counters held in the cache itself:
+    spot          - today's spot, its attendance and its ratings graph
+    scoreboard    - anything shown on the leaderboard (scores, titles, avatars and usernames)
+    avatars       - the avatar catalogue
+    user:<pk>     - a single user's UserInfo
+spot and scoreboard are also kept per campus, as spot:<campus> and scoreboard:<campus> (see campuses.py). A page
+built from one campus's data depends on both the campus's version and the site-wide one, so a change on one campus
+only bumps that campus's version, and a change that affects every campus (e.g. an avatar's image) bumps the
+site-wide one. When data changes, the signal receivers in signals.py bump the matching versions, so the next request
+builds a new key and misses the cache. Stale entries are never deleted, they just stop being looked up and expire after
+VIEW_CACHE_TIMEOUT. A cache hit does not touch the database.
+"""
+
+VIEW_CACHE_TIMEOUT = getattr(settings, 'VIEW_CACHE_TIMEOUT', 60 * 60 * 24)
+VERSION_PREFIX = 'exseed:version:'
+
+
+def get_versions(names) -> list:
+    """Reads the current version of each named piece of data, starting a version for any that don't have one yet"""
+    keys = [VERSION_PREFIX + name for name in names]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            # A timestamp rather than 1, so a version that has been evicted never repeats a number used before
+            found[key] = time.time_ns()
+            cache.add(key, found[key], None)
+            found[key] = cache.get(key, found[key])  # Another process may have added it first
+        versions.append(found[key])
+    return versions
+
+
+def bump_version(*names):
+    """Marks named pieces of data as changed, so every cached page built from them is rebuilt on its next request"""
+    for name in names:
+        key = VERSION_PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:  # The version isn't in the cache yet
+            cache.set(key, time.time_ns(), None)
+
+
+def user_version(user_pk) -> str:
+    """The version name for one user's data"""
+    return 'user:%s' % user_pk
+
+
+def campus_version(name, campus_pk) -> str:
+    """The version name for one campus's copy of a piece of data, e.g. 'scoreboard:2', for bumping"""
+    return '%s:%s' % (name, campus_pk)
+
+
+def campus_versions(name, campus_pk) -> list:
+    """The version names a page built from one campus's copy of a piece of data depends on: the campus's own, and the
+    site-wide one that is bumped when every campus's copy changes
+    """
+    return [name, campus_version(name, campus_pk)]
+
+
+def view_cache_key(view_name, request, versions) -> str:
+    """Builds the cache key for a page
+
+    The key includes the user's browser (user agent) and CSRF secret, as the page contains a CSRF token tied to that
+    secret and mobile and desktop users are shown different pages. The secret is read from request.META, where the CSRF
+    middleware puts the secret from the cookie, or the new secret it is about to send if the browser had none.
+    Today's date (on the game clock) is included as the spot of the day changes at midnight.
+    """
+    device = hashlib.md5((request.META.get('HTTP_USER_AGENT', '') + '|' +
+                          request.META.get('CSRF_COOKIE', '')).encode()).hexdigest()
+    return 'exseed:view:%s:%s:%s:%s:%s:%s' % (
+        view_name, request.user.pk, device, clock.today().isoformat(),
+        hashlib.md5(request.GET.urlencode().encode()).hexdigest(), '.'.join(str(v) for v in versions))
+
+
+def cache_per_user(view_name, depends_on):
+    """Caches a view's successful GET responses per user, until the data they depend on changes
+
+    Must be placed below @login_required (or @async_login_required for async views, which are cached the same way).
+
+    Args:
+        view_name (str): A name for the view, used in the cache key
+        depends_on (function): Takes the request and returns the list of version names the page is built from
+
+    Returns:
+        function: The decorator
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                if request.method != 'GET' or not request.user.is_authenticated:
+                    return await view(request, *args, **kwargs)
+                # depends_on may look up the user's campus, which can need the database
+                versions = await sync_to_async(lambda: get_versions(depends_on(request)))()
+                response = await cache.aget(view_cache_key(view_name, request, versions))
+                if response is not None:
+                    return response
+                response = await view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.streaming:
+                    await cache.aset(view_cache_key(view_name, request, versions), response, VIEW_CACHE_TIMEOUT)
+                return response
+            return async_wrapper
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method != 'GET' or not request.user.is_authenticated:
+                return view(request, *args, **kwargs)
+            versions = get_versions(depends_on(request))
+            response = cache.get(view_cache_key(view_name, request, versions))
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            # Redirects (e.g. to the pledge page) are not cached, as they depend on things other than the versions.
+            # The key is rebuilt as rendering the page may have created the browser's CSRF secret
+            if response.status_code == 200 and not response.streaming:
+                cache.set(view_cache_key(view_name, request, versions), response, VIEW_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Campus, UserInfo, default_campus_id
+
+"""
+Developer note:
+Each campus is run as its own game: its own spots, its own spot of the day (SpotRecord is unique on campus and day),
+and its own leaderboards. A user plays on one campus, held on their UserInfo. Registers belong to a campus through
+their spot of the day.
+
+So that adding campuses doesn't slow the others down, nothing a page or a job reads crosses campuses:
+    - the indexes on UserInfo, SpotRecord and SpotRecommendation start with the campus, so ranking one campus's
+      leaderboard, or finding its spot of the day, only reads that campus's rows
+    - the cached pages depend on per-campus versions ('spot:<campus>' and 'scoreboard:<campus>', see caching.py), so a
+      register on one campus doesn't throw away the cached pages of every other campus
+    - live updates (see live.py) are published per campus
+    - the midnight jobs choose a spot of the day and average the attendance for each campus in turn
+The spot index (see geo.py) still holds every spot, as finding spots near a position doesn't depend on the campus.
+
+Pages find the campus of the user asking with campus_of(), which is cached, so a cached page still needs no queries.
+"""
+
+CAMPUS_CACHE_TIMEOUT = getattr(settings, 'USER_CACHE_TIMEOUT', 60 * 60)
+CAMPUS_KEY_PREFIX = 'exseed:campus-of:'
+
+
+def campus_of(user_pk) -> int:
+    """The campus a user plays on. Users without a UserInfo (e.g. superusers) see the default campus
+
+    Args:
+        user_pk (int): The user's primary key
+
+    Returns:
+        int: The campus's primary key
+    """
+    key = CAMPUS_KEY_PREFIX + str(user_pk)
+    campus_pk = cache.get(key)
+    if campus_pk is None:
+        campus_pk = UserInfo.objects.filter(user_id=user_pk).values_list('campus_id', flat=True).first()
+        if campus_pk is None:
+            return default_campus_id()  # Not cached, as signing up adds the UserInfo after the user
+        cache.set(key, campus_pk, CAMPUS_CACHE_TIMEOUT)
+    return campus_pk
+
+
+def forget_campus(user_pk):
+    """Removes a user's campus from the cache, so it is looked up again. Called whenever their UserInfo changes"""
+    cache.delete(CAMPUS_KEY_PREFIX + str(user_pk))
+
+
+def get_campus(code=None) -> Campus:
+    """Finds a campus by its code, for the management commands
+
+    Args:
+        code (str): The campus's code. Defaults to the default campus
+
+    Raises:
+        ValueError: There is no campus with that code
+
+    Returns:
+        Campus: The campus
+    """
+    if code is None:
+        return Campus.objects.get(pk=default_campus_id())
+    campus = Campus.objects.filter(code=code).first()
+    if campus is None:
+        codes = ", ".join(Campus.objects.values_list('code', flat=True))
+        raise ValueError("There is no campus '%s' (choose from %s)" % (code, codes))
+    return campus
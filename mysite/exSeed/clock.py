@@ -0,0 +1,115 @@
+import datetime
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+"""
+Developer note:
+The game's idea of the current date and time. The views, the registering hours check and the daily jobs read the time
+from here rather than from datetime.date.today() and datetime.datetime.now(), so a different clock can be put in to
+play out a season faster than real time (see benchmarks/simulator.py), or to try registering outside the real
+registering hours. Times are naive local times, as datetime.datetime.now() gives.
+
+The clock is shared by the whole process, including the threads the async views' queries run in. It is set from the
+GAME_CLOCK setting when the app starts, and can be swapped with set_clock() or, for a block of code, use_clock().
+"""
+
+# Users can register their attendance from the start of FIRST_REGISTER_HOUR to the end of LAST_REGISTER_HOUR
+FIRST_REGISTER_HOUR = 9
+LAST_REGISTER_HOUR = 16
+
+
+class Clock:
+    """The real time"""
+
+    def now(self) -> datetime.datetime:
+        return datetime.datetime.now()
+
+    def today(self) -> datetime.date:
+        return self.now().date()
+
+
+class SimulatedClock(Clock):
+    """A clock that only moves when it is told to
+
+    Attributes:
+        current (datetime.datetime): The time it shows
+    """
+
+    def __init__(self, start):
+        self.current = start
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime.datetime:
+        return self.current
+
+    def set(self, moment):
+        """Moves the clock to a time, which can be earlier than the time it shows"""
+        with self._lock:
+            self.current = moment
+
+    def advance(self, delta):
+        """Moves the clock on by a datetime.timedelta"""
+        with self._lock:
+            self.current += delta
+
+
+_clock = Clock()
+
+
+def get_clock() -> Clock:
+    return _clock
+
+
+def set_clock(clock):
+    """Makes a clock the one the whole process reads the time from
+
+    Args:
+        clock (Clock): The new clock
+    """
+    global _clock
+    _clock = clock
+
+
+def install_clock():
+    """Sets the clock from the GAME_CLOCK setting (the dotted path of a Clock class), or the real time if unset"""
+    path = getattr(settings, 'GAME_CLOCK', None)
+    set_clock(import_string(path)() if path else Clock())
+
+
+@contextmanager
+def use_clock(clock):
+    """Reads the time from a clock within a with block, then puts the previous clock back"""
+    previous = get_clock()
+    set_clock(clock)
+    try:
+        yield clock
+    finally:
+        set_clock(previous)
+
+
+def now() -> datetime.datetime:
+    return _clock.now()
+
+
+def today() -> datetime.date:
+    return _clock.today()
+
+
+def current_time() -> datetime.time:
+    return _clock.now().time()
+
+
+def registering_open(time=None) -> bool:
+    """Whether users can register their attendance at a time
+
+    Args:
+        time (datetime.time): The time to check. Defaults to the current time
+
+    Returns:
+        bool: True from the start of FIRST_REGISTER_HOUR to the end of LAST_REGISTER_HOUR
+    """
+    hour = (time or current_time()).hour
+    return FIRST_REGISTER_HOUR <= hour <= LAST_REGISTER_HOUR
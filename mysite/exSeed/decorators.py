@@ -0,0 +1,34 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import resolve_url
+
+"""
+Developer note:
+The async views in views.py (home_page, leaderboard, profile_page and compass) can't use Django's @login_required, as
+this version of Django only supports it on normal views. Under ASGI these views run in the event loop, where the
+database can only be used through the async ORM or sync_to_async.
+"""
+
+
+def async_login_required(view):
+    """The same as @login_required(), for async views. Unauthenticated users are redirected to the login page
+
+    The session and user are loaded here (in a thread, as this may query the database), so the view can use
+    request.user and request.session without blocking the event loop.
+
+    Args:
+        view (function): The async view to protect
+
+    Returns:
+        function: The wrapped view
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        is_authenticated = await sync_to_async(lambda: request.user.is_authenticated)()
+        if not is_authenticated:
+            return redirect_to_login(request.get_full_path(), resolve_url(settings.LOGIN_URL))
+        return await view(request, *args, **kwargs)
+    return wrapper
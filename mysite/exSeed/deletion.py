@@ -0,0 +1,204 @@
+import datetime
+import logging
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AccountDeletion, UserInfo, UserRegister, GameEvent
+from .caching import bump_version, user_version, campus_version
+
+"""
+Developer note:
+Deleting an account used to delete the User in the request, and the cascade loaded and removed every one of the user's
+registers in one transaction, holding SQLite's write lock for as long as that took (and sending a signal for each row).
+Now a deletion is queued instead. request_deletion() marks the account inactive straight away, which logs the user out
+everywhere, and adds an AccountDeletion row. The deletion is then carried out in the background:
+    1. the user's registers and game events are removed ACCOUNT_DELETION_CHUNK_SIZE rows at a time, each chunk in its
+       own short transaction with a pause of ACCOUNT_DELETION_PAUSE seconds after it, so other requests get the write
+       lock
+    2. their UserInfo is removed
+    3. the User is deleted, which now only has a few rows left to cascade to (e.g. their sessions)
+The cached pages are refreshed once at the end, rather than for every row. Each chunk updates the AccountDeletion row,
+so the admin shows how far along each deletion is.
+
+Deletions are started by a background thread in the process that queued them. A deletion is claimed by changing its
+status, so no two threads or processes carry out the same one. If a process stops part way through, the hourly
+account_deletions job (see maintenance.py) picks the deletion up again once it has made no progress for STALE_AFTER.
+Removing rows that are already gone does nothing, so a deletion can always be carried on from where it stopped.
+"""
+
+logger = logging.getLogger(__name__)
+
+STALE_AFTER = datetime.timedelta(minutes=10)  # A running deletion that hasn't made progress for this long is restarted
+CHUNKED_MODELS = (  # (model, the foreign key to the user) for the tables a user can have many rows in
+    (UserRegister, 'uId'),
+    (GameEvent, 'user'),
+)
+
+
+def chunk_size() -> int:
+    return getattr(settings, 'ACCOUNT_DELETION_CHUNK_SIZE', 500)
+
+
+def request_deletion(user, requested_by) -> AccountDeletion:
+    """Marks an account inactive and queues it to be deleted. Asking again for an account already queued returns the
+    deletion already waiting
+
+    Args:
+        user (User): The account to delete
+        requested_by (User): Who asked, i.e. the user or a member of staff
+
+    Returns:
+        AccountDeletion: The queued deletion
+    """
+    with transaction.atomic():
+        pending = AccountDeletion.objects.filter(userId=user.pk).exclude(status=AccountDeletion.DONE).first()
+        if pending is not None:
+            return pending
+        user.is_active = False
+        user.save(update_fields=['is_active'])  # Logs them out, as inactive users can't be loaded for a session
+        deletion = AccountDeletion.objects.create(username=user.username, userId=user.pk,
+                                                  requestedBy=requested_by.username, requestedAt=timezone.now())
+        transaction.on_commit(deletion_worker.start)
+    return deletion
+
+
+def _delete_chunk(model, foreign_key, user_pk, size) -> int:
+    """Removes up to `size` of a user's rows from a table in one query, without loading them or sending signals
+
+    Returns:
+        int: The number of rows removed
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    key = connection.ops.quote_name(model._meta.pk.column)
+    column = connection.ops.quote_name(model._meta.get_field(foreign_key).column)
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE %s IN (SELECT %s FROM %s WHERE %s = %%s LIMIT %d)'
+                       % (table, key, key, table, column, size), [user_pk])
+        return cursor.rowcount
+
+
+def claim(deletion) -> bool:
+    """Claims a queued deletion, or one whose process stopped part way through, for this thread
+
+    Returns:
+        bool: True if this thread is now the one carrying it out
+    """
+    now = timezone.now()
+    claimed = AccountDeletion.objects.filter(pk=deletion.pk).filter(
+        Q(status=AccountDeletion.QUEUED) | Q(status=AccountDeletion.RUNNING, updatedAt__lt=now - STALE_AFTER)
+    ).update(status=AccountDeletion.RUNNING, startedAt=deletion.startedAt or now, updatedAt=now)
+    return claimed == 1
+
+
+def carry_out(deletion):
+    """Deletes a claimed account, a chunk at a time, recording its progress on the AccountDeletion row
+
+    Args:
+        deletion (AccountDeletion): The deletion, claimed with claim()
+    """
+    user_pk = deletion.userId
+    try:
+        if deletion.rowsTotal == 0:
+            deletion.rowsTotal = sum(model.objects.filter(**{foreign_key + '_id': user_pk}).count()
+                                     for model, foreign_key in CHUNKED_MODELS) + 2  # The UserInfo and the User
+            AccountDeletion.objects.filter(pk=deletion.pk).update(rowsTotal=deletion.rowsTotal)
+        for model, foreign_key in CHUNKED_MODELS:
+            while True:
+                removed = _delete_chunk(model, foreign_key, user_pk, chunk_size())
+                if removed == 0:
+                    break
+                deletion.rowsDeleted = min(deletion.rowsDeleted + removed, deletion.rowsTotal)
+                AccountDeletion.objects.filter(pk=deletion.pk).update(rowsDeleted=deletion.rowsDeleted,
+                                                                      updatedAt=timezone.now())
+                time.sleep(getattr(settings, 'ACCOUNT_DELETION_PAUSE', 0.05))
+        campus_pk = UserInfo.objects.filter(user_id=user_pk).values_list('campus_id', flat=True).first()
+        with transaction.atomic():
+            UserInfo.objects.filter(user_id=user_pk).delete()
+            User.objects.filter(pk=user_pk).delete()
+        # Their ratings and scores are no longer shown on their campus's pages (or on any campus's, if a deletion that
+        # stopped part way through had already removed their UserInfo)
+        if campus_pk is None:
+            bump_version('spot', 'scoreboard', user_version(user_pk))
+        else:
+            bump_version(campus_version('spot', campus_pk), campus_version('scoreboard', campus_pk),
+                         user_version(user_pk))
+        AccountDeletion.objects.filter(pk=deletion.pk).update(
+            status=AccountDeletion.DONE, rowsDeleted=deletion.rowsTotal, finishedAt=timezone.now(),
+            updatedAt=timezone.now())
+    except Exception:
+        logger.exception("Deleting %s failed", deletion.username)
+        AccountDeletion.objects.filter(pk=deletion.pk).update(status=AccountDeletion.FAILED,
+                                                              output=traceback.format_exc(), updatedAt=timezone.now())
+
+
+def process_deletions() -> int:
+    """Carries out every deletion that is queued, or was left part way through by a process that stopped
+
+    Returns:
+        int: How many deletions this call carried out
+    """
+    carried_out = 0
+    stale = timezone.now() - STALE_AFTER
+    waiting = Q(status=AccountDeletion.QUEUED) | Q(status=AccountDeletion.RUNNING, updatedAt__lt=stale)
+    for deletion in AccountDeletion.objects.filter(waiting).order_by('requestedAt'):
+        if claim(deletion):
+            carry_out(deletion)
+            carried_out += 1
+    return carried_out
+
+
+class DeletionWorker:
+    """The background thread that carries out this process's queued deletions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._running = False
+        self._again = False
+
+    def start(self):
+        """Starts the thread, or has it look for more deletions before it stops if it is already running"""
+        with self._lock:
+            if self._running:
+                self._again = True
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='exseed-deletions', daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout=None) -> bool:
+        """Waits for the thread to finish
+
+        Returns:
+            bool: True if it has finished
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return thread is None or not thread.is_alive()
+
+    def _run(self):
+        try:
+            while True:
+                try:
+                    process_deletions()
+                except Exception:
+                    logger.exception("Looking for account deletions failed")
+                with self._lock:
+                    if not self._again:
+                        self._running = False
+                        return
+                    self._again = False
+        finally:
+            connection.close()  # This thread's own connection
+
+
+deletion_worker = DeletionWorker()
+
@@ -0,0 +1,357 @@
+import datetime
+import itertools
+import json
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from . import clock
+from .models import GameEvent, ProjectionCheckpoint, DailyStats, UserInfo
+from .caching import bump_version, user_version, campus_version
+
+"""
+Developer note:
+Every game action is added to GameEvent, an append-only log: a register, a streak reset at midnight, a title change
+and an avatar change. Each event is a kind code, the user, the game day and one number (or, for a title, the text).
+Events are never changed or removed, except with the user's account. Stats that reconcile_stats finds to be wrong are
+put right with a correction event (see correction()), rather than by changing UserInfo, so a rebuild keeps them.
+
+The stats the pages read are projections of the log. A projection is a class registered with @projection, with an
+apply() that folds a batch of events (in log order) into its read model, and a reset() that empties the read model.
+Each projection's ProjectionCheckpoint row records the last event it applied, so catch_up() only applies the events
+added since, and rebuild() resets a projection and applies the whole log again. A new read model is added by writing
+a projection, without changing the views that add the events.
+    user_stats   - UserInfo's points, streak, last register, title and avatar. Inline: it is caught up in the same
+                   transaction as record(), so the pages show a user's register as soon as it is made. It also
+                   invalidates the cached pages showing the users it changes, so the log drives the caches
+    daily_stats  - DailyStats, what happened each day. Caught up by the projections job every ten minutes
+A batch of events and the checkpoint saying they have been applied are saved in one transaction, so a projection that
+fails part way through carries on from its last batch. record() holds the inline projections' checkpoints while it adds
+events, so events are applied in the order they were added.
+
+The registers made before the log existed were added to it by backfill(), from migration 0012: each user's history
+(their registers, scored by addScore's rules, the streak resets the midnight job would have made, then their title and
+avatar). A user's history is in the order it happened, but the histories of different users are one after another.
+"""
+
+BATCH_SIZE = 2000  # Events applied per transaction
+PLACE_BONUS = (4, 3, 2, 1)  # Extra points for the first, second, third and fourth to register each day
+MAX_POINTS = 32767  # The most a PositiveSmallIntegerField holds
+DAILY_FIELDS = ('registers', 'points', 'streakResets', 'streakDaysLost')  # The counts kept in DailyStats
+CORRECTED_FIELDS = ('totalPoints', 'currentStreak', 'lastSpotRegister')  # The UserInfo stats a correction can set
+
+PROJECTIONS = {}  # Projection name -> Projection, in the order they were registered
+
+
+class Projection:
+    """A read model built from the event log
+
+    Attributes:
+        name (str): The name its checkpoint is kept under
+        inline (bool): Whether it is caught up in the same transaction as the events are recorded, rather than by the
+            projections job
+    """
+    name = None
+    inline = False
+
+    def apply(self, events):
+        """Folds a batch of events into the read model
+
+        Args:
+            events (list[GameEvent]): The events, in log order
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """Empties the read model, before the whole log is applied again"""
+        raise NotImplementedError
+
+
+def projection(cls):
+    """Registers a Projection class, so catch_up() and rebuild() keep its read model up to date"""
+    PROJECTIONS[cls.name] = cls()
+    return cls
+
+
+def record(*events) -> list[GameEvent]:
+    """Adds events to the log and applies them to the inline projections
+
+    Args:
+        *events (GameEvent): The new events, unsaved
+
+    Returns:
+        list[GameEvent]: The saved events
+    """
+    inline = [name for name, projected in PROJECTIONS.items() if projected.inline]
+    with transaction.atomic():
+        # Held until the transaction ends, so another process's events can't be added between these and their
+        # projection, and then applied after them
+        list(ProjectionCheckpoint.objects.select_for_update().filter(name__in=inline))
+        events = GameEvent.objects.bulk_create(events)
+        catch_up(inline)
+    return events
+
+
+def catch_up(names=None, batch_size=BATCH_SIZE) -> dict:
+    """Applies the events added since each projection's checkpoint
+
+    Args:
+        names (list[str]): The projections to catch up. Defaults to all of them
+        batch_size (int): Events applied per transaction
+
+    Returns:
+        dict[str, int]: How many events each projection applied
+    """
+    applied = {}
+    for name in names if names is not None else PROJECTIONS:
+        applied[name] = 0
+        while True:
+            with transaction.atomic():
+                checkpoint, _ = ProjectionCheckpoint.objects.select_for_update().get_or_create(name=name)
+                events = list(GameEvent.objects.filter(pk__gt=checkpoint.position).order_by('pk')[:batch_size])
+                if not events:
+                    break
+                PROJECTIONS[name].apply(events)
+                checkpoint.position = events[-1].pk
+                checkpoint.updatedAt = timezone.now()
+                checkpoint.save()
+            applied[name] += len(events)
+            if len(events) < batch_size:
+                break
+    return applied
+
+
+def rebuild(names=None, batch_size=BATCH_SIZE) -> dict:
+    """Empties projections' read models and applies the whole log to them again
+
+    Args:
+        names (list[str]): The projections to rebuild. Defaults to all of them
+        batch_size (int): Events applied per transaction
+
+    Returns:
+        dict[str, int]: How many events each projection applied
+    """
+    names = list(names if names is not None else PROJECTIONS)
+    for name in names:
+        with transaction.atomic():
+            PROJECTIONS[name].reset()
+            ProjectionCheckpoint.objects.update_or_create(name=name, defaults={'position': 0,
+                                                                               'updatedAt': timezone.now()})
+    return catch_up(names, batch_size)
+
+
+def status() -> list[tuple[str, int, int]]:
+    """Each projection's name, checkpoint and the number of events it has still to apply"""
+    positions = dict(ProjectionCheckpoint.objects.values_list('name', 'position'))
+    return [(name, positions.get(name, 0), GameEvent.objects.filter(pk__gt=positions.get(name, 0)).count())
+            for name in PROJECTIONS]
+
+
+def correction(user_pk, day, stats) -> GameEvent:
+    """An event setting some of a user's stats to what they should be, e.g. as worked out by reconcile.py
+
+    Args:
+        user_pk (int): The user
+        day (datetime.date): The game day the stats were worked out for
+        stats (dict): The corrected value of each of CORRECTED_FIELDS that was wrong
+
+    Returns:
+        GameEvent: The event, unsaved, for record()
+    """
+    return GameEvent(kind=GameEvent.CORRECTION, user_id=user_pk, day=day, text=json.dumps(stats, default=str))
+
+
+def backfill(user_pks=None, today=None, batch_size=BATCH_SIZE, registry=apps) -> int:
+    """Writes the history of users who have no events yet, from their registers. Their stats already include this
+    history, so the inline projections are moved past it rather than applying it again
+
+    Args:
+        user_pks (list[int]): The users to write the history of. Defaults to every user without events
+        today (datetime.date): The game day to write the history up to. Defaults to today on the game clock
+        batch_size (int): Users written at a time
+        registry (django.apps.registry.Apps): Where to find the models, so a migration can pass its historical ones
+
+    Returns:
+        int: How many events were added
+    """
+    event_model = registry.get_model('exSeed', 'GameEvent')
+    checkpoint_model = registry.get_model('exSeed', 'ProjectionCheckpoint')
+    info_model = registry.get_model('exSeed', 'UserInfo')
+    register_model = registry.get_model('exSeed', 'UserRegister')
+    today = today or clock.today()
+    infos = info_model.objects.filter(~Exists(event_model.objects.filter(user_id=OuterRef('user_id'))))
+    if user_pks is not None:
+        infos = infos.filter(user_id__in=user_pks)
+    user_pks = list(infos.order_by('user_id').values_list('user_id', flat=True))
+
+    # Who came first to fourth each day. There are at most four a day, so this is small
+    bonus = place_bonuses(register_model.objects.all(), batch_size)
+
+    added = 0
+    inline = [name for name, projected in PROJECTIONS.items() if projected.inline]
+    for start in range(0, len(user_pks), batch_size):
+        chunk = user_pks[start:start + batch_size]
+        events = []
+        registers = (register_model.objects.filter(uId_id__in=chunk).order_by('uId_id', 'srId__spotDay', 'pk')
+                     .values_list('uId_id', 'srId_id', 'srId__spotDay'))
+        for user_pk, user_registers in itertools.groupby(registers.iterator(chunk_size=batch_size),
+                                                         key=lambda row: row[0]):
+            events += [event_model(**fields) for fields in _history(user_pk, user_registers, bonus, today)]
+        for user_pk, title, avatar_pk in (info_model.objects.filter(user_id__in=chunk)
+                                          .values_list('user_id', 'title', 'avatarId_id')):
+            if title:
+                events.append(event_model(kind=GameEvent.TITLE_CHANGE, user_id=user_pk, day=today, text=title))
+            events.append(event_model(kind=GameEvent.AVATAR_CHANGE, user_id=user_pk, day=today, value=avatar_pk))
+        with transaction.atomic():
+            head = event_model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            event_model.objects.bulk_create(events, batch_size=batch_size)
+            new_head = event_model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+            for name in inline:
+                checkpoint, _ = checkpoint_model.objects.select_for_update().get_or_create(name=name)
+                if checkpoint.position == head:  # Only when it had applied everything before this history
+                    checkpoint.position = new_head
+                    checkpoint.save()
+        added += len(events)
+    return added
+
+
+def place_bonuses(registers, chunk_size=BATCH_SIZE) -> dict:
+    """The extra points for being the first, second, third or fourth to register at each spot of the day. The first
+    four are picked as the registers are streamed in registerTime order, rather than by filtering on a window function,
+    which not every database (or Django before 4.2) allows
+
+    Args:
+        registers (QuerySet): The UserRegister rows to look through
+        chunk_size (int): Rows fetched at a time
+
+    Returns:
+        dict[tuple[int, int], int]: The extra points for each (spot record, user). A user registered twice on the same
+            day (which a race can cause) gets the larger
+    """
+    bonus = {}
+    ordered = registers.order_by('srId_id', 'registerTime', 'pk').values_list('srId_id', 'uId_id')
+    for record_pk, day_registers in itertools.groupby(ordered.iterator(chunk_size=chunk_size), key=lambda row: row[0]):
+        for (_, user_pk), extra in zip(day_registers, PLACE_BONUS):
+            bonus[record_pk, user_pk] = max(bonus.get((record_pk, user_pk), 0), extra)
+    return bonus
+
+
+def _history(user_pk, registers, bonus, today) -> list[dict]:
+    """A user's registers and streak resets, in the order they happened
+
+    Args:
+        user_pk (int): The user
+        registers (iterable[tuple[int, int, datetime.date]]): Their (user, spot record, day) registers, by day
+        bonus (dict[tuple[int, int], int]): The extra points for each (spot record, user) in a day's first four
+        today (datetime.date): The day the history runs up to
+
+    Returns:
+        list[dict]: The fields of each event
+    """
+    events = []
+    streak, last = 0, None
+    for record_pk, day_registers in itertools.groupby(registers, key=lambda row: row[1]):
+        day = next(day_registers)[2]  # A second register on the same day (which a race can cause) counts once
+        if last is not None and day - last > datetime.timedelta(days=1):
+            # Reset by the midnight job of the day after the one they missed
+            events.append({'kind': GameEvent.STREAK_RESET, 'user_id': user_pk,
+                           'day': last + datetime.timedelta(days=2), 'value': streak})
+            streak = 0
+        events.append({'kind': GameEvent.REGISTER, 'user_id': user_pk, 'day': day,
+                       'value': 1 + bonus.get((record_pk, user_pk), 0)})
+        streak, last = streak + 1, day
+    if last is not None and today - last > datetime.timedelta(days=1):
+        events.append({'kind': GameEvent.STREAK_RESET, 'user_id': user_pk,
+                       'day': last + datetime.timedelta(days=2), 'value': streak})
+    return events
+
+
+@projection
+class UserStats(Projection):
+    """UserInfo's points, streak, last register, title and avatar"""
+    name = 'user_stats'
+    inline = True
+
+    def apply(self, events):
+        infos = {info.user_id: info for info in UserInfo.objects.filter(user_id__in={event.user_id for event in events})
+                 .only('pk', 'user_id', 'campus_id', 'totalPoints', 'currentStreak', 'lastSpotRegister', 'title',
+                       'avatarId')}
+        changed, fields = {}, set()
+        for event in events:
+            info = infos.get(event.user_id)
+            if info is None:
+                continue  # The user's account is being deleted
+            if event.kind == GameEvent.REGISTER:
+                info.totalPoints = min(info.totalPoints + event.value, MAX_POINTS)
+                # Worked out from the last register, as reconcile.py does, so the streak is right even if the
+                # midnight job that resets it hasn't run yet (e.g. it catches up after registering has opened)
+                if info.lastSpotRegister != event.day:
+                    continues = (info.lastSpotRegister is not None
+                                 and event.day - info.lastSpotRegister == datetime.timedelta(days=1))
+                    info.currentStreak = info.currentStreak + 1 if continues else 1
+                info.lastSpotRegister = event.day
+                fields.update(('totalPoints', 'currentStreak', 'lastSpotRegister'))
+            elif event.kind == GameEvent.STREAK_RESET:
+                info.currentStreak = 0
+                fields.add('currentStreak')
+            elif event.kind == GameEvent.TITLE_CHANGE:
+                info.title = event.text
+                fields.add('title')
+            elif event.kind == GameEvent.AVATAR_CHANGE:
+                info.avatarId_id = event.value
+                fields.add('avatarId')
+            elif event.kind == GameEvent.CORRECTION:
+                stats = {field: value for field, value in json.loads(event.text).items() if field in CORRECTED_FIELDS}
+                if stats.get('lastSpotRegister') is not None:
+                    stats['lastSpotRegister'] = datetime.date.fromisoformat(stats['lastSpotRegister'])
+                for field, value in stats.items():
+                    setattr(info, field, value)
+                fields.update(stats)
+            changed[info.pk] = info
+        if changed:
+            UserInfo.objects.bulk_update(list(changed.values()), sorted(fields))
+            # bulk_update() sends no signals, so the cached pages showing these users, and their campuses'
+            # leaderboards, are invalidated here
+            campuses = {campus_version('scoreboard', info.campus_id) for info in changed.values()}
+            bump_version(*campuses, *[user_version(info.user_id) for info in changed.values()])
+
+    def reset(self):
+        # Titles and avatars are kept, as users who never changed them have no events to set them again
+        UserInfo.objects.update(totalPoints=0, currentStreak=0, lastSpotRegister=None)
+        bump_version('scoreboard')
+
+
+@projection
+class DailyStatsProjection(Projection):
+    """DailyStats, what happened in the game each day"""
+    name = 'daily_stats'
+
+    def apply(self, events):
+        days = {}
+        for event in events:
+            if event.kind not in (GameEvent.REGISTER, GameEvent.STREAK_RESET):
+                continue
+            stats = days.setdefault(event.day, dict.fromkeys(DAILY_FIELDS, 0))
+            if event.kind == GameEvent.REGISTER:
+                stats['registers'] += 1
+                stats['points'] += event.value
+            else:
+                stats['streakResets'] += 1
+                stats['streakDaysLost'] += event.value or 0
+        if not days:
+            return
+        DailyStats.objects.bulk_create([DailyStats(day=day) for day in days], ignore_conflicts=True)
+        # One statement run for every day, adding to the totals. A batch of backfilled history covers hundreds of
+        # days, which bulk_update() would write as a CASE for each column
+        quote = connection.ops.quote_name
+        columns = [quote(DailyStats._meta.get_field(field).column) for field in DAILY_FIELDS]
+        with connection.cursor() as cursor:
+            cursor.executemany('UPDATE %s SET %s WHERE %s = %%s' % (
+                quote(DailyStats._meta.db_table), ', '.join('%s = %s + %%s' % (column, column) for column in columns),
+                quote('day')), [[stats[field] for field in DAILY_FIELDS] + [connection.ops.adapt_datefield_value(day)]
+                                for day, stats in days.items()])
+
+    def reset(self):
+        DailyStats.objects.all().delete()
@@ -0,0 +1,160 @@
+import csv
+import datetime
+import json
+
+from django.db.models import Q
+
+from .models import UserRegister, SpotRecord, UserInfo
+
+"""
+Developer note:
+Exports are built from .values_list() querysets that are read with .iterator(), so no model instances (and none of
+their FK-heavy __str__ methods) are created, and only CHUNK_SIZE rows are ever held in memory at once. This keeps
+memory use flat no matter how large the register grows.
+"""
+
+CHUNK_SIZE = 2000  # Number of rows fetched from the database per round trip
+EXPORT_FORMATS = ('csv', 'jsonl')
+
+# Each dataset maps to the columns that are exported, in the order they appear in the file
+DATASET_COLUMNS = {
+    'registers': (
+        ('id', 'id'),
+        ('username', 'uId__username'),
+        ('spot_day', 'srId__spotDay'),
+        ('spot_name', 'srId__sId__name'),
+        ('rating', 'spotNiceness'),
+        ('register_time', 'registerTime'),
+        ('register_time_editable', 'registerTimeEditable'),
+    ),
+    'spotrecords': (
+        ('id', 'id'),
+        ('spot_day', 'spotDay'),
+        ('spot_id', 'sId_id'),
+        ('spot_name', 'sId__name'),
+        ('attendance', 'attendance'),
+    ),
+    'userinfo': (
+        ('user_id', 'user_id'),
+        ('username', 'user__username'),
+        ('title', 'title'),
+        ('avatar', 'avatarId__avatarTitle'),
+        ('total_points', 'totalPoints'),
+        ('current_streak', 'currentStreak'),
+        ('last_register', 'lastSpotRegister'),
+        ('has_taken_pledge', 'hasTakenPledge'),
+    ),
+}
+
+
+class Echo:
+    """A file-like object that hands back whatever is written to it, so csv.writer can be used to build single
+    lines for a streamed response without buffering the whole file
+    """
+    def write(self, value):
+        return value
+
+
+def parse_date(value, argument_name):
+    """Converts an ISO formatted date (YYYY-MM-DD) into a datetime.date
+
+    Args:
+        value (str): The date supplied by the user. Can be empty
+        argument_name (str): The name of the argument, used in the error message
+
+    Raises:
+        ValueError: The value is not a valid ISO date
+
+    Returns:
+        datetime.date: The parsed date, or None if no value was supplied
+    """
+    if not value:
+        return None
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError("'%s' must be a date in the format YYYY-MM-DD, not '%s'" % (argument_name, value))
+
+
+def _spot_filter(prefix, spot):
+    """Builds a filter matching a spot by its primary key or its name"""
+    if str(spot).isdigit():
+        return Q(**{prefix + 'pk': int(spot)})
+    return Q(**{prefix + 'name': spot})
+
+
+def export_queryset(dataset, start=None, end=None, spot=None):
+    """Builds the values_list queryset for one of the exportable datasets
+
+    Args:
+        dataset (str): One of the keys of DATASET_COLUMNS
+        start (datetime.date): Only include rows on or after this date. Optional
+        end (datetime.date): Only include rows on or before this date. Optional
+        spot (str): Only include rows related to this spot, given as a spot ID or name. Optional
+
+    Raises:
+        ValueError: The dataset is not recognised
+
+    Returns:
+        QuerySet: A queryset yielding one tuple per row, ordered by primary key
+    """
+    if dataset not in DATASET_COLUMNS:
+        raise ValueError("Unknown dataset '%s' (choose from %s)" % (dataset, ", ".join(DATASET_COLUMNS)))
+    lookups = [lookup for _, lookup in DATASET_COLUMNS[dataset]]
+
+    if dataset == 'registers':
+        queryset = UserRegister.objects.all()
+        date_field, spot_prefix = 'srId__spotDay', 'srId__sId__'
+    elif dataset == 'spotrecords':
+        queryset = SpotRecord.objects.all()
+        date_field, spot_prefix = 'spotDay', 'sId__'
+    else:
+        # For user stats the date range applies to the day the user last registered, and the spot filter keeps the
+        # users that have registered at that spot at least once
+        queryset = UserInfo.objects.all()
+        date_field, spot_prefix = 'lastSpotRegister', 'user__userregister__srId__sId__'
+
+    if start is not None:
+        queryset = queryset.filter(**{date_field + '__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{date_field + '__lte': end})
+    if spot:
+        queryset = queryset.filter(_spot_filter(spot_prefix, spot))
+        if dataset == 'userinfo':
+            queryset = queryset.distinct()  # A user can have registered at the same spot many times
+    return queryset.order_by('pk').values_list(*lookups)
+
+
+def stream_export(dataset, export_format='csv', start=None, end=None, spot=None):
+    """Generates an export one line at a time
+
+    Args:
+        dataset (str): One of the keys of DATASET_COLUMNS
+        export_format (str): Either 'csv' or 'jsonl'
+        start (datetime.date): Only include rows on or after this date. Optional
+        end (datetime.date): Only include rows on or before this date. Optional
+        spot (str): Only include rows related to this spot, given as a spot ID or name. Optional
+
+    Raises:
+        ValueError: The dataset or format is not recognised
+
+    Returns:
+        generator: Yields each line of the export as a string, starting with the header for csv exports
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError("Unknown format '%s' (choose from %s)" % (export_format, ", ".join(EXPORT_FORMATS)))
+    # The queryset is built (and validated) before the generator starts, so errors are raised to the caller straight away
+    queryset = export_queryset(dataset, start, end, spot)
+    header = [name for name, _ in DATASET_COLUMNS[dataset]]
+    return _generate_lines(queryset, header, export_format)
+
+
+def _generate_lines(queryset, header, export_format):
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(header)
+        for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+            yield writer.writerow(row)
+    else:
+        for row in queryset.iterator(chunk_size=CHUNK_SIZE):
+            yield json.dumps(dict(zip(header, row)), default=str) + "\n"  # default=str writes dates in ISO format
@@ -1,7 +1,7 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.models import User
-from .models import UserInfo
+from .models import UserInfo, Campus
 
 
 class SignupForm(UserCreationForm):
@@ -12,6 +12,12 @@ class SignupForm(UserCreationForm):
     @author: Sam Tebbet
     """
     email = forms.EmailField(max_length=200, help_text='Required')  # adds email functionality
+    campus = forms.ModelChoiceField(queryset=Campus.objects.all(), help_text='The campus you will play on')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if Campus.objects.count() < 2:
+            del self.fields['campus']  # Everyone plays on the default campus
 
     class Meta:
         """
@@ -0,0 +1,270 @@
+import heapq
+import math
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .caching import bump_version, get_versions
+
+"""
+Developer note:
+Spot co-ordinates are stored as Decimals, which are slow to do trigonometry with. The SpotIndex converts every spot to
+radians (and pre-computes the cosine of its latitude) once, when the index is built, so that checking a user's position
+only costs a few float operations per nearby spot. Spots are bucketed into a grid of GRID_CELL_DEGREES sized cells, so
+a lookup only has to look at the spots in the cells around the user, rather than at every spot in the catalogue.
+
+Each server process keeps its own index. When a spot is added, edited or removed, invalidate_spot_index() bumps the
+'spot-index' version in the shared cache (see caching.py), and every process rebuilds its index the next time it finds
+the version has changed. A geofence check for a spot the index doesn't have (e.g. one added a moment ago) rebuilds the
+index once before giving up.
+"""
+
+EARTH_RADIUS_METRES = 6371000
+GRID_CELL_DEGREES = 0.01  # Roughly 1.1km north to south
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_METRES / 180
+INDEX_MAX_AGE_SECONDS = 300  # Rebuilds the index every so often, in case a change was made without bumping the version
+INDEX_VERSION = 'spot-index'  # The cache version bumped whenever the spots change
+
+
+def geofence_radius():
+    """Returns how close (in metres) a user must be to a spot to register at it"""
+    return getattr(settings, 'SPOT_GEOFENCE_RADIUS', 50)
+
+
+def haversine(lat1, lng1, cos_lat1, lat2, lng2, cos_lat2) -> float:
+    """Calculates the great-circle distance between two points whose co-ordinates are already in radians
+
+    Args:
+        lat1 (float), lng1 (float): The first point, in radians
+        cos_lat1 (float): The cosine of lat1
+        lat2 (float), lng2 (float): The second point, in radians
+        cos_lat2 (float): The cosine of lat2
+
+    Returns:
+        float: The distance between the points in metres
+    """
+    sin_half_dlat = math.sin((lat2 - lat1) / 2)
+    sin_half_dlng = math.sin((lng2 - lng1) / 2)
+    a = sin_half_dlat * sin_half_dlat + cos_lat1 * cos_lat2 * sin_half_dlng * sin_half_dlng
+    return 2 * EARTH_RADIUS_METRES * math.asin(min(1.0, math.sqrt(a)))
+
+
+def to_point(latitude, longitude) -> tuple[float, float, float]:
+    """Converts a latitude/longitude in degrees (float, Decimal or str) into (lat radians, long radians, cos(lat))"""
+    lat = math.radians(float(latitude))
+    return lat, math.radians(float(longitude)), math.cos(lat)
+
+
+class SpotIndex:
+    """An in-memory grid index over the spot catalogue
+
+    Attributes:
+        points (dict): Maps each spot's primary key to its point, as returned by to_point()
+        details (dict): Maps each spot's primary key to the extra values it was built with (e.g. its name), so lookups
+            can be answered without going back to the database
+        cells (dict): Maps a grid cell (row, column) to the list of (spot pk, point) inside it
+        built_at (float): The time.monotonic() time the index was built
+        version (int): The 'spot-index' version it was built at, if it is the shared index (see get_spot_index())
+    """
+    def __init__(self, spots):
+        """
+        Args:
+            spots (iterable): Tuples of (spot pk, latitude, longitude, *details), e.g. from Spot.objects.values_list()
+        """
+        self.points = {}
+        self.details = {}
+        self.cells = defaultdict(list)
+        for pk, latitude, longitude, *details in spots:
+            point = to_point(latitude, longitude)
+            self.points[pk] = point
+            self.details[pk] = (float(latitude), float(longitude), *details)
+            self.cells[self.cell_for(latitude, longitude)].append((pk, point))
+        self.built_at = time.monotonic()
+        self.version = None
+
+    def __len__(self):
+        return len(self.points)
+
+    @staticmethod
+    def cell_for(latitude, longitude) -> tuple[int, int]:
+        return math.floor(float(latitude) / GRID_CELL_DEGREES), math.floor(float(longitude) / GRID_CELL_DEGREES)
+
+    def distance_to(self, spot_pk, latitude, longitude):
+        """Returns the distance in metres from a position to a spot, or None if the spot is not in the index"""
+        point = self.points.get(spot_pk)
+        if point is None:
+            return None
+        return haversine(*to_point(latitude, longitude), *point)
+
+    def cells_within(self, latitude, longitude, radius):
+        """Yields the contents of every grid cell that could contain a point within radius metres of the position"""
+        row, column = self.cell_for(latitude, longitude)
+        row_span = math.ceil(radius / METRES_PER_DEGREE / GRID_CELL_DEGREES)
+        # Lines of longitude get closer together away from the equator, so more columns are needed to cover the radius
+        cos_lat = max(math.cos(math.radians(float(latitude))), 0.01)
+        column_span = math.ceil(radius / (METRES_PER_DEGREE * cos_lat) / GRID_CELL_DEGREES)
+        for r in range(row - row_span, row + row_span + 1):
+            for c in range(column - column_span, column + column_span + 1):
+                cell = self.cells.get((r, c))
+                if cell:
+                    yield cell
+
+    def within(self, latitude, longitude, radius) -> list[tuple[int, float]]:
+        """Finds every spot within radius metres of a position
+
+        Args:
+            latitude (float): The position's latitude in degrees
+            longitude (float): The position's longitude in degrees
+            radius (float): The search radius in metres
+
+        Returns:
+            list[tuple[int, float]]: (spot pk, distance in metres) for each spot in range, nearest first
+        """
+        origin = to_point(latitude, longitude)
+        found = []
+        for cell in self.cells_within(latitude, longitude, radius):
+            for pk, point in cell:
+                distance = haversine(*origin, *point)
+                if distance <= radius:
+                    found.append((pk, distance))
+        found.sort(key=lambda item: item[1])
+        return found
+
+    def ring(self, row, column, distance):
+        """Yields the contents of the occupied cells that are exactly distance cells away from (row, column)"""
+        if distance == 0:
+            cells = [(row, column)]
+        else:
+            cells = []
+            for c in range(column - distance, column + distance + 1):  # Top and bottom edges of the square
+                cells.append((row - distance, c))
+                cells.append((row + distance, c))
+            for r in range(row - distance + 1, row + distance):  # Left and right edges, without the corners
+                cells.append((r, column - distance))
+                cells.append((r, column + distance))
+        for cell in cells:
+            contents = self.cells.get(cell)
+            if contents:
+                yield contents
+
+    def nearest(self, latitude, longitude, k) -> list[tuple[int, float]]:
+        """Finds the k spots closest to a position
+
+        The search starts in the position's own grid cell and moves outwards one ring of cells at a time. It stops once
+        the k-th closest spot found so far is nearer than anything in the next ring could possibly be. If the spots are
+        so spread out that searching ring by ring would visit more cells than exist, every spot is checked instead.
+
+        Args:
+            latitude (float): The position's latitude in degrees
+            longitude (float): The position's longitude in degrees
+            k (int): How many spots to return
+
+        Returns:
+            list[tuple[int, float]]: (spot pk, distance in metres) for the k nearest spots, nearest first
+        """
+        if k <= 0:
+            return []
+        origin = to_point(latitude, longitude)
+        row, column = self.cell_for(latitude, longitude)
+        cell_height = GRID_CELL_DEGREES * METRES_PER_DEGREE
+        best = []  # A heap of (-distance, pk), so the furthest of the k best is always at best[0]
+        distance = 0
+        while True:
+            if (2 * distance + 1) ** 2 > 4 * len(self.cells):
+                return self._scan(origin, k)
+            for cell in self.ring(row, column, distance):
+                for pk, point in cell:
+                    item = (-haversine(*origin, *point), pk)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+            # Anything in the next ring is at least this far away (the position may be at the edge of its own cell)
+            furthest_latitude = min(abs(float(latitude)) + (distance + 1) * GRID_CELL_DEGREES, 89.9)
+            cell_width = cell_height * math.cos(math.radians(furthest_latitude))
+            if len(best) == k and -best[0][0] <= distance * min(cell_height, cell_width):
+                break
+            distance += 1
+        return sorted(((pk, -negative_distance) for negative_distance, pk in best), key=lambda item: item[1])
+
+    def _scan(self, origin, k):
+        """Checks the distance to every spot. Used when the spots are too spread out for a ring search to help"""
+        distances = ((pk, haversine(*origin, *point)) for pk, point in self.points.items())
+        return heapq.nsmallest(k, distances, key=lambda item: item[1])
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_spot_index(rebuild=False) -> SpotIndex:
+    """Returns this process's spot index, building it from the database if it is missing, out of date, or the spots
+    have changed since it was built (in any process)
+
+    Args:
+        rebuild (bool): Whether to build it again anyway
+    """
+    global _index
+    version = get_versions([INDEX_VERSION])[0]
+    index = _index
+    if (rebuild or index is None or index.version != version
+            or time.monotonic() - index.built_at > INDEX_MAX_AGE_SECONDS):
+        from .models import Spot
+        with _index_lock:
+            if _index is index:  # Another thread may have rebuilt it while this one waited for the lock
+                _index = SpotIndex(Spot.objects.values_list('pk', 'latitude', 'longitude', 'name', 'imageName').iterator())
+                _index.version = version
+            index = _index
+    return index
+
+
+def invalidate_spot_index():
+    """Has every process rebuild its spot index on next use. Called whenever a spot is saved or deleted, once the change
+    is committed, so no process can rebuild from the spots as they were before it
+    """
+    transaction.on_commit(_invalidate)
+
+
+def _invalidate():
+    global _index
+    _index = None
+    bump_version(INDEX_VERSION)
+
+
+def is_at_spot(spot_pk, latitude, longitude) -> bool:
+    """Checks whether a position is within the geofence of a spot
+
+    Args:
+        spot_pk (int): The primary key of the spot
+        latitude (float): The user's latitude in degrees
+        longitude (float): The user's longitude in degrees
+
+    Returns:
+        bool: True if the user is within geofence_radius() metres of the spot
+    """
+    distance = get_spot_index().distance_to(spot_pk, latitude, longitude)
+    if distance is None:  # The spot may have been added since this process's index was built
+        distance = get_spot_index(rebuild=True).distance_to(spot_pk, latitude, longitude)
+    return distance is not None and distance <= geofence_radius()
+
+
+def parse_position(latitude, longitude):
+    """Reads a position sent by the browser
+
+    Args:
+        latitude (str): The latitude in degrees
+        longitude (str): The longitude in degrees
+
+    Returns:
+        tuple[float, float]: The position, or None if it is missing or not a valid co-ordinate
+    """
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):  # Also rejects nan
+        return None
+    return latitude, longitude
@@ -0,0 +1,54 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import connections
+
+"""
+Developer note:
+Hashing a password is deliberately slow (about a tenth of a second each with Django's default hasher), so hashing a
+cohort's passwords one after another takes many minutes. The hashes are worked out in a pool of processes instead, one
+per CPU, as each hash is pure computation that a thread couldn't run in parallel. This module doesn't import any models,
+so a worker process that is started afresh (rather than forked, e.g. on Windows) can import it before setting Django up.
+"""
+
+CHUNK_SIZE = 50  # Passwords sent to a worker at a time
+
+
+def _start_worker():
+    if not apps.ready:
+        django.setup()
+
+
+def _hash(password) -> str:
+    return make_password(password)
+
+
+def hash_passwords(passwords, workers=None) -> list[str]:
+    """Hashes passwords for storing in User.password. A missing password gets an unusable hash, so that user can only
+    log in after setting a password through the password reset page
+
+    Args:
+        passwords (list[str]): The raw passwords, or None (or '') for users without one
+        workers (int): How many processes to hash in. Defaults to the number of CPUs. 1 hashes in this process
+
+    Returns:
+        list[str]: The hash of each password, in the same order
+    """
+    hashes = [make_password(None) if not password else None for password in passwords]
+    to_hash = [number for number, password in enumerate(passwords) if password]
+    workers = min(workers or os.cpu_count() or 1, len(to_hash))
+    if workers <= 1:
+        for number in to_hash:
+            hashes[number] = make_password(passwords[number])
+        return hashes
+
+    connections.close_all()  # Forked workers mustn't share this process's database connections
+    with ProcessPoolExecutor(max_workers=workers, initializer=_start_worker) as pool:
+        chunk_size = max(1, min(CHUNK_SIZE, len(to_hash) // (workers * 4)))  # Small cohorts are still shared out
+        results = pool.map(_hash, [passwords[number] for number in to_hash], chunksize=chunk_size)
+        for number, hashed in zip(to_hash, results):
+            hashes[number] = hashed
+    return hashes
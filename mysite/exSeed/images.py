@@ -0,0 +1,378 @@
+import glob
+import hashlib
+import logging
+import os
+import re
+import tempfile
+import threading
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Without Pillow, images are stored and served as uploaded, without variants
+    Image = ImageOps = None
+
+"""
+Developer note:
+Avatars, spot images and the streak images used to be hot-linked from imgur, so every page waited on a third party for
+full size images. Images are now kept in IMAGE_ROOT and linked as IMAGE_URL + a name made from a hash of the image's
+contents, e.g. '/images/0123...cdef_1200.png' (the hash, the image's width, and its format). An image's URL changes
+whenever its contents do, so images are served with a year long, immutable Cache-Control header, and browsers never
+ask for them again. Avatar.imageName and Spot.imageName hold these links (or, as before, a link to another site).
+
+When an image is stored, its variants are made in a pool of IMAGE_WORKERS threads, so the upload isn't kept waiting:
+the image scaled down to each of IMAGE_WIDTHS (no wider than the image itself), as WebP and as a fallback for browsers
+without WebP (JPEG, or PNG for images that can be transparent), e.g. '0123...cdef-384.webp'. Pillow does its scaling
+and encoding without holding the GIL, so the threads run in parallel. Pages show stored images with the picture
+template tag (see templatetags/pictures.py), which lists the variants in srcset, so each browser downloads the smallest
+that is sharp at the size it is shown. Which variants an image has follows from its name, so showing it needs no
+queries. A variant that is asked for before the pool has made it is made by the request.
+
+Pillow is optional. Without it, images are still stored and served from here, but no variants are made and pages show
+the image as it was uploaded. 'python manage.py store_images' copies the images still linked from other sites into the
+store, and makes any variants that are missing.
+
+In production, the web server can serve IMAGE_ROOT at IMAGE_URL itself, with the same Cache-Control header, and pass
+only the requests for missing files on to the image view.
+"""
+
+logger = logging.getLogger(__name__)
+
+DIGEST_LENGTH = 32  # Hex digits of the SHA-256 of the image kept in its name
+CACHE_CONTROL = 'public, max-age=31536000, immutable'  # A year, the longest browsers keep anything for
+SIGNATURES = [  # (the bytes an image file starts with, its format)
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+]
+CONTENT_TYPES = {'jpg': 'image/jpeg', 'png': 'image/png', 'gif': 'image/gif', 'webp': 'image/webp'}
+ORIGINAL_NAME = re.compile(r'^(?P<digest>[0-9a-f]{%d})(?:_(?P<width>[1-9][0-9]*))?\.(?P<format>jpg|png|gif|webp)$'
+                           % DIGEST_LENGTH)
+VARIANT_NAME = re.compile(r'^(?P<digest>[0-9a-f]{%d})-(?P<width>[1-9][0-9]*)\.(?P<format>webp|jpg|png)$'
+                          % DIGEST_LENGTH)
+SOURCES_KEY = 'exseed:image-sources'  # The cached {link on another site: its stored copy's link}
+
+
+def image_root() -> str:
+    return str(getattr(settings, 'IMAGE_ROOT', os.path.join(settings.BASE_DIR, 'images')))
+
+
+def image_url() -> str:
+    return getattr(settings, 'IMAGE_URL', '/images/')
+
+
+def image_widths() -> tuple:
+    return tuple(getattr(settings, 'IMAGE_WIDTHS', (96, 192, 384, 768)))
+
+
+def image_format(data) -> str:
+    """Works out an image's format from the bytes it starts with, rather than trusting its file name
+
+    Args:
+        data (bytes): The image file
+
+    Raises:
+        ValueError: It isn't a JPEG, PNG, GIF or WebP image
+
+    Returns:
+        str: 'jpg', 'png', 'gif' or 'webp'
+    """
+    for signature, found in SIGNATURES:
+        if data.startswith(signature):
+            return found
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    raise ValueError("The file isn't a JPEG, PNG, GIF or WebP image")
+
+
+def fallback_format(original_format) -> str:
+    """The format of the variants made for browsers without WebP. PNG, GIF and WebP images can be transparent, which
+    JPEG can't show, so they get PNG variants
+    """
+    return 'jpg' if original_format == 'jpg' else 'png'
+
+
+def variant_widths(width) -> list[int]:
+    """The widths an image is scaled down to. An image narrower than some of IMAGE_WIDTHS gets a variant at its own
+    width in their place, rather than being scaled up
+
+    Args:
+        width (int): The image's width
+
+    Returns:
+        list[int]: The widths, smallest first
+    """
+    return sorted({min(variant_width, width) for variant_width in image_widths()})
+
+
+def variant_name(digest, width, variant_format) -> str:
+    return '%s-%d.%s' % (digest, width, variant_format)
+
+
+def is_stored(link) -> bool:
+    """Whether a link is to an image in the store, rather than on another site"""
+    return bool(link) and link.startswith(image_url()) and ORIGINAL_NAME.match(link[len(image_url()):]) is not None
+
+
+def store(data, source=None) -> str:
+    """Stores an image and starts making its variants. Storing an image that is already stored changes nothing
+
+    Args:
+        data (bytes): The image file
+        source (str): The link on another site that this is a copy of, if it is one
+
+    Raises:
+        ValueError: It isn't an image, or Pillow can't read it
+
+    Returns:
+        str: The image's link, for Avatar.imageName or Spot.imageName
+    """
+    from .models import StoredImage
+
+    original_format = image_format(data)
+    digest = hashlib.sha256(data).hexdigest()[:DIGEST_LENGTH]
+    width = None
+    if Image is not None:
+        try:
+            with Image.open(BytesIO(data)) as image:
+                width = image.width
+                if image.getexif().get(0x0112) in (5, 6, 7, 8):  # A photo taken on its side, which is turned upright
+                    width = image.height
+        except (OSError, Image.DecompressionBombError) as e:
+            raise ValueError("The image can't be read (%s)" % e)
+    name = '%s_%d.%s' % (digest, width, original_format) if width else '%s.%s' % (digest, original_format)
+
+    path = os.path.join(image_root(), name)
+    if not os.path.exists(path):
+        _write(path, data)
+    stored = StoredImage.objects.get_or_create(name=name, defaults={'width': width})[0]
+    if source is not None and stored.source != source:
+        StoredImage.objects.filter(source=source).update(source=None)  # An earlier copy, if the image has changed
+        stored.source = source
+        stored.save(update_fields=['source'])
+        cache.delete(SOURCES_KEY)
+    if width:
+        variant_pool.submit(name)
+    return image_url() + name
+
+
+def copy_to_store(url, timeout=10) -> str:
+    """Downloads an image linked from another site and stores it
+
+    Args:
+        url (str): The image's link
+        timeout (float): How long to wait for the other site, in seconds
+
+    Raises:
+        ValueError: It isn't an image, or it couldn't be downloaded
+
+    Returns:
+        str: The stored copy's link
+    """
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers={'User-Agent': 'exSeed'}),
+                                    timeout=timeout) as response:
+            data = response.read()
+    except OSError as e:
+        raise ValueError("%s couldn't be downloaded (%s)" % (url, e))
+    return store(data, source=url)
+
+
+def local_link(link) -> str:
+    """The link to the stored copy of an image linked from another site, if it has been copied into the store
+
+    Args:
+        link (str): The image's link
+
+    Returns:
+        str: The stored copy's link, or the link itself if there is no copy
+    """
+    if not link or is_stored(link):
+        return link
+    sources = cache.get(SOURCES_KEY)
+    if sources is None:
+        from .models import StoredImage
+        sources = {source: image_url() + name
+                   for source, name in StoredImage.objects.exclude(source=None).values_list('source', 'name')}
+        cache.set(SOURCES_KEY, sources, None)
+    return sources.get(link, link)
+
+
+def sources(link, width=None, sizes=None) -> dict:
+    """The variants of a stored image for an <img> (and the WebP <source> in front of it), worked out from its link
+
+    Args:
+        link (str): The image's link
+        width (int): The width it is shown at, in CSS pixels. Lists the variants for 1x and 2x screens
+        sizes (str): An <img> sizes attribute, for images whose width depends on the screen. Lists every variant
+
+    Returns:
+        dict: 'src', 'srcset', 'webp' (the WebP srcset) and 'sizes'. Only 'src' is set for links to other sites and
+            images without variants
+    """
+    found = {'src': link, 'srcset': '', 'webp': '', 'sizes': ''}
+    match = ORIGINAL_NAME.match(link[len(image_url()):]) if is_stored(link) else None
+    if match is None or match['width'] is None:
+        return found
+    digest, widths = match['digest'], variant_widths(int(match['width']))
+    fallback = fallback_format(match['format'])
+
+    def url(variant_width, variant_format):
+        return image_url() + variant_name(digest, variant_width, variant_format)
+
+    if sizes is not None or width is None:
+        chosen = [(variant_width, '%dw' % variant_width) for variant_width in widths]
+        found['sizes'] = sizes or '100vw'
+        found['src'] = url(widths[-1], fallback)
+    else:
+        one_x = next((variant_width for variant_width in widths if variant_width >= width), widths[-1])
+        two_x = next((variant_width for variant_width in widths if variant_width >= 2 * width), widths[-1])
+        chosen = [(one_x, '1x')] + ([(two_x, '2x')] if two_x != one_x else [])
+        found['src'] = url(one_x, fallback)
+    found['srcset'] = ', '.join('%s %s' % (url(variant_width, fallback), size) for variant_width, size in chosen)
+    found['webp'] = ', '.join('%s %s' % (url(variant_width, 'webp'), size) for variant_width, size in chosen)
+    return found
+
+
+def make_variants(name) -> list[str]:
+    """Makes the variants of a stored image that don't exist yet
+
+    Args:
+        name (str): The stored image's name
+
+    Returns:
+        list[str]: The names of the variants made
+    """
+    match = ORIGINAL_NAME.match(name)
+    if Image is None or match is None or match['width'] is None:
+        return []
+    digest, widths = match['digest'], variant_widths(int(match['width']))
+    formats = ('webp', fallback_format(match['format']))
+    missing = [(width, variant_format) for width in widths for variant_format in formats
+               if not os.path.exists(os.path.join(image_root(), variant_name(digest, width, variant_format)))]
+    if not missing:
+        return []
+
+    made = []
+    with Image.open(os.path.join(image_root(), name)) as original:
+        image = ImageOps.exif_transpose(original)
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+        for width in sorted({width for width, _ in missing}, reverse=True):
+            height = max(1, round(image.height * width / image.width))
+            # reducing_gap shrinks large images by a whole factor first, which is far quicker and looks the same
+            resized = image if width == image.width else image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            for variant_format in formats:
+                if (width, variant_format) in missing:
+                    made.append(_save_variant(resized, variant_name(digest, width, variant_format), variant_format))
+    return made
+
+
+def _save_variant(image, name, variant_format) -> str:
+    quality = getattr(settings, 'IMAGE_QUALITY', 80)
+    output = BytesIO()
+    if variant_format == 'webp':
+        image.save(output, 'WEBP', quality=quality, method=4)
+    elif variant_format == 'jpg':
+        image.convert('RGB').save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(output, 'PNG', optimize=True)
+    _write(os.path.join(image_root(), name), output.getvalue())
+    return name
+
+
+def _write(path, data):
+    """Writes a file under a temporary name and then renames it, so a request never serves half of it"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+    except BaseException:
+        os.remove(temporary)
+        raise
+
+
+def image_file(name) -> tuple:
+    """Finds the file for a request to IMAGE_URL + name, making the variant if it is one the pool hasn't made yet
+
+    Args:
+        name (str): The image or variant's name
+
+    Returns:
+        tuple[str, str]: The file's path and content type, or (None, None) if there is no such image
+    """
+    match = ORIGINAL_NAME.match(name) or VARIANT_NAME.match(name)
+    if match is None:
+        return None, None
+    path = os.path.join(image_root(), name)
+    if not os.path.exists(path) and VARIANT_NAME.match(name):
+        original = _original_name(match['digest'])
+        if original is not None and name in _variant_names(original):
+            make_variants(original)
+    if not os.path.exists(path):
+        return None, None
+    return path, CONTENT_TYPES[match['format']]
+
+
+def _original_name(digest) -> str:
+    """The name of the stored image with this hash that has variants, or None"""
+    for path in glob.glob(os.path.join(glob.escape(image_root()), digest + '_*')):
+        if ORIGINAL_NAME.match(os.path.basename(path)):
+            return os.path.basename(path)
+    return None
+
+
+def _variant_names(name) -> set:
+    """The names of every variant a stored image should have"""
+    match = ORIGINAL_NAME.match(name)
+    formats = ('webp', fallback_format(match['format']))
+    return {variant_name(match['digest'], width, variant_format)
+            for width in variant_widths(int(match['width'])) for variant_format in formats}
+
+
+class VariantPool:
+    """The threads that make stored images' variants, started when the first image is stored"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+
+    def submit(self, name):
+        """Queues an image to have its variants made"""
+        with self._lock:
+            if self._executor is None:
+                workers = getattr(settings, 'IMAGE_WORKERS', None) or min(4, os.cpu_count() or 1)
+                self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='exseed-images')
+            future = self._executor.submit(self._make, name)
+            self._pending.add(future)
+            future.add_done_callback(self._pending.discard)
+
+    def wait(self, timeout=None) -> bool:
+        """Waits for the queued images' variants to be made
+
+        Returns:
+            bool: True if they all have been
+        """
+        with self._lock:
+            pending = list(self._pending)
+        return not wait(pending, timeout).not_done
+
+    @staticmethod
+    def _make(name):
+        try:
+            made = make_variants(name)
+            logger.info("Made %d variants of %s", len(made), name)
+        except Exception:
+            logger.exception("Making the variants of %s failed", name)
+
+
+variant_pool = VariantPool()
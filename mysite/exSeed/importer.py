@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Spot, Avatar, UserInfo, default_campus_id
+from .geo import invalidate_spot_index
+from .caching import bump_version, campus_version
+from .hashing import hash_passwords
+
+"""
+Developer note:
+Imports validate every row against the model field definitions in memory (no database access per row), then write
+all of the valid rows with a handful of bulk queries. A bad row is reported with its row number and skipped, and never
+stops the rest of the file from being imported.
+
+Students (see import_students) are imported the same way, as a User and a UserInfo each, like signing up makes. A
+cohort is meant to be onboarded without passwords, and each student then sets theirs through the password reset page:
+10,000 students without passwords are added in about a second. Passwords given in the file are hashed in a pool of
+processes (see hashing.py), but each hash still takes about a tenth of a second of a CPU (PBKDF2 with 600,000
+iterations), so 1,000 students with passwords took 96 seconds on one CPU, and 10,000 take about a quarter of an hour
+there, or two minutes on eight. That can't be brought down to seconds without weakening the hasher.
+"""
+
+BATCH_SIZE = 500  # Number of rows written per bulk query
+IMPORT_FORMATS = ('csv', 'json')
+SPOT_FIELDS = ('name', 'desc', 'latitude', 'longitude', 'imageName')
+AVATAR_FIELDS = ('avatarTitle', 'imageName')
+STUDENT_FIELDS = ('username', 'email', 'first_name', 'last_name')
+DEFAULT_AVATAR = ('Emotionless Default', 'https://i.imgur.com/fhrZmo9.png')  # (title, image) every new user starts with
+DEFAULT_TITLE = 'Sapling'
+
+
+class ImportResult:
+    """Holds the outcome of an import
+
+    Attributes:
+        created (int): How many new records were added
+        updated (int): How many existing records were overwritten
+        errors (list[tuple[int, str]]): The row number (counting from 1) and the problem, for each row that was skipped
+    """
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.errors = []
+
+    def __str__(self):
+        return "%d created, %d updated, %d rejected" % (self.created, self.updated, len(self.errors))
+
+
+def read_rows(file, import_format):
+    """Reads the rows of an uploaded file
+
+    Args:
+        file (file): A text or binary file object
+        import_format (str): Either 'csv' (with a header row) or 'json' (a list of objects)
+
+    Raises:
+        ValueError: The format is not recognised, or the file could not be read
+
+    Returns:
+        list[dict]: One dictionary per row, keyed by column name
+    """
+    content = file.read()
+    if isinstance(content, bytes):
+        content = content.decode('utf-8-sig')  # Removes the byte order mark Excel adds to csv files
+    if import_format == 'csv':
+        return list(csv.DictReader(io.StringIO(content)))
+    elif import_format == 'json':
+        try:
+            rows = json.loads(content)
+        except json.JSONDecodeError as e:
+            raise ValueError("File is not valid JSON: %s" % e)
+        if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+            raise ValueError("A JSON import must be a list of objects")
+        return rows
+    raise ValueError("Unknown format '%s' (choose from %s)" % (import_format, ", ".join(IMPORT_FORMATS)))
+
+
+def guess_format(file_name):
+    """Picks the import format from a file's extension, defaulting to csv"""
+    return 'json' if file_name.lower().endswith('.json') else 'csv'
+
+
+def validate_rows(model, field_names, rows, key_field, defaults=None):
+    """Cleans every row against the model's field definitions
+
+    Args:
+        model (Model): The model class being imported
+        field_names (tuple[str]): The fields read from each row
+        rows (list[dict]): The raw rows
+        key_field (str): The field that identifies a record. Rows repeating an earlier key in the file are rejected
+        defaults (dict): Values given to every instance, found once for the whole file (e.g. the campus)
+
+    Returns:
+        tuple[list[Model], list[tuple[int, str]]]: The unsaved, valid instances and the errors for the rejected rows
+    """
+    instances, errors, seen_keys = [], [], set()
+    fields = [model._meta.get_field(name) for name in field_names]
+    for row_number, row in enumerate(rows, start=1):
+        values, problems = {}, []
+        for field in fields:
+            value = row.get(field.name)
+            if isinstance(value, str):
+                value = value.strip()
+            if value in field.empty_values and field.null:
+                values[field.name] = None  # e.g. a spot without a description
+                continue
+            if value is None:
+                value = ''  # Lets the field report it as missing
+            try:
+                values[field.name] = field.clean(value, None)
+            except ValidationError as e:
+                problems.append("%s: %s" % (field.name, " ".join(e.messages)))
+        if not problems:
+            if values[key_field] in seen_keys:
+                problems.append("%s: '%s' appears more than once in the file" % (key_field, values[key_field]))
+            seen_keys.add(values.get(key_field))
+        if problems:
+            errors.append((row_number, "; ".join(problems)))
+        else:
+            instances.append(model(**values, **(defaults or {})))
+    return instances, errors
+
+
+def import_spots(rows, batch_size=BATCH_SIZE, campus=None):
+    """Adds or updates spots in bulk. Spots are matched on their unique name, so re-importing a file updates the
+    existing spots rather than duplicating them
+
+    Args:
+        rows (list[dict]): Rows with the keys name, desc, latitude, longitude and imageName
+        batch_size (int): Number of rows written per query
+        campus (int): The primary key of the campus new spots are added to. Defaults to the default campus. Existing
+            spots stay on their campus
+
+    Returns:
+        ImportResult: The number of spots created and updated, and the rejected rows
+    """
+    result = ImportResult()
+    spots, result.errors = validate_rows(Spot, SPOT_FIELDS, rows, 'name',
+                                         defaults={'campus_id': campus or default_campus_id()})
+    existing = set()
+    names = [spot.name for spot in spots]
+    for i in range(0, len(names), batch_size):  # Chunked to stay under SQLite's limit on query parameters
+        existing.update(Spot.objects.filter(name__in=names[i:i + batch_size]).values_list('name', flat=True))
+    Spot.objects.bulk_create(
+        spots,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['name'],
+        update_fields=[field for field in SPOT_FIELDS if field != 'name'],
+    )
+    # bulk_create does not send the post_save signals that normally do this
+    invalidate_spot_index()
+    bump_version('spot')
+    result.updated = len(existing)
+    result.created = len(spots) - result.updated
+    return result
+
+
+def import_avatars(rows, batch_size=BATCH_SIZE):
+    """Adds or updates avatars in bulk. Avatars are matched on their title, as that is what users choose them by
+
+    Args:
+        rows (list[dict]): Rows with the keys avatarTitle and imageName
+        batch_size (int): Number of rows written per query
+
+    Returns:
+        ImportResult: The number of avatars created and updated, and the rejected rows
+    """
+    result = ImportResult()
+    avatars, result.errors = validate_rows(Avatar, AVATAR_FIELDS, rows, 'avatarTitle')
+    # avatarTitle is not unique in the database, so the first avatar with each title is the one that gets updated
+    existing_ids = {}
+    for avatar_id, title in Avatar.objects.order_by('-pk').values_list('pk', 'avatarTitle'):
+        existing_ids[title] = avatar_id
+    to_update, to_create = [], []
+    for avatar in avatars:
+        if avatar.avatarTitle in existing_ids:
+            avatar.pk = existing_ids[avatar.avatarTitle]
+            to_update.append(avatar)
+        else:
+            to_create.append(avatar)
+    Avatar.objects.bulk_update(to_update, ['imageName'], batch_size=batch_size)
+    Avatar.objects.bulk_create(to_create, batch_size=batch_size)
+    bump_version('avatars', 'scoreboard')  # Bulk queries do not send the post_save signals that normally do this
+    result.created, result.updated = len(to_create), len(to_update)
+    return result
+
+
+def default_avatar() -> Avatar:
+    """The avatar new users are given, which is added if it doesn't exist yet"""
+    title, image = DEFAULT_AVATAR
+    return Avatar.objects.filter(avatarTitle=title).first() or Avatar.objects.create(avatarTitle=title, imageName=image)
+
+
+def validate_students(rows):
+    """Cleans every student row: the username and email are required and checked as signing up would check them,
+    and a password, if given, must pass the password validators
+
+    Args:
+        rows (list[dict]): Rows with the keys username, email, and optionally password, first_name and last_name
+
+    Returns:
+        tuple[list[tuple[User, str]], list[tuple[int, str]]]: The unsaved users with their raw passwords (or None),
+            and the errors for the rejected rows
+    """
+    email_field = User._meta.get_field('email')
+    users, errors = validate_rows(User, STUDENT_FIELDS, rows, 'username')
+    # Usernames are compared ignoring case, as signing up does
+    taken = {username.lower() for username in User.objects.values_list('username', flat=True)}
+    rejected = dict(errors)
+    students, seen = [], set()
+    valid = iter(users)
+    for row_number, row in enumerate(rows, start=1):
+        if row_number in rejected:
+            continue
+        user = next(valid)
+        problems = []
+        if not user.email:
+            problems.append("email: %s" % email_field.error_messages['blank'])
+        if user.username.lower() in taken or user.username.lower() in seen:
+            problems.append("username: '%s' is already taken" % user.username)
+        seen.add(user.username.lower())
+        password = (row.get('password') or '').strip() or None
+        if password is not None:
+            try:
+                validate_password(password, user)
+            except ValidationError as e:
+                problems.append("password: %s" % " ".join(e.messages))
+        if problems:
+            errors.append((row_number, "; ".join(problems)))
+        else:
+            students.append((user, password))
+    errors.sort()
+    return students, errors
+
+
+def import_students(rows, batch_size=BATCH_SIZE, workers=None, campus=None):
+    """Adds a cohort of students, each with a User and a UserInfo, in bulk. Students without a password can log in
+    once they have set one through the password reset page. Leaving the passwords out is much faster, as each one given
+    is hashed (see the note at the top of this file)
+
+    Args:
+        rows (list[dict]): Rows with the keys username, email, and optionally password, first_name and last_name
+        batch_size (int): Number of rows written per query
+        workers (int): How many processes the passwords are hashed in (see hashing.py). Defaults to one per CPU
+        campus (int): The primary key of the campus the students play on. Defaults to the default campus
+
+    Returns:
+        ImportResult: The number of students added, and the rejected rows
+    """
+    result = ImportResult()
+    students, result.errors = validate_students(rows)
+    if not students:
+        return result
+    hashes = hash_passwords([password for _, password in students], workers)
+    users = []
+    for (user, _), hashed in zip(students, hashes):
+        user.password = hashed
+        users.append(user)
+
+    with transaction.atomic():
+        avatar = default_avatar()  # Found once, rather than for every student
+        campus = campus or default_campus_id()
+        User.objects.bulk_create(users, batch_size=batch_size)
+        names = [user.username for user in users]
+        user_ids = []
+        for i in range(0, len(names), batch_size):  # Chunked to stay under SQLite's limit on query parameters
+            user_ids.extend(User.objects.filter(username__in=names[i:i + batch_size]).values_list('pk', flat=True))
+        UserInfo.objects.bulk_create([UserInfo(user_id=user_id, avatarId=avatar, title=DEFAULT_TITLE, campus_id=campus)
+                                      for user_id in user_ids], batch_size=batch_size)
+    # Bulk queries do not send the post_save signals that normally do this
+    bump_version(campus_version('scoreboard', campus))
+    result.created = len(users)
+    return result
+
+
+IMPORTERS = {
+    'spots': import_spots,
+    'avatars': import_avatars,
+}
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import threading
+import time
+
+from django.core.cache import cache
+
+"""
+Developer note:
+Browsers on the home and leaderboard pages get live updates through Server-Sent Events from '/live', rather than
+reloading the whole page. When addScore commits, views.publish_live_update() builds one snapshot of today's attendance,
+the hourly ratings and both top fives for the user's campus, and publish() stores it in the shared cache under a new
+id. Each campus has its own snapshot, so a register on one campus is only sent to the browsers on that campus.
+
+Each server process has a LiveHub per campus. It notices a new snapshot (straight away if it was published in the same
+process, otherwise within POLL_SECONDS) and encodes it as an SSE message once, then wakes every connection in that
+process to send the same bytes. So an update costs one cache read and one encode per process, however many browsers
+are connected. Only the sections that changed since the previous snapshot are sent.
+
+Streaming needs the ASGI server (see mysite/asgi.py). Under mod_wsgi each connection would hold a worker, so '/live'
+instead sends the latest snapshot and asks the browser to reconnect after WSGI_RETRY_MILLISECONDS.
+
+Django 4.2 stops reading from an ASGI connection once the request body has arrived, so it never hears that a browser
+has gone, and the server quietly drops what is sent after that. A stream would then send keep-alives forever, and its
+hub would keep polling for nobody. watch_disconnects() wraps the ASGI application to keep listening, and sets an event
+in the request's scope (under DISCONNECTED_KEY) that ends the stream.
+"""
+
+LIVE_KEY_PREFIX = 'exseed:live:latest:'
+SECTIONS = ('attendance', 'ratings', 'leaderboard')
+POLL_SECONDS = 1  # How often each process checks the cache for snapshots published by other processes
+KEEPALIVE_SECONDS = 15  # How often a comment is sent on a quiet connection, so proxies don't close it
+RETRY_MILLISECONDS = 3000  # How long a browser waits before reconnecting after losing the stream
+WSGI_RETRY_MILLISECONDS = 30000
+DISCONNECTED_KEY = 'exseed.disconnected'  # The scope key of the event set when the browser disconnects
+
+
+def encode_events(event_id, data, previous=None) -> bytes:
+    """Formats a snapshot as SSE events, one per section
+
+    Args:
+        event_id (int): The snapshot's id, sent so the browser can tell snapshots apart
+        data (dict): The snapshot, with a value for each of SECTIONS
+        previous (dict): The snapshot the browser already has. Sections that haven't changed since it are left out
+
+    Returns:
+        bytes: The encoded events (empty if nothing changed)
+    """
+    events = []
+    for section in SECTIONS:
+        if previous is not None and previous.get(section) == data.get(section):
+            continue
+        events.append('id: %s\nevent: %s\ndata: %s\n\n' % (event_id, section, json.dumps(data.get(section))))
+    return ''.join(events).encode()
+
+
+def live_key(campus_pk) -> str:
+    """The cache key a campus's latest snapshot is kept under"""
+    return LIVE_KEY_PREFIX + str(campus_pk)
+
+
+def publish(data, campus_pk):
+    """Makes a snapshot a campus's latest, for every process to send to the browsers connected from that campus
+
+    Args:
+        data (dict): The snapshot, with a value for each of SECTIONS
+        campus_pk (int): The campus the snapshot is for
+    """
+    stored = {'id': time.time_ns(), 'data': data}
+    cache.set(live_key(campus_pk), stored, None)
+    hub_for(campus_pk).notify(stored)
+
+
+async def alatest(campus_pk):
+    """A campus's latest snapshot published by any process, as {'id': ..., 'data': ...}, or None if there isn't one"""
+    return await cache.aget(live_key(campus_pk))
+
+
+class LiveMessage:
+    """A snapshot, with its SSE encoding worked out once for every connection"""
+
+    def __init__(self, stored, previous=None):
+        self.id = stored['id']
+        self.data = stored['data']
+        self.previous_id = previous.id if previous is not None else None
+        self.full = encode_events(self.id, self.data)
+        self.changes = encode_events(self.id, self.data, previous.data) if previous is not None else self.full
+
+
+class LiveHub:
+    """Fans a campus's latest snapshot out to every connection from that campus in this process
+
+    Attributes:
+        key (str): The cache key the campus's snapshots are published under
+    """
+
+    def __init__(self, key):
+        self.key = key
+        self.latest = None
+        self.subscribers = 0
+        self._loop = None
+        self._changed = None
+        self._poller = None
+
+    def _attach(self):
+        """Sets the hub up on the running event loop, and starts polling for snapshots from other processes"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._changed = asyncio.Event()
+            self._poller = None
+        if self._poller is None or self._poller.done():
+            self._poller = loop.create_task(self._poll())
+
+    async def _poll(self):
+        while self.subscribers:
+            stored = await cache.aget(self.key)
+            if stored is not None:
+                self._receive(stored)
+            await asyncio.sleep(POLL_SECONDS)
+
+    def _receive(self, stored):
+        """Makes a snapshot the latest and wakes every connection waiting for one. Runs on the event loop"""
+        if self.latest is not None and stored['id'] <= self.latest.id:
+            return  # Already seen
+        self.latest = LiveMessage(stored, self.latest)
+        if self._changed is not None:
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    def notify(self, stored):
+        """Passes a snapshot published in this process straight to the hub. Safe to call from any thread"""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._receive, stored)
+
+    async def subscribe(self, disconnected=None):
+        """Streams SSE messages for one connection: the latest snapshot, then changes as they are published
+
+        Args:
+            disconnected (asyncio.Event): Set when the browser disconnects, which ends the stream (see
+                watch_disconnects)
+
+        Yields:
+            bytes: Encoded events, or keep-alive comments
+        """
+        self._attach()
+        self.subscribers += 1
+        try:
+            stored = await cache.aget(self.key)
+            if stored is not None:
+                self._receive(stored)
+            yield b'retry: %d\n\n' % RETRY_MILLISECONDS
+            sent = None
+            while disconnected is None or not disconnected.is_set():
+                message = self.latest
+                if message is not None and message.id != sent:
+                    # Only the changes are sent if the browser has the snapshot they are relative to
+                    yield message.changes if sent is not None and message.previous_id == sent else message.full
+                    sent = message.id
+                    continue
+                if not await self._wait(disconnected):
+                    yield b': keep-alive\n\n'
+        finally:
+            self.subscribers -= 1
+
+    async def _wait(self, disconnected):
+        """Waits up to KEEPALIVE_SECONDS for a new snapshot, or for the browser to disconnect
+
+        Returns:
+            bool: Whether either happened
+        """
+        waiting = {asyncio.ensure_future(self._changed.wait())}
+        if disconnected is not None:
+            waiting.add(asyncio.ensure_future(disconnected.wait()))
+        try:
+            done, _ = await asyncio.wait(waiting, timeout=KEEPALIVE_SECONDS, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in waiting:
+                task.cancel()
+        return bool(done)
+
+hubs = {}  # Campus primary key -> its LiveHub in this process
+_hubs_lock = threading.Lock()
+
+
+def hub_for(campus_pk) -> LiveHub:
+    """This process's hub for a campus, made the first time it is needed"""
+    with _hubs_lock:
+        if campus_pk not in hubs:
+            hubs[campus_pk] = LiveHub(live_key(campus_pk))
+        return hubs[campus_pk]
+
+
+def watch_disconnects(application):
+    """Wraps an ASGI application so each HTTP request's scope holds an asyncio.Event, under DISCONNECTED_KEY, that is
+    set when the client disconnects. Once the request body has been read the connection is listened to in the
+    background, as Django 4.2 doesn't listen for disconnects while streaming a response
+
+    Args:
+        application: The ASGI application, e.g. from get_asgi_application()
+
+    Returns:
+        The wrapped ASGI application
+    """
+    async def watched(scope, receive, send):
+        if scope['type'] != 'http':
+            return await application(scope, receive, send)
+        disconnected = asyncio.Event()
+        listener = None
+
+        async def listen():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            disconnected.set()
+
+        async def receive_body():
+            nonlocal listener
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                disconnected.set()
+            elif not message.get('more_body', False) and listener is None:
+                listener = asyncio.ensure_future(listen())
+            return message
+
+        try:
+            await application(dict(scope, **{DISCONNECTED_KEY: disconnected}), receive_body, send)
+        finally:
+            if listener is not None:
+                listener.cancel()
+    return watched
@@ -0,0 +1,132 @@
+import atexit
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+"""
+Developer note:
+Sending an email over SMTP can take several seconds, so emails (e.g. from the password reset form) aren't sent in the
+request. EMAIL_BACKEND is QueuedEmailBackend, which puts each email on an in-process queue and returns straight away.
+A background thread takes up to EMAIL_QUEUE_BATCH_SIZE emails at a time off the queue and sends them over one
+connection of EMAIL_QUEUE_BACKEND (SMTP on the server). An email that fails is retried up to EMAIL_QUEUE_ATTEMPTS
+times, waiting EMAIL_QUEUE_RETRY_DELAY seconds before the first retry and twice as long before each one after that.
+
+For local work, set EMAIL_QUEUE_BACKEND to the file based backend (see settings.py) to write emails to disk instead.
+
+The queue is held in memory, so emails still waiting when a server process stops are lost, although the queue is
+given a few seconds to empty when Python exits.
+"""
+
+logger = logging.getLogger(__name__)
+
+
+def queue_setting(name, default):
+    """Reads an EMAIL_QUEUE_* setting when it is needed, so it can be changed in tests"""
+    return getattr(settings, 'EMAIL_QUEUE_' + name, default)
+
+
+class MailQueue:
+    """The emails waiting to be sent by this process, and the background thread that sends them"""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition()
+        self.pending = 0  # Emails queued or waiting to be retried, that haven't been sent or given up on
+
+    def put(self, messages):
+        """Queues emails to be sent in the background
+
+        Args:
+            messages (list[EmailMessage]): The emails
+        """
+        with self._idle:
+            self.pending += len(messages)
+        for message in messages:
+            self._queue.put((message, 1))
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='exseed-mail', daemon=True)
+                self._worker.start()
+
+    def flush(self, timeout=None) -> bool:
+        """Waits until every queued email has been sent or given up on
+
+        Args:
+            timeout (float): The longest to wait, in seconds. Waits forever if None
+
+        Returns:
+            bool: True if the queue emptied in time
+        """
+        with self._idle:
+            return self._idle.wait_for(lambda: self.pending == 0, timeout)
+
+    def _done(self, count=1):
+        with self._idle:
+            self.pending -= count
+            if self.pending == 0:
+                self._idle.notify_all()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            batch_size = queue_setting('BATCH_SIZE', 50)
+            while len(batch) < batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._send(batch)
+
+    def _send(self, batch):
+        """Sends a batch of emails over one connection, retrying any that fail"""
+        failed = []
+        try:
+            connection = get_connection(queue_setting('BACKEND', 'django.core.mail.backends.smtp.EmailBackend'))
+            connection.open()
+        except Exception as error:
+            logger.warning("Couldn't connect to send %d emails: %s", len(batch), error)
+            failed = batch
+        else:
+            try:
+                for message, attempt in batch:
+                    try:
+                        connection.send_messages([message])
+                        self._done()
+                    except Exception as error:
+                        logger.warning("Failed to send email to %s: %s", ', '.join(message.recipients()), error)
+                        failed.append((message, attempt))
+            finally:
+                try:
+                    connection.close()
+                except Exception:
+                    pass  # The emails were sent, so a connection that won't close cleanly doesn't matter
+
+        for message, attempt in failed:
+            if attempt >= queue_setting('ATTEMPTS', 5):
+                logger.error("Giving up on email to %s after %d attempts", ', '.join(message.recipients()), attempt)
+                self._done()
+                continue
+            delay = queue_setting('RETRY_DELAY', 2) * 2 ** (attempt - 1)
+            retry = threading.Timer(delay, self._queue.put, [(message, attempt + 1)])
+            retry.daemon = True
+            retry.start()
+
+
+mail_queue = MailQueue()
+atexit.register(mail_queue.flush, 5)
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """An email backend that queues emails to be sent in the background, so the request doesn't wait for them"""
+
+    def send_messages(self, email_messages):
+        if not email_messages:
+            return 0
+        mail_queue.put(list(email_messages))
+        return len(email_messages)
@@ -0,0 +1,131 @@
+import datetime
+
+from django.db.models import Avg, Q
+
+from .models import Campus, Spot, SpotRecord, UserInfo, GameEvent
+from . import events
+from .deletion import process_deletions
+from .ratelimit import remove_idle_buckets
+from .recommender import refresh_recommendations, assign_spot_of_the_day
+from .scheduler import job
+
+"""
+Developer note:
+The daily maintenance jobs. These used to run in addScore when the first user of the day registered, and in
+ExseedConfig.ready() when the server started. They run at midnight, in the order they are defined here: yesterday's
+attendance is averaged before the spot recommendations are rebuilt, so the new averages are used. Each campus has its
+own spot of the day, so the jobs that deal with it work through the campuses one at a time. Each job can be run again
+for the same day without changing the result.
+"""
+
+
+@job('attendance_averages', '0 0 * * *')
+def update_attendance_averages(run_time) -> str:
+    """Recalculates the average attendance of each campus's spot of the day yesterday, from every day it has been the
+    spot
+
+    Args:
+        run_time (datetime.datetime): When the run was scheduled for. Yesterday is the day before this
+
+    Returns:
+        str: A summary of the run
+    """
+    yesterday = run_time.date() - datetime.timedelta(days=1)
+    summaries = []
+    for record in SpotRecord.objects.filter(spotDay=yesterday).order_by('campus_id'):
+        average = SpotRecord.objects.filter(sId=record.sId_id, spotDay__lte=yesterday).aggregate(Avg('attendance'))
+        # update() rather than save(), as the spot's other details haven't changed and shouldn't rebuild the spot index
+        Spot.objects.filter(pk=record.sId_id).update(average_attendance=round(average['attendance__avg']))
+        summaries.append("Spot %d average attendance is now %d" % (record.sId_id, round(average['attendance__avg'])))
+    if not summaries:
+        return "There was no spot of the day on %s" % yesterday
+    return ", ".join(summaries)
+
+
+@job('reset_streaks', '0 0 * * *')
+def reset_streaks(run_time) -> str:
+    """Resets the streak of every user who didn't register at yesterday's spot. A register works out the streak from
+    the user's last register itself (see events.py), so a run that is late, after some users have registered today,
+    leaves their new streaks alone
+
+    Args:
+        run_time (datetime.datetime): When the run was scheduled for. Yesterday is the day before this
+
+    Returns:
+        str: A summary of the run
+    """
+    yesterday = run_time.date() - datetime.timedelta(days=1)
+    missed = UserInfo.objects.filter(currentStreak__gt=0).filter(
+        Q(lastSpotRegister__lt=yesterday) | Q(lastSpotRegister__isnull=True))
+    # One event for each user, applied by the user_stats projection (see events.py) in a single bulk update, which
+    # also invalidates the cached pages showing these streaks
+    resets = [GameEvent(kind=GameEvent.STREAK_RESET, user_id=user_pk, day=run_time.date(), value=streak)
+              for user_pk, streak in missed.values_list('user_id', 'currentStreak')]
+    if resets:
+        events.record(*resets)
+    return "Reset %d streaks" % len(resets)
+
+
+@job('spot_of_the_day', '0 0 * * *')
+def choose_spot_of_the_day(run_time) -> str:
+    """Rebuilds each campus's spot recommendations and assigns the campus's spot of the day from them
+
+    Args:
+        run_time (datetime.datetime): When the run was scheduled for. The spot is chosen for this day
+
+    Returns:
+        str: A summary of the run
+    """
+    today = run_time.date()
+    summaries = []
+    for campus in Campus.objects.order_by('pk'):
+        candidates = refresh_recommendations(today, campus.pk)
+        record = assign_spot_of_the_day(today, campus.pk)
+        if record is not None:
+            summaries.append("%s is the spot of the day on %s, from %d candidates" % (record.sId.name, campus.name,
+                                                                                     candidates))
+    if not summaries:
+        return "There are no spots to choose from"
+    return ", ".join(summaries)
+
+
+@job('rate_limit_files', '0 0 * * *')
+def remove_rate_limit_files(run_time) -> str:
+    """Removes the rate limit buckets (see ratelimit.py) that haven't been used for a day, as they are full again
+
+    Args:
+        run_time (datetime.datetime): When the run was scheduled for
+
+    Returns:
+        str: A summary of the run
+    """
+    return "Removed %d idle rate limit buckets" % remove_idle_buckets()
+
+
+@job('account_deletions', '0 * * * *')
+def resume_deletions(run_time) -> str:
+    """Carries out any account deletions (see deletion.py) queued by, or left part way through by, a process that has
+    since stopped. Deletions are normally carried out straight away by the process that queued them
+
+    Args:
+        run_time (datetime.datetime): When the run was scheduled for
+
+    Returns:
+        str: A summary of the run
+    """
+    return "Carried out %d account deletions" % process_deletions()
+
+
+@job('projections', '*/10 * * * *')
+def catch_up_projections(run_time) -> str:
+    """Applies the events added since the last run to the projections that aren't kept up to date as events are
+    recorded (see events.py)
+
+    Args:
+        run_time (datetime.datetime): When the run was scheduled for
+
+    Returns:
+        str: A summary of the run
+    """
+    applied = events.catch_up()
+    return ", ".join("%s applied %d events" % (name, count) for name, count in applied.items())
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+MOBILE_AGENT = ("Mozilla/5.0 (iPhone; CPU iPhone OS 16_3 like Mac OS X) AppleWebKit/605.1.15 "
+                "(KHTML, like Gecko) Version/16.3 Mobile/15E148 Safari/604.1")
+DEFAULT_PATHS = ['/', '/leaderboard?q=streak', '/profile', '/compass']
+# A cache local to this process, so uncached runs don't fill the shared cache with pages nobody will request again
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'}}
+
+
+class Command(BaseCommand):
+    """Compares how the site's WSGI and ASGI handlers cope with many concurrent requests to the async views
+
+    Requests are passed straight to each handler in this process, so the comparison doesn't depend on a web server
+    being installed. WSGI requests are served by a pool of threads (as mod_wsgi does) and ASGI requests are all run on
+    one event loop (as an ASGI server such as uvicorn does), with --concurrency requests in flight at once.
+
+    Usage:
+        python manage.py benchmark_asgi <username> --requests 400 --concurrency 32 [--uncached]
+    """
+    help = "Benchmarks concurrent throughput of the WSGI and ASGI handlers for the async views"
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="An existing user (who has taken the pledge) to make the requests as")
+        parser.add_argument('--requests', type=int, default=400, help="Requests to make to each page")
+        parser.add_argument('--concurrency', type=int, default=32, help="Requests in flight at once")
+        parser.add_argument('--path', action='append', dest='paths',
+                            help="A page to request (can be repeated). Defaults to home, leaderboard, profile and compass")
+        parser.add_argument('--uncached', action='store_true',
+                            help="Give every request a different query string, so no page is served from the cache")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError("User '%s' does not exist" % options['username'])
+        session = self.log_in(user)
+        self.cookie = '%s=%s' % (settings.SESSION_COOKIE_NAME, session.session_key)
+        self.host = 'localhost' if 'localhost' in settings.ALLOWED_HOSTS else settings.ALLOWED_HOSTS[0]
+
+        try:
+            with override_settings(**({'CACHES': LOCAL_CACHE} if options['uncached'] else {})):
+                for path in options['paths'] or DEFAULT_PATHS:
+                    paths = [self.request_path(path, i, options['uncached']) for i in range(options['requests'])]
+                    self.report(path, 'WSGI', *self.run_wsgi(paths, options['concurrency']))
+                    self.report(path, 'ASGI', *asyncio.run(self.run_asgi(paths, options['concurrency'])))
+        finally:
+            session.delete()
+
+    @staticmethod
+    def log_in(user):
+        """Creates a session for the user, the same as logging in would"""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session
+
+    @staticmethod
+    def request_path(path, number, uncached):
+        if not uncached:
+            return path
+        return '%s%sbenchmark=%d-%d' % (path, '&' if '?' in path else '?', time.time_ns(), number)
+
+    def run_wsgi(self, paths, concurrency):
+        """Serves every path through the WSGI handler from a pool of threads
+
+        Returns:
+            tuple[float, list[float], int]: The total time, the time for each request and the number that failed
+        """
+        handler = WSGIHandler()
+
+        def request(full_path):
+            path, _, query = full_path.partition('?')
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': self.host, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': self.host, 'HTTP_USER_AGENT': MOBILE_AGENT, 'HTTP_COOKIE': self.cookie,
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': io.StringIO(), 'wsgi.url_scheme': 'http',
+                'wsgi.version': (1, 0), 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            statuses = []
+            start = time.perf_counter()
+            response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            b''.join(response)
+            response.close()
+            return time.perf_counter() - start, statuses[0].startswith('200')
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(request, paths))
+        return time.perf_counter() - start, [r[0] for r in results], sum(1 for r in results if not r[1])
+
+    async def run_asgi(self, paths, concurrency):
+        """Serves every path through the ASGI handler on one event loop
+
+        Returns:
+            tuple[float, list[float], int]: The total time, the time for each request and the number that failed
+        """
+        handler = ASGIHandler()
+        limit = asyncio.Semaphore(concurrency)
+
+        async def request(full_path):
+            path, _, query = full_path.partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'client': ('127.0.0.1', 0), 'server': (self.host, 80),
+                'headers': [(b'host', self.host.encode()), (b'user-agent', MOBILE_AGENT.encode()),
+                            (b'cookie', self.cookie.encode())],
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            async with limit:
+                start = time.perf_counter()
+                await handler(scope, receive, send)
+                return time.perf_counter() - start, messages[0].get('status') == 200
+
+        start = time.perf_counter()
+        results = await asyncio.gather(*(request(path) for path in paths))
+        return time.perf_counter() - start, [r[0] for r in results], sum(1 for r in results if not r[1])
+
+    def report(self, path, server, total, times, failures):
+        times = sorted(times)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        self.stdout.write("%-22s %s: %7.1f requests/s, median %.2f ms, p95 %.2f ms%s" % (
+            path, server, len(times) / total, statistics.median(times) * 1000, p95 * 1000,
+            ", %d not OK" % failures if failures else ""))
@@ -0,0 +1,91 @@
+import math
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exSeed.geo import SpotIndex, haversine, to_point
+from exSeed.models import Spot
+
+
+class Command(BaseCommand):
+    """Compares the nearest-spot index against a brute-force scan of the Spot table
+
+    Synthetic spots are added inside a transaction that is rolled back at the end, so the database is left unchanged.
+
+    Usage:
+        python manage.py benchmark_nearest --spots 10000 --queries 1000
+    """
+    help = "Benchmarks SpotIndex.nearest() against a brute-force ORM scan over a synthetic spot catalogue"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spots', type=int, default=10000, help="Number of synthetic spots to add")
+        parser.add_argument('--queries', type=int, default=1000, help="Number of index lookups to time")
+        parser.add_argument('--scan-queries', type=int, default=20,
+                            help="Number of brute-force lookups to time (these are much slower)")
+        parser.add_argument('-k', type=int, default=5, help="Number of nearest spots to find")
+        parser.add_argument('--spread', type=float, default=1.0,
+                            help="Size (in degrees) of the square the spots are scattered over")
+        parser.add_argument('--seed', type=int, default=2434)
+
+    def handle(self, *args, **options):
+        generator = random.Random(options['seed'])
+        centre_lat, centre_long, spread = 50.7355, -3.5339, options['spread']  # Centred on Streatham campus
+
+        def random_position():
+            return (round(centre_lat + generator.uniform(-spread, spread) / 2, 6),
+                    round(centre_long + generator.uniform(-spread, spread) / 2, 6))
+
+        with transaction.atomic():
+            Spot.objects.bulk_create(
+                [Spot(name="Benchmark spot %d" % i, desc='', latitude=lat, longitude=long)
+                 for i, (lat, long) in enumerate(random_position() for _ in range(options['spots']))],
+                batch_size=1000,
+            )
+            total_spots = Spot.objects.count()
+
+            start = time.perf_counter()
+            index = SpotIndex(Spot.objects.values_list('pk', 'latitude', 'longitude', 'name', 'imageName').iterator())
+            build_time = time.perf_counter() - start
+
+            queries = [random_position() for _ in range(max(options['queries'], options['scan_queries']))]
+            index_times = []
+            for lat, long in queries[:options['queries']]:
+                start = time.perf_counter()
+                index.nearest(lat, long, options['k'])
+                index_times.append(time.perf_counter() - start)
+
+            scan_times = []
+            for lat, long in queries[:options['scan_queries']]:
+                start = time.perf_counter()
+                expected = self.brute_force(lat, long, options['k'])
+                scan_times.append(time.perf_counter() - start)
+                found = index.nearest(lat, long, options['k'])
+                # Ties could legitimately come back in either order, so the distances are compared rather than the pks
+                if not all(math.isclose(a[1], b[1], abs_tol=0.001) for a, b in zip(found, expected)):
+                    self.stderr.write("Index result differs from brute force at (%s, %s)" % (lat, long))
+
+            transaction.set_rollback(True)
+
+        self.stdout.write("Spots in catalogue: %d (k=%d)" % (total_spots, options['k']))
+        self.stdout.write("Index build: %.1f ms" % (build_time * 1000))
+        self.report("Index lookup", index_times)
+        self.report("ORM brute-force scan", scan_times)
+        self.stdout.write("Speed-up (median): %.0fx" % (statistics.median(scan_times) / statistics.median(index_times)))
+
+    @staticmethod
+    def brute_force(latitude, longitude, k):
+        """Loads every spot from the database and sorts them by distance, as a view without the index would have to"""
+        origin = to_point(latitude, longitude)
+        distances = [(pk, haversine(*origin, *to_point(lat, long)))
+                     for pk, lat, long in Spot.objects.values_list('pk', 'latitude', 'longitude')]
+        distances.sort(key=lambda item: item[1])
+        return distances[:k]
+
+    def report(self, name, times):
+        times = sorted(times)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        self.stdout.write("%s: median %.3f ms, p95 %.3f ms over %d queries" % (
+            name, statistics.median(times) * 1000, p95 * 1000, len(times)))
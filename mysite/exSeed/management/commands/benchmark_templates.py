@@ -0,0 +1,82 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.test import RequestFactory
+
+from exSeed.extra import extra_dictionary
+
+
+class Command(BaseCommand):
+    """Times how long the home and leaderboard templates take to render, with their shared fragments cached (warm) and
+    not yet cached (cold). Uses the same template engine, and so the same cached template loader, as the site.
+
+    Usage:
+        python manage.py benchmark_templates --renders 500
+    """
+    help = "Benchmarks rendering home.html and leaderboard.html with cold and warm fragment caches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--renders', type=int, default=500, help="Number of renders to time for each case")
+
+    def handle(self, *args, **options):
+        engine = engines['django']
+        loaders = [loader.__class__.__module__ for loader in engine.engine.template_loaders]
+        self.stdout.write("Template loaders: %s" % ", ".join(loaders))
+
+        request = RequestFactory().get('/', HTTP_USER_AGENT="Mobile")
+        request.user = AnonymousUser()
+        row = [1, 12, 'https://i.imgur.com/fhrZmo9.png', 'username', 'Sapling']
+        contexts = {
+            'home.html': {
+                'file_path': 'https://i.imgur.com/u7yqGqI.jpeg',
+                'spot_name': 'Duck Pond',
+                'spot_description': 'A duck pond with fountains and nice secluded seating areas.',
+                'spot_latitude': 50.73439,
+                'spot_longitude': -3.537932,
+                'spot_data': [0, 3.5, 4.0, 0, 2.5, 0, 0, 0],
+                'colours': ["rgb(34,177,76)"] * 8,
+                'fact': extra_dictionary['facts'][0],
+                'geofence_radius': 50,
+                'spot_record_id': 1,
+            },
+            'leaderboard.html': {
+                'leaderboardType': 'streak',
+                'TopResults': [[i] + row[1:] for i in range(1, 6)],
+                'UserResults': [[i] + row[1:] for i in range(8, 11)],
+                'above_name': 'username',
+            },
+        }
+        # The fragment name and the context variables it varies on, with the version last
+        fragments = {
+            'home.html': ('spot_card', ['spot_record_id', 'spot_version']),
+            'leaderboard.html': ('leaderboard_top_five', ['leaderboardType', 'scoreboard_version']),
+        }
+
+        for name, context in contexts.items():
+            template = engine.get_template(name)
+            fragment, vary_on = fragments[name]
+            version_key = vary_on[-1]
+            used_keys = []
+            cold, warm = [], []
+            for i in range(options['renders']):
+                # A new version each time means the fragment has to be rendered and stored
+                context[version_key] = 'cold-%d-%d' % (time.time_ns(), i)
+                used_keys.append(make_template_fragment_key(fragment, [context[key] for key in vary_on]))
+                start = time.perf_counter()
+                template.render(context, request)
+                cold.append(time.perf_counter() - start)
+            context[version_key] = 'warm-%d' % time.time_ns()
+            used_keys.append(make_template_fragment_key(fragment, [context[key] for key in vary_on]))
+            template.render(context, request)
+            for _ in range(options['renders']):
+                start = time.perf_counter()
+                template.render(context, request)
+                warm.append(time.perf_counter() - start)
+            self.stdout.write("%s: cold fragments median %.3f ms, warm fragments median %.3f ms" % (
+                name, statistics.median(cold) * 1000, statistics.median(warm) * 1000))
+            cache.delete_many(used_keys)  # So the benchmark doesn't leave thousands of fragments in the shared cache
@@ -0,0 +1,53 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed.benchmarks.runner import PAGES, run_benchmarks, compare
+
+
+class Command(BaseCommand):
+    """Times each view through the test client and saves the results as JSON (see exSeed/benchmarks/runner.py)
+
+    Usage:
+        python manage.py benchmark_views --output before.json
+        python manage.py benchmark_views --output after.json --compare before.json
+        python manage.py benchmark_views --view leaderboard_total --view addScore --repeat 50
+    """
+    help = "Benchmarks the views with a cold and a warm cache, saving the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', default='bench0', help="The user to request the pages as (default 'bench0')")
+        parser.add_argument('--repeat', type=int, default=20, help="Requests to time for each view and cache state")
+        parser.add_argument('--view', action='append', dest='views', choices=list(PAGES) + ['addScore'],
+                            help="A view to time (can be repeated). Defaults to all of them")
+        parser.add_argument('--output', help="A file to save the results to, as JSON")
+        parser.add_argument('--compare', help="Results from an earlier run (e.g. another commit) to compare with")
+
+    def handle(self, *args, **options):
+        if not User.objects.filter(username=options['user']).exists():
+            raise CommandError("User '%s' does not exist. Run seed_benchmark first" % options['user'])
+        results = run_benchmarks(options['user'], options['repeat'], options['views'])
+
+        self.stdout.write("Commit %s, %d users, %d registers" % (
+            results['commit'], results['dataset']['users'], results['dataset']['registers']))
+        for name, states in results['results'].items():
+            if 'skipped' in states:
+                self.stdout.write("%-20s skipped: %s" % (name, states['skipped']))
+                continue
+            for state, summary in states.items():
+                self.stdout.write("%-20s %-5s median %8.2f ms  p95 %8.2f ms  %3d queries" % (
+                    name, state, summary['median_ms'], summary['p95_ms'], summary['queries']))
+
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(results, file, indent=2)
+            self.stdout.write("Saved to %s" % options['output'])
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                before = json.load(file)
+            self.stdout.write("\nCompared with %s (commit %s):" % (options['compare'], before.get('commit')))
+            for name, state, previous, current in compare(before, results):
+                change = (current - previous) / previous * 100 if previous else 0.0
+                self.stdout.write("%-20s %-5s %8.2f ms -> %8.2f ms  (%+.1f%%)" % (name, state, previous, current, change))
@@ -0,0 +1,47 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed.export import stream_export, parse_date, DATASET_COLUMNS, EXPORT_FORMATS
+
+
+class Command(BaseCommand):
+    """Writes a dataset out as CSV or JSONL, one row at a time
+
+    Usage:
+        python manage.py export_data registers --format jsonl --start 2023-03-01 --end 2023-03-31 --spot "Duck Pond"
+    """
+    help = "Streams UserRegister, SpotRecord or UserInfo data to a CSV or JSONL file (or stdout)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASET_COLUMNS), help="The data to export")
+        parser.add_argument('--format', dest='export_format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--start', help="Only include rows on or after this date (YYYY-MM-DD)")
+        parser.add_argument('--end', help="Only include rows on or before this date (YYYY-MM-DD)")
+        parser.add_argument('--spot', help="Only include rows for this spot (ID or name)")
+        parser.add_argument('--output', '-o', help="File to write to. Defaults to stdout")
+
+    def handle(self, *args, **options):
+        try:
+            start = parse_date(options['start'], 'start')
+            end = parse_date(options['end'], 'end')
+            lines = stream_export(options['dataset'], options['export_format'], start, end, options['spot'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        if options['output']:
+            out = open(options['output'], 'w', newline='', encoding='utf-8')
+        else:
+            out = sys.stdout
+        try:
+            rows = 0
+            for line in lines:
+                out.write(line)
+                rows += 1
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        if options['output']:
+            if options['export_format'] == 'csv':
+                rows -= 1  # The header line is not a row
+            self.stderr.write("Exported %d rows to %s" % (rows, options['output']))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed.campuses import get_campus
+from exSeed.importer import read_rows, guess_format, IMPORTERS, IMPORT_FORMATS, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Bulk imports spots or avatars from a CSV or JSON file
+
+    Usage:
+        python manage.py import_data spots new_spots.csv [--campus streatham]
+        python manage.py import_data avatars avatars.json
+    """
+    help = "Adds or updates Spot or Avatar records from a CSV or JSON file, reporting any rows that are rejected"
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', choices=list(IMPORTERS), help="What the file contains")
+        parser.add_argument('file', help="Path to the file")
+        parser.add_argument('--format', dest='import_format', choices=IMPORT_FORMATS,
+                            help="Defaults to json for .json files and csv for anything else")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--campus', default=None,
+                            help="The code of the campus new spots are added to. Defaults to the default campus")
+
+    def handle(self, *args, **options):
+        extra = {}
+        if options['campus'] is not None:
+            if options['model'] != 'spots':
+                raise CommandError("Only spots belong to a campus")
+            try:
+                extra['campus'] = get_campus(options['campus']).pk
+            except ValueError as e:
+                raise CommandError(e)
+        import_format = options['import_format'] or guess_format(options['file'])
+        try:
+            with open(options['file'], encoding='utf-8-sig', newline='') as file:
+                rows = read_rows(file, import_format)
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        result = IMPORTERS[options['model']](rows, batch_size=options['batch_size'], **extra)
+        for row_number, error in result.errors:
+            self.stderr.write("Row %d: %s" % (row_number, error))
+        self.stdout.write("Imported %s: %s" % (options['model'], result))
@@ -0,0 +1,30 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed.campuses import get_campus
+from exSeed.models import Campus
+from exSeed.recommender import refresh_recommendations
+
+
+class Command(BaseCommand):
+    """Rebuilds the scored list of candidates for the spot of the day on each campus. Intended to be run nightly, e.g.
+    from cron:
+        5 0 * * * cd /path/to/mysite && python manage.py recommend_spots
+    """
+    help = "Scores every spot on attendance, rating, recency and spread, and stores the ranked candidate list"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=datetime.date.fromisoformat, default=None,
+                            help="The day to build the list for (YYYY-MM-DD). Defaults to today")
+        parser.add_argument('--campus', default=None, help="The code of the campus to build the list for. Defaults to "
+                                                           "every campus")
+
+    def handle(self, *args, **options):
+        try:
+            campuses = [get_campus(options['campus'])] if options['campus'] else list(Campus.objects.order_by('pk'))
+        except ValueError as e:
+            raise CommandError(e)
+        for campus in campuses:
+            count = refresh_recommendations(options['date'], campus.pk)
+            self.stdout.write("Scored %d spots on %s" % (count, campus.name))
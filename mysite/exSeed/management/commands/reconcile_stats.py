@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed import clock
+from exSeed.reconcile import start, unfinished, reconcile, CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    """Checks users' points, streaks and last registers, and spots' attendances, against the registers (see
+    exSeed/reconcile.py), reporting any that are wrong and optionally correcting them
+
+    Usage:
+        python manage.py reconcile_stats             Reports the wrong stats
+        python manage.py reconcile_stats --fix       Reports and corrects them
+        python manage.py reconcile_stats --resume    Carries on the last check that was stopped part way through
+    """
+    help = "Checks the denormalised stats against the registers, and reports (or with --fix corrects) the wrong ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help="Correct the wrong stats")
+        parser.add_argument('--resume', action='store_true',
+                            help="Carry on the last unfinished check, with the options it was started with")
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help="Rows to check at a time")
+        parser.add_argument('--show', type=int, default=20, help="How many of the wrong stats to list (default 20)")
+        parser.add_argument('--force', action='store_true', help="Correct stats even while users can register")
+
+    def handle(self, *args, **options):
+        check = unfinished() if options['resume'] else None
+        if options['resume'] and check is None:
+            raise CommandError("There is no unfinished check to resume")
+        fix = check.fix if check is not None else options['fix']
+        if fix and clock.registering_open() and not options['force']:
+            raise CommandError("Users can register right now, so stats corrected now could be wrong again straight "
+                               "away. Run this outside the registering hours, or pass --force")
+        if check is None:
+            check = start(fix=fix)
+        else:
+            self.stdout.write("Resuming check %d (%s pass, %d rows checked)" % (check.pk, check.phase, check.checked))
+
+        self.shown = 0
+        started = time.perf_counter()
+        check = reconcile(check, chunk_size=options['chunk_size'],
+                          report=lambda discrepancy: self.report(discrepancy, options['show']))
+        for field, count in sorted(check.state['found'].items()):
+            self.stdout.write("%-20s %d wrong" % (field, count))
+        self.stdout.write("Checked %d rows in %.1fs: %d wrong, %d corrected" % (
+            check.checked, time.perf_counter() - started, check.found, check.fixed))
+
+    def report(self, discrepancy, show):
+        if self.shown < show:
+            self.stdout.write(str(discrepancy))
+        self.shown += 1
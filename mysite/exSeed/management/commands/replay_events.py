@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed import clock
+from exSeed.events import PROJECTIONS, catch_up, rebuild, status, BATCH_SIZE
+
+
+class Command(BaseCommand):
+    """Applies the game event log to its projections (see exSeed/events.py)
+
+    Usage:
+        python manage.py replay_events                        Catches every projection up from its checkpoint
+        python manage.py replay_events daily_stats --rebuild  Empties the named projections and applies the whole log
+        python manage.py replay_events --status               Lists each projection's checkpoint
+    """
+    help = "Catches the projections of the game event log up, or rebuilds them from the whole log"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Projections to replay. Defaults to all of them")
+        parser.add_argument('--rebuild', action='store_true', help="Empty the projections and apply the whole log")
+        parser.add_argument('--status', action='store_true', help="List the projections and their checkpoints")
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help="Events applied per transaction")
+        parser.add_argument('--force', action='store_true', help="Rebuild even while users can register")
+
+    def handle(self, *args, **options):
+        if options['status']:
+            for name, position, behind in status():
+                self.stdout.write("%-20s at event %-10d %d behind" % (name, position, behind))
+            return
+
+        unknown = [name for name in options['names'] if name not in PROJECTIONS]
+        if unknown:
+            raise CommandError("Unknown projection(s): %s. Projections are: %s" % (', '.join(unknown),
+                                                                                  ', '.join(PROJECTIONS)))
+        names = options['names'] or None
+        if options['rebuild']:
+            if clock.registering_open() and not options['force']:
+                raise CommandError("Users can register right now, and would see their stats emptied while the log is "
+                                   "applied again. Run this outside the registering hours, or pass --force")
+            applied = rebuild(names, options['batch_size'])
+        else:
+            applied = catch_up(names, options['batch_size'])
+        for name, count in applied.items():
+            self.stdout.write("%s: applied %d events" % (name, count))
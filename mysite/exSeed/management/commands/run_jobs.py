@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed import clock
+from exSeed.models import JobRun
+from exSeed.scheduler import JOBS, run_job, run_due_jobs, scheduler_loop
+
+
+class Command(BaseCommand):
+    """Runs the scheduled jobs (see exSeed/scheduler.py and exSeed/maintenance.py)
+
+    Usage:
+        python manage.py run_jobs                 Runs any jobs that are due and haven't run yet
+        python manage.py run_jobs reset_streaks   Runs the named jobs now, whether or not they are due
+        python manage.py run_jobs --list          Lists the jobs and their last runs
+        python manage.py run_jobs --loop          Keeps running due jobs every minute (instead of the web server doing it)
+    """
+    help = "Runs scheduled maintenance jobs that are due, or named jobs straight away"
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Jobs to run now. Runs the due jobs if none are named")
+        parser.add_argument('--list', action='store_true', help="List the jobs and their last runs")
+        parser.add_argument('--loop', action='store_true', help="Run due jobs every minute until stopped")
+
+    def handle(self, *args, **options):
+        if options['list']:
+            for name, job in JOBS.items():
+                last = JobRun.objects.filter(name=name).first()
+                self.stdout.write("%-20s %-12s last run: %s" % (name, job.schedule, last or 'never'))
+            return
+
+        if options['loop']:
+            self.stdout.write("Running due jobs every minute. Press Ctrl+C to stop")
+            scheduler_loop()
+            return
+
+        unknown = [name for name in options['names'] if name not in JOBS]
+        if unknown:
+            raise CommandError("Unknown job(s): %s. Jobs are: %s" % (', '.join(unknown), ', '.join(JOBS)))
+
+        if options['names']:
+            # A run made by hand is logged at the current time, so it never clashes with a scheduled run
+            runs = [run_job(JOBS[name], clock.now()) for name in options['names']]
+        else:
+            runs = run_due_jobs()
+        for run in runs:
+            if run is None:
+                continue  # Another process claimed it
+            self.stdout.write("%s: %s" % (run, run.output.strip().splitlines()[-1] if run.output.strip() else ''))
+        if not runs:
+            self.stdout.write("No jobs are due")
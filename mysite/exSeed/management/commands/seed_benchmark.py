@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from exSeed.benchmarks.dataset import seed, clear
+
+
+class Command(BaseCommand):
+    """Adds a synthetic season of play for benchmarking the views (see exSeed/benchmarks/dataset.py). Use a copy of the
+    database, not the live one
+
+    Usage:
+        python manage.py seed_benchmark --users 2000 --spots 60 --days 200
+        python manage.py seed_benchmark --clear      Removes the dataset (and makes a new one if sizes are given)
+    """
+    help = "Adds synthetic users, spots and a season of spot records and registers, for benchmarking"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=None, help="Users to add (default 2000)")
+        parser.add_argument('--spots', type=int, default=None, help="Spots to add (default 60)")
+        parser.add_argument('--days', type=int, default=None, help="Length of the season, ending today (default 200)")
+        parser.add_argument('--prefix', default='bench', help="The start of every username (default 'bench')")
+        parser.add_argument('--seed', type=int, default=1, help="The random seed. The same seed gives the same data")
+        parser.add_argument('--clear', action='store_true', help="Remove an existing benchmark dataset first")
+
+    def handle(self, *args, **options):
+        sizes = [options['users'], options['spots'], options['days']]
+        if options['clear']:
+            clear(options['prefix'])
+            self.stdout.write("Removed the benchmark dataset")
+            if sizes == [None, None, None]:
+                return
+        try:
+            result = seed(options['users'] or 2000, options['spots'] or 60, options['days'] or 200,
+                          prefix=options['prefix'], random_seed=options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write("Added %s" % result)
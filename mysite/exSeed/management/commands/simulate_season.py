@@ -0,0 +1,69 @@
+import csv
+import datetime
+import statistics
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from exSeed.benchmarks.simulator import simulate
+
+
+class Command(BaseCommand):
+    """Plays a season of synthetic users on a simulated clock, and reports what each day cost as the season went on
+    (see exSeed/benchmarks/simulator.py). The season is played in a throwaway database, made the same way as the test
+    database and removed afterwards, so the real one is never touched
+
+    Usage:
+        python manage.py simulate_season --days 270 --users 300 --spots 60 [--output costs.csv] [--every 7]
+    """
+    help = "Simulates a season of play day by day and reports each day's rollover and registering costs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=270, help="Days to play (default 270, an academic year)")
+        parser.add_argument('--users', type=int, default=300, help="Users playing (default 300)")
+        parser.add_argument('--spots', type=int, default=60, help="Spots to choose from (default 60)")
+        parser.add_argument('--start', type=datetime.date.fromisoformat, default=None,
+                            help="The first day, as YYYY-MM-DD (default today)")
+        parser.add_argument('--seed', type=int, default=1, help="The random seed. The same seed plays the same season")
+        parser.add_argument('--every', type=int, default=7, help="Print a summary line every this many days")
+        parser.add_argument('--output', help="Write every day's costs to this CSV file")
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['users'] < 1 or options['spots'] < 2:
+            raise CommandError("Play at least one day, with at least one user and two spots")
+
+        self.stdout.write("%-10s  %8s  %12s  %9s  %9s  %8s  %8s  %9s" % (
+            'day', 'rollover', 'roll queries', 'home', 'registers', 'register', 'queries', 'all regs'))
+        self.window = []
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            costs = simulate(options['days'], options['users'], options['spots'], start=options['start'],
+                             random_seed=options['seed'], progress=lambda cost: self.progress(cost, options['every']))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['output']:
+            rows = [cost.row() for cost in costs]
+            with open(options['output'], 'w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=list(rows[0]))
+                writer.writeheader()
+                writer.writerows(rows)
+            self.stdout.write("Wrote %d days to %s" % (len(rows), options['output']))
+
+    def progress(self, cost, every):
+        """Prints the mean costs of the last `every` days, once they have been played"""
+        self.window.append(cost)
+        if len(self.window) < every:
+            return
+        days = self.window
+        self.window = []
+        self.stdout.write("%-10s  %6.1fms  %12.1f  %7.1fms  %9.1f  %6.2fms  %8.1f  %9d" % (
+            days[-1].day.isoformat(),
+            statistics.fmean(day.rollover_ms for day in days),
+            statistics.fmean(sum(queries for _, queries in day.jobs.values()) for day in days),
+            statistics.fmean(day.home[0] for day in days) * 1000,
+            statistics.fmean(len(day.registers) for day in days),
+            statistics.fmean(day.register_ms for day in days),
+            statistics.fmean(day.register_queries for day in days),
+            days[-1].total_registers))
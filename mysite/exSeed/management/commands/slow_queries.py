@@ -0,0 +1,57 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand
+
+from exSeed.slow_queries import aggregate, slow_query_log
+
+SORTS = {  # --sort: how the query shapes are ordered
+    'total': lambda shape: shape.total,
+    'count': lambda shape: shape.count,
+    'mean': lambda shape: shape.mean,
+    'worst': lambda shape: shape.worst,
+}
+
+
+class Command(BaseCommand):
+    """Lists the slow queries that took the most time, grouped by the shape of the query (see exSeed/slow_queries.py)
+
+    Usage:
+        python manage.py slow_queries                  The 10 shapes that took the most time in total
+        python manage.py slow_queries --top 20 --sort mean
+        python manage.py slow_queries --days 1         Only queries logged in the last day
+        python manage.py slow_queries --clear          Empties the log, e.g. after a fix has been deployed
+    """
+    help = "Lists the query shapes in the slow query log that took the most time, and where they were made"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10, help="How many query shapes to list")
+        parser.add_argument('--sort', choices=SORTS, default='total', help="What to order the shapes by")
+        parser.add_argument('--days', type=float, default=None, help="Only count queries from the last few days")
+        parser.add_argument('--clear', action='store_true', help="Empty the slow query log")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            if os.path.exists(slow_query_log()):
+                open(slow_query_log(), 'w').close()
+            self.stdout.write("Cleared %s" % slow_query_log())
+            return
+
+        since = None
+        if options['days'] is not None:
+            since = datetime.datetime.now() - datetime.timedelta(days=options['days'])
+        shapes = sorted(aggregate(since=since), key=SORTS[options['sort']], reverse=True)
+        if not shapes:
+            self.stdout.write("No slow queries have been logged in %s" % slow_query_log())
+            return
+
+        self.stdout.write("%d query shapes, %d slow queries\n" % (len(shapes), sum(shape.count for shape in shapes)))
+        for rank, shape in enumerate(shapes[:options['top']], 1):
+            self.stdout.write("%d. %d queries, %.3fs total, %.1f ms mean, %.1f ms worst, %d different parameters" % (
+                rank, shape.count, shape.total, shape.mean * 1000, shape.worst * 1000, len(shape.params)))
+            self.stdout.write("   %s" % shape.shape)
+            for site, count in shape.sites.most_common(3):
+                self.stdout.write("   from %s (%d)" % (site, count))
+            if shape.views:
+                self.stdout.write("   in views: %s" % ', '.join('%s (%d)' % view for view in shape.views.most_common(3)))
+            self.stdout.write("")
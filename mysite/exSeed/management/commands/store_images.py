@@ -0,0 +1,60 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from exSeed.images import copy_to_store, is_stored, local_link, store, variant_pool, image_root, image_url, Image
+from exSeed.models import Avatar, Spot, StoredImage
+from exSeed.views import STREAK_IMAGES
+
+
+class Command(BaseCommand):
+    """Copies the avatars, spot images and streak images that are still linked from other sites into the image store
+    (see exSeed/images.py), and points the avatars and spots at the copies. Images that were stored before Pillow was
+    installed, or whose variants weren't all made, get their missing variants. It can be run again at any time, e.g.
+    after adding spots linked from elsewhere
+    """
+    help = "Copies images linked from other sites into the image store, and makes any missing variants"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=10,
+                            help="How long to wait for another site to send an image, in seconds (default 10)")
+
+    def handle(self, *args, **options):
+        links = {*Avatar.objects.values_list('imageName', flat=True), *Spot.objects.values_list('imageName', flat=True),
+                 *STREAK_IMAGES}
+        copied = failed = 0
+        for link in sorted(link for link in links if link and not is_stored(link)):
+            stored = local_link(link)
+            if stored == link:
+                try:
+                    stored = copy_to_store(link, options['timeout'])
+                except ValueError as e:
+                    self.stderr.write(str(e))
+                    failed += 1
+                    continue
+                copied += 1
+            self.relink(link, stored)
+
+        if Image is None:
+            self.stdout.write("Pillow isn't installed, so no variants were made")
+        else:
+            # Images stored without Pillow are stored again, as their names don't give the width their variants need
+            for old in StoredImage.objects.filter(width=None):
+                try:
+                    with open(os.path.join(image_root(), old.name), 'rb') as file:
+                        self.relink(image_url() + old.name, store(file.read(), source=old.source))
+                except (OSError, ValueError) as e:
+                    self.stderr.write("%s couldn't be stored again (%s)" % (old.name, e))
+            for name in StoredImage.objects.exclude(width=None).values_list('name', flat=True):
+                variant_pool.submit(name)
+            variant_pool.wait()
+        self.stdout.write("Copied %d images into the store, %d couldn't be copied" % (copied, failed))
+
+    @staticmethod
+    def relink(link, stored):
+        """Points the avatars and spots with one link at another. Each is saved on its own, so the signals refresh the
+        cached pages and the spot index
+        """
+        for row in [*Avatar.objects.filter(imageName=link), *Spot.objects.filter(imageName=link)]:
+            row.imageName = stored
+            row.save(update_fields=['imageName'])
@@ -0,0 +1,465 @@
+import asyncio
+import atexit
+import glob
+import json
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the files of stopped processes are kept
+    fcntl = None
+
+"""
+Developer note:
+Request metrics, exposed at '/metrics' in the Prometheus text format (for staff, or for a scraper sending
+'Authorization: Bearer <METRICS_TOKEN>'). MetricsMiddleware records, for each URL name:
+    exseed_requests_total              - requests, by method and status code
+    exseed_request_duration_seconds    - a histogram of how long requests took
+    exseed_db_queries_total            - database queries made
+    exseed_db_query_seconds_total      - time spent in the database
+and MeasuredFileBasedCache records exseed_cache_requests_total, the cache hits and misses for each kind of cache key.
+Requests turned away by the rate limits are counted in exseed_rate_limited_total (see ratelimit.py).
+
+Database queries are counted by a wrapper added to every database connection as it is opened. The wrapper adds to the
+RequestStats of the request being handled, found through a context variable, which also works for the async views
+whose queries run in another thread.
+
+Apache runs several processes, so each one keeps its own totals in memory and writes them to its own file in
+METRICS_DIR every METRICS_FLUSH_SECONDS. '/metrics' adds up every process's file. Apache replaces its processes from
+time to time, so when '/metrics' finds files from processes on this server that have stopped, it adds their totals to
+RETIRED_FILE and removes them, so the totals never go down and the directory doesn't grow. Reading the files and
+retiring them are done under a lock on the directory, so a scrape never counts a stopped process twice. Clearing the
+directory resets every total, which Prometheus handles.
+
+Staff can also add '?timing' to any page's URL to get a Server-Timing header, which the browser's developer tools show
+as a breakdown of where the request's time went:
+    total     - the whole request, from the first middleware
+    mw        - the middleware, i.e. everything outside the view (ViewTimingMiddleware times the view)
+    view      - the view, including its database queries and template rendering
+    db        - the database queries, and how many there were
+    template  - rendering templates (timed by TimedDjangoTemplates)
+    ua        - working out the browser from the user agent (see views.parse)
+"""
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+RETIRED_FILE = 'retired.json'  # The totals of the processes that have stopped, in METRICS_DIR
+LOCK_FILE = '.lock'
+
+METRICS = {  # name: (type, help)
+    'exseed_requests_total': ('counter', "Requests handled, by URL name, method and status code"),
+    'exseed_request_duration_seconds': ('histogram', "Time taken to handle each request, by URL name"),
+    'exseed_db_queries_total': ('counter', "Database queries made while handling requests, by URL name"),
+    'exseed_db_query_seconds_total': ('counter', "Time spent in the database while handling requests, by URL name"),
+    'exseed_cache_requests_total': ('counter', "Cache lookups, by kind of key and whether they were found"),
+    'exseed_rate_limited_total': ('counter', "Requests turned away by a rate limit, by limit and scope"),
+}
+
+CACHE_KINDS = (  # (key prefix, kind) for exseed_cache_requests_total
+    ('exseed:view:', 'page'),
+    ('exseed:version:', 'version'),
+    ('exseed:auth-user:', 'user'),
+    ('exseed:live:', 'live'),
+    ('template.cache.', 'fragment'),
+    ('django.contrib.sessions.', 'session'),
+)
+
+
+class RequestStats:
+    """What happened while handling one request"""
+
+    def __init__(self, request=None):
+        self.request = request
+        self.queries = 0
+        self.db_time = 0.0
+        self.view_time = 0.0
+        self.spans = defaultdict(float)  # Time taken by other parts of the request (see span()), by name
+
+
+request_stats = ContextVar('request_stats', default=None)
+
+
+@contextmanager
+def span(name):
+    """Adds the time taken by a block of code to the current request's Server-Timing"""
+    stats = request_stats.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.spans[name] += time.perf_counter() - start
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with span('template'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing how long templates take to render"""
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+
+def time_query(execute, sql, params, many, context):
+    """A database execute wrapper that adds each query to the current request's stats"""
+    stats = request_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - start
+        stats.queries += 1
+
+
+@receiver(connection_created)
+def add_query_timer(sender, connection, **kwargs):
+    """Adds time_query to every database connection as it is opened"""
+    if time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_query)
+
+
+class ProcessMetrics:
+    """This process's totals, and writing them to its file in METRICS_DIR"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = defaultdict(float)  # (name, labels) -> total
+        self.histograms = {}  # (name, labels) -> [count in each bucket..., sum, count]
+        # The process's start time is part of the name, so a new process reusing a process ID has a new file
+        self.file_name = '%s-%d-%d.json' % (socket.gethostname(), os.getpid(), time.time_ns())
+        self.last_flush = time.monotonic()
+
+    def inc(self, name, labels, amount=1):
+        with self.lock:
+            self.counters[name, labels] += amount
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            histogram = self.histograms.setdefault((name, labels), [0] * (len(DURATION_BUCKETS) + 2))
+            for i, bucket in enumerate(DURATION_BUCKETS):
+                if value <= bucket:
+                    histogram[i] += 1
+                    break
+            histogram[-2] += value
+            histogram[-1] += 1
+
+    def snapshot_counters(self) -> dict:
+        """A copy of the counters, by (name, labels)"""
+        with self.lock:
+            return dict(self.counters)
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    def flush(self, force=False):
+        """Writes the totals to this process's file, if METRICS_FLUSH_SECONDS have passed since they were last written"""
+        if not force and time.monotonic() - self.last_flush < getattr(settings, 'METRICS_FLUSH_SECONDS', 5):
+            return
+        self.last_flush = time.monotonic()
+        directory = metrics_dir()
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.file_name)
+        with open(path + '.tmp', 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(path + '.tmp', path)  # Replaced in one step, so a reader never sees half a file
+
+
+process_metrics = ProcessMetrics()
+atexit.register(lambda: process_metrics.flush(force=True) if process_metrics.counters else None)
+
+
+def metrics_dir() -> str:
+    return str(getattr(settings, 'METRICS_DIR', os.path.join(settings.BASE_DIR, 'metrics')))
+
+
+def cache_kind(key) -> str:
+    key = key.split(':', 2)[-1]  # Removes the prefix and version the cache adds
+    for prefix, kind in CACHE_KINDS:
+        if key.startswith(prefix):
+            return kind
+    return 'other'
+
+
+class MeasuredFileBasedCache(FileBasedCache):
+    """The file based cache, counting hits and misses for exseed_cache_requests_total"""
+    _not_found = object()
+
+    def get(self, key, default=None, version=None):
+        value = super().get(key, self._not_found, version)
+        found = value is not self._not_found
+        process_metrics.inc('exseed_cache_requests_total', (('kind', cache_kind(self.make_key(key, version))),
+                                                            ('result', 'hit' if found else 'miss')))
+        return value if found else default
+
+
+def record_request(request, response, duration, stats):
+    """Adds a finished request to this process's totals"""
+    match = getattr(request, 'resolver_match', None)
+    view = (match.url_name or match.view_name) if match is not None else 'unmatched'
+    status = response.status_code if response is not None else 500
+    process_metrics.inc('exseed_requests_total', (('view', view), ('method', request.method), ('status', str(status))))
+    process_metrics.observe('exseed_request_duration_seconds', (('view', view),), duration)
+    process_metrics.inc('exseed_db_queries_total', (('view', view),), stats.queries)
+    process_metrics.inc('exseed_db_query_seconds_total', (('view', view),), stats.db_time)
+    process_metrics.flush()
+
+
+def wants_timing(request) -> bool:
+    """Whether a request asked for a Server-Timing header, and is allowed one (only staff are)"""
+    if 'timing' not in request.GET:
+        return False
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_active and user.is_staff
+
+
+def server_timing(stats, total) -> str:
+    """Formats a request's timings as a Server-Timing header (durations are in milliseconds)"""
+    entries = [
+        'total;dur=%.2f' % (total * 1000),
+        'mw;desc="Middleware";dur=%.2f' % ((total - stats.view_time) * 1000),
+        'view;desc="View";dur=%.2f' % (stats.view_time * 1000),
+        'db;desc="%d queries";dur=%.2f' % (stats.queries, stats.db_time * 1000),
+    ]
+    entries += ['%s;dur=%.2f' % (name, duration * 1000) for name, duration in stats.spans.items()]
+    return ', '.join(entries)
+
+
+class MetricsMiddleware:
+    """Records every request's metrics, and adds the Server-Timing header for staff who ask for it. Should be first
+    in MIDDLEWARE, so the time includes the other middleware
+
+    Works for both normal and async views, so the async views don't have to switch threads to pass through it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats(request)
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = self.get_response(request)
+            if wants_timing(request):
+                response['Server-Timing'] = server_timing(stats, time.perf_counter() - start)
+            return response
+        finally:
+            request_stats.reset(token)
+            record_request(request, response, time.perf_counter() - start, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats(request)
+        token = request_stats.set(stats)
+        start = time.perf_counter()
+        response = None
+        try:
+            response = await self.get_response(request)
+            # Checking the user can load them from the database, which can't be done on the event loop
+            if 'timing' in request.GET and await sync_to_async(wants_timing)(request):
+                response['Server-Timing'] = server_timing(stats, time.perf_counter() - start)
+            return response
+        finally:
+            request_stats.reset(token)
+            record_request(request, response, time.perf_counter() - start, stats)
+
+
+class ViewTimingMiddleware:
+    """Times the view for Server-Timing. Should be last in MIDDLEWARE, so only the view is inside it"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        start = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            self.record(time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        start = time.perf_counter()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.record(time.perf_counter() - start)
+
+    @staticmethod
+    def record(duration):
+        stats = request_stats.get()
+        if stats is not None:
+            stats.view_time += duration
+
+
+def collect() -> dict:
+    """Adds up the totals in every process's file, and retires the files of processes that have stopped
+
+    Returns:
+        dict: {'counters': {(name, labels): total}, 'histograms': {(name, labels): [buckets..., sum, count]}}
+    """
+    process_metrics.flush(force=True)
+    directory = metrics_dir()
+    counters, histograms = defaultdict(float), {}
+    with _locked(directory, shared=True):
+        paths = glob.glob(os.path.join(directory, '*.json'))
+        for path in paths:
+            _add_file(path, counters, histograms)
+    stopped = [path for path in paths if _has_stopped(os.path.basename(path))]
+    if stopped:
+        retire(stopped)
+    return {'counters': counters, 'histograms': histograms}
+
+
+def retire(paths):
+    """Adds the totals in the files of processes that have stopped to RETIRED_FILE, and removes the files
+
+    Args:
+        paths (list[str]): The files
+    """
+    directory = metrics_dir()
+    retired = os.path.join(directory, RETIRED_FILE)
+    counters, histograms = defaultdict(float), {}
+    with _locked(directory):
+        paths = [path for path in paths if _add_file(path, counters, histograms)]  # Not retired by another process
+        if not paths:
+            return
+        _add_file(retired, counters, histograms)
+        with open(retired + '.tmp', 'w') as file:
+            json.dump({'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+                       'histograms': [[name, list(labels), values] for (name, labels), values in histograms.items()]},
+                      file)
+        os.replace(retired + '.tmp', retired)
+        for path in paths:
+            os.remove(path)
+
+
+def _add_file(path, counters, histograms) -> bool:
+    """Adds the totals in a metrics file to counters and histograms
+
+    Returns:
+        bool: Whether the file could be read
+    """
+    try:
+        with open(path) as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return False  # Removed or being replaced
+    for name, labels, value in data['counters']:
+        counters[name, tuple(tuple(label) for label in labels)] += value
+    for name, labels, values in data['histograms']:
+        key = (name, tuple(tuple(label) for label in labels))
+        if key in histograms:
+            histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+        else:
+            histograms[key] = values
+    return True
+
+
+def _has_stopped(file_name) -> bool:
+    """Whether a file in METRICS_DIR was written by a process on this server that has since stopped"""
+    if fcntl is None:
+        return False  # Without the lock, a file can't be retired safely
+    try:
+        host, pid, _ = file_name[:-len('.json')].rsplit('-', 2)
+        pid = int(pid)
+    except ValueError:
+        return False  # e.g. RETIRED_FILE
+    if host != socket.gethostname() or pid == os.getpid():
+        return False
+    try:
+        os.kill(pid, 0)  # Checks the process exists, without sending it a signal
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass  # Running as another user
+    return False
+
+
+@contextmanager
+def _locked(directory, shared=False):
+    """Holds a lock on METRICS_DIR, shared by the processes reading it or held by the one retiring files"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    descriptor = os.open(os.path.join(directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(descriptor, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(descriptor)  # Also releases the lock
+
+
+def _labels(labels, extra=()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = ('%s="%s"' % (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+               for name, value in pairs)
+    return '{%s}' % ','.join(escaped)
+
+
+def render_metrics() -> str:
+    """Every process's metrics, in the Prometheus text exposition format"""
+    totals = collect()
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append('# HELP %s %s' % (name, help_text))
+        lines.append('# TYPE %s %s' % (name, metric_type))
+        if metric_type == 'counter':
+            for (metric, labels), value in sorted(totals['counters'].items()):
+                if metric == name:
+                    lines.append('%s%s %s' % (name, _labels(labels), repr(float(value))))
+        else:
+            for (metric, labels), values in sorted(totals['histograms'].items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bucket, count in zip(DURATION_BUCKETS, values):
+                    cumulative += count
+                    lines.append('%s_bucket%s %d' % (name, _labels(labels, [('le', repr(float(bucket)))]), cumulative))
+                lines.append('%s_bucket%s %d' % (name, _labels(labels, [('le', '+Inf')]), values[-1]))
+                lines.append('%s_sum%s %s' % (name, _labels(labels), repr(float(values[-2]))))
+                lines.append('%s_count%s %d' % (name, _labels(labels), values[-1]))
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 10:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0004_userregister_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpotRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(help_text='How strongly this spot is recommended (0 to 1)')),
+                ('rank', models.PositiveIntegerField(db_index=True, help_text='Position in the recommendation list, 1 being the best')),
+                ('computedOn', models.DateField(help_text='The day this recommendation list was built')),
+                ('sId', models.ForeignKey(help_text='The recommended spot', on_delete=django.db.models.deletion.CASCADE, to='exSeed.spot')),
+            ],
+            options={
+                'verbose_name': 'Spot Recommendation',
+                'verbose_name_plural': 'Spot Recommendations',
+                'ordering': ['rank'],
+            },
+        ),
+    ]
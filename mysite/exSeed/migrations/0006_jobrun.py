@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0005_spotrecommendation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='The name of the job', max_length=100)),
+                ('scheduledFor', models.DateTimeField(help_text='When this run was due')),
+                ('startedAt', models.DateTimeField(help_text='When this run started')),
+                ('finishedAt', models.DateTimeField(blank=True, help_text='When this run finished', null=True)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('output', models.TextField(blank=True, help_text='What the run did, or the error if it failed')),
+            ],
+            options={
+                'verbose_name': 'Job Run',
+                'verbose_name_plural': 'Job Runs',
+                'ordering': ['-scheduledFor'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='jobrun',
+            constraint=models.UniqueConstraint(fields=('name', 'scheduledFor'), name='unique_job_run'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:22
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('exSeed', '0006_jobrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='The URL that was profiled', max_length=500)),
+                ('view', models.CharField(help_text='The view that handled the request', max_length=100)),
+                ('mode', models.CharField(choices=[('cprofile', 'cProfile'), ('sample', 'Sampling')], default='cprofile', max_length=10)),
+                ('createdAt', models.DateTimeField(help_text='When the request was made')),
+                ('duration', models.FloatField(help_text='How long the request took while being profiled, in seconds')),
+                ('fileName', models.CharField(help_text="The profile's file in PROFILE_DIR", max_length=100)),
+                ('user', models.ForeignKey(help_text='Who asked for the profile', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Request Profile',
+                'verbose_name_plural': 'Request Profiles',
+                'ordering': ['-createdAt'],
+            },
+        ),
+    ]
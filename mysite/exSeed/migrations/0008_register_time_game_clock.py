@@ -0,0 +1,20 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:36
+
+from django.db import migrations, models
+import exSeed.clock
+import exSeed.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0007_requestprofile'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userregister',
+            name='registerTime',
+            field=models.TimeField(default=exSeed.clock.current_time, editable=False, help_text='The time that the record is created. Note, this field cannot be edited, and is automatically created', validators=[exSeed.models.valid_time]),
+        ),
+    ]
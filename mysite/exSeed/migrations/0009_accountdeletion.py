@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0008_register_time_game_clock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(help_text='The account being deleted', max_length=150)),
+                ('userId', models.BigIntegerField(help_text="The account's ID")),
+                ('requestedBy', models.CharField(help_text='Who asked for the account to be deleted', max_length=150)),
+                ('requestedAt', models.DateTimeField(help_text='When the deletion was asked for')),
+                ('startedAt', models.DateTimeField(blank=True, help_text='When the deletion started', null=True)),
+                ('updatedAt', models.DateTimeField(blank=True, help_text='When the deletion last made progress', null=True)),
+                ('finishedAt', models.DateTimeField(blank=True, help_text='When the account was removed', null=True)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('rowsTotal', models.PositiveIntegerField(default=0, help_text='Rows there were to remove')),
+                ('rowsDeleted', models.PositiveIntegerField(default=0, help_text='Rows removed so far')),
+                ('output', models.TextField(blank=True, help_text='The error, if the deletion failed')),
+            ],
+            options={
+                'verbose_name': 'Account Deletion',
+                'verbose_name_plural': 'Account Deletions',
+                'ordering': ['-requestedAt'],
+            },
+        ),
+    ]
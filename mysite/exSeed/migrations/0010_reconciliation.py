@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0009_accountdeletion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Reconciliation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('startedAt', models.DateTimeField(help_text='When the check started')),
+                ('updatedAt', models.DateTimeField(help_text='When the check last made progress')),
+                ('finishedAt', models.DateTimeField(blank=True, help_text='When the check finished', null=True)),
+                ('day', models.DateField(help_text='The game day the stats were checked as of')),
+                ('fix', models.BooleanField(default=False, help_text='Whether wrong stats are corrected, rather than only reported')),
+                ('phase', models.CharField(choices=[('records', 'Spots of the day'), ('users', 'Users'), ('spots', 'Spots'), ('done', 'Done')], default='records', max_length=10)),
+                ('position', models.BigIntegerField(default=0, help_text='The last row checked in this phase')),
+                ('checked', models.PositiveIntegerField(default=0)),
+                ('found', models.PositiveIntegerField(default=0)),
+                ('fixed', models.PositiveIntegerField(default=0)),
+                ('state', models.JSONField(blank=True, default=dict, help_text='What the earlier phases worked out for the later ones')),
+            ],
+            options={
+                'verbose_name': 'Reconciliation',
+                'verbose_name_plural': 'Reconciliations',
+                'ordering': ['-startedAt'],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('exSeed', '0010_reconciliation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('registers', models.PositiveIntegerField(default=0)),
+                ('points', models.PositiveIntegerField(default=0)),
+                ('streakResets', models.PositiveIntegerField(default=0)),
+                ('streakDaysLost', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Daily Stats',
+                'verbose_name_plural': 'Daily Stats',
+                'ordering': ['-day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ProjectionCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('position', models.BigIntegerField(default=0, help_text='The ID of the last event applied')),
+                ('updatedAt', models.DateTimeField(blank=True, help_text='When events were last applied', null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GameEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.PositiveSmallIntegerField(choices=[(1, 'Register'), (2, 'Streak reset'), (3, 'Title change'), (4, 'Avatar change')])),
+                ('day', models.DateField(help_text='The game day it happened on')),
+                ('value', models.IntegerField(blank=True, help_text="The points scored, the streak lost, or the new avatar's ID", null=True)),
+                ('text', models.CharField(blank=True, help_text='The new title', max_length=100)),
+                ('user', models.ForeignKey(help_text='The user it happened to', on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Game Event',
+                'verbose_name_plural': 'Game Events',
+                'ordering': ['pk'],
+            },
+        ),
+    ]
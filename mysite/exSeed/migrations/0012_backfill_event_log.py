@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def backfill_event_log(apps, schema_editor):
+    from exSeed.events import backfill
+    backfill(registry=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0011_event_log'),
+    ]
+
+    operations = [
+        # The event log starts with each user's history, worked out from their registers (see events.py)
+        migrations.RunPython(backfill_event_log, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,102 @@
+from django.db import migrations, models
+import django.db.models.deletion
+import exSeed.models
+
+
+def add_default_campus(apps, schema_editor):
+    """Puts every existing spot, spot of the day, recommendation and user in the default campus"""
+    code, name = exSeed.models.DEFAULT_CAMPUS
+    campus, _ = apps.get_model('exSeed', 'Campus').objects.get_or_create(code=code, defaults={'name': name})
+    for model_name in ('Spot', 'SpotRecord', 'SpotRecommendation', 'UserInfo'):
+        apps.get_model('exSeed', model_name).objects.update(campus=campus)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0012_backfill_event_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Campus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.SlugField(help_text='A short name for the campus, used in commands', max_length=30, unique=True)),
+                ('name', models.CharField(help_text="The campus's name", max_length=100)),
+            ],
+            options={
+                'verbose_name': 'Campus',
+                'verbose_name_plural': 'Campuses',
+                'ordering': ['name'],
+            },
+        ),
+        # Added empty, filled with the default campus, then made required
+        migrations.AddField(
+            model_name='spot',
+            name='campus',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, to='exSeed.campus'),
+        ),
+        migrations.AddField(
+            model_name='spotrecord',
+            name='campus',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='exSeed.campus'),
+        ),
+        migrations.AddField(
+            model_name='spotrecommendation',
+            name='campus',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='exSeed.campus'),
+        ),
+        migrations.AddField(
+            model_name='userinfo',
+            name='campus',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, to='exSeed.campus'),
+        ),
+        migrations.RunPython(add_default_campus, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='spot',
+            name='campus',
+            field=models.ForeignKey(default=exSeed.models.default_campus_id, help_text='The campus this spot is on', on_delete=django.db.models.deletion.PROTECT, to='exSeed.campus'),
+        ),
+        migrations.AlterField(
+            model_name='spotrecord',
+            name='campus',
+            field=models.ForeignKey(db_index=False, editable=False, help_text='The campus this is the spot of the day for', on_delete=django.db.models.deletion.PROTECT, to='exSeed.campus'),
+        ),
+        migrations.AlterField(
+            model_name='spotrecommendation',
+            name='campus',
+            field=models.ForeignKey(db_index=False, help_text='The campus whose list this is in', on_delete=django.db.models.deletion.CASCADE, to='exSeed.campus'),
+        ),
+        migrations.AlterField(
+            model_name='userinfo',
+            name='campus',
+            field=models.ForeignKey(db_index=False, default=exSeed.models.default_campus_id, help_text='The campus the user plays on', on_delete=django.db.models.deletion.PROTECT, to='exSeed.campus'),
+        ),
+        # A spot of the day is now unique within its campus, rather than across the whole site
+        migrations.AlterField(
+            model_name='spotrecord',
+            name='spotDay',
+            field=models.DateField(db_index=True, help_text='The day that this was the spot of the day, represented as the Python datetime.date value', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='spotrecord',
+            constraint=models.UniqueConstraint(fields=('campus', 'spotDay'), name='unique_campus_spot_day'),
+        ),
+        migrations.AddIndex(
+            model_name='spotrecommendation',
+            index=models.Index(fields=['campus', 'rank'], name='recommendation_campus_rank'),
+        ),
+        migrations.AddIndex(
+            model_name='userinfo',
+            index=models.Index(fields=['campus', '-currentStreak', '-totalPoints'], name='userinfo_campus_streak'),
+        ),
+        migrations.AddIndex(
+            model_name='userinfo',
+            index=models.Index(fields=['campus', '-totalPoints', '-currentStreak'], name='userinfo_campus_points'),
+        ),
+        migrations.AddIndex(
+            model_name='userinfo',
+            index=models.Index(fields=['campus', 'lastSpotRegister'], name='userinfo_campus_last_register'),
+        ),
+    ]
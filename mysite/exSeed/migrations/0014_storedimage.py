@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0013_campus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text="The image's file in IMAGE_ROOT", max_length=100, unique=True)),
+                ('width', models.PositiveIntegerField(blank=True, help_text="The image's width in pixels", null=True)),
+                ('source', models.URLField(blank=True, help_text='The link on another site this is a copy of', null=True, unique=True)),
+                ('storedAt', models.DateTimeField(auto_now_add=True, help_text='When the image was stored')),
+            ],
+            options={
+                'verbose_name': 'Stored Image',
+                'verbose_name_plural': 'Stored Images',
+                'ordering': ['-storedAt'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exSeed', '0014_storedimage'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameevent',
+            name='kind',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Register'), (2, 'Streak reset'), (3, 'Title change'), (4, 'Avatar change'), (5, 'Correction')]),
+        ),
+        migrations.AlterField(
+            model_name='gameevent',
+            name='text',
+            field=models.CharField(blank=True, help_text='The new title, or the corrected stats', max_length=100),
+        ),
+    ]
@@ -4,6 +4,8 @@ from django.core.validators import MaxValueValidator, MinValueValidator, Decimal
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
+from .clock import FIRST_REGISTER_HOUR, LAST_REGISTER_HOUR, current_time
+
 """
 Developer note:
 When no field is explicitly defined as the primary key, Django automatically creates an auto-incrementing integer primary key.
@@ -19,14 +21,14 @@ def valid_time(time):
         time (datetime.time): The time of the register submission
 
     Raises:
-        ValidationError: Time is too early for start time (default is 06:00)
-        ValidationError: Time is too late for end time (default is 19:00)
+        ValidationError: Time is before FIRST_REGISTER_HOUR (see clock.py)
+        ValidationError: Time is after LAST_REGISTER_HOUR
 
     @author Rowan N
     """
     current_hour = time.hour
-    earliest_hour = 9  # This value indicates the earliest hour the user can submit a valid time
-    latest_hour = 16  # This value indicates the final hour within which a user can submit a valid time
+    earliest_hour = FIRST_REGISTER_HOUR  # This value indicates the earliest hour the user can submit a valid time
+    latest_hour = LAST_REGISTER_HOUR  # This value indicates the final hour within which a user can submit a valid time
     if current_hour < earliest_hour:
         raise ValidationError(
             _('%(time)s is not after %(hour)s:00:00'),
@@ -39,7 +41,51 @@ def valid_time(time):
         )
 
 
+DEFAULT_CAMPUS = ('main', 'Main Campus')  # (code, name) of the campus spots and users are put in when none is given
+
+
+def default_campus_id() -> int:
+    """The campus spots and users are put in when none is given, which is added if it doesn't exist yet. A site with
+    only one campus never needs to choose one
+    """
+    code, name = DEFAULT_CAMPUS
+    return Campus.objects.get_or_create(code=code, defaults={'name': name})[0].pk
+
+
 # Create your models here.
+class Campus(models.Model):
+    """This table holds each campus the game is played on. Spots, spots of the day and users each belong to one campus,
+    and each campus has its own spot of the day and leaderboards (see campuses.py)
+
+    Columns:
+        code (SlugField): A short name for the campus, used by the management commands. This MUST be a unique value
+        name (CharField): The campus's name
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. Streatham (streatham)) (AKA name (code))
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    code = models.SlugField(
+        help_text="A short name for the campus, used in commands",
+        max_length=30,
+        unique=True,
+    )
+    name = models.CharField(
+        help_text="The campus's name",
+        max_length=100,
+    )
+
+    def __str__(self):
+        return self.name + " (" + self.code + ")"
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = "Campuses"
+        verbose_name = "Campus"
+
+
 class UserInfo(models.Model):
     """This table holds additional data on each user
 
@@ -56,7 +102,8 @@ class UserInfo(models.Model):
             not played yesterday
         hasTakenPledge (BooleanField): Boolean value for if the user has taken the SotD pledge. Means this user cannot access main pages of the
             site if false.
-        
+        campus (ForeignKey): The campus the user plays on, whose spot of the day and leaderboards they see. Defaults to
+            the default campus
 
     Functions:
         __str__(self): Defines how each record in the table is represented (E.g. 7 dev [CS=1 TP=1]) (AKA ID Username [currentStreak totalPoints])
@@ -106,12 +153,26 @@ class UserInfo(models.Model):
         default=False,
         verbose_name="Pledged"
     )
+    campus = models.ForeignKey(
+        'Campus',
+        on_delete=models.PROTECT,
+        default=default_campus_id,
+        db_index=False,  # Every index in Meta starts with the campus
+        help_text="The campus the user plays on",
+    )
 
     def __str__(self):
         return str(self.user.id) + " " + str(self.user.username) + " [CS=" + \
             str(self.currentStreak) + " TP=" + str(self.totalPoints) + "]"
 
     class Meta:
+        # A campus's leaderboards are read in these orders, and its first registers of the day are counted by
+        # lastSpotRegister, so each campus's rows are read without scanning the other campuses'
+        indexes = [
+            models.Index(fields=['campus', '-currentStreak', '-totalPoints'], name='userinfo_campus_streak'),
+            models.Index(fields=['campus', '-totalPoints', '-currentStreak'], name='userinfo_campus_points'),
+            models.Index(fields=['campus', 'lastSpotRegister'], name='userinfo_campus_last_register'),
+        ]
         verbose_name_plural = "Additional User Info"
         verbose_name = "Users Info"
 
@@ -155,6 +216,7 @@ class Spot(models.Model):
             or under -180
         average_attendance (PositiveSmallIntegerField): The average attendance of this spot when it is the spot of the day
         imageName (CharField): The link to the image for this spot. Can be empty
+        campus (ForeignKey): The campus the spot is on. Defaults to the default campus
 
     Functions:
         __str__(self): Defines how each record in the table is represented (E.g. Duck Pond (ID 1)) (AKA name (ID spotID))
@@ -202,6 +264,12 @@ class Spot(models.Model):
         max_length=100,
         blank=True,
     )
+    campus = models.ForeignKey(
+        'Campus',
+        on_delete=models.PROTECT,
+        default=default_campus_id,
+        help_text="The campus this spot is on",
+    )
 
     def __str__(self):
         return self.name + " (ID " + str(self.id) + ")"
@@ -253,7 +321,8 @@ class UserRegister(models.Model):
     )
 
     registerTime = models.TimeField(
-        auto_now_add=True,
+        default=current_time,  # The game clock's time (see clock.py) rather than auto_now_add's real time
+        editable=False,
         help_text="The time that the record is created. Note, this field cannot be edited, and is automatically created",
         validators=[valid_time]
     )
@@ -280,7 +349,9 @@ class SpotRecord(models.Model):  # SpotRecord
     Columns:
         sId (ForeignKey): Holds the spot that is the spot of the day. If the spot it's referencing is deleted, this record is also deleted
         attendance (PositiveSmallIntegerField): Records how many individuals have attended this spot-instance. Default is 0
-        spotDay (DateField): The actual date this spot is spot of the day. Must be unique (only one spot can be spot of the day)
+        spotDay (DateField): The actual date this spot is spot of the day. Must be unique on each campus (only one spot
+            can be the campus's spot of the day)
+        campus (ForeignKey): The campus this is the spot of the day for. Always the spot's campus, which save() copies
 
     Functions:
         __str__(self): Defines how each record in the table is represented (E.g. 26 February - Rock Garden) (AKA spotDay - sId.name)
@@ -300,15 +371,557 @@ class SpotRecord(models.Model):  # SpotRecord
     )
     spotDay = models.DateField(
         help_text="The day that this was the spot of the day, represented as the Python datetime.date value",
-        unique=True,  # This implies db_index = True
         null=True,
-        db_index=True,  # Orders entries by date submitted
+        db_index=True,  # Orders entries by date submitted, across every campus (e.g. for exports)
     )
+    campus = models.ForeignKey(
+        'Campus',
+        on_delete=models.PROTECT,
+        db_index=False,  # The unique constraint in Meta starts with the campus
+        editable=False,
+        help_text="The campus this is the spot of the day for",
+    )
+
+    def save(self, *args, **kwargs):
+        if self.campus_id is None:
+            self.campus_id = Spot.objects.values_list('campus_id', flat=True).get(pk=self.sId_id)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         formatted_date = self.spotDay.strftime("%d %B")
         return str(formatted_date) + " - " + self.sId.name
 
     class Meta:
+        constraints = [
+            # Also the index a campus's spot of the day is looked up by
+            models.UniqueConstraint(fields=['campus', 'spotDay'], name='unique_campus_spot_day'),
+        ]
         verbose_name_plural = "Spot Record"
         verbose_name = "Spot Records"
+
+
+class SpotRecommendation(models.Model):
+    """This table holds the scored list of candidates for the next spot of the day. It is rebuilt every night by the
+    recommend_spots command, so that choosing the day's spot only needs to read the top few rows
+
+    Columns:
+        sId (ForeignKey): The spot being recommended. If the spot is deleted, this record is also deleted
+        score (FloatField): How strongly the spot is recommended, from 0 to 1. See recommender.score_spots()
+        rank (PositiveIntegerField): The spot's position in the list, starting from 1 for the highest score
+        computedOn (DateField): The date the list was built
+        campus (ForeignKey): The campus of the spot. Each campus has its own list
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. 1. Duck Pond (0.82))
+                                                                           (AKA rank. sId.name (score))
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    sId = models.ForeignKey(
+        'Spot',
+        on_delete=models.CASCADE,
+        help_text="The recommended spot",
+    )
+    score = models.FloatField(
+        help_text="How strongly this spot is recommended (0 to 1)",
+    )
+    rank = models.PositiveIntegerField(
+        help_text="Position in the recommendation list, 1 being the best",
+        db_index=True,  # Daily selection reads the list in rank order
+    )
+    computedOn = models.DateField(
+        help_text="The day this recommendation list was built",
+    )
+    campus = models.ForeignKey(
+        'Campus',
+        on_delete=models.CASCADE,
+        db_index=False,  # The index in Meta starts with the campus
+        help_text="The campus whose list this is in",
+    )
+
+    def __str__(self):
+        return str(self.rank) + ". " + self.sId.name + " (" + str(round(self.score, 2)) + ")"
+
+    class Meta:
+        ordering = ['rank']
+        indexes = [
+            models.Index(fields=['campus', 'rank'], name='recommendation_campus_rank'),
+        ]
+        verbose_name_plural = "Spot Recommendations"
+        verbose_name = "Spot Recommendation"
+
+
+class JobRun(models.Model):
+    """This table is the run log of the scheduled jobs (see scheduler.py). Adding a run's record is also how a worker
+    claims it, so no two workers make the same run
+
+    Columns:
+        name (CharField): The job's name
+        scheduledFor (DateTimeField): The time the run was due. Unique with name, so each run is only made once
+        startedAt (DateTimeField): When the run started
+        finishedAt (DateTimeField): When the run finished. Empty while it is running
+        status (CharField): 'running', 'succeeded' or 'failed'
+        output (TextField): A summary of what the run did, or the error if it failed
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. reset_streaks at 2023-03-01 00:00 - succeeded)
+                                                                           (AKA name at scheduledFor - status)
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = [(RUNNING, 'Running'), (SUCCEEDED, 'Succeeded'), (FAILED, 'Failed')]
+
+    name = models.CharField(
+        max_length=100,
+        help_text="The name of the job",
+    )
+    scheduledFor = models.DateTimeField(
+        help_text="When this run was due",
+    )
+    startedAt = models.DateTimeField(
+        help_text="When this run started",
+    )
+    finishedAt = models.DateTimeField(
+        help_text="When this run finished",
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=RUNNING,
+    )
+    output = models.TextField(
+        help_text="What the run did, or the error if it failed",
+        blank=True,
+    )
+
+    def __str__(self):
+        return self.name + " at " + self.scheduledFor.strftime("%Y-%m-%d %H:%M") + " - " + self.status
+
+    class Meta:
+        ordering = ['-scheduledFor']
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'scheduledFor'], name='unique_job_run'),
+        ]
+        verbose_name_plural = "Job Runs"
+        verbose_name = "Job Run"
+
+
+class RequestProfile(models.Model):
+    """This table lists the requests profiled by staff (see profiling.py). The profile itself is kept in a file in
+    PROFILE_DIR, as it can be large
+
+    Columns:
+        path (CharField): The URL that was profiled, including the query string
+        view (CharField): The URL name of the view that handled it
+        user (ForeignKey): The staff member who asked for the profile
+        mode (CharField): 'cprofile' (every function call, timed) or 'sample' (the stack, sampled every few milliseconds)
+        createdAt (DateTimeField): When the request was made
+        duration (FloatField): How long the request took, in seconds (longer than without the profiler)
+        fileName (CharField): The profile's file in PROFILE_DIR
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. /leaderboard?profile (cprofile) at 2023-03-01 12:00:00)
+                                                                           (AKA path (mode) at createdAt)
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    CPROFILE = 'cprofile'
+    SAMPLE = 'sample'
+    MODES = [(CPROFILE, 'cProfile'), (SAMPLE, 'Sampling')]
+
+    path = models.CharField(
+        max_length=500,
+        help_text="The URL that was profiled",
+    )
+    view = models.CharField(
+        max_length=100,
+        help_text="The view that handled the request",
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        help_text="Who asked for the profile",
+    )
+    mode = models.CharField(
+        max_length=10,
+        choices=MODES,
+        default=CPROFILE,
+    )
+    createdAt = models.DateTimeField(
+        help_text="When the request was made",
+    )
+    duration = models.FloatField(
+        help_text="How long the request took while being profiled, in seconds",
+    )
+    fileName = models.CharField(
+        max_length=100,
+        help_text="The profile's file in PROFILE_DIR",
+    )
+
+    def __str__(self):
+        return self.path + " (" + self.mode + ") at " + self.createdAt.strftime("%Y-%m-%d %H:%M:%S")
+
+    class Meta:
+        ordering = ['-createdAt']
+        verbose_name_plural = "Request Profiles"
+        verbose_name = "Request Profile"
+
+
+class AccountDeletion(models.Model):
+    """This table is the queue of accounts waiting to be deleted, and the log of those that have been (see
+    deletion.py). The user's rows are removed a chunk at a time in the background, so the row counts show how far along
+    a deletion is
+
+    Columns:
+        username (CharField): The username of the account being deleted
+        userId (BigIntegerField): The account's primary key. Not a foreign key, as the account is deleted at the end
+        requestedBy (CharField): The username of whoever asked for the deletion (the user, or a member of staff)
+        requestedAt (DateTimeField): When the deletion was asked for
+        startedAt (DateTimeField): When the deletion started. Empty while it is queued
+        updatedAt (DateTimeField): When the last chunk of rows was removed, so a deletion left by a stopped process can
+            be picked up again
+        finishedAt (DateTimeField): When the account was removed. Empty until then
+        status (CharField): 'queued', 'running', 'done' or 'failed'
+        rowsTotal (PositiveIntegerField): How many rows there were to remove when the deletion started
+        rowsDeleted (PositiveIntegerField): How many rows have been removed so far
+        output (TextField): The error, if the deletion failed
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. Deleting sam - running)
+                                                                           (AKA Deleting username - status)
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    username = models.CharField(
+        max_length=150,
+        help_text="The account being deleted",
+    )
+    userId = models.BigIntegerField(
+        help_text="The account's ID",
+    )
+    requestedBy = models.CharField(
+        max_length=150,
+        help_text="Who asked for the account to be deleted",
+    )
+    requestedAt = models.DateTimeField(
+        help_text="When the deletion was asked for",
+    )
+    startedAt = models.DateTimeField(
+        help_text="When the deletion started",
+        null=True,
+        blank=True,
+    )
+    updatedAt = models.DateTimeField(
+        help_text="When the deletion last made progress",
+        null=True,
+        blank=True,
+    )
+    finishedAt = models.DateTimeField(
+        help_text="When the account was removed",
+        null=True,
+        blank=True,
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=QUEUED,
+    )
+    rowsTotal = models.PositiveIntegerField(
+        default=0,
+        help_text="Rows there were to remove",
+    )
+    rowsDeleted = models.PositiveIntegerField(
+        default=0,
+        help_text="Rows removed so far",
+    )
+    output = models.TextField(
+        blank=True,
+        help_text="The error, if the deletion failed",
+    )
+
+    def __str__(self):
+        return "Deleting " + self.username + " - " + self.status
+
+    class Meta:
+        ordering = ['-requestedAt']
+        verbose_name_plural = "Account Deletions"
+        verbose_name = "Account Deletion"
+
+
+class Reconciliation(models.Model):
+    """This table records each check of the denormalised stats against the registers (see reconcile.py), and how far
+    along it is, so a check that was stopped part way through can be carried on
+
+    Columns:
+        startedAt (DateTimeField): When the check started
+        updatedAt (DateTimeField): When the last chunk was checked
+        finishedAt (DateTimeField): When the check finished. Empty until then
+        day (DateField): The game day the stats were checked as of, kept so a resumed check uses the same one
+        fix (BooleanField): Whether the wrong stats are corrected, or only reported
+        phase (CharField): The pass the check is in: 'records', 'users', 'spots' or 'done'
+        position (BigIntegerField): The primary key of the last row checked in this pass
+        checked (PositiveIntegerField): How many rows have been checked
+        found (PositiveIntegerField): How many wrong stats have been found
+        fixed (PositiveIntegerField): How many of them have been corrected
+        state (JSONField): What the earlier passes worked out for the later ones, and the wrong stats found by field
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. Check 3 - users (12 found))
+                                                                           (AKA Check id - phase (found found))
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    RECORDS = 'records'
+    USERS = 'users'
+    SPOTS = 'spots'
+    DONE = 'done'
+    PHASES = [(RECORDS, 'Spots of the day'), (USERS, 'Users'), (SPOTS, 'Spots'), (DONE, 'Done')]
+
+    startedAt = models.DateTimeField(
+        help_text="When the check started",
+    )
+    updatedAt = models.DateTimeField(
+        help_text="When the check last made progress",
+    )
+    finishedAt = models.DateTimeField(
+        help_text="When the check finished",
+        null=True,
+        blank=True,
+    )
+    day = models.DateField(
+        help_text="The game day the stats were checked as of",
+    )
+    fix = models.BooleanField(
+        help_text="Whether wrong stats are corrected, rather than only reported",
+        default=False,
+    )
+    phase = models.CharField(
+        max_length=10,
+        choices=PHASES,
+        default=RECORDS,
+    )
+    position = models.BigIntegerField(
+        help_text="The last row checked in this phase",
+        default=0,
+    )
+    checked = models.PositiveIntegerField(
+        default=0,
+    )
+    found = models.PositiveIntegerField(
+        default=0,
+    )
+    fixed = models.PositiveIntegerField(
+        default=0,
+    )
+    state = models.JSONField(
+        help_text="What the earlier phases worked out for the later ones",
+        default=dict,
+        blank=True,
+    )
+
+    def __str__(self):
+        return "Check " + str(self.pk) + " - " + self.phase + " (" + str(self.found) + " found)"
+
+    class Meta:
+        ordering = ['-startedAt']
+        verbose_name_plural = "Reconciliations"
+        verbose_name = "Reconciliation"
+
+
+class GameEvent(models.Model):
+    """This table is the append-only log of what users do in the game (see events.py). Rows are only ever added, and
+    each is a few small columns, so the log stays compact however long the game runs. The UserInfo stats and the daily
+    rollups are projections of this log, and can be rebuilt from it
+
+    Columns:
+        kind (PositiveSmallIntegerField): What happened, as a code: 1 register, 2 streak reset, 3 title change,
+            4 avatar change, 5 correction (of stats found to be wrong by reconcile_stats)
+        user (ForeignKey): The user it happened to
+        day (DateField): The game day it happened on
+        value (IntegerField): The points scored for a register, the streak lost for a reset, or the new avatar's ID
+        text (CharField): The new title, for a title change, or the corrected stats as JSON, for a correction. Empty
+            otherwise
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. 12: register by 7 on 2023-03-01)
+                                                                           (AKA id: kind by user on day)
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    REGISTER = 1
+    STREAK_RESET = 2
+    TITLE_CHANGE = 3
+    AVATAR_CHANGE = 4
+    CORRECTION = 5
+    KINDS = [(REGISTER, 'Register'), (STREAK_RESET, 'Streak reset'), (TITLE_CHANGE, 'Title change'),
+             (AVATAR_CHANGE, 'Avatar change'), (CORRECTION, 'Correction')]
+
+    kind = models.PositiveSmallIntegerField(
+        choices=KINDS,
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        help_text="The user it happened to",
+    )
+    day = models.DateField(
+        help_text="The game day it happened on",
+    )
+    value = models.IntegerField(
+        help_text="The points scored, the streak lost, or the new avatar's ID",
+        null=True,
+        blank=True,
+    )
+    text = models.CharField(
+        help_text="The new title, or the corrected stats",
+        max_length=100,
+        blank=True,
+    )
+
+    def __str__(self):
+        return (str(self.pk) + ": " + self.get_kind_display().lower() + " by " + str(self.user_id) + " on "
+                + str(self.day))
+
+    class Meta:
+        ordering = ['pk']
+        verbose_name_plural = "Game Events"
+        verbose_name = "Game Event"
+
+
+class ProjectionCheckpoint(models.Model):
+    """This table records how far along the event log (GameEvent) each projection (see events.py) has got
+
+    Columns:
+        name (CharField): The projection's name
+        position (BigIntegerField): The ID of the last event it has applied
+        updatedAt (DateTimeField): When it last applied events
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. user_stats at 1042)
+                                                                           (AKA name at position)
+    """
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+    )
+    position = models.BigIntegerField(
+        help_text="The ID of the last event applied",
+        default=0,
+    )
+    updatedAt = models.DateTimeField(
+        help_text="When events were last applied",
+        null=True,
+        blank=True,
+    )
+
+    def __str__(self):
+        return self.name + " at " + str(self.position)
+
+
+class DailyStats(models.Model):
+    """This table is a projection of the event log (see events.py): what happened in the game each day
+
+    Columns:
+        day (DateField): The game day
+        registers (PositiveIntegerField): How many users registered at the spot of the day
+        points (PositiveIntegerField): How many points were scored
+        streakResets (PositiveIntegerField): How many streaks were reset at the start of the day
+        streakDaysLost (PositiveIntegerField): The total length of the streaks that were reset
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. 2023-03-01: 40 registers)
+                                                                           (AKA day: registers registers)
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    day = models.DateField(
+        unique=True,
+    )
+    registers = models.PositiveIntegerField(
+        default=0,
+    )
+    points = models.PositiveIntegerField(
+        default=0,
+    )
+    streakResets = models.PositiveIntegerField(
+        default=0,
+    )
+    streakDaysLost = models.PositiveIntegerField(
+        default=0,
+    )
+
+    def __str__(self):
+        return str(self.day) + ": " + str(self.registers) + " registers"
+
+    class Meta:
+        ordering = ['-day']
+        verbose_name_plural = "Daily Stats"
+        verbose_name = "Daily Stats"
+
+
+class StoredImage(models.Model):
+    """This table lists the images kept on this site (see images.py), which avatars and spots link to. The images and
+    their variants are files in IMAGE_ROOT, named after a hash of the image
+
+    Columns:
+        name (CharField): The image's file name in IMAGE_ROOT, linked to as IMAGE_URL + name
+        width (PositiveIntegerField): The image's width in pixels. Empty if it was stored without Pillow, so has no
+            variants
+        source (URLField): The link on another site this is a copy of (see 'python manage.py store_images'). Empty for
+            uploaded images
+        storedAt (DateTimeField): When the image was first stored
+
+    Functions:
+        __str__(self): Defines how each record in the table is represented (E.g. 0123...cdef_1200.png)
+                                                                           (AKA name)
+
+    Other:
+        The meta class defines how information from this table is referred to in the admin screen (named for purpose of clarity)
+    """
+    name = models.CharField(
+        max_length=100,
+        unique=True,
+        help_text="The image's file in IMAGE_ROOT",
+    )
+    width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="The image's width in pixels",
+    )
+    source = models.URLField(
+        null=True,
+        blank=True,
+        unique=True,
+        help_text="The link on another site this is a copy of",
+    )
+    storedAt = models.DateTimeField(
+        auto_now_add=True,
+        help_text="When the image was stored",
+    )
+
+    def __str__(self):
+        return self.name
+
+    class Meta:
+        ordering = ['-storedAt']
+        verbose_name_plural = "Stored Images"
+        verbose_name = "Stored Image"
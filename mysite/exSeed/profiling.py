@@ -0,0 +1,364 @@
+import asyncio
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from asgiref.sync import async_to_sync, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import RequestProfile
+
+"""
+Developer note:
+Staff can profile the view of any request by adding '?profile' to its URL, e.g. '/leaderboard?q=total&profile'. The
+profile is saved to a file in PROFILE_DIR, listed in the admin under Request Profiles, and the response's X-Profile
+header links to it. There are two kinds of profile:
+    ?profile or ?profile=cprofile  - cProfile, which times every function call. Exact call counts, but it makes the
+                                     view several times slower. Under ASGI it misses an async view's database queries,
+                                     which run in a thread shared with other requests
+    ?profile=sample                - Samples the stack every PROFILER_SAMPLE_INTERVAL seconds. Barely slows the view
+                                     down, and follows an async view into the threads its queries run in
+
+Either kind can be read in the admin as a text report sorted by cumulative time, own time or calls, or downloaded as
+collapsed stacks ('a;b;c 12' lines), which flamegraph.pl and speedscope.app turn into a flame graph. For cProfile the
+stacks are worked out from who called whom, so time is shared out between a function's callers in proportion.
+
+Unless the query parameter is there, ProfilerMiddleware does nothing but look for it, so it is safe to leave on in
+production. Only one request per process is profiled at a time, as the profilers can't be nested.
+"""
+
+PARAMETER = 'profile'
+SORTS = {  # report sort: (cProfile sort key, description)
+    'cumulative': ('cumulative', "Cumulative time"),
+    'tottime': ('tottime', "Own time"),
+    'calls': ('ncalls', "Calls"),
+}
+REPORT_LINES = 80  # Functions shown in a report
+MAX_DEPTH = 100  # Deepest stack worked out from a cProfile profile
+
+_profiling = threading.Lock()  # Held while a request is being profiled
+_file_numbers = itertools.count()
+
+
+def profile_dir() -> str:
+    return str(getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, 'profiles')))
+
+
+def frame_label(code_name, file_name, line) -> str:
+    """How a function is named in reports and stacks, e.g. 'leaderboard (views.py:281)'"""
+    if file_name == '~':  # A built in function, which cProfile names '<built-in method ...>'
+        return code_name
+    return '%s (%s:%d)' % (code_name, os.path.basename(file_name), line)
+
+
+class Sampler:
+    """Records the stacks of some threads every few milliseconds, from a background thread
+
+    Attributes:
+        interval (float): Seconds between samples
+        stacks (Counter): How many times each stack was seen, by its collapsed form ('outer;...;inner')
+    """
+
+    def __init__(self, interval, threads):
+        """
+        Args:
+            interval (float): Seconds between samples
+            threads (function): Given a thread ID and its current frame, returns whether to sample it
+        """
+        self.interval = interval
+        self.threads = threads
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='exseed-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != self._thread.ident and self.threads(thread_id, frame):
+                    self.stacks[self._collapse(frame)] += 1
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        labels = []
+        while frame is not None:
+            code = frame.f_code
+            labels.append(frame_label(code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        return ';'.join(reversed(labels))
+
+
+def in_sync_to_async(frame) -> bool:
+    """Whether a thread is running a function for sync_to_async (e.g. an async view's database query)"""
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == 'thread_handler' and code.co_filename.endswith(os.path.join('asgiref', 'sync.py')):
+            return True
+        frame = frame.f_back
+    return False
+
+
+class RequestProfiler:
+    """Profiles one request's view, and saves the profile
+
+    A cProfile profiler only sees the thread it was started in, so one is started in each thread the view runs in (an
+    async view runs on an event loop in another thread under WSGI), and they are added together when saved.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.mode = RequestProfile.SAMPLE if request.GET.get(PARAMETER) == 'sample' else RequestProfile.CPROFILE
+        self.profilers = []  # One for each thread, for cProfile
+        self.threads = set()  # The threads to sample, for sampling
+        self.sampler = None
+        self.duration = None
+
+    def _enter(self):
+        """Starts profiling the current thread"""
+        if self.mode == RequestProfile.SAMPLE:
+            self.threads.add(threading.get_ident())
+            return None
+        profiler = cProfile.Profile()
+        self.profilers.append(profiler)
+        profiler.enable()
+        return profiler
+
+    @staticmethod
+    def _exit(profiler):
+        if profiler is not None:
+            profiler.disable()
+
+    def _run(self, view_func, args, kwargs):
+        profiler = self._enter()
+        try:
+            if asyncio.iscoroutinefunction(view_func):
+                # Runs the view on an event loop in another thread, as Django would, profiling that thread too.
+                # Its database queries are run back in this thread
+                async def profiled_view():
+                    loop_profiler = self._enter()
+                    try:
+                        return await view_func(self.request, *args, **kwargs)
+                    finally:
+                        self._exit(loop_profiler)
+                return async_to_sync(profiled_view)()
+            return view_func(self.request, *args, **kwargs)
+        finally:
+            self._exit(profiler)
+
+    async def _arun(self, view_func, args, kwargs):
+        if not asyncio.iscoroutinefunction(view_func):
+            return await sync_to_async(self._run)(view_func, args, kwargs)
+        profiler = self._enter()
+        try:
+            return await view_func(self.request, *args, **kwargs)
+        finally:
+            self._exit(profiler)
+
+    def _start(self, follow_sync_to_async):
+        if self.mode == RequestProfile.SAMPLE:
+            def sample(thread_id, frame):
+                return thread_id in self.threads or (follow_sync_to_async and in_sync_to_async(frame))
+            self.sampler = Sampler(getattr(settings, 'PROFILER_SAMPLE_INTERVAL', 0.001), sample)
+            self.sampler.start()
+        return time.perf_counter()
+
+    def _stop(self, start):
+        self.duration = time.perf_counter() - start
+        if self.sampler is not None:
+            self.sampler.stop()
+
+    def run(self, view_func, args, kwargs):
+        """Runs the view, profiling it, and saves the profile
+
+        Returns:
+            HttpResponse: The view's response
+        """
+        start = self._start(follow_sync_to_async=False)
+        response = None
+        try:
+            response = self._run(view_func, args, kwargs)
+            return response
+        finally:
+            self._stop(start)
+            self.save(response)
+
+    async def arun(self, view_func, args, kwargs):
+        """Runs the view from the event loop, profiling it, and saves the profile. The database queries of an async
+        view run in sync_to_async's thread, which cProfile can't see but sampling follows
+
+        Returns:
+            HttpResponse: The view's response
+        """
+        start = self._start(follow_sync_to_async=True)
+        response = None
+        try:
+            response = await self._arun(view_func, args, kwargs)
+            return response
+        finally:
+            self._stop(start)
+            await sync_to_async(self.save)(response)
+
+    def save(self, response) -> RequestProfile:
+        """Saves the profile, linking to it from the response's X-Profile header"""
+        directory = profile_dir()
+        os.makedirs(directory, exist_ok=True)
+        file_name = '%s-%d-%d.%s' % (timezone.now().strftime('%Y%m%d-%H%M%S'), os.getpid(), next(_file_numbers),
+                                     'folded' if self.mode == RequestProfile.SAMPLE else 'prof')
+        if self.mode == RequestProfile.SAMPLE:
+            with open(os.path.join(directory, file_name), 'w') as file:
+                file.writelines('%s %d\n' % stack for stack in self.sampler.stacks.items())
+        else:
+            pstats.Stats(*self.profilers).dump_stats(os.path.join(directory, file_name))
+
+        match = getattr(self.request, 'resolver_match', None)
+        profile = RequestProfile.objects.create(
+            path=self.request.get_full_path()[:500],
+            view=(match.url_name or match.view_name) if match is not None else 'unmatched',
+            user=self.request.user, mode=self.mode, createdAt=timezone.now(), duration=self.duration,
+            fileName=file_name)
+        if response is not None:
+            response['X-Profile'] = reverse('admin:exSeed_requestprofile_change', args=[profile.pk])
+        return profile
+
+
+def may_profile(request) -> bool:
+    """Whether the request's user may profile requests (only staff can)"""
+    user = getattr(request, 'user', None)
+    return user is not None and user.is_active and user.is_staff
+
+
+class ProfilerMiddleware:
+    """Profiles the view of requests from staff with '?profile' in the URL, by running the view itself in
+    process_view. Goes after the other middleware with a process_view (e.g. CSRF), as returning a response from
+    process_view skips the ones after it
+
+    Works for both normal and async views, so the async views don't have to switch threads to pass through it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if PARAMETER not in request.GET or not may_profile(request) or not _profiling.acquire(blocking=False):
+            return None
+        try:
+            return RequestProfiler(request).run(view_func, view_args, view_kwargs)
+        finally:
+            _profiling.release()
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        if PARAMETER not in request.GET or not await sync_to_async(may_profile)(request) \
+                or not _profiling.acquire(blocking=False):
+            return None
+        try:
+            return await RequestProfiler(request).arun(view_func, view_args, view_kwargs)
+        finally:
+            _profiling.release()
+
+
+def _sample_report(stacks, sort) -> str:
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        labels = stack.split(';')
+        own[labels[-1]] += count
+        for label in set(labels):  # A recursive function is only counted once per sample
+            total[label] += count
+    samples = sum(stacks.values())
+    counts = own if sort == 'tottime' else total
+    lines = ["%d samples\n" % samples, "%8s %8s  %s" % ("total %", "own %", "function")]
+    for label, _ in counts.most_common(REPORT_LINES):
+        lines.append("%8.1f %8.1f  %s" % (100 * total[label] / samples, 100 * own[label] / samples, label))
+    return '\n'.join(lines) + '\n'
+
+
+def _read_stacks(path) -> Counter:
+    stacks = Counter()
+    with open(path) as file:
+        for line in file:
+            stack, count = line.rstrip('\n').rsplit(' ', 1)
+            stacks[stack] += int(count)
+    return stacks
+
+
+def report(profile, sort='cumulative') -> str:
+    """A text report of a profile, listing the functions that took the most time
+
+    Args:
+        profile (RequestProfile): The profile
+        sort (str): A key of SORTS. Sampled profiles have no call counts, so 'calls' is the same as 'cumulative'
+
+    Returns:
+        str: The report
+    """
+    path = os.path.join(profile_dir(), profile.fileName)
+    if profile.mode == RequestProfile.SAMPLE:
+        return _sample_report(_read_stacks(path), sort)
+    output = io.StringIO()
+    stats = pstats.Stats(path, stream=output)
+    stats.sort_stats(SORTS.get(sort, SORTS['cumulative'])[0]).print_stats(REPORT_LINES)
+    return output.getvalue()
+
+
+def collapsed_stacks(profile) -> str:
+    """A profile as collapsed stacks ('outer;...;inner count' lines) for flame graph tools. A cProfile profile's counts
+    are microseconds
+
+    Args:
+        profile (RequestProfile): The profile
+
+    Returns:
+        str: The stacks
+    """
+    path = os.path.join(profile_dir(), profile.fileName)
+    if profile.mode == RequestProfile.SAMPLE:
+        with open(path) as file:
+            return file.read()
+
+    stats = pstats.Stats(path).stats  # {function: (primitive calls, calls, own time, cumulative time, callers)}
+    callees = defaultdict(dict)
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, edge in callers.items():
+            callees[caller][function] = edge[3]  # The cumulative time of the calls made from this caller
+    stacks = defaultdict(float)
+
+    def walk(function, stack, share):
+        # share is the fraction of the function's time spent on this stack
+        _, _, own_time, cumulative_time, _ = stats[function]
+        stack = stack + (function,)
+        stacks[stack] += own_time * share
+        if len(stack) >= MAX_DEPTH:
+            return
+        for callee, edge_time in callees[function].items():
+            callee_time = stats[callee][3]
+            if callee in stack or not callee_time or edge_time * share < 1e-6:
+                continue  # Recursion, or too little time to show
+            walk(callee, stack, edge_time * share / callee_time)
+
+    for function, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            walk(function, (), 1.0)
+
+    return ''.join('%s %d\n' % (';'.join(frame_label(name, file, line) for file, line, name in stack), time * 1e6)
+                   for stack, time in stacks.items() if time * 1e6 >= 1)
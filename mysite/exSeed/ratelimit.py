@@ -0,0 +1,290 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from .metrics import process_metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows, where each process keeps its own buckets
+    fcntl = None
+
+"""
+Developer note:
+Rate limits for the views that write to the database, so a burst of requests (everyone arriving at the spot at 9:00,
+or a lecture theatre signing up at once in freshers' week) is turned away quickly instead of queueing every web server
+process on SQLite's write lock. Each limit is a token bucket: a request takes a token, and a request that finds the
+bucket empty gets a 429 response, with a Retry-After header saying when the next token is due. RATE_LIMITS sets the
+limits for each view, for two scopes:
+    user    - one bucket per logged in user (or, for visitors, per IP address)
+    global  - one bucket shared by everyone
+A request must find a token in every one of its buckets, and only takes them if it does.
+
+The buckets are kept in RATE_LIMIT_DIR, one small file each, locked while a request takes from them, so every server
+process shares them. Each process also remembers when a bucket it found empty will next have a token, and turns
+requests for it away without touching the file until then, so rejecting a burst costs almost nothing. Without
+RATE_LIMIT_DIR (or on Windows, which can't lock the files this way) each process keeps its buckets in memory.
+
+Limited requests are counted in exseed_rate_limited_total, by limit and scope. Bucket files that haven't been used for
+a day are full again, and are removed by the daily rate_limit_files job (see maintenance.py).
+"""
+
+SCOPES = ('user', 'global')  # The order buckets are locked in, so two requests never wait on each other's locks
+MAX_LOCAL_ENTRIES = 10000  # When a process remembers more buckets than this, the full and expired ones are dropped
+IDLE_SECONDS = 24 * 60 * 60  # How long a bucket file can go unused before it is removed
+
+
+class TokenBucket:
+    """Holds up to `capacity` tokens, refilled at `rate` tokens a second
+
+    Attributes:
+        capacity (float): The most tokens it can hold, i.e. the largest burst let through at once
+        rate (float): Tokens added each second
+        tokens (float): Tokens it held at `updated`
+        updated (float): When tokens was worked out, as a time.time()
+    """
+
+    def __init__(self, capacity, rate, tokens=None, updated=None):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity if tokens is None else tokens
+        self.updated = time.time() if updated is None else updated
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + max(0.0, now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self) -> float:
+        """Seconds until there is a token to take, or 0 if there is one now. Call refill() first"""
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def is_full(self, now) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+
+class Limit:
+    """One bucket a request takes a token from
+
+    Attributes:
+        name (str): The limit's name in RATE_LIMITS, e.g. 'score'
+        scope (str): 'user' or 'global'
+        key (str): Which bucket of the scope, e.g. 'user:12' or 'ip:10.0.0.1'
+        capacity (int): See TokenBucket
+        rate (float): See TokenBucket
+    """
+
+    def __init__(self, name, scope, key, requests, seconds):
+        self.name = name
+        self.scope = scope
+        self.key = key
+        self.capacity = requests
+        self.rate = requests / seconds
+
+    @property
+    def id(self) -> str:
+        """A name for the bucket that is safe to use as a file name"""
+        return '%s-%s-%s' % (self.name, self.scope, hashlib.sha1(self.key.encode()).hexdigest()[:20])
+
+    def new_bucket(self) -> TokenBucket:
+        return TokenBucket(self.capacity, self.rate)
+
+
+def client_key(request) -> str:
+    """Identifies who made a request: the logged in user, or the IP address of a visitor"""
+    if request.user.is_authenticated:
+        return 'user:%d' % request.user.pk
+    return 'ip:%s' % request.META.get('REMOTE_ADDR', '')
+
+
+def limits_for(name, request) -> list[Limit]:
+    """The buckets a request to a limited view takes from, from the RATE_LIMITS setting, in locking order"""
+    configured = getattr(settings, 'RATE_LIMITS', {}).get(name, {})
+    return [Limit(name, scope, client_key(request) if scope == 'user' else 'global', *configured[scope])
+            for scope in SCOPES if scope in configured]
+
+
+class LocalBuckets:
+    """Buckets kept in this process's memory"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = {}  # Limit.id -> TokenBucket
+
+    def take(self, limits, now) -> list[float]:
+        """Takes a token from every bucket if they all have one
+
+        Returns:
+            list[float]: How long until each bucket has a token, all 0 if the tokens were taken
+        """
+        with self.lock:
+            if len(self.buckets) > MAX_LOCAL_ENTRIES:
+                self.buckets = {key: bucket for key, bucket in self.buckets.items() if not bucket.is_full(now)}
+            buckets = [self.buckets.setdefault(limit.id, limit.new_bucket()) for limit in limits]
+            return _take_all(buckets, now)
+
+
+class FileBuckets:
+    """Buckets kept in files in a directory, shared by every process that uses it
+
+    Attributes:
+        directory (str): Where the files are
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def take(self, limits, now) -> list[float]:
+        """Takes a token from every bucket if they all have one, holding a lock on each bucket's file meanwhile
+
+        Returns:
+            list[float]: How long until each bucket has a token, all 0 if the tokens were taken
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        files = []
+        try:
+            for limit in limits:
+                descriptor = os.open(os.path.join(self.directory, limit.id), os.O_RDWR | os.O_CREAT, 0o600)
+                files.append(descriptor)
+                fcntl.flock(descriptor, fcntl.LOCK_EX)
+            buckets = [self._read(descriptor, limit) for descriptor, limit in zip(files, limits)]
+            waits = _take_all(buckets, now)
+            if not any(waits):
+                for descriptor, bucket in zip(files, buckets):
+                    os.pwrite(descriptor, ('%.6f %.6f' % (bucket.tokens, bucket.updated)).ljust(40).encode(), 0)
+            return waits
+        finally:
+            for descriptor in files:
+                os.close(descriptor)  # Also releases the lock
+
+    @staticmethod
+    def _read(descriptor, limit) -> TokenBucket:
+        try:
+            tokens, updated = (float(value) for value in os.pread(descriptor, 64, 0).split())
+        except ValueError:
+            return limit.new_bucket()  # A new file
+        # The bucket's size follows RATE_LIMITS, so a changed limit applies straight away
+        return TokenBucket(limit.capacity, limit.rate, min(tokens, limit.capacity), updated)
+
+
+def _take_all(buckets, now) -> list[float]:
+    for bucket in buckets:
+        bucket.refill(now)
+    waits = [bucket.wait() for bucket in buckets]
+    if not any(waits):
+        for bucket in buckets:
+            bucket.tokens -= 1
+    return waits
+
+
+class RateLimiter:
+    """Checks requests against their buckets, remembering which buckets are empty so they can be turned away fast"""
+
+    def __init__(self):
+        self.local = LocalBuckets()
+        self.lock = threading.Lock()
+        self.empty_until = {}  # Limit.id -> when the bucket next has a token
+
+    def store(self):
+        directory = getattr(settings, 'RATE_LIMIT_DIR', None)
+        if directory is None or fcntl is None:
+            return self.local
+        return FileBuckets(str(directory))
+
+    def check(self, name, request) -> float:
+        """Takes a token from each of a request's buckets
+
+        Args:
+            name (str): The limit, a key of RATE_LIMITS
+            request (HttpRequest): The request
+
+        Returns:
+            float: 0 if the request can go ahead, or how many seconds to wait before trying again
+        """
+        limits = limits_for(name, request)
+        if not limits:
+            return 0.0
+        now = time.time()
+        with self.lock:
+            waits = [self.empty_until.get(limit.id, 0.0) - now for limit in limits]
+        if max(waits) <= 0:  # Not known to be empty, so the shared bucket is checked
+            waits = self.store().take(limits, now)
+            if any(waits):
+                with self.lock:
+                    if len(self.empty_until) > MAX_LOCAL_ENTRIES:
+                        self.empty_until = {key: until for key, until in self.empty_until.items() if until > now}
+                    for limit, wait in zip(limits, waits):
+                        if wait > 0:
+                            self.empty_until[limit.id] = now + wait
+        for limit, wait in zip(limits, waits):
+            if wait > 0:
+                process_metrics.inc('exseed_rate_limited_total', (('limit', name), ('scope', limit.scope)))
+        return max(0.0, max(waits))
+
+    def reset(self):
+        """Forgets the buckets kept in memory (not the files)"""
+        with self.lock:
+            self.empty_until.clear()
+        self.local = LocalBuckets()
+
+
+limiter = RateLimiter()
+
+
+def too_many_requests(retry_after) -> HttpResponse:
+    """A 429 response, made without a template or the database so that turning a request away is cheap"""
+    seconds = max(1, math.ceil(retry_after))
+    response = HttpResponse("Too many requests. Please try again in %d seconds." % seconds, status=429,
+                            content_type='text/plain')
+    response['Retry-After'] = str(seconds)
+    return response
+
+
+def rate_limit(name, methods=('POST',)):
+    """Limits a view's requests with the buckets set for `name` in RATE_LIMITS
+
+    Must be placed below @login_required, so visitors are sent to log in rather than limited by their IP address.
+
+    Args:
+        name (str): The limit, a key of RATE_LIMITS
+        methods (tuple[str]): The request methods that are limited. Other requests aren't counted
+
+    Returns:
+        function: The decorator
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method in methods:
+                retry_after = limiter.check(name, request)
+                if retry_after:
+                    return too_many_requests(retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def remove_idle_buckets(idle_seconds=IDLE_SECONDS) -> int:
+    """Removes bucket files that haven't been used for idle_seconds, which are full again by then
+
+    Returns:
+        int: The number of files removed
+    """
+    directory = getattr(settings, 'RATE_LIMIT_DIR', None)
+    if directory is None or not os.path.isdir(directory):
+        return 0
+    removed = 0
+    cutoff = time.time() - idle_seconds
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass  # Removed by another process
+    return removed
@@ -0,0 +1,161 @@
+import datetime
+import random
+
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Max
+
+from . import clock
+from .models import Spot, SpotRecord, UserRegister, SpotRecommendation, default_campus_id
+from .geo import haversine, to_point
+
+"""
+Developer note:
+Rather than picking the spot of the day completely at random, every spot is given a score from four features:
+    attendance - the spot's average_attendance (popular spots get more people outside)
+    rating     - the mean spotNiceness users have given the spot (spots without ratings are treated as average)
+    recency    - how many days since the spot was last the spot of the day (capped at RECENCY_CAP_DAYS)
+    spread     - how far the spot is from the recent spots of the day, so users get to explore more of campus
+Each feature is scaled to 0-1 across the campus's catalogue and combined with WEIGHTS. The scores are calculated in one
+pass over the catalogue by refresh_recommendations(), which is run nightly for each campus, and stored in
+SpotRecommendation. Picking the day's spot then only reads the top CANDIDATE_POOL rows of the campus's list.
+"""
+
+WEIGHTS = {
+    'attendance': 0.3,
+    'rating': 0.3,
+    'recency': 0.3,
+    'spread': 0.1,
+}
+RECENCY_CAP_DAYS = 30  # A spot unused for this long is treated the same as one that has never been used
+RECENT_SPOT_DAYS = 7  # How many recent spots of the day are used to measure geographic spread
+NEUTRAL_RATING = 3.0  # The rating given to spots nobody has rated yet
+CANDIDATE_POOL = 3  # The day's spot is chosen at random (weighted by score) from this many of the top candidates
+
+
+def _scale(values):
+    """Scales a list of numbers to between 0 and 1. If every value is the same they all become 0.5"""
+    lowest, highest = min(values), max(values)
+    if highest == lowest:
+        return [0.5] * len(values)
+    return [(value - lowest) / (highest - lowest) for value in values]
+
+
+def score_spots(today, campus=None) -> list[tuple[int, float]]:
+    """Scores every spot on a campus as a candidate for the campus's spot of the day
+
+    Args:
+        today (datetime.date): The day the scores are calculated for. Recency is measured up to this day
+        campus (int): The campus's primary key. Defaults to the default campus
+
+    Returns:
+        list[tuple[int, float]]: (spot pk, score) for every spot on the campus, highest score first
+    """
+    campus = campus or default_campus_id()
+    spots = list(Spot.objects.filter(campus_id=campus).values_list('pk', 'latitude', 'longitude', 'average_attendance'))
+    if not spots:
+        return []
+    # Each of these is a single grouped query over the campus's history, rather than a query per spot
+    records = SpotRecord.objects.filter(campus_id=campus, spotDay__lte=today)
+    ratings = dict(UserRegister.objects.filter(srId__campus_id=campus).values_list('srId__sId')
+                   .annotate(Avg('spotNiceness')).order_by())
+    last_used = dict(records.values_list('sId').annotate(Max('spotDay')).order_by())
+    recent_points = [to_point(lat, long) for lat, long in records.filter(
+        spotDay__gt=today - datetime.timedelta(days=RECENT_SPOT_DAYS)).values_list('sId__latitude', 'sId__longitude')]
+
+    attendance, rating, recency, spread = [], [], [], []
+    for pk, latitude, longitude, average_attendance in spots:
+        attendance.append(average_attendance)
+        rating.append(ratings.get(pk) or NEUTRAL_RATING)
+        if pk in last_used:
+            recency.append(min((today - last_used[pk]).days, RECENCY_CAP_DAYS))
+        else:
+            recency.append(RECENCY_CAP_DAYS)
+        point = to_point(latitude, longitude)
+        spread.append(min((haversine(*point, *recent) for recent in recent_points), default=0))
+
+    features = {
+        'attendance': _scale(attendance),
+        'rating': _scale(rating),
+        'recency': _scale(recency),
+        'spread': _scale(spread),
+    }
+    scores = [
+        (spot[0], sum(WEIGHTS[name] * features[name][i] for name in WEIGHTS))
+        for i, spot in enumerate(spots)
+    ]
+    scores.sort(key=lambda item: item[1], reverse=True)
+    return scores
+
+
+def refresh_recommendations(today=None, campus=None) -> int:
+    """Rebuilds a campus's stored candidate list. This should be run once a day, after the previous day has finished
+
+    Args:
+        today (datetime.date): The day the list is built for. Defaults to today
+        campus (int): The campus's primary key. Defaults to the default campus
+
+    Returns:
+        int: The number of candidates stored
+    """
+    today = today or clock.today()
+    campus = campus or default_campus_id()
+    scores = score_spots(today, campus)
+    with transaction.atomic():
+        SpotRecommendation.objects.filter(campus_id=campus).delete()
+        SpotRecommendation.objects.bulk_create([
+            SpotRecommendation(sId_id=pk, campus_id=campus, score=score, rank=rank, computedOn=today)
+            for rank, (pk, score) in enumerate(scores, start=1)
+        ])
+    return len(scores)
+
+
+def choose_spot(today, campus):
+    """Chooses a campus's spot of the day from the top of its stored candidate list, never repeating yesterday's spot
+
+    If the list has not been built yet, a random spot on the campus is chosen instead.
+
+    Args:
+        today (datetime.date): The day a spot is being chosen for
+        campus (int): The campus's primary key
+
+    Returns:
+        Spot: The chosen spot, or None if there are no spots on the campus
+    """
+    yesterday_spot = SpotRecord.objects.filter(campus_id=campus, spotDay=today - datetime.timedelta(days=1)) \
+        .values_list('sId', flat=True).first()
+    candidates = list(SpotRecommendation.objects.select_related('sId').filter(campus_id=campus)
+                      .exclude(sId=yesterday_spot).order_by('rank')[:CANDIDATE_POOL])
+    if candidates:
+        # Weighted so the best candidate is the most likely, but the same spot does not win every time the list is stale
+        weights = [max(candidate.score, 0.01) for candidate in candidates]
+        return random.choices(candidates, weights=weights)[0].sId
+
+    spots = Spot.objects.filter(campus_id=campus).exclude(pk=yesterday_spot)
+    if not spots.exists():
+        spots = Spot.objects.filter(campus_id=campus)  # There is only one spot, so it has to be repeated
+    return spots.order_by('?').first()
+
+
+def assign_spot_of_the_day(today, campus=None):
+    """Gets a campus's SpotRecord for a day, choosing the day's spot if one hasn't been assigned yet
+
+    Args:
+        today (datetime.date): The day to get the spot of the day for
+        campus (int): The campus's primary key. Defaults to the default campus
+
+    Returns:
+        SpotRecord: The day's record, or None if there are no spots on the campus to choose from
+    """
+    campus = campus or default_campus_id()
+    record = SpotRecord.objects.select_related('sId').filter(campus_id=campus, spotDay=today).first()
+    if record is not None:
+        return record
+    spot = choose_spot(today, campus)
+    if spot is None:
+        return None
+    try:
+        with transaction.atomic():
+            return SpotRecord.objects.create(sId=spot, campus_id=campus, attendance=0, spotDay=today)
+    except IntegrityError:
+        # Another request assigned a spot at the same moment, so theirs is used
+        return SpotRecord.objects.select_related('sId').get(campus_id=campus, spotDay=today)
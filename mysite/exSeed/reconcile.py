@@ -0,0 +1,243 @@
+import datetime
+import itertools
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from . import clock, events
+from .models import Reconciliation, Spot, SpotRecord, UserInfo, UserRegister
+from .caching import bump_version
+from .events import MAX_POINTS
+
+"""
+Developer note:
+A user's points, streak and last register, a spot of the day's attendance and a spot's average attendance are all kept
+as running totals, updated as each register is made. A request that fails part way through, or two that race, leave
+them wrong for good. reconcile() works each of them out again from the UserRegister rows and reports (and, if asked,
+corrects) the ones that differ, by the same rules addScore and the midnight jobs follow:
+    attendance          - the number of users registered at the spot of the day
+    totalPoints         - 1 for each register, plus 4, 3, 2 or 1 for being the first, second, third or fourth to
+                          register that day (in registerTime order)
+    lastSpotRegister    - the day of the user's latest register
+    currentStreak       - the days in a row the user registered, up to their last register, or 0 if that was before
+                          yesterday
+    average_attendance  - the mean attendance of the spot's past days as spot of the day (today's is still going)
+A user registered twice on the same day (which a race can cause) counts that day once, with the larger of the two
+bonuses, as in the event log's backfill (see events.py).
+
+A user's points, streak and last register are the user_stats projection of the event log, so they are corrected by
+recording a correction event for each user that is wrong, which replay_events --rebuild applies again, rather than by
+changing UserInfo.
+
+The check is made in three passes, each over its table in primary key order, a chunk of rows at a time, with a few
+grouped queries per chunk rather than a query per row, so it runs in the same memory however many registers there are:
+    1. records  - each spot of the day's attendance, and who came first to fourth
+    2. users    - each user's register count, last day and streak, plus the bonuses found in pass 1
+    3. spots    - each spot's average attendance, from the attendances found in pass 1
+What pass 1 finds for the later passes is small (at most four users a day, and a total per spot), and is kept with the
+check's Reconciliation row. The row is saved after every chunk, in the same transaction as that chunk's corrections,
+so a check that is stopped can be resumed from the chunk after the last one saved.
+
+Registers made during a check can make it report stats that are about to be right, so corrections should be made
+outside the registering hours (see clock.py).
+"""
+
+CHUNK_SIZE = 2000  # Rows of the table being checked per chunk
+
+
+class Discrepancy:
+    """A stat that differs from what the registers say it should be
+
+    Attributes:
+        model (str): The model the stat is kept on, e.g. 'UserInfo'
+        pk (int): The row's primary key
+        field (str): The stat, e.g. 'totalPoints'
+        stored (object): The value kept in the database
+        expected (object): The value worked out from the registers
+    """
+
+    def __init__(self, model, pk, field, stored, expected):
+        self.model = model
+        self.pk = pk
+        self.field = field
+        self.stored = stored
+        self.expected = expected
+
+    def __str__(self):
+        return "%s %d %s is %s, should be %s" % (self.model, self.pk, self.field, self.stored, self.expected)
+
+
+def start(fix=False, day=None) -> Reconciliation:
+    """Starts a new check
+
+    Args:
+        fix (bool): Whether to correct the wrong stats, rather than only report them
+        day (datetime.date): The game day to check the stats as of. Defaults to today on the game clock
+
+    Returns:
+        Reconciliation: The check, ready for reconcile()
+    """
+    now = timezone.now()
+    return Reconciliation.objects.create(startedAt=now, updatedAt=now, day=day or clock.today(), fix=fix,
+                                         state={'bonus': {}, 'spots': {}, 'found': {}})
+
+
+def unfinished() -> Reconciliation:
+    """The latest check that hasn't finished, or None"""
+    return Reconciliation.objects.exclude(phase=Reconciliation.DONE).order_by('-startedAt').first()
+
+
+def reconcile(check, chunk_size=CHUNK_SIZE, report=None) -> Reconciliation:
+    """Carries out a check (or the rest of one that was stopped) to the end
+
+    Args:
+        check (Reconciliation): The check, from start() or unfinished()
+        chunk_size (int): Rows to check at a time
+        report (function): Called with each Discrepancy as it is found
+
+    Returns:
+        Reconciliation: The finished check
+    """
+    passes = {
+        Reconciliation.RECORDS: (_check_records, Reconciliation.USERS),
+        Reconciliation.USERS: (_check_users, Reconciliation.SPOTS),
+        Reconciliation.SPOTS: (_check_spots, Reconciliation.DONE),
+    }
+    while check.phase != Reconciliation.DONE:
+        check_chunk, next_phase = passes[check.phase]
+        with transaction.atomic():
+            checked, position, discrepancies = check_chunk(check, chunk_size)
+            for discrepancy in discrepancies:
+                found = check.state['found']
+                found[discrepancy.field] = found.get(discrepancy.field, 0) + 1
+                if report is not None:
+                    report(discrepancy)
+            check.found += len(discrepancies)
+            check.fixed += len(discrepancies) if check.fix else 0
+            check.checked += checked
+            if checked < chunk_size:  # The last chunk of this pass
+                check.phase, check.position = next_phase, 0
+            else:
+                check.position = position
+            check.updatedAt = timezone.now()
+            if check.phase == Reconciliation.DONE:
+                check.finishedAt = check.updatedAt
+            check.save()
+    return check
+
+
+def _check_records(check, chunk_size) -> tuple:
+    """Checks a chunk of spots of the day's attendance, noting the day's first four and the past attendances
+
+    Returns:
+        tuple[int, int, list[Discrepancy]]: The rows checked, the last one's primary key, and what was wrong
+    """
+    records = list(SpotRecord.objects.filter(pk__gt=check.position).order_by('pk')
+                   .values_list('pk', 'sId_id', 'spotDay', 'attendance')[:chunk_size])
+    if not records:
+        return 0, check.position, []
+    first, last = records[0][0], records[-1][0]
+    registers = UserRegister.objects.filter(srId_id__gte=first, srId_id__lte=last)
+    attendances = dict(registers.values('srId_id').annotate(users=Count('uId_id', distinct=True))
+                       .values_list('srId_id', 'users'))
+    bonus = check.state['bonus']
+    for (_, user_pk), extra in events.place_bonuses(registers, chunk_size).items():
+        bonus[str(user_pk)] = bonus.get(str(user_pk), 0) + extra
+
+    discrepancies, fixes = [], []
+    spots = check.state['spots']
+    for pk, spot_pk, spot_day, stored in records:
+        expected = attendances.get(pk, 0)
+        if stored != expected:
+            discrepancies.append(Discrepancy('SpotRecord', pk, 'attendance', stored, expected))
+            fixes.append(SpotRecord(pk=pk, attendance=expected))
+        if spot_day < check.day:
+            total, days = spots.get(str(spot_pk), (0, 0))
+            spots[str(spot_pk)] = (total + expected, days + 1)
+    if check.fix and fixes:
+        SpotRecord.objects.bulk_update(fixes, ['attendance'])
+        bump_version('spot')  # bulk_update() sends no signals
+    return len(records), last, discrepancies
+
+
+def _check_users(check, chunk_size) -> tuple:
+    """Checks a chunk of users' points, streaks and last registers
+
+    Returns:
+        tuple[int, int, list[Discrepancy]]: The rows checked, the last one's primary key, and what was wrong
+    """
+    infos = list(UserInfo.objects.filter(pk__gt=check.position).order_by('pk')
+                 .values_list('pk', 'user_id', 'totalPoints', 'currentStreak', 'lastSpotRegister')[:chunk_size])
+    if not infos:
+        return 0, check.position, []
+    user_pks = [user_pk for _, user_pk, _, _, _ in infos]
+    registers = UserRegister.objects.filter(uId_id__in=user_pks)
+    totals = {user_pk: (days, last_day) for user_pk, days, last_day in registers.values('uId_id').annotate(
+        days=Count('srId_id', distinct=True), last_day=Max('srId__spotDay')).values_list('uId_id', 'days', 'last_day')}
+    yesterday = check.day - datetime.timedelta(days=1)
+    streaks = _streaks([user_pk for user_pk, (_, last_day) in totals.items() if last_day >= yesterday])
+
+    discrepancies, fixes = [], []
+    bonus = check.state['bonus']
+    for pk, user_pk, points, streak, last_register in infos:
+        days, last_day = totals.get(user_pk, (0, None))
+        expected = {
+            'totalPoints': min(days + bonus.pop(str(user_pk), 0), MAX_POINTS),
+            'currentStreak': streaks.get(user_pk, 0),
+            'lastSpotRegister': last_day,
+        }
+        stored = {'totalPoints': points, 'currentStreak': streak, 'lastSpotRegister': last_register}
+        wrong = [field for field in expected if stored[field] != expected[field]]
+        discrepancies += [Discrepancy('UserInfo', pk, field, stored[field], expected[field]) for field in wrong]
+        if wrong:
+            fixes.append(events.correction(user_pk, check.day, {field: expected[field] for field in wrong}))
+    if check.fix and fixes:
+        events.record(*fixes)  # The projection updates the users and their cached pages
+    return len(infos), infos[-1][0], discrepancies
+
+
+def _streaks(user_pks) -> dict:
+    """Works out the streak of users whose last register was yesterday or today
+
+    Returns:
+        dict[int, int]: Each user's streak
+    """
+    streaks = {}
+    days = (UserRegister.objects.filter(uId_id__in=user_pks).order_by('uId_id', '-srId__spotDay')
+            .values_list('uId_id', 'srId__spotDay').distinct())
+    # Streamed a row at a time, as a long-standing user has a register for most days
+    for user_pk, user_days in itertools.groupby(days.iterator(chunk_size=CHUNK_SIZE), key=lambda row: row[0]):
+        streak, previous = 0, None
+        for _, day in user_days:
+            if previous is not None and previous - day != datetime.timedelta(days=1):
+                break
+            streak, previous = streak + 1, day
+        streaks[user_pk] = streak
+    return streaks
+
+
+def _check_spots(check, chunk_size) -> tuple:
+    """Checks a chunk of spots' average attendance, from the past attendances noted in the records pass. Spots that
+    have never been the spot of the day keep the average they were given
+
+    Returns:
+        tuple[int, int, list[Discrepancy]]: The rows checked, the last one's primary key, and what was wrong
+    """
+    spots = list(Spot.objects.filter(pk__gt=check.position).order_by('pk')
+                 .values_list('pk', 'average_attendance')[:chunk_size])
+    if not spots:
+        return 0, check.position, []
+    discrepancies, fixes = [], []
+    for pk, stored in spots:
+        if str(pk) not in check.state['spots']:
+            continue
+        total, days = check.state['spots'][str(pk)]
+        expected = round(total / days)  # Rounded as the attendance_averages job does
+        if stored != expected:
+            discrepancies.append(Discrepancy('Spot', pk, 'average_attendance', stored, expected))
+            fixes.append(Spot(pk=pk, average_attendance=expected))
+    if check.fix and fixes:
+        # Like the attendance_averages job, without the signals that would rebuild the spot index
+        Spot.objects.bulk_update(fixes, ['average_attendance'])
+    return len(spots), spots[-1][0], discrepancies
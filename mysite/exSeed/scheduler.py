@@ -0,0 +1,236 @@
+import datetime
+import logging
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.db import IntegrityError, transaction, close_old_connections
+from django.utils import timezone
+
+from . import clock
+from .models import JobRun
+
+"""
+Developer note:
+Daily maintenance (choosing the spot of the day, resetting streaks, updating attendance averages) runs as scheduled
+jobs rather than as a side effect of whoever happens to make the first request of the day. Jobs are registered with
+the @job decorator (see maintenance.py) and given a cron-style schedule, e.g. '0 0 * * *' for midnight every day.
+
+Every web server process runs a scheduler thread (started from wsgi.py and asgi.py) which checks once a minute for
+jobs that are due. Before a job runs it is claimed by adding its JobRun row; the (name, scheduledFor) pair is unique,
+so when several processes find the same job due only the first one to add the row runs it. The JobRun table is also
+the run log, shown in the admin. A run that was missed (e.g. the server was down at midnight) is still made if it is
+found within the job's catch_up time.
+
+Jobs can also be run from the command line with 'python manage.py run_jobs'.
+"""
+
+logger = logging.getLogger(__name__)
+
+CRON_FIELDS = (  # (name, lowest, highest) for each of the five fields of a schedule
+    ('minute', 0, 59),
+    ('hour', 0, 23),
+    ('day', 1, 31),
+    ('month', 1, 12),
+    ('weekday', 0, 6),  # 0 is Sunday, as in cron (7 is also accepted for Sunday)
+)
+
+
+class CronSchedule:
+    """A cron-style schedule: 'minute hour day month weekday', where each field is '*', a number, a range ('1-5'),
+    a list ('0,30') or a step ('*/15')
+
+    Raises:
+        ValueError: If the expression isn't a valid schedule
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        parts = expression.split()
+        if len(parts) != len(CRON_FIELDS):
+            raise ValueError("A schedule needs %d fields: %r" % (len(CRON_FIELDS), expression))
+        self.minutes, self.hours, self.days, self.months, self.weekdays = [
+            self._parse(part, lowest, highest) for part, (_, lowest, highest) in zip(parts, CRON_FIELDS)]
+        # As in cron, if both the day and the weekday are restricted, a day matching either one is used
+        self.any_day = parts[2] == '*'
+        self.any_weekday = parts[4] == '*'
+
+    @staticmethod
+    def _parse(field, lowest, highest) -> set[int]:
+        values = set()
+        for part in field.split(','):
+            step = 1
+            if '/' in part:
+                part, step = part.split('/')
+                step = int(step)
+            if part == '*':
+                start, end = lowest, highest
+            elif '-' in part:
+                start, end = (int(value) for value in part.split('-'))
+            else:
+                start = end = int(part)
+            top = 7 if highest == 6 else highest  # Sunday can be written as 7 in the weekday field
+            if not lowest <= start <= end <= top or step < 1:
+                raise ValueError("%r is out of range (%d-%d)" % (field, lowest, highest))
+            values.update(value % 7 if top == 7 else value for value in range(start, end + 1, step))
+        return values
+
+    def matches_day(self, date) -> bool:
+        if date.month not in self.months:
+            return False
+        day = date.day in self.days
+        weekday = (date.weekday() + 1) % 7 in self.weekdays  # Python counts from Monday, cron from Sunday
+        if self.any_day or self.any_weekday:
+            return day and weekday
+        return day or weekday
+
+    def previous(self, moment, lookback_days=366):
+        """The latest time at or before a moment that the schedule fires
+
+        Args:
+            moment (datetime.datetime): The time to look back from
+            lookback_days (int): How many days to look back before giving up
+
+        Returns:
+            datetime.datetime: The time (to the minute), or None if it doesn't fire within lookback_days
+        """
+        moment = moment.replace(second=0, microsecond=0)
+        for offset in range(lookback_days + 1):
+            date = moment.date() - datetime.timedelta(days=offset)
+            if not self.matches_day(date):
+                continue
+            for hour in sorted(self.hours, reverse=True):
+                if offset == 0 and hour > moment.hour:
+                    continue
+                for minute in sorted(self.minutes, reverse=True):
+                    fire = datetime.datetime.combine(date, datetime.time(hour, minute))
+                    if fire <= moment:
+                        return fire
+        return None
+
+    def __str__(self):
+        return self.expression
+
+
+class Job:
+    """A registered job
+
+    Attributes:
+        name (str): The job's name, used in the run log and the run_jobs command
+        schedule (CronSchedule): When the job runs
+        function (function): Does the work. Takes the time the run was scheduled for, and returns a summary (str)
+        catch_up (datetime.timedelta): How late a missed run can still be made
+    """
+
+    def __init__(self, name, schedule, function, catch_up):
+        self.name = name
+        self.schedule = schedule
+        self.function = function
+        self.catch_up = catch_up
+
+
+JOBS = {}  # Every registered job, by name, in the order they were registered (which is the order due jobs are run in)
+
+
+def job(name, schedule, catch_up=datetime.timedelta(days=1)):
+    """Registers a function as a scheduled job
+
+    Args:
+        name (str): The job's name
+        schedule (str): A cron-style schedule, see CronSchedule
+        catch_up (datetime.timedelta): How late a missed run can still be made
+
+    Returns:
+        function: The decorator
+    """
+    def decorator(function):
+        JOBS[name] = Job(name, CronSchedule(schedule), function, catch_up)
+        return function
+    return decorator
+
+
+def run_job(job_to_run, scheduled_for):
+    """Claims and runs one run of a job, recording it in the run log
+
+    Args:
+        job_to_run (Job): The job
+        scheduled_for (datetime.datetime): The (local) time the run is for. Only one run is made for each time
+
+    Returns:
+        JobRun: The finished run, or None if the run had already been claimed
+    """
+    try:
+        with transaction.atomic():
+            run = JobRun.objects.create(name=job_to_run.name, scheduledFor=timezone.make_aware(scheduled_for),
+                                        startedAt=timezone.now(), status=JobRun.RUNNING)
+    except IntegrityError:
+        return None  # Another process has already claimed this run
+
+    try:
+        run.output = job_to_run.function(scheduled_for) or ''
+        run.status = JobRun.SUCCEEDED
+    except Exception:
+        logger.exception("Job %s failed", job_to_run.name)
+        run.output = traceback.format_exc()
+        run.status = JobRun.FAILED
+    run.finishedAt = timezone.now()
+    run.save(update_fields=['output', 'status', 'finishedAt'])
+    return run
+
+
+def due_runs(now=None) -> list[tuple[Job, datetime.datetime]]:
+    """Finds the jobs that are due and haven't been run yet
+
+    Args:
+        now (datetime.datetime): The current (local) time. Defaults to the game clock's time (see clock.py)
+
+    Returns:
+        list[tuple[Job, datetime.datetime]]: Each due job, with the time its run is for
+    """
+    now = now or clock.now()
+    due = []
+    for scheduled in JOBS.values():
+        fire = scheduled.schedule.previous(now, lookback_days=scheduled.catch_up.days + 1)
+        if fire is None or fire < now - scheduled.catch_up:
+            continue
+        if not JobRun.objects.filter(name=scheduled.name, scheduledFor=timezone.make_aware(fire)).exists():
+            due.append((scheduled, fire))
+    return due
+
+
+def run_due_jobs(now=None) -> list[JobRun]:
+    """Runs every job that is due. See due_runs()
+
+    Returns:
+        list[JobRun]: The runs made by this process
+    """
+    runs = [run_job(scheduled, fire) for scheduled, fire in due_runs(now)]
+    return [run for run in runs if run is not None]
+
+
+_scheduler_thread = None
+_scheduler_lock = threading.Lock()
+
+
+def start_scheduler():
+    """Starts this process's scheduler thread, unless JOB_SCHEDULER_ENABLED is False or it is already running"""
+    global _scheduler_thread
+    if not getattr(settings, 'JOB_SCHEDULER_ENABLED', True):
+        return
+    with _scheduler_lock:
+        if _scheduler_thread is None or not _scheduler_thread.is_alive():
+            _scheduler_thread = threading.Thread(target=scheduler_loop, name='exseed-scheduler', daemon=True)
+            _scheduler_thread.start()
+
+
+def scheduler_loop():
+    """Runs due jobs at the start of every minute, forever"""
+    while True:
+        try:
+            run_due_jobs()
+        except Exception:
+            logger.exception("Couldn't check for due jobs")
+        finally:
+            close_old_connections()
+        time.sleep(60 - time.time() % 60 + 1)  # Wakes just after the start of the next minute
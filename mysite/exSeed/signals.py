@@ -0,0 +1,109 @@
+import os
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Spot, SpotRecord, UserRegister, UserInfo, Avatar, RequestProfile
+from .geo import invalidate_spot_index
+from .caching import bump_version, user_version, campus_version
+from .campuses import campus_of, forget_campus
+from .backends import forget_user
+from .profiling import profile_dir
+
+"""
+Signal receivers that keep in-memory and cached data in step with the database. These are connected in
+ExseedConfig.ready()
+"""
+
+
+@receiver(post_save, sender=Spot)
+@receiver(post_delete, sender=Spot)
+def spot_changed(sender, instance, **kwargs):
+    """Rebuilds the spot index next time it is used, whenever a spot is added, edited or removed"""
+    invalidate_spot_index()
+    bump_version(campus_version('spot', instance.campus_id))
+
+
+@receiver(post_save, sender=SpotRecord)
+@receiver(post_delete, sender=SpotRecord)
+@receiver(post_save, sender=UserRegister)
+@receiver(post_delete, sender=UserRegister)
+def attendance_changed(sender, instance, **kwargs):
+    """Refreshes the campus's cached home pages when today's spot, its attendance or its ratings change (e.g. in
+    addScore)
+    """
+    if sender is SpotRecord:
+        campus_pk = instance.campus_id
+    elif UserRegister.srId.is_cached(instance):  # As in addScore, so no query is needed
+        campus_pk = instance.srId.campus_id
+    else:
+        campus_pk = SpotRecord.objects.filter(pk=instance.srId_id).values_list('campus_id', flat=True).first()
+    bump_version(campus_version('spot', campus_pk) if campus_pk is not None else 'spot')
+
+
+@receiver(post_save, sender=UserInfo)
+@receiver(post_delete, sender=UserInfo)
+def user_info_changed(sender, instance, signal, created=False, update_fields=None, **kwargs):
+    """Refreshes the user's own cached pages and their campus's leaderboard when a user's score, streak, title or avatar
+    changes (e.g. in take_pledge, or in the admin)
+    """
+    forget_campus(instance.user_id)
+    versions = [user_version(instance.user_id), campus_version('scoreboard', instance.campus_id)]
+    if signal is post_save and not created and (update_fields is None or 'campus' in update_fields):
+        versions.append('scoreboard')  # The user may have moved from another campus, whose leaderboard showed them
+    bump_version(*versions)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Drops the cached copy used to identify the user on each request. Usernames are also shown on their campus's
+    leaderboard
+    """
+    forget_user(instance.pk)
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return  # Saved on every login, and doesn't change what is shown
+    bump_version(user_version(instance.pk), campus_version('scoreboard', campus_of(instance.pk)))
+
+
+@receiver(post_save, sender=Avatar)
+@receiver(post_delete, sender=Avatar)
+def avatar_changed(sender, **kwargs):
+    """Avatars are listed on the profile page and shown on the leaderboard"""
+    bump_version('avatars', 'scoreboard')
+
+
+@receiver(post_delete, sender=RequestProfile)
+def profile_deleted(sender, instance, **kwargs):
+    """Removes a deleted request profile's file"""
+    try:
+        os.remove(os.path.join(profile_dir(), instance.fileName))
+    except FileNotFoundError:
+        pass
+
+
+# The post_delete receivers above that are called for every row of a bulk delete of users or spots
+DELETE_RECEIVERS = [
+    (spot_changed, Spot),
+    (attendance_changed, SpotRecord),
+    (attendance_changed, UserRegister),
+    (user_info_changed, UserInfo),
+    (user_changed, User),
+]
+
+
+@contextmanager
+def deletions_unsignalled():
+    """Disconnects DELETE_RECEIVERS, so deleting many users or spots is done in a few queries rather than loading every
+    related row and refreshing the cache for each one. It affects the whole process, so is only for management
+    commands, which must refresh the cache themselves afterwards
+    """
+    for function, sender in DELETE_RECEIVERS:
+        post_delete.disconnect(function, sender=sender)
+    try:
+        yield
+    finally:
+        for function, sender in DELETE_RECEIVERS:
+            post_delete.connect(function, sender=sender)
@@ -0,0 +1,214 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+from asgiref.sync import SyncToAsync
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .metrics import request_stats
+
+"""
+Developer note:
+Every database query that takes longer than SLOW_QUERY_THRESHOLD seconds is logged, by a wrapper added to every
+database connection as it is opened. Each one is written as a line of JSON to SLOW_QUERY_LOG (shared by all the server
+processes) and as a warning to the 'exSeed.slow_queries' logger, with:
+    sql       - the query, with placeholders for its parameters
+    shape     - the query with its literals, placeholders and IN lists replaced, so repeats of a query match
+    params    - a fingerprint of the parameters (they are not logged, as they can hold personal details), to tell
+                whether the same query is being repeated with the same values
+    duration  - how long it took, in seconds
+    site      - the exSeed function and line that made it, e.g. 'views.py:351 leaderboard'
+    view      - the URL name of the view whose request made it, if any
+
+An async view's queries run in another thread, where the view isn't on the stack. If nothing in exSeed is, the site is
+found from the coroutines waiting on the event loop that handed the query to the thread, e.g. the 'async for' line in
+leaderboard. When several requests' coroutines are waiting on the loop (under ASGI) it can't be told which one made
+the query, so the site is 'unknown' and the view is the best guide to where it came from.
+
+'python manage.py slow_queries' lists the query shapes that took the most time, and where they were made.
+"""
+
+logger = logging.getLogger(__name__)
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Files in exSeed which are never where a query came from: the database wrappers, middleware, and the tests (which
+# make queries through the views)
+NOT_SITES = {os.path.join(PACKAGE_DIR, name) for name in ('slow_queries.py', 'metrics.py', 'profiling.py', 'tests.py')}
+MAX_SQL_LENGTH = 4000  # Longer queries are cut short in the log
+
+_write_lock = threading.Lock()
+
+
+def slow_query_log() -> str:
+    return str(getattr(settings, 'SLOW_QUERY_LOG', os.path.join(settings.BASE_DIR, 'slow_queries.log')))
+
+
+def query_shape(sql) -> str:
+    """A query with its details taken out, so that queries which only differ in their values match
+
+    e.g. "SELECT * FROM t WHERE id IN (%s, %s) AND name = 'Sam' LIMIT 21" -> "SELECT * FROM t WHERE id IN (...) AND
+    name = ? LIMIT ?"
+    """
+    shape = re.sub(r"'(?:[^']|'')*'", '?', sql)  # Quoted strings
+    shape = re.sub(r'(?<![\w."])-?\d+(?:\.\d+)?\b', '?', shape)  # Numbers, but not digits in names such as "U0"
+    shape = shape.replace('%s', '?')
+    shape = re.sub(r'\(\s*\?(?:\s*,\s*\?)*\s*\)', '(...)', shape)  # IN lists of any length
+    return re.sub(r'\s+', ' ', shape).strip()
+
+
+def params_fingerprint(params) -> str:
+    return hashlib.sha1(repr(params).encode()).hexdigest()[:12]
+
+
+def _is_site(frame) -> bool:
+    file_name = frame.f_code.co_filename
+    return file_name.startswith(PACKAGE_DIR) and file_name not in NOT_SITES
+
+
+def _describe(frame) -> str:
+    return '%s:%d %s' % (os.path.relpath(frame.f_code.co_filename, PACKAGE_DIR), frame.f_lineno, frame.f_code.co_name)
+
+
+def _waiting_site():
+    """The innermost exSeed coroutine waiting on the event loop that handed this thread its work, if only one is"""
+    loop = getattr(SyncToAsync.threadlocal, 'main_event_loop', None)
+    if loop is None:
+        return None
+    sites = set()
+    for task in asyncio.all_tasks(loop):
+        site = None
+        awaitable = task.get_coro()
+        while awaitable is not None:  # Follows what each coroutine is waiting on, from the outside in
+            frame = getattr(awaitable, 'cr_frame', None) or getattr(awaitable, 'ag_frame', None)
+            if frame is not None and _is_site(frame):
+                site = _describe(frame)
+            awaitable = getattr(awaitable, 'cr_await', None) or getattr(awaitable, 'ag_await', None)
+        if site is not None:
+            sites.add(site)
+    return sites.pop() if len(sites) == 1 else None
+
+
+def call_site() -> str:
+    """The innermost exSeed function that made the current query (see NOT_SITES), as 'file:line function'"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if _is_site(frame):
+            return _describe(frame)
+        frame = frame.f_back
+    return _waiting_site() or 'unknown'
+
+
+def record_slow_query(sql, params, many, duration, alias):
+    """Writes a slow query to the log"""
+    stats = request_stats.get()
+    match = getattr(stats.request, 'resolver_match', None) if stats is not None else None
+    entry = {
+        'time': datetime.datetime.now().isoformat(timespec='seconds'),
+        'duration': round(duration, 6),
+        'sql': sql[:MAX_SQL_LENGTH],
+        'shape': query_shape(sql)[:MAX_SQL_LENGTH],
+        'params': params_fingerprint(params),
+        'many': many,
+        'database': alias,
+        'site': call_site(),
+        'view': (match.url_name or match.view_name) if match is not None else None,
+    }
+    logger.warning("Slow query (%.0f ms) at %s: %s", duration * 1000, entry['site'], entry['sql'][:200])
+    path = slow_query_log()
+    try:
+        with _write_lock, open(path, 'a') as file:
+            file.write(json.dumps(entry) + '\n')  # One short write, so lines from different processes don't mix
+    except OSError as error:
+        logger.error("Couldn't write to the slow query log %s: %s", path, error)
+
+
+def log_slow_query(execute, sql, params, many, context):
+    """A database execute wrapper that logs queries taking longer than SLOW_QUERY_THRESHOLD seconds"""
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        if duration >= getattr(settings, 'SLOW_QUERY_THRESHOLD', 0.1):
+            record_slow_query(sql, params, many, duration, context['connection'].alias)
+
+
+@receiver(connection_created)
+def add_slow_query_log(sender, connection, **kwargs):
+    """Adds log_slow_query to every database connection as it is opened"""
+    if log_slow_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_slow_query)
+
+
+class QueryShape:
+    """The slow queries of one shape, added up
+
+    Attributes:
+        shape (str): The query shape
+        count (int): How many were logged
+        total (float): Their total duration, in seconds
+        worst (float): The longest one took, in seconds
+        sites (Counter): How many were made from each call site
+        views (Counter): How many were made by each view's requests
+        params (set): The parameter fingerprints seen
+    """
+
+    def __init__(self, shape):
+        self.shape = shape
+        self.count = 0
+        self.total = 0.0
+        self.worst = 0.0
+        self.sites = Counter()
+        self.views = Counter()
+        self.params = set()
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, entry):
+        self.count += 1
+        self.total += entry['duration']
+        self.worst = max(self.worst, entry['duration'])
+        self.sites[entry['site']] += 1
+        if entry.get('view'):
+            self.views[entry['view']] += 1
+        self.params.add(entry['params'])
+
+
+def aggregate(path=None, since=None) -> list[QueryShape]:
+    """Adds up the slow query log by query shape
+
+    Args:
+        path (str): The log. Defaults to SLOW_QUERY_LOG
+        since (datetime.datetime): Only count queries logged from this time
+
+    Returns:
+        list[QueryShape]: Each shape of query, in no particular order
+    """
+    shapes = {}
+    try:
+        with open(path or slow_query_log()) as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # A line cut short, e.g. by a full disk
+                if since is not None and datetime.datetime.fromisoformat(entry['time']) < since:
+                    continue
+                if entry['shape'] not in shapes:
+                    shapes[entry['shape']] = QueryShape(entry['shape'])
+                shapes[entry['shape']].add(entry)
+    except FileNotFoundError:
+        return []
+    return list(shapes.values())
@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from ..images import sources
+
+"""
+Developer note:
+{% picture link width %} shows an avatar or spot image. Images in the store (see images.py) are shown as a <picture>
+listing their WebP and fallback variants, so the browser picks the smallest one that is sharp at the size shown; links
+to other sites are shown as a plain <img>, as before. Templates should load 'pictures' and use this for every image
+that comes from the database.
+"""
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(link, width=None, sizes=None, **attributes):
+    """Renders an image from the database
+
+    Args:
+        link (str): The image's link, e.g. an Avatar's imageName
+        width (int): The width it is shown at, in CSS pixels
+        sizes (str): An <img> sizes attribute, instead of width, for images whose width depends on the screen
+        attributes (dict): Attributes for the <img>, e.g. class or alt
+
+    Returns:
+        str: The HTML
+    """
+    found = sources(link or '', width, sizes)
+    extra = format_html_join('', ' {}="{}"', attributes.items())
+    if not found['srcset']:
+        return format_html('<img src="{}"{}>', found['src'], extra)
+    sizes_attribute = format_html(' sizes="{}"', found['sizes']) if found['sizes'] else ''
+    return format_html('<picture><source type="image/webp" srcset="{}"{}><img src="{}" srcset="{}"{}{}></picture>',
+                       found['webp'], sizes_attribute, found['src'], found['srcset'], sizes_attribute, extra)
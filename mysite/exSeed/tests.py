@@ -1,12 +1,63 @@
 from django.contrib.auth.models import User
-from django.test import TransactionTestCase, Client
+from django.test import TransactionTestCase, Client, AsyncClient, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import F
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core import mail
+from django.core.mail.backends import locmem
 from django.urls import reverse
+from django.template import Context, Template
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from .models import UserInfo, Avatar, SpotRecord, Spot
+from .models import UserInfo, Avatar, SpotRecord, Spot, UserRegister, SpotRecommendation, JobRun, RequestProfile, \
+    AccountDeletion, Reconciliation, GameEvent, DailyStats, Campus, StoredImage, default_campus_id
+from django.core.files.uploadedfile import SimpleUploadedFile
+from .importer import read_rows, import_spots, import_students
+from .recommender import score_spots, refresh_recommendations, assign_spot_of_the_day
+from .geo import SpotIndex, is_at_spot, parse_position, INDEX_VERSION
+from .caching import bump_version
+from .views import publish_live_update, get_streak_image, STREAK_IMAGES
+from .images import store, variant_pool, image_url, CACHE_CONTROL, Image
+from . import live
+from .mail import mail_queue
+from .profiling import collapsed_stacks
+from .slow_queries import query_shape, aggregate
+from .ratelimit import RateLimiter, limiter, remove_idle_buckets
+from .deletion import deletion_worker, process_deletions, STALE_AFTER
+from . import reconcile
+from . import events
+from .metrics import process_metrics
+from .benchmarks import dataset
+from .benchmarks.runner import run_benchmarks
+from .benchmarks.simulator import simulate
+from .clock import SimulatedClock, use_clock
+from . import clock
+from .scheduler import CronSchedule, Job, JOBS, run_job, run_due_jobs
+from .maintenance import reset_streaks, update_attendance_averages
+from asgiref.sync import sync_to_async
+from decimal import Decimal
+import asyncio
 import datetime
+import io
+import json
+import os
+import random
+import smtplib
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import zlib
 
 # Create your tests here.
 
+MOBILE_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 10_3_1 like Mac OS X) AppleWebKit/603.1.30 (KHTML, like Gecko) Version/10.0 Mobile/14E304 Safari/602.1"
+
 class NonMobileTests(TransactionTestCase):
 
     def test_url(self):
@@ -401,7 +452,9 @@ class TestAddScore(TransactionTestCase):
         old_user = UserInfo.objects.get(user=user_account)
 
         add_score_response = self.client.post(reverse('score'), HTTP_USER_AGENT="Mozilla/5.0 (iPhone; CPU iPhone OS 10_3_1 like Mac OS X) AppleWebKit/603.1.30 (KHTML, like Gecko) Version/10.0 Mobile/14E304 Safari/602.1", data = {
-            'star': 3 #give star rating so a score can be added
+            'star': 3, #give star rating so a score can be added
+            'latitude': 50.73441, # a position a couple of metres from the duck pond
+            'longitude': -3.537950
         })
 
         user_account = User.objects.get(username='testuser')
@@ -418,6 +471,126 @@ class TestAddScore(TransactionTestCase):
             self.assertEqual(old_user.currentStreak, new_user.currentStreak - 1)  # Streak should increase by 1
             self.assertEqual(old_user.totalPoints, new_user.totalPoints - 5)  # Technically the first user to reach the spot
 
+    def test_adding_score_away_from_spot(self):
+        """
+        Parameters:
+            self
+        Tests that no score is added when the user's position is not at the spot, or is missing
+        """
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, attendance=0, spotDay=datetime.date.today())
+        SpotRecord.objects.create(sId=spot, attendance=0, spotDay=datetime.date.today() - datetime.timedelta(days=1))
+        user = User.objects.create_user(username='testuser', password='Hjguhjlkjbv765588')
+        UserInfo.objects.create(user=user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'), hasTakenPledge=True)
+        self.client.force_login(user)
+
+        for position in ({'latitude': 50.736190, 'longitude': -3.529250}, {}):  # XFI is about 650m away
+            self.client.post(reverse('score'), HTTP_USER_AGENT="Mozilla/5.0 (iPhone; CPU iPhone OS 10_3_1 like Mac OS X) AppleWebKit/603.1.30 (KHTML, like Gecko) Version/10.0 Mobile/14E304 Safari/602.1", data={
+                'star': 3, **position
+            })
+        self.assertEqual(UserInfo.objects.get(user=user).totalPoints, 0)
+        self.assertEqual(UserRegister.objects.count(), 0)
+
+    def test_get_during_registering_hours(self):
+        """
+        Parameters:
+            self
+        Tests that a logged in user who gets /addScore while a spot is open to register at is sent home, without
+        registering
+        """
+        day = datetime.date(2024, 3, 5)
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, attendance=0, spotDay=day)
+        user = User.objects.create_user(username='testuser', password='Hjguhjlkjbv765588')
+        UserInfo.objects.create(user=user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                hasTakenPledge=True)
+        self.client.force_login(user)
+        with use_clock(SimulatedClock(datetime.datetime.combine(day, datetime.time(10, 30)))):
+            response = self.client.get(reverse('score'), HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(UserRegister.objects.count(), 0)
+
+
+class TestSpotIndex(TransactionTestCase):
+    def test_distances_and_range_search(self):
+        """
+        Parameters:
+            self
+        Tests the grid index against known distances between campus spots, including spots in neighbouring grid cells
+        """
+        index = SpotIndex([(1, Decimal('50.734390'), Decimal('-3.537932')),  # Duck Pond
+                           (2, Decimal('50.736190'), Decimal('-3.529250')),  # XFI Common
+                           (3, Decimal('51.507400'), Decimal('-0.127800'))])  # London
+        self.assertAlmostEqual(index.distance_to(1, 50.736190, -3.529250), 646, delta=5)
+        self.assertEqual([pk for pk, _ in index.within(50.7345, -3.5379, 1000)], [1, 2])
+        self.assertEqual([pk for pk, _ in index.within(50.7345, -3.5379, 50)], [1])
+        self.assertEqual(index.within(0, 0, 1000), [])
+        self.assertIsNone(index.distance_to(4, 0, 0))
+
+    def test_nearest_matches_brute_force(self):
+        """
+        Parameters:
+            self
+        Tests that the ring search finds the same spots as checking every spot, for dense and sparse catalogues
+        """
+        generator = random.Random(18)
+        for spread in (0.05, 20):
+            spots = [(i, generator.uniform(50, 50 + spread), generator.uniform(-4, -4 + spread)) for i in range(300)]
+            index = SpotIndex(spots)
+            for _ in range(20):
+                lat, long = generator.uniform(50, 50 + spread), generator.uniform(-4, -4 + spread)
+                expected = sorted(index.distance_to(pk, lat, long) for pk, _, _ in spots)[:7]
+                self.assertEqual([round(d, 6) for _, d in index.nearest(lat, long, 7)], [round(d, 6) for d in expected])
+        self.assertEqual(len(index.nearest(0, 0, 500)), 300)  # Asking for more spots than exist returns them all
+
+    def test_index_rebuilt_when_spots_change(self):
+        """
+        Parameters:
+            self
+        Tests that saving a spot is reflected in the geofence check
+        """
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        self.assertTrue(is_at_spot(spot.pk, 50.73439, -3.537932))
+        spot.latitude, spot.longitude = 50.736190, -3.529250
+        spot.save()
+        self.assertFalse(is_at_spot(spot.pk, 50.73439, -3.537932))
+        self.assertEqual(parse_position('91', '0'), None)
+
+    def test_index_follows_changes_made_elsewhere(self):
+        """
+        Parameters:
+            self
+        Tests that a spot added without this process's index being told (as by another server process) can still be
+        registered at, and that a spot moved elsewhere is checked at its new position once its version is bumped
+        """
+        duck_pond = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        self.assertTrue(is_at_spot(duck_pond.pk, 50.73439, -3.537932))
+        # bulk_create sends no signals, so this process's index isn't told about the new spot
+        Spot.objects.bulk_create([Spot(name='XFI Common', desc='', latitude=50.736190, longitude=-3.529250)])
+        xfi = Spot.objects.get(name='XFI Common')
+        self.assertTrue(is_at_spot(xfi.pk, 50.736190, -3.529250))
+
+        Spot.objects.filter(pk=duck_pond.pk).update(latitude=50.736190, longitude=-3.529250)
+        self.assertTrue(is_at_spot(duck_pond.pk, 50.73439, -3.537932))  # This process hasn't been told yet
+        bump_version(INDEX_VERSION)  # What the other process's signal does
+        self.assertFalse(is_at_spot(duck_pond.pk, 50.73439, -3.537932))
+        self.assertTrue(is_at_spot(duck_pond.pk, 50.736190, -3.529250))
+
+    def test_nearest_spots_endpoint(self):
+        """
+        Parameters:
+            self
+        Tests that the nearest spots are returned as JSON, closest first
+        """
+        Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        Spot.objects.create(name='XFI Common', desc='', latitude=50.736190, longitude=-3.529250)
+        self.client.force_login(User.objects.create_user(username='testuser', password='x'))
+        response = self.client.get(reverse('nearest_spots'), {'latitude': 50.7362, 'longitude': -3.5293, 'k': 5})
+        self.assertEqual([spot['name'] for spot in response.json()['spots']], ['XFI Common', 'Duck Pond'])
+        self.assertLess(response.json()['spots'][0]['distance'], 10)
+        response = self.client.get(reverse('nearest_spots'), {'latitude': 'north'})
+        self.assertEqual(response.status_code, 400)
+
 
 class TestPledge(TransactionTestCase):
     def test_url(self):
@@ -495,4 +668,1647 @@ class TestPrivacyPolicyPage(TransactionTestCase):
 
         response = self.client.get(reverse('privacy_policy'), HTTP_USER_AGENT = "Mozilla/5.0 (iPhone; CPU iPhone OS 10_3_1 like Mac OS X) AppleWebKit/603.1.30 (KHTML, like Gecko) Version/10.0 Mobile/14E304 Safari/602.1")
         self.assertEqual(response.status_code, 200) #test the status code returned
-        self.assertTemplateUsed(response, template_name='privacy_policy.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, template_name='privacy_policy.html')
+
+class TestExport(TransactionTestCase):
+    def setUp(self):
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        other_spot = Spot.objects.create(name='XFI Common', desc='', latitude=50.736190, longitude=-3.529250)
+        today = datetime.date.today()
+        self.today_record = SpotRecord.objects.create(sId=spot, attendance=1, spotDay=today)
+        SpotRecord.objects.create(sId=other_spot, attendance=0, spotDay=today - datetime.timedelta(days=1))
+        self.user = User.objects.create_user(username='testuser', password='Hjguhjlkjbv765588')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'))
+        UserRegister.objects.create(uId=self.user, srId=self.today_record, spotNiceness=4)
+
+    def test_export_requires_staff(self):
+        """
+        Parameters:
+            self
+
+        Tests that users who are not staff are sent to the admin login instead of receiving data
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('export', kwargs={'dataset': 'registers'}))
+        self.assertEqual(response.status_code, 302)
+
+    def test_csv_export_with_spot_filter(self):
+        """
+        Parameters:
+            self
+
+        Tests that spot records are streamed as csv and that the spot filter is applied
+        """
+        self.client.force_login(User.objects.create_user(username='keeper', password='x', is_staff=True))
+        response = self.client.get(reverse('export', kwargs={'dataset': 'spotrecords'}), {'spot': 'Duck Pond'})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,spot_day,spot_id,spot_name,attendance')
+        self.assertEqual(len(lines), 2)  # Header and the single Duck Pond record
+        self.assertIn('Duck Pond', lines[1])
+
+    def test_jsonl_export_with_date_range(self):
+        """
+        Parameters:
+            self
+
+        Tests that registers are streamed as JSON lines, and that a bad date is rejected
+        """
+        self.client.force_login(User.objects.create_user(username='keeper', password='x', is_staff=True))
+        today = datetime.date.today().isoformat()
+        response = self.client.get(reverse('export', kwargs={'dataset': 'registers'}), {'format': 'jsonl', 'start': today})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['username'], 'testuser')
+        self.assertEqual(rows[0]['spot_day'], today)
+
+        response = self.client.get(reverse('export', kwargs={'dataset': 'registers'}), {'start': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestBulkImport(TransactionTestCase):
+    def test_spot_import_upserts_and_reports_bad_rows(self):
+        """
+        Parameters:
+            self
+
+        Tests that a spot file creates new spots, updates existing ones by name and skips invalid rows
+        """
+        Spot.objects.create(name='Duck Pond', desc='Old', latitude=50.73439, longitude=-3.537932)
+        rows = read_rows(io.StringIO(
+            "name,desc,latitude,longitude,imageName\n"
+            "Duck Pond,New description,50.73439,-3.537932,\n"
+            "XFI Common,,50.736190,-3.529250,https://i.imgur.com/zxC3CwO.jpg\n"
+            "Nowhere,Too far north,95.0,0,\n"
+            "XFI Common,Repeated,50.0,-3.0,\n"
+        ), 'csv')
+        result = import_spots(rows)
+        self.assertEqual((result.created, result.updated), (1, 1))
+        self.assertEqual([row_number for row_number, _ in result.errors], [3, 4])
+        self.assertEqual(Spot.objects.get(name='Duck Pond').desc, 'New description')
+        self.assertIsNone(Spot.objects.get(name='XFI Common').desc)
+
+    def test_avatar_import_from_admin(self):
+        """
+        Parameters:
+            self
+
+        Tests that avatars can be uploaded through the admin import page
+        """
+        Avatar.objects.create(imageName='https://i.imgur.com/old.png', avatarTitle='Happy Fish')
+        self.client.force_login(User.objects.create_superuser(username='keeper', password='x'))
+        upload = SimpleUploadedFile('avatars.json', json.dumps([
+            {'avatarTitle': 'Happy Fish', 'imageName': 'https://i.imgur.com/HteIBRi.png'},
+            {'avatarTitle': 'Emotionless Default', 'imageName': 'https://i.imgur.com/fhrZmo9.png'},
+        ]).encode())
+        response = self.client.post(reverse('admin:exSeed_avatar_import'), {'file': upload})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Avatar.objects.count(), 2)
+        self.assertEqual(Avatar.objects.get(avatarTitle='Happy Fish').imageName, 'https://i.imgur.com/HteIBRi.png')
+
+    def test_cohort_onboarding(self):
+        """
+        Parameters:
+            self
+
+        Tests that a cohort is added with a UserInfo and the default avatar each, that passwords hashed in a pool of
+        processes work, and that taken usernames, missing emails and weak passwords are rejected
+        """
+        User.objects.create_user(username='Existing', password='x')
+        rows = read_rows(io.StringIO(
+            "username,email,password,first_name\n"
+            "alice,alice@example.com,Hjguhjlkjbv765588,Alice\n"
+            "bob,bob@example.com,,\n"
+            "carol,carol@example.com,Kdfjgh4875Xq,\n"
+            "existing,someone@example.com,,\n"
+            "dave,,,\n"
+            "erin,erin@example.com,password,\n"
+            "ALICE,alice2@example.com,,\n"
+        ), 'csv')
+        result = import_students(rows, workers=2)
+        self.assertEqual(result.created, 3)
+        self.assertEqual([row_number for row_number, _ in result.errors], [4, 5, 6, 7])
+        self.assertEqual(Avatar.objects.filter(avatarTitle='Emotionless Default').count(), 1)
+        self.assertEqual(UserInfo.objects.filter(avatarId__avatarTitle='Emotionless Default', title='Sapling').count(), 3)
+        self.assertTrue(User.objects.get(username='alice').check_password('Hjguhjlkjbv765588'))
+        self.assertTrue(User.objects.get(username='carol').check_password('Kdfjgh4875Xq'))
+        self.assertFalse(User.objects.get(username='bob').has_usable_password())
+        self.assertEqual(User.objects.get(username='alice').first_name, 'Alice')
+
+        out = io.StringIO()
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write("username,email\nfrank,frank@example.com\n")
+        call_command('onboard_cohort', file.name, '--workers', '1', stdout=out, stderr=io.StringIO())
+        os.remove(file.name)
+        self.assertIn("1 created", out.getvalue())
+        self.assertTrue(UserInfo.objects.filter(user__username='frank').exists())
+
+
+class TestSpotRecommender(TransactionTestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.duck_pond = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932, average_attendance=10)
+        self.xfi = Spot.objects.create(name='XFI Common', desc='', latitude=50.736190, longitude=-3.529250, average_attendance=2)
+        self.forum = Spot.objects.create(name='Forum Lawn', desc='', latitude=50.735200, longitude=-3.534000, average_attendance=2)
+        user = User.objects.create_user(username='testuser', password='x')
+        for days_ago, spot, rating in ((1, self.duck_pond, 2), (2, self.xfi, 1), (30, self.forum, 5)):
+            record = SpotRecord.objects.create(sId=spot, spotDay=self.today - datetime.timedelta(days=days_ago))
+            UserRegister.objects.create(uId=user, srId=record, spotNiceness=rating)
+
+    def test_scores_favour_well_rated_unused_spots(self):
+        """
+        Parameters:
+            self
+        Tests that a highly rated spot that hasn't been used for a month beats recently used, poorly rated spots
+        """
+        scores = score_spots(self.today)
+        self.assertEqual(len(scores), 3)
+        self.assertEqual(scores[0][0], self.forum.pk)
+        self.assertEqual(scores[-1][0], self.xfi.pk)
+        self.assertTrue(all(0 <= score <= 1 for _, score in scores))
+
+    def test_assignment_uses_candidates_and_skips_yesterday(self):
+        """
+        Parameters:
+            self
+        Tests that today's spot comes from the stored candidate list, is never yesterday's spot, and is only assigned once
+        """
+        self.assertEqual(refresh_recommendations(self.today), 3)
+        self.assertEqual(SpotRecommendation.objects.first().sId, self.forum)
+        record = assign_spot_of_the_day(self.today)
+        self.assertNotEqual(record.sId, self.duck_pond)
+        self.assertEqual(assign_spot_of_the_day(self.today), record)
+        self.assertEqual(SpotRecord.objects.filter(spotDay=self.today).count(), 1)
+
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'exseed-tests'}}
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestViewCaching(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, spotDay=datetime.date.today())
+        self.user = User.objects.create_user(username='testuser', password='x')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                title='Sapling', hasTakenPledge=True)
+        self.client.force_login(self.user)
+
+    def page_queries(self, url):
+        """Requests a page and returns its response and the queries made on exSeed tables"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_USER_AGENT=MOBILE_AGENT)
+        return response, [query['sql'] for query in queries if 'exSeed_' in query['sql']]
+
+    def test_repeat_visits_served_from_cache(self):
+        """
+        Parameters:
+            self
+        Tests that the second visit to each page does not query the game's tables
+        """
+        for url in ('/', '/leaderboard?q=streak', '/profile'):
+            first, first_queries = self.page_queries(url)
+            second, second_queries = self.page_queries(url)
+            self.assertEqual(first.status_code, 200)
+            self.assertTrue(first_queries)
+            self.assertEqual(second_queries, [])
+            self.assertEqual(first.content, second.content)
+
+    def test_changes_invalidate_cached_pages(self):
+        """
+        Parameters:
+            self
+        Tests that changing title refreshes the profile and leaderboard, and editing the spot refreshes the home page
+        """
+        self.page_queries('/profile')
+        self.page_queries('/leaderboard?q=total')
+        self.page_queries('/')
+        self.client.get(reverse('change_title', kwargs={'title': 'Tree'}), HTTP_USER_AGENT=MOBILE_AGENT)
+        response, queries = self.page_queries('/profile')
+        self.assertTrue(queries)
+        self.assertContains(response, 'Tree')
+        response, queries = self.page_queries('/leaderboard?q=total')
+        self.assertContains(response, 'Tree')
+
+        self.page_queries('/')
+        Spot.objects.filter(name='Duck Pond').update(name='Duck Pond (renamed)')  # Bulk updates send no signals
+        self.assertEqual(self.page_queries('/')[1], [])
+        spot = Spot.objects.get()
+        spot.desc = 'Now with ducks'
+        spot.save()
+        self.assertContains(self.page_queries('/')[0], 'Now with ducks')
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestLeaderboardFragments(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        avatar = Avatar.objects.create(imageName='a.png', avatarTitle='A')
+        for i in range(10):
+            user = User.objects.create_user(username='player%d' % i, password='x')
+            UserInfo.objects.create(user=user, avatarId=avatar, totalPoints=100 - i, hasTakenPledge=True)
+        self.client.force_login(User.objects.get(username='player8'))
+
+    def test_leaderboard_rows(self):
+        """
+        Parameters:
+            self
+        Tests that the leaderboard shows the top five, then the user with the players either side of them
+        """
+        response = self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual([row[3] for row in response.context['TopResults']],
+                         ['player0', 'player1', 'player2', 'player3', 'player4'])
+        self.assertEqual([row[3] for row in response.context['UserResults']], ['player7', 'player8', 'player9'])
+        self.assertEqual(response.context['above_name'], 'player7')
+        self.assertContains(response, 'player0')
+
+    def test_top_five_fragment_is_reused(self):
+        """
+        Parameters:
+            self
+        Tests that a change which doesn't bump the scoreboard version leaves the cached top five in place, and that a
+        change which does bump it re-renders them
+        """
+        self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT)
+        User.objects.filter(username='player0').update(username='renamed')  # Bulk updates send no signals
+        # A different browser misses the whole-page cache, but shares the fragment
+        response = self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT + ' Tablet')
+        self.assertNotContains(response, 'renamed')
+
+        User.objects.get(username='renamed').save()
+        response = self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT + ' Tablet')
+        self.assertContains(response, 'renamed')
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestCachedIdentity(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, spotDay=datetime.date.today())
+        self.user = User.objects.create_user(username='testuser', password='x')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                title='Sapling', hasTakenPledge=True)
+        self.client.login(username='testuser', password='x')
+
+    def identity_queries(self, url):
+        """Requests a page and returns the queries made on the session and user tables"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries
+                if 'django_session' in query['sql'] or 'auth_user' in query['sql']]
+
+    def test_no_identity_queries(self):
+        """
+        Parameters:
+            self
+        Tests that once the session and user are cached, logged in pages don't query the session or user tables
+        """
+        for url in ('/', '/leaderboard?q=streak', '/profile', '/compass'):
+            self.client.get(url, HTTP_USER_AGENT=MOBILE_AGENT)
+            self.assertEqual(self.identity_queries(url), [])
+
+    def test_password_change_ends_session(self):
+        """
+        Parameters:
+            self
+        Tests that the cached user is dropped when the user is saved, so a new password still logs out old sessions
+        """
+        self.identity_queries('/profile')
+        self.user.set_password('new password')
+        self.user.save()
+        response = self.client.get('/profile', HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual(response.status_code, 302)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestAsyncViews(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, spotDay=datetime.date.today())
+        self.user = User.objects.create_user(username='testuser', password='x')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                title='Sapling', hasTakenPledge=True)
+        self.async_client = AsyncClient()
+
+    async def test_pages_served_on_event_loop(self):
+        """
+        Parameters:
+            self
+        Tests that the async views render through the ASGI request handler without touching the database synchronously
+        """
+        await sync_to_async(self.async_client.force_login)(self.user)
+        for url in ('/', '/leaderboard?q=streak', '/profile', '/compass'):
+            response = await self.async_client.get(url, headers={'user-agent': MOBILE_AGENT})
+            self.assertEqual(response.status_code, 200, url)
+        response = await self.async_client.get('/leaderboard?q=streak', headers={'user-agent': MOBILE_AGENT})
+        self.assertContains(response, 'testuser')
+
+    async def test_logged_out_redirected(self):
+        """
+        Parameters:
+            self
+        Tests that the async views still send logged out users to the login page
+        """
+        response = await self.async_client.get('/compass', headers={'user-agent': MOBILE_AGENT})
+        self.assertRedirects(response, '/login?next=/compass', fetch_redirect_response=False)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestLiveUpdates(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        live.hubs.clear()
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        self.record = SpotRecord.objects.create(sId=spot, spotDay=datetime.date.today(), attendance=1)
+        self.user = User.objects.create_user(username='testuser', password='x')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                title='Sapling', hasTakenPledge=True, totalPoints=5, currentStreak=1)
+        UserRegister.objects.create(uId=self.user, srId=self.record, spotNiceness=4,
+                                    registerTimeEditable=datetime.time(10, 30))
+        UserRegister.objects.filter(uId=self.user).update(registerTime=datetime.time(10, 30))
+
+    def test_snapshot(self):
+        """
+        Parameters:
+            self
+        Tests that the published snapshot holds today's attendance, the hourly ratings and both top fives
+        """
+        publish_live_update()
+        data = cache.get(live.live_key(self.record.campus_id))['data']
+        self.assertEqual(data['attendance'], 1)
+        self.assertEqual(data['ratings']['averages'], [0, 4.0, 0, 0, 0, 0, 0, 0])
+        self.assertEqual(data['leaderboard']['total'], [[1, 5, 'a.png', 'testuser', 'Sapling']])
+
+    def test_only_changes_sent(self):
+        """
+        Parameters:
+            self
+        Tests that an update only includes the sections that changed
+        """
+        before = {'attendance': 1, 'ratings': {}, 'leaderboard': {}}
+        after = dict(before, attendance=2)
+        self.assertEqual(live.encode_events(7, after, before), b'id: 7\nevent: attendance\ndata: 2\n\n')
+        self.assertEqual(live.encode_events(7, after).count(b'event: '), 3)
+
+    def test_wsgi_fallback(self):
+        """
+        Parameters:
+            self
+        Tests that under WSGI '/live' sends the current events and a long retry, rather than holding the connection
+        """
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('live'), HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertTrue(response.content.startswith(b'retry: %d' % live.WSGI_RETRY_MILLISECONDS))
+        self.assertIn(b'event: leaderboard', response.content)
+
+    async def test_fan_out(self):
+        """
+        Parameters:
+            self
+        Tests that one published update reaches every connected stream, and only its changes are sent
+        """
+        await sync_to_async(publish_live_update)()
+        hub = live.hub_for(self.record.campus_id)
+        streams = [hub.subscribe() for _ in range(3)]
+        for stream in streams:
+            self.assertTrue((await stream.__anext__()).startswith(b'retry:'))
+            self.assertIn(b'event: attendance', await stream.__anext__())
+        await SpotRecord.objects.filter(pk=self.record.pk).aupdate(attendance=2)
+        await sync_to_async(publish_live_update)()
+        for stream in streams:
+            self.assertEqual((await asyncio.wait_for(stream.__anext__(), 5)).split(b'\n')[1:3],
+                             [b'event: attendance', b'data: 2'])
+            await stream.aclose()
+        self.assertEqual(hub.subscribers, 0)
+
+    async def test_asgi_stream(self):
+        """
+        Parameters:
+            self
+        Tests that '/live' streams events when served through the ASGI request handler
+        """
+        async_client = AsyncClient()
+        await sync_to_async(async_client.force_login)(self.user)
+        response = await async_client.get(reverse('live'), headers={'user-agent': MOBILE_AGENT})
+        self.assertTrue(response.streaming)
+        chunks = response.streaming_content
+        self.assertTrue((await chunks.__anext__()).startswith(b'retry:'))
+        self.assertIn(b'event: ratings', await chunks.__anext__())
+        await chunks.aclose()
+
+    async def test_stream_ends_on_disconnect(self):
+        """
+        Parameters:
+            self
+        Tests that a stream ends, and stops being counted by its hub, once its browser disconnects
+        """
+        await sync_to_async(publish_live_update)()
+        hub = live.hub_for(self.record.campus_id)
+        disconnected = asyncio.Event()
+        stream = hub.subscribe(disconnected)
+        self.assertTrue((await stream.__anext__()).startswith(b'retry:'))
+        self.assertIn(b'event: attendance', await stream.__anext__())
+        waiting = asyncio.ensure_future(stream.__anext__())
+        disconnected.set()
+        with self.assertRaises(StopAsyncIteration):
+            await asyncio.wait_for(waiting, 5)
+        self.assertEqual(hub.subscribers, 0)
+
+    async def test_disconnects_watched(self):
+        """
+        Parameters:
+            self
+        Tests that the ASGI wrapper sets the request's disconnect event when the client goes, after the body is read
+        """
+        messages = asyncio.Queue()
+        await messages.put({'type': 'http.request', 'body': b'', 'more_body': False})
+        seen = []
+
+        async def application(scope, receive, send):
+            await receive()
+            seen.append(scope[live.DISCONNECTED_KEY].is_set())
+            await messages.put({'type': 'http.disconnect'})
+            await asyncio.wait_for(scope[live.DISCONNECTED_KEY].wait(), 5)
+            seen.append(True)
+
+        await live.watch_disconnects(application)({'type': 'http'}, messages.get, None)
+        self.assertEqual(seen, [False, True])
+
+
+class FlakyEmailBackend(locmem.EmailBackend):
+    """An email backend (for TestEmailQueue) that fails the first few sends, and counts the connections opened"""
+    failures_left = 0
+    connections_opened = 0
+
+    def open(self):
+        FlakyEmailBackend.connections_opened += 1
+        return super().open()
+
+    def send_messages(self, messages):
+        if FlakyEmailBackend.failures_left:
+            FlakyEmailBackend.failures_left -= 1
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='exSeed.mail.QueuedEmailBackend',
+                   EMAIL_QUEUE_BACKEND='exSeed.tests.FlakyEmailBackend', EMAIL_QUEUE_RETRY_DELAY=0.01)
+class TestEmailQueue(TransactionTestCase):
+    def setUp(self):
+        FlakyEmailBackend.failures_left = 0
+        FlakyEmailBackend.connections_opened = 0
+        mail_queue.flush(5)
+        User.objects.create_user(username='testuser', email='testuser@email.com', password='x')
+
+    def test_password_reset_queued(self):
+        """
+        Parameters:
+            self
+        Tests that the password reset form returns without sending the email, which is then sent in the background
+        """
+        response = self.client.post(reverse('password_reset'), {'email': 'testuser@email.com'})
+        self.assertRedirects(response, reverse('password_reset_done'), fetch_redirect_response=False)
+        self.assertTrue(mail_queue.flush(5))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['testuser@email.com'])
+
+    def test_retry(self):
+        """
+        Parameters:
+            self
+        Tests that an email which fails to send is retried
+        """
+        FlakyEmailBackend.failures_left = 2
+        with self.assertLogs('exSeed.mail', 'WARNING') as logs:
+            mail.send_mail('Subject', 'Body', None, ['testuser@email.com'])
+            self.assertTrue(mail_queue.flush(5))
+        self.assertEqual(len(logs.records), 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(FlakyEmailBackend.connections_opened, 3)
+
+    def test_batched(self):
+        """
+        Parameters:
+            self
+        Tests that emails queued together are sent over one connection
+        """
+        messages = [mail.EmailMessage('Subject %d' % i, 'Body', None, ['testuser@email.com']) for i in range(20)]
+        mail.get_connection().send_messages(messages)
+        self.assertTrue(mail_queue.flush(5))
+        self.assertEqual(len(mail.outbox), 20)
+        self.assertLessEqual(FlakyEmailBackend.connections_opened, 2)
+
+
+class TestScheduler(TransactionTestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        self.midnight = datetime.datetime.combine(self.today, datetime.time(0, 0))
+        avatar = Avatar.objects.create(imageName='a.png', avatarTitle='A')
+        for name, last_register, streak in (('kept', self.yesterday, 3), ('missed', self.today - datetime.timedelta(days=3), 2),
+                                            ('never', None, 1)):
+            user = User.objects.create_user(username=name, password='x')
+            UserInfo.objects.create(user=user, avatarId=avatar, currentStreak=streak, lastSpotRegister=last_register)
+
+    def test_cron_schedule(self):
+        """
+        Parameters:
+            self
+        Tests that schedules find the right previous run time, and invalid schedules are rejected
+        """
+        moment = datetime.datetime(2023, 3, 15, 10, 37)  # A Wednesday
+        self.assertEqual(CronSchedule('0 0 * * *').previous(moment), datetime.datetime(2023, 3, 15, 0, 0))
+        self.assertEqual(CronSchedule('*/15 * * * *').previous(moment), datetime.datetime(2023, 3, 15, 10, 30))
+        self.assertEqual(CronSchedule('30 9 * * 1-5').previous(datetime.datetime(2023, 3, 19, 12, 0)),
+                         datetime.datetime(2023, 3, 17, 9, 30))  # Sunday looks back to Friday
+        self.assertEqual(CronSchedule('0 12 * * 7').previous(moment), datetime.datetime(2023, 3, 12, 12, 0))
+        for invalid in ('0 0 * *', '60 0 * * *', '0 0 32 * *', '*/0 * * * *'):
+            with self.assertRaises(ValueError):
+                CronSchedule(invalid)
+
+    def test_due_jobs_run_once(self):
+        """
+        Parameters:
+            self
+        Tests that due jobs run once, are logged, and can't be claimed again by another worker
+        """
+        runs = run_due_jobs(self.midnight + datetime.timedelta(minutes=5))
+        self.assertEqual([run.name for run in runs], ['attendance_averages', 'reset_streaks', 'spot_of_the_day',
+                                                     'rate_limit_files', 'account_deletions', 'projections'])
+        self.assertTrue(all(run.status == JobRun.SUCCEEDED for run in runs))
+        self.assertEqual(run_due_jobs(self.midnight + datetime.timedelta(minutes=6)), [])
+        self.assertIsNone(run_job(JOBS['reset_streaks'], self.midnight))
+        self.assertEqual(JobRun.objects.count(), 6)
+
+    def test_reset_streaks(self):
+        """
+        Parameters:
+            self
+        Tests that only users who missed yesterday's spot lose their streak
+        """
+        reset_streaks(self.midnight)
+        streaks = dict(UserInfo.objects.values_list('user__username', 'currentStreak'))
+        self.assertEqual(streaks, {'kept': 3, 'missed': 0, 'never': 0})
+
+    def test_attendance_average(self):
+        """
+        Parameters:
+            self
+        Tests that yesterday's spot's average attendance is worked out from every day it was the spot of the day
+        """
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, spotDay=self.yesterday - datetime.timedelta(days=7), attendance=4)
+        SpotRecord.objects.create(sId=spot, spotDay=self.yesterday, attendance=8)
+        update_attendance_averages(self.midnight)
+        update_attendance_averages(self.midnight)  # Running again doesn't change the result
+        self.assertEqual(Spot.objects.get().average_attendance, 6)
+
+    def test_failed_run_logged(self):
+        """
+        Parameters:
+            self
+        Tests that a job that raises an error is logged as failed, with the error
+        """
+        def broken(run_time):
+            raise RuntimeError("Something went wrong")
+        with self.assertLogs('exSeed.scheduler', 'ERROR'):
+            run = run_job(Job('broken', CronSchedule('0 0 * * *'), broken, datetime.timedelta(days=1)), self.midnight)
+        self.assertEqual(run.status, JobRun.FAILED)
+        self.assertIn("Something went wrong", run.output)
+
+
+class TestMetrics(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(METRICS_DIR=self.directory.name, METRICS_TOKEN='secret',
+                                                   CACHES=LOCAL_CACHE)
+        self.settings_override.enable()
+        self.staff = User.objects.create_user(username='staff', password='x', is_staff=True)
+        self.user = User.objects.create_user(username='testuser', password='x')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                title='Sapling', hasTakenPledge=True)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def scrape(self) -> dict:
+        """Reads /metrics with the token, returning each sample's value by its name and labels"""
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        samples = {}
+        for line in response.content.decode().splitlines():
+            if line and not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_only_staff_or_token(self):
+        """
+        Parameters:
+            self
+        Tests that the metrics can only be read by staff, or with the token
+        """
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.assertEqual(self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(self.staff)
+        self.assertContains(self.client.get(reverse('metrics')), '# TYPE exseed_requests_total counter')
+
+    def test_requests_and_queries_counted(self):
+        """
+        Parameters:
+            self
+        Tests that requests to a view (including an async one) are counted, with their queries and a duration
+        """
+        label = 'exseed_requests_total{view="leaderboard",method="GET",status="200"}'
+        before = self.scrape()
+        self.client.force_login(self.user)
+        for _ in range(2):
+            self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT)
+        after = self.scrape()
+        self.assertEqual(after[label] - before.get(label, 0), 2)
+        queries = 'exseed_db_queries_total{view="leaderboard"}'
+        self.assertGreater(after[queries] - before.get(queries, 0), 0)
+        self.assertIn('exseed_request_duration_seconds_bucket{view="leaderboard",le="+Inf"}', after)
+
+    def test_processes_added_up(self):
+        """
+        Parameters:
+            self
+        Tests that the totals written by other processes are added to this one's
+        """
+        for number in range(2):
+            with open(os.path.join(self.directory.name, 'other-%d.json' % number), 'w') as file:
+                json.dump({'counters': [['exseed_requests_total', [['view', 'elsewhere'], ['method', 'GET'],
+                                                                   ['status', '200']], 3]],
+                           'histograms': []}, file)
+        samples = self.scrape()
+        self.assertEqual(samples['exseed_requests_total{view="elsewhere",method="GET",status="200"}'], 6)
+
+    @unittest.skipIf(os.name == 'nt', "Stopped processes' files are only retired where the directory can be locked")
+    def test_stopped_processes_retired(self):
+        """
+        Parameters:
+            self
+        Tests that the files of processes that have stopped are added to the retired totals and removed, without
+        changing the totals, while the files of running processes are kept
+        """
+        stopped = subprocess.Popen([sys.executable, '-c', ''])
+        stopped.wait()
+        label = 'exseed_requests_total{view="elsewhere",method="GET",status="200"}'
+        for pid in (stopped.pid, stopped.pid, os.getppid()):
+            with open(os.path.join(self.directory.name, '%s-%d-%d.json' % (socket.gethostname(), pid, time.time_ns())),
+                      'w') as file:
+                json.dump({'counters': [['exseed_requests_total', [['view', 'elsewhere'], ['method', 'GET'],
+                                                                   ['status', '200']], 2]],
+                           'histograms': [['exseed_request_duration_seconds', [['view', 'elsewhere']],
+                                           [1] + [0] * 10 + [0.001, 1]]]}, file)
+        self.assertEqual(self.scrape()[label], 6)
+        self.assertEqual(self.scrape()[label], 6)
+        files = os.listdir(self.directory.name)
+        self.assertIn('retired.json', files)
+        self.assertEqual(len([name for name in files if '-%d-' % stopped.pid in name]), 0)
+        self.assertEqual(len([name for name in files if '-%d-' % os.getppid() in name]), 1)
+        self.assertEqual(self.scrape()['exseed_request_duration_seconds_count{view="elsewhere"}'], 3)
+
+    def test_server_timing_for_staff(self):
+        """
+        Parameters:
+            self
+        Tests that staff asking for it get a Server-Timing header with every span, on async and normal views
+        """
+        UserInfo.objects.create(user=self.staff, avatarId=Avatar.objects.first(), title='Sapling', hasTakenPledge=True)
+        self.client.force_login(self.staff)
+        # A desktop browser is shown the QR code page by the (normal) change_profile_picture view
+        for path, agent in (('/leaderboard?q=total&timing', MOBILE_AGENT),
+                            ('/change_profile_picture?timing', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64)')):
+            header = self.client.get(path, HTTP_USER_AGENT=agent)['Server-Timing']
+            names = [entry.split(';')[0] for entry in header.split(', ')]
+            for name in ('total', 'mw', 'view', 'db', 'template', 'ua'):
+                self.assertIn(name, names, path)
+            self.assertRegex(header, r'db;desc="\d+ queries";dur=[\d.]+')
+        self.assertNotIn('Server-Timing', self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT))
+
+    def test_no_server_timing_for_users(self):
+        """
+        Parameters:
+            self
+        Tests that users who aren't staff don't get a Server-Timing header, even if they ask for it
+        """
+        self.client.force_login(self.user)
+        self.assertNotIn('Server-Timing', self.client.get('/leaderboard?q=total&timing', HTTP_USER_AGENT=MOBILE_AGENT))
+
+
+class TestProfiler(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PROFILE_DIR=self.directory.name, CACHES=LOCAL_CACHE)
+        self.settings_override.enable()
+        self.staff = User.objects.create_user(username='staff', password='x', is_staff=True, is_superuser=True)
+        self.user = User.objects.create_user(username='testuser', password='x')
+        avatar = Avatar.objects.create(imageName='a.png', avatarTitle='A')
+        for user in (self.staff, self.user):
+            UserInfo.objects.create(user=user, avatarId=avatar, title='Sapling', hasTakenPledge=True)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def test_only_staff_profiled(self):
+        """
+        Parameters:
+            self
+        Tests that a request from a user who isn't staff isn't profiled, even if they ask for it
+        """
+        self.client.force_login(self.user)
+        response = self.client.get('/leaderboard?q=total&profile', HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-Profile', response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    def test_cprofile(self):
+        """
+        Parameters:
+            self
+        Tests that a cProfile profile is saved and linked to, and can be read as a report and as collapsed stacks
+        """
+        self.client.force_login(self.staff)
+        response = self.client.get('/leaderboard?q=total&profile', HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get()
+        self.assertEqual((profile.view, profile.mode, profile.user), ('leaderboard', RequestProfile.CPROFILE, self.staff))
+        self.assertEqual(response['X-Profile'], reverse('admin:exSeed_requestprofile_change', args=[profile.pk]))
+
+        self.assertContains(self.client.get(response['X-Profile']), '(leaderboard)')
+        report = self.client.get(reverse('admin:exSeed_requestprofile_report', args=[profile.pk]) + '?sort=tottime')
+        self.assertContains(report, 'Ordered by: internal time')
+        stacks = self.client.get(reverse('admin:exSeed_requestprofile_collapsed', args=[profile.pk]))
+        lines = stacks.content.decode().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r'^\S.* \d+$')
+        self.assertTrue(any('leaderboard (views.py' in line for line in lines))
+
+    @override_settings(PROFILER_SAMPLE_INTERVAL=0.0001)
+    def test_sampling(self):
+        """
+        Parameters:
+            self
+        Tests that a sampled profile is saved, and that deleting it removes its file
+        """
+        self.client.force_login(self.staff)
+        response = self.client.get('/leaderboard?q=total&profile=sample', HTTP_USER_AGENT=MOBILE_AGENT)
+        profile = RequestProfile.objects.get()
+        self.assertEqual(profile.mode, RequestProfile.SAMPLE)
+        report = self.client.get(reverse('admin:exSeed_requestprofile_report', args=[profile.pk]))
+        self.assertContains(report, 'samples')
+        path = os.path.join(self.directory.name, profile.fileName)
+        self.assertTrue(os.path.exists(path))
+        profile.delete()
+        self.assertFalse(os.path.exists(path))
+
+    async def test_profiled_on_event_loop(self):
+        """
+        Parameters:
+            self
+        Tests that an async view served through the ASGI request handler is profiled, by cProfile and by sampling
+        """
+        async_client = AsyncClient()
+        await sync_to_async(async_client.force_login)(self.staff)
+        for mode in ('cprofile', 'sample'):
+            response = await async_client.get('/leaderboard?q=total&profile=' + mode,
+                                              headers={'user-agent': MOBILE_AGENT})
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('X-Profile', response)
+        profile = await RequestProfile.objects.aget(mode=RequestProfile.CPROFILE)
+        stacks = await sync_to_async(collapsed_stacks)(profile)
+        self.assertIn('leaderboard (views.py', stacks)
+
+
+class TestSlowQueries(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self.directory.name, 'slow.log')
+        self.settings_override = override_settings(SLOW_QUERY_LOG=self.log, CACHES=LOCAL_CACHE)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(username='testuser', password='x')
+        UserInfo.objects.create(user=self.user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                title='Sapling', hasTakenPledge=True, currentStreak=3)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    def test_query_shape(self):
+        """
+        Parameters:
+            self
+        Tests that queries only differing in their values, or the length of an IN list, have the same shape
+        """
+        first = query_shape('SELECT "U0"."id" FROM t WHERE "id" IN (%s, %s) AND name = \'Sam\' LIMIT 21')
+        second = query_shape('SELECT "U0"."id"  FROM t WHERE "id" IN (%s) AND name = \'it\'\'s\' LIMIT 5')
+        self.assertEqual(first, 'SELECT "U0"."id" FROM t WHERE "id" IN (...) AND name = ? LIMIT ?')
+        self.assertEqual(first, second)
+
+    def test_slow_queries_logged(self):
+        """
+        Parameters:
+            self
+        Tests that queries over the threshold are logged with where they came from, and are listed by the command
+        """
+        self.client.force_login(self.user)
+        with override_settings(SLOW_QUERY_THRESHOLD=0), self.assertLogs('exSeed.slow_queries', 'WARNING'):
+            reset_streaks(datetime.datetime.now())
+            self.client.get('/leaderboard?q=total', HTTP_USER_AGENT=MOBILE_AGENT)
+        shapes = aggregate()
+        self.assertTrue(any(site.startswith('maintenance.py:') and site.endswith(' reset_streaks')
+                            for shape in shapes for site in shape.sites))
+        # leaderboard is async, so its queries are found from the coroutine waiting for them
+        self.assertTrue(any(site.startswith('views.py:') and site.endswith(' leaderboard')
+                            for shape in shapes for site in shape.sites))
+        self.assertTrue(any('leaderboard' in shape.views for shape in shapes))
+
+        output = io.StringIO()
+        call_command('slow_queries', '--top', '1', stdout=output)
+        self.assertIn('1. ', output.getvalue())
+        self.assertNotIn('2. ', output.getvalue())
+
+    def test_fast_queries_not_logged(self):
+        """
+        Parameters:
+            self
+        Tests that queries under the threshold aren't logged
+        """
+        with override_settings(SLOW_QUERY_THRESHOLD=10):
+            reset_streaks(datetime.datetime.now())
+        self.assertEqual(aggregate(), [])
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestBenchmarks(TransactionTestCase):
+    def test_seeded_season(self):
+        """
+        Parameters:
+            self
+        Tests that the seeded season is consistent: attendance matches the registers, and points are shared out as
+        addScore does, with the first four at a spot each day getting extra
+        """
+        result = dataset.seed(users=40, spots=6, days=15, random_seed=3)
+        self.assertEqual((result.users, result.spots, result.records), (40, 6, 15))
+        self.assertEqual(UserRegister.objects.count(), result.registers)
+        for record in SpotRecord.objects.all():
+            self.assertEqual(record.attendance, UserRegister.objects.filter(srId=record).count())
+        expected_points = sum(1 + max(0, 4 - position) for record in SpotRecord.objects.all()
+                              for position in range(record.attendance))
+        self.assertEqual(sum(UserInfo.objects.values_list('totalPoints', flat=True)), expected_points)
+        self.assertTrue(SpotRecord.objects.filter(spotDay=datetime.date.today()).exists())
+
+        with self.assertRaises(ValueError):
+            dataset.seed(users=1, spots=1, days=1)  # Today already has a spot of the day
+        dataset.clear('bench')
+        self.assertFalse(UserInfo.objects.exists())
+        self.assertFalse(SpotRecord.objects.exists())
+
+    def test_views_timed(self):
+        """
+        Parameters:
+            self
+        Tests that the benchmark times a view with a cold and a warm cache, counting an async view's queries
+        """
+        dataset.seed(users=20, spots=4, days=5)
+        results = run_benchmarks('bench0', repeat=2, pages=['leaderboard_total'])
+        timed = results['results']['leaderboard_total']
+        self.assertEqual(timed['cold']['requests'], 2)
+        self.assertGreater(timed['cold']['queries'], 0)
+        self.assertEqual(timed['warm']['queries'], 0)
+        self.assertEqual(results['dataset']['users'], 20)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestGameClock(TransactionTestCase):
+    def test_register_on_simulated_clock(self):
+        """
+        Parameters:
+            self
+        Tests that addScore reads the game clock: registering is refused out of hours and the register is given the
+        clock's time
+        """
+        day = datetime.date(2024, 3, 5)
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        SpotRecord.objects.create(sId=spot, attendance=0, spotDay=day)
+        user = User.objects.create_user(username='testuser', password='Hjguhjlkjbv765588')
+        UserInfo.objects.create(user=user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'),
+                                hasTakenPledge=True)
+        self.client.force_login(user)
+        data = {'star': 4, 'latitude': 50.73439, 'longitude': -3.537932}
+
+        game_clock = SimulatedClock(datetime.datetime.combine(day, datetime.time(20, 15)))
+        with use_clock(game_clock):
+            response = self.client.post(reverse('score'), data, HTTP_USER_AGENT=MOBILE_AGENT)
+            self.assertEqual(response.context['error'], 'time')
+            game_clock.set(datetime.datetime.combine(day, datetime.time(10, 30)))
+            self.client.post(reverse('score'), data, HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertIsNot(clock.get_clock(), game_clock)
+
+        register = UserRegister.objects.get(uId=user)
+        self.assertEqual(register.registerTime, datetime.time(10, 30))
+        self.assertEqual(UserInfo.objects.get(user=user).lastSpotRegister, day)
+        self.assertTrue(clock.registering_open(datetime.time(16, 59)))
+        self.assertFalse(clock.registering_open(datetime.time(8, 59)))
+
+    def test_simulated_season(self):
+        """
+        Parameters:
+            self
+        Tests that the simulator plays each day through the jobs and addScore, on the days it simulates
+        """
+        start = datetime.date(2024, 9, 2)
+        costs = simulate(days=4, users=12, spots=3, start=start, random_seed=2)
+        self.assertEqual([cost.day for cost in costs], [start + datetime.timedelta(days=n) for n in range(4)])
+        self.assertEqual(set(costs[0].jobs), {'reset_streaks', 'attendance_averages', 'spot_of_the_day',
+                                              'rate_limit_files', 'account_deletions', 'projections'})
+        self.assertEqual(UserRegister.objects.count(), sum(len(cost.registers) for cost in costs))
+        self.assertEqual(costs[-1].total_registers, UserRegister.objects.count())
+        self.assertEqual(list(SpotRecord.objects.order_by('spotDay').values_list('spotDay', flat=True)),
+                         [cost.day for cost in costs])
+        for record in SpotRecord.objects.all():
+            self.assertEqual(record.attendance, UserRegister.objects.filter(srId=record).count())
+        self.assertTrue(all(9 <= register.registerTime.hour <= 16 for register in UserRegister.objects.all()))
+        self.assertGreater(costs[0].home[1], 0)
+        self.assertEqual(costs[-1].row()['registers'], len(costs[-1].registers))
+
+
+class TestRateLimits(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(RATE_LIMIT_DIR=self.directory.name, CACHES=LOCAL_CACHE)
+        self.settings_override.enable()
+        limiter.reset()
+        avatar = Avatar.objects.create(imageName='a.png', avatarTitle='A')
+        self.users = []
+        for name in ('first', 'second'):
+            user = User.objects.create_user(username=name, password='x')
+            UserInfo.objects.create(user=user, avatarId=avatar, hasTakenPledge=True)
+            self.users.append(user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        limiter.reset()
+        self.directory.cleanup()
+
+    @staticmethod
+    def limited(limit, scope):
+        return process_metrics.snapshot_counters().get(
+            ('exseed_rate_limited_total', (('limit', limit), ('scope', scope))), 0)
+
+    @override_settings(RATE_LIMITS={'score': {'user': (2, 60)}})
+    def test_per_user_limit(self):
+        """
+        Parameters:
+            self
+        Tests that a user's addScore requests past their limit get a 429 with a Retry-After, while another user's don't
+        """
+        before = self.limited('score', 'user')
+        self.client.force_login(self.users[0])
+        statuses = [self.client.post(reverse('score'), {'star': 3}, HTTP_USER_AGENT=MOBILE_AGENT).status_code
+                    for _ in range(3)]
+        self.assertNotIn(429, statuses[:2])
+        self.assertEqual(statuses[2], 429)
+        response = self.client.post(reverse('score'), {'star': 3}, HTTP_USER_AGENT=MOBILE_AGENT)
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(1 <= int(response['Retry-After']) <= 30)
+        self.assertEqual(self.limited('score', 'user') - before, 2)
+        self.assertNotEqual(self.client.get(reverse('score'), HTTP_USER_AGENT=MOBILE_AGENT).status_code, 429)
+
+        self.client.force_login(self.users[1])
+        self.assertNotEqual(self.client.post(reverse('score'), {'star': 3}, HTTP_USER_AGENT=MOBILE_AGENT).status_code, 429)
+
+    @override_settings(RATE_LIMITS={'signup': {'user': (5, 60), 'global': (1, 60)}})
+    def test_global_limit(self):
+        """
+        Parameters:
+            self
+        Tests that the global bucket is shared by visitors from different addresses
+        """
+        data = {'username': 'newuser', 'email': 'new@email.com', 'password1': 'Hjguhjlkjbv765588',
+                'password2': 'Hjguhjlkjbv765588'}
+        first = self.client.post(reverse('signup'), data, HTTP_USER_AGENT=MOBILE_AGENT, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(first.status_code, 302)
+        self.client.logout()
+        data['username'] = 'otheruser'
+        second = self.client.post(reverse('signup'), data, HTTP_USER_AGENT=MOBILE_AGENT, REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(second.status_code, 429)
+        self.assertFalse(User.objects.filter(username='otheruser').exists())
+
+    @override_settings(RATE_LIMITS={'score': {'user': (2, 60), 'global': (3, 60)}})
+    def test_buckets_shared_between_processes(self):
+        """
+        Parameters:
+            self
+        Tests that limiters in different processes share the bucket files, that an empty bucket is then turned away
+        without reading its file, and that a request only takes tokens when every bucket has one
+        """
+        request = RequestFactory().post('/addScore')
+        request.user = self.users[0]
+        process_one, process_two = RateLimiter(), RateLimiter()
+        self.assertEqual(process_one.check('score', request), 0)
+        self.assertEqual(process_two.check('score', request), 0)
+        self.assertGreater(process_one.check('score', request), 0)  # The user's two tokens are gone
+
+        request.user = self.users[1]
+        self.assertEqual(process_two.check('score', request), 0)  # The last global token
+        wait = process_two.check('score', request)
+        self.assertAlmostEqual(wait, 20, delta=1)  # The global bucket refills a token every 20 seconds
+
+        for name in os.listdir(self.directory.name):
+            os.remove(os.path.join(self.directory.name, name))
+        self.assertGreater(process_two.check('score', request), 0)  # Still known to be empty
+        self.assertEqual(process_one.check('score', request), 0)  # Full new buckets
+
+        with override_settings(RATE_LIMIT_DIR=None):
+            local = RateLimiter()
+            self.assertEqual([local.check('score', request) > 0 for _ in range(3)], [False, False, True])
+
+    def test_idle_buckets_removed(self):
+        """
+        Parameters:
+            self
+        Tests that bucket files unused for a day are removed, and recent ones kept
+        """
+        for name, age in (('old', 2 * 24 * 60 * 60), ('recent', 60)):
+            path = os.path.join(self.directory.name, name)
+            open(path, 'w').close()
+            os.utime(path, (time.time() - age, time.time() - age))
+        self.assertEqual(remove_idle_buckets(), 1)
+        self.assertEqual(os.listdir(self.directory.name), ['recent'])
+
+
+@override_settings(ACCOUNT_DELETION_CHUNK_SIZE=2, ACCOUNT_DELETION_PAUSE=0, CACHES=LOCAL_CACHE)
+class TestAccountDeletion(TransactionTestCase):
+    def setUp(self):
+        avatar = Avatar.objects.create(imageName='a.png', avatarTitle='A')
+        spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        self.users = {}
+        for name in ('leaving', 'staying', 'staff'):
+            user = User.objects.create_user(username=name, password='Hjguhjlkjbv765588', is_staff=name == 'staff')
+            UserInfo.objects.create(user=user, avatarId=avatar, hasTakenPledge=True)
+            self.users[name] = user
+        for day in range(5):
+            spot_day = datetime.date(2024, 9, 2) + datetime.timedelta(days=day)
+            record = SpotRecord.objects.create(sId=spot, spotDay=spot_day)
+            UserRegister.objects.create(uId=self.users['leaving'], srId=record, spotNiceness=4)
+            UserRegister.objects.create(uId=self.users['staying'], srId=record, spotNiceness=3)
+
+    def tearDown(self):
+        deletion_worker.wait(10)
+
+    def delete(self, by, username):
+        self.client.force_login(self.users[by])
+        return self.client.post(reverse('delete', args=[username]), HTTP_USER_AGENT=MOBILE_AGENT)
+
+    def test_delete_own_account(self):
+        """
+        Parameters:
+            self
+        Tests that deleting your own account logs you out, and that the background worker removes the account and its
+        registers in chunks, recording its progress
+        """
+        response = self.delete('leaving', 'leaving')
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertNotIn('_auth_user_id', self.client.session)
+        self.assertTrue(deletion_worker.wait(10))
+
+        deletion = AccountDeletion.objects.get(username='leaving')
+        self.assertEqual((deletion.status, deletion.requestedBy), (AccountDeletion.DONE, 'leaving'))
+        self.assertEqual((deletion.rowsDeleted, deletion.rowsTotal), (7, 7))  # 5 registers, the UserInfo and the User
+        self.assertFalse(User.objects.filter(username='leaving').exists())
+        self.assertEqual(UserRegister.objects.count(), 5)
+        self.assertEqual(UserInfo.objects.count(), 2)
+
+    def test_only_self_or_staff(self):
+        """
+        Parameters:
+            self
+        Tests that users can't delete someone else's account, that staff can, and that the view only accepts POST
+        """
+        self.assertEqual(self.delete('staying', 'leaving').status_code, 403)
+        self.assertTrue(User.objects.get(username='leaving').is_active)
+        self.assertEqual(self.client.get(reverse('delete', args=['staying']), HTTP_USER_AGENT=MOBILE_AGENT).status_code,
+                         405)
+
+        self.delete('staff', 'leaving')
+        self.assertIn('_auth_user_id', self.client.session)  # Staff stay logged in
+        self.assertTrue(deletion_worker.wait(10))
+        self.assertEqual(AccountDeletion.objects.get(username='leaving').requestedBy, 'staff')
+        self.assertEqual(list(User.objects.order_by('username').values_list('username', flat=True)),
+                         ['staff', 'staying'])
+
+    def test_resume_stopped_deletion(self):
+        """
+        Parameters:
+            self
+        Tests that a deletion left part way through by a stopped process is carried on from where it was once stale
+        """
+        user = self.users['leaving']
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        UserRegister.objects.filter(uId=user, srId__spotDay__lt=datetime.date(2024, 9, 4)).delete()  # The first chunk
+        stopped = AccountDeletion.objects.create(username='leaving', userId=user.pk, requestedBy='leaving',
+                                                 requestedAt=timezone.now(), status=AccountDeletion.RUNNING,
+                                                 rowsTotal=7, rowsDeleted=2, updatedAt=timezone.now())
+        self.assertEqual(process_deletions(), 0)  # Still within STALE_AFTER, so possibly still running
+
+        AccountDeletion.objects.filter(pk=stopped.pk).update(updatedAt=timezone.now() - STALE_AFTER * 2)
+        self.assertEqual(process_deletions(), 1)
+        stopped.refresh_from_db()
+        self.assertEqual((stopped.status, stopped.rowsDeleted), (AccountDeletion.DONE, 7))
+        self.assertFalse(User.objects.filter(pk=user.pk).exists())
+        self.assertEqual(UserRegister.objects.count(), 5)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestReconcile(TransactionTestCase):
+    def setUp(self):
+        self.today = datetime.date(2024, 10, 18)
+        dataset.seed(users=30, spots=5, days=20, random_seed=4, today=self.today)
+        self.user = UserInfo.objects.filter(currentStreak__gt=1).order_by('pk').first()
+        self.record = SpotRecord.objects.filter(attendance__gt=0).order_by('pk').first()
+        self.spot = self.record.sId
+
+    def check(self, fix=False, chunk_size=7, report=None):
+        return reconcile.reconcile(reconcile.start(fix=fix, day=self.today), chunk_size=chunk_size, report=report)
+
+    def stats(self):
+        return (UserInfo.objects.values_list('pk', 'totalPoints', 'currentStreak', 'lastSpotRegister').order_by('pk'),
+                SpotRecord.objects.values_list('pk', 'attendance').order_by('pk'),
+                Spot.objects.values_list('pk', 'average_attendance').order_by('pk'))
+
+    def corrupt(self):
+        UserInfo.objects.filter(pk=self.user.pk).update(totalPoints=F('totalPoints') + 3, currentStreak=0)
+        SpotRecord.objects.filter(pk=self.record.pk).update(attendance=F('attendance') - 1)
+        Spot.objects.filter(pk=self.spot.pk).update(average_attendance=F('average_attendance') + 5)
+
+    def test_consistent_season(self):
+        """
+        Parameters:
+            self
+        Tests that the stats of a season played by addScore's rules are all found to be right
+        """
+        check = self.check()
+        self.assertEqual(check.phase, Reconciliation.DONE)
+        self.assertEqual(check.found, 0)
+        self.assertEqual(check.checked, UserInfo.objects.count() + SpotRecord.objects.count() + Spot.objects.count())
+
+    def test_report_and_fix(self):
+        """
+        Parameters:
+            self
+        Tests that wrong stats are reported without being changed, then corrected with fix
+        """
+        correct = [list(rows) for rows in self.stats()]
+        self.corrupt()
+        found = []
+        check = self.check(report=found.append)
+        self.assertEqual(sorted((discrepancy.model, discrepancy.field) for discrepancy in found), [
+            ('Spot', 'average_attendance'), ('SpotRecord', 'attendance'), ('UserInfo', 'currentStreak'),
+            ('UserInfo', 'totalPoints')])
+        self.assertEqual((check.found, check.fixed), (4, 0))
+        self.assertNotEqual([list(rows) for rows in self.stats()], correct)
+
+        check = self.check(fix=True)
+        self.assertEqual((check.found, check.fixed), (4, 4))
+        self.assertEqual([list(rows) for rows in self.stats()], correct)
+        self.assertEqual(self.check().found, 0)
+
+    def test_resume(self):
+        """
+        Parameters:
+            self
+        Tests that a check stopped part way through the users pass carries on from its last saved chunk with the same
+        result, including the bonuses the records pass found
+        """
+        correct = [list(rows) for rows in self.stats()]
+        UserInfo.objects.update(totalPoints=0)
+        seen = []
+
+        def stop_in_users_pass(discrepancy):
+            seen.append(discrepancy)
+            if len(seen) == 12:
+                raise KeyboardInterrupt
+
+        with self.assertRaises(KeyboardInterrupt):
+            self.check(fix=True, chunk_size=5, report=stop_in_users_pass)
+        stopped = reconcile.unfinished()
+        self.assertEqual(stopped.phase, Reconciliation.USERS)
+        self.assertGreater(stopped.position, 0)
+
+        call_command('reconcile_stats', '--resume', '--force', '--chunk-size', '5', stdout=io.StringIO())
+        self.assertIsNone(reconcile.unfinished())
+        self.assertEqual([list(rows) for rows in self.stats()], correct)
+
+    def test_fix_survives_rebuild(self):
+        """
+        Parameters:
+            self
+        Tests that users' stats are corrected with correction events, which rebuilding the projection applies again
+        """
+        correct = [list(rows) for rows in self.stats()]
+        UserRegister.objects.filter(uId_id=self.user.user_id).order_by('pk').first().delete()
+        self.check(fix=True)
+        fixed = [list(rows) for rows in self.stats()]
+        self.assertNotEqual(fixed, correct)
+        self.assertIn(self.user.user_id, GameEvent.objects.filter(kind=GameEvent.CORRECTION).values_list('user_id',
+                                                                                                         flat=True))
+        events.rebuild(['user_stats'])
+        self.assertEqual([list(rows) for rows in self.stats()], fixed)
+        self.assertEqual(self.check().found, 0)
+
+    def test_same_day_registers_counted_once(self):
+        """
+        Parameters:
+            self
+        Tests that a user registered twice on one day (which a race can cause) is scored the same way by the check as
+        by the event log's backfill: one point and the larger bonus for the day
+        """
+        first = UserRegister.objects.filter(srId=self.record).order_by('registerTime', 'pk').first()
+        again = UserRegister.objects.create(uId_id=first.uId_id, srId=self.record, spotNiceness=3,
+                                            registerTimeEditable=first.registerTime)
+        UserRegister.objects.filter(pk=again.pk).update(registerTime=first.registerTime)  # Second to register
+        user_pks = list(UserInfo.objects.values_list('user_id', flat=True))
+        GameEvent.objects.all().delete()
+        events.backfill(user_pks, self.today)
+        events.rebuild(['user_stats'])
+        self.assertEqual(self.check().found, 0)
+
+
+@override_settings(CACHES=LOCAL_CACHE, RATE_LIMITS={})
+class TestEventLog(TransactionTestCase):
+    def setUp(self):
+        self.day = datetime.date(2024, 3, 5)
+        self.spot = Spot.objects.create(name='Duck Pond', desc='', latitude=50.73439, longitude=-3.537932)
+        self.avatars = [Avatar.objects.create(imageName=name, avatarTitle=name) for name in ('a.png', 'b.png')]
+        self.users = []
+        for name in ('first', 'second'):
+            user = User.objects.create_user(username=name, password='Hjguhjlkjbv765588')
+            UserInfo.objects.create(user=user, avatarId=self.avatars[0], hasTakenPledge=True)
+            self.users.append(user)
+
+    def play(self, days):
+        """Both users register on each of `days` days from self.day, the first one arriving first"""
+        for number in range(days):
+            day = self.day + datetime.timedelta(days=number)
+            SpotRecord.objects.create(sId=self.spot, attendance=0, spotDay=day)
+            with use_clock(SimulatedClock(datetime.datetime.combine(day, datetime.time(10)))):
+                for user in self.users:
+                    self.client.force_login(user)
+                    self.client.post(reverse('score'), {'star': 4, 'latitude': 50.73439, 'longitude': -3.537932},
+                                     HTTP_USER_AGENT=MOBILE_AGENT)
+
+    def stats(self):
+        return list(UserInfo.objects.order_by('user_id').values_list('totalPoints', 'currentStreak', 'lastSpotRegister',
+                                                                     'title', 'avatarId'))
+
+    def test_streak_reset_after_register(self):
+        """
+        Parameters:
+            self
+        Tests that a user who missed a day and registers before the midnight job has reset their streak (e.g. as it
+        catches up after a restart) starts a new streak, and the late job leaves it alone
+        """
+        self.play(2)
+        day = self.day + datetime.timedelta(days=3)
+        SpotRecord.objects.create(sId=self.spot, attendance=0, spotDay=day)
+        with use_clock(SimulatedClock(datetime.datetime.combine(day, datetime.time(10)))):
+            self.client.force_login(self.users[0])
+            self.client.post(reverse('score'), {'star': 4, 'latitude': 50.73439, 'longitude': -3.537932},
+                             HTTP_USER_AGENT=MOBILE_AGENT)
+        reset_streaks(datetime.datetime.combine(day, datetime.time(10, 5)))
+        self.assertEqual([stats[1:3] for stats in self.stats()], [(1, day), (0, self.day + datetime.timedelta(days=1))])
+        found = []
+        reconcile.reconcile(reconcile.start(day=day), report=found.append)
+        self.assertEqual([discrepancy for discrepancy in found if discrepancy.model == 'UserInfo'], [])
+
+    def test_actions_recorded_and_projected(self):
+        """
+        Parameters:
+            self
+        Tests that registers, streak resets, and title and avatar changes are added to the log, and that the stats and
+        the daily rollup are projections of it that can be rebuilt
+        """
+        self.play(2)
+        self.client.force_login(self.users[1])
+        self.client.get(reverse('change_title', args=['Oak']), HTTP_USER_AGENT=MOBILE_AGENT)
+        self.client.post(reverse('change_profile_picture'), {'chosen_pfp': 'b.png'}, HTTP_USER_AGENT=MOBILE_AGENT)
+        reset_streaks(datetime.datetime.combine(self.day + datetime.timedelta(days=4), datetime.time(0)))
+
+        self.assertEqual(list(GameEvent.objects.values_list('kind', 'user_id', 'value')), [
+            (GameEvent.REGISTER, self.users[0].pk, 5), (GameEvent.REGISTER, self.users[1].pk, 4),
+            (GameEvent.REGISTER, self.users[0].pk, 5), (GameEvent.REGISTER, self.users[1].pk, 4),
+            (GameEvent.TITLE_CHANGE, self.users[1].pk, None), (GameEvent.AVATAR_CHANGE, self.users[1].pk,
+                                                                self.avatars[1].pk),
+            (GameEvent.STREAK_RESET, self.users[0].pk, 2), (GameEvent.STREAK_RESET, self.users[1].pk, 2)])
+        second_day = self.day + datetime.timedelta(days=1)
+        projected = [(10, 0, second_day, '', self.avatars[0].pk), (8, 0, second_day, 'Oak', self.avatars[1].pk)]
+        self.assertEqual(self.stats(), projected)
+
+        self.assertFalse(DailyStats.objects.exists())  # Caught up by the projections job, not as events are added
+        self.assertEqual(events.catch_up()['daily_stats'], 8)
+        self.assertEqual(list(DailyStats.objects.order_by('day').values_list('registers', 'points', 'streakResets')),
+                         [(2, 9, 0), (2, 9, 0), (0, 0, 2)])
+
+        UserInfo.objects.update(totalPoints=1, currentStreak=7, lastSpotRegister=None)
+        self.assertEqual(events.rebuild(['user_stats']), {'user_stats': 8})
+        self.assertEqual(self.stats(), projected)
+        self.assertEqual(events.catch_up(), {'user_stats': 0, 'daily_stats': 0})
+
+    def test_new_projection(self):
+        """
+        Parameters:
+            self
+        Tests that a newly registered projection is caught up from the start of the log, and then only with the events
+        added since its checkpoint
+        """
+        self.play(1)
+        seen = []
+
+        class Registers(events.Projection):
+            name = 'test_registers'
+
+            def apply(self, batch):
+                seen.extend(event.pk for event in batch if event.kind == GameEvent.REGISTER)
+
+        events.projection(Registers)
+        try:
+            self.assertEqual(events.catch_up(['test_registers'], batch_size=1), {'test_registers': 2})
+            self.day += datetime.timedelta(days=1)
+            self.play(1)
+            self.assertEqual(events.catch_up(['test_registers']), {'test_registers': 2})
+        finally:
+            del events.PROJECTIONS['test_registers']
+        self.assertEqual(seen, list(GameEvent.objects.filter(kind=GameEvent.REGISTER).values_list('pk', flat=True)))
+
+    def test_backfill(self):
+        """
+        Parameters:
+            self
+        Tests that registers made before the log existed are written as each user's history, scored by addScore's
+        rules, with the streak resets the midnight job made, and that a rebuild from it gives the same stats
+        """
+        records = [SpotRecord.objects.create(sId=self.spot, spotDay=self.day + datetime.timedelta(days=day))
+                   for day in (0, 1, 3)]
+        for record in records:
+            for user in self.users:
+                UserRegister.objects.create(uId=user, srId=record, spotNiceness=4)
+        last_day = records[-1].spotDay
+        UserInfo.objects.filter(user=self.users[0]).update(totalPoints=15, currentStreak=1, lastSpotRegister=last_day)
+        UserInfo.objects.filter(user=self.users[1]).update(totalPoints=12, currentStreak=1, lastSpotRegister=last_day,
+                                                           title='Oak')
+        before = self.stats()
+
+        self.assertEqual(events.backfill(today=last_day), 11)  # 6 registers, 2 resets, 1 title and 2 avatars
+        self.assertEqual(list(GameEvent.objects.filter(user=self.users[0]).values_list('kind', 'day', 'value')), [
+            (GameEvent.REGISTER, self.day, 5), (GameEvent.REGISTER, self.day + datetime.timedelta(days=1), 5),
+            (GameEvent.STREAK_RESET, self.day + datetime.timedelta(days=3), 2), (GameEvent.REGISTER, last_day, 5),
+            (GameEvent.AVATAR_CHANGE, last_day, self.avatars[0].pk)])
+        self.assertEqual(events.catch_up(['user_stats']), {'user_stats': 0})  # Already in the stats
+        self.assertEqual(events.backfill(), 0)  # Everyone has a history now
+
+        self.assertEqual(events.rebuild(), {'user_stats': 11, 'daily_stats': 11})
+        self.assertEqual(self.stats(), before)
+
+
+@override_settings(CACHES=LOCAL_CACHE)
+class TestCampuses(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.day = datetime.date(2024, 3, 5)
+        self.main = Campus.objects.get(pk=default_campus_id())
+        self.penryn = Campus.objects.create(code='penryn', name='Penryn')
+        Spot.objects.create(name='Duck Pond', desc='Main', latitude=50.73439, longitude=-3.537932)
+        Spot.objects.create(name='Tremough Lawn', desc='Penryn', latitude=50.1705, longitude=-5.1235,
+                            campus=self.penryn)
+        avatar = Avatar.objects.create(imageName='a.png', avatarTitle='A')
+        self.users, self.clients = {}, {}
+        for name, campus in (('main1', self.main), ('main2', self.main), ('penryn1', self.penryn)):
+            self.users[name] = User.objects.create_user(username=name, password='x')
+            UserInfo.objects.create(user=self.users[name], avatarId=avatar, hasTakenPledge=True, campus=campus)
+            self.clients[name] = Client()
+            self.clients[name].force_login(self.users[name])
+
+    def get(self, user, url):
+        """Requests a page as a user at 10:00 on self.day, and returns its response and the queries made on exSeed
+        tables"""
+        with use_clock(SimulatedClock(datetime.datetime.combine(self.day, datetime.time(10)))), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.clients[user].get(url, HTTP_USER_AGENT=MOBILE_AGENT)
+        return response, [query['sql'] for query in queries if 'exSeed_' in query['sql']]
+
+    def register(self, user, latitude, longitude):
+        with use_clock(SimulatedClock(datetime.datetime.combine(self.day, datetime.time(10)))):
+            return self.clients[user].post(reverse('score'), {'star': 4, 'latitude': latitude, 'longitude': longitude},
+                                           HTTP_USER_AGENT=MOBILE_AGENT)
+
+    def test_campus_without_spots(self):
+        """
+        Parameters:
+            self
+        Tests that users on a campus with no spots yet are told there is no spot of the day, rather than the home page
+        failing, and that its spot is shown once one is added
+        """
+        empty = Campus.objects.create(code='truro', name='Truro')
+        UserInfo.objects.filter(user=self.users['penryn1']).update(campus=empty)
+        response = self.get('penryn1', '/')[0]
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'No spot of the day yet')
+        self.assertFalse(SpotRecord.objects.filter(campus=empty).exists())
+        self.assertRedirects(self.get('penryn1', '/compass')[0], '/', fetch_redirect_response=False)
+
+        Spot.objects.create(name='Truro Green', desc='', latitude=50.2632, longitude=-5.0510, campus=empty)
+        self.assertEqual(self.get('penryn1', '/')[0].context['spot_name'], 'Truro Green')
+
+    def test_each_campus_has_a_spot_of_the_day(self):
+        """
+        Parameters:
+            self
+        Tests that the midnight job chooses a spot of the day for each campus from its own spots, and that users see
+        their own campus's spot
+        """
+        run_job(JOBS['spot_of_the_day'], datetime.datetime.combine(self.day, datetime.time(0)))
+        self.assertEqual(dict(SpotRecord.objects.filter(spotDay=self.day).values_list('campus__code', 'sId__name')),
+                         {'main': 'Duck Pond', 'penryn': 'Tremough Lawn'})
+        self.assertEqual(self.get('main1', '/')[0].context['spot_name'], 'Duck Pond')
+        self.assertEqual(self.get('penryn1', '/')[0].context['spot_name'], 'Tremough Lawn')
+
+    def test_registers_and_leaderboards_stay_on_their_campus(self):
+        """
+        Parameters:
+            self
+        Tests that a user registers at their own campus's spot, is only racing the users on their campus for the
+        first four places, and is ranked against them alone
+        """
+        self.get('main1', '/')
+        self.get('penryn1', '/')
+        self.assertEqual(self.register('penryn1', 50.73439, -3.537932).context['error'], 'location')  # Main's spot
+        self.register('main1', 50.73439, -3.537932)
+        self.register('penryn1', 50.1705, -5.1235)
+        self.assertEqual(list(SpotRecord.objects.order_by('campus_id').values_list('attendance', flat=True)), [1, 1])
+        self.assertEqual(UserInfo.objects.get(user=self.users['penryn1']).totalPoints, 5)  # First on their campus
+
+        response = self.get('main2', '/leaderboard?q=total')[0]
+        self.assertEqual([row[3] for row in response.context['TopResults']], ['main1', 'main2'])
+        response = self.get('penryn1', '/leaderboard?q=total')[0]
+        self.assertEqual([row[3] for row in response.context['TopResults']], ['penryn1'])
+
+    def test_register_keeps_other_campus_pages_cached(self):
+        """
+        Parameters:
+            self
+        Tests that a register on one campus refreshes that campus's cached pages, and leaves the other campus's alone
+        """
+        run_job(JOBS['spot_of_the_day'], datetime.datetime.combine(self.day, datetime.time(0)))
+        for user in ('main1', 'penryn1'):
+            self.get(user, '/')
+            self.get(user, '/leaderboard?q=total')
+        self.register('penryn1', 50.1705, -5.1235)
+        self.assertEqual(self.get('main1', '/')[1], [])
+        self.assertEqual(self.get('main1', '/leaderboard?q=total')[1], [])
+        self.assertTrue(self.get('penryn1', '/leaderboard?q=total')[1])
+        self.assertTrue(self.get('penryn1', '/')[1])
+
+
+def png(width, height, colour=(0, 128, 0)) -> bytes:
+    """A PNG of one colour, made without Pillow"""
+    rows = b''.join(b'\x00' + bytes(colour) * width for _ in range(height))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+
+class TestImageStore(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(IMAGE_ROOT=self.directory.name, IMAGE_WIDTHS=(96, 192, 384),
+                                                   CACHES=LOCAL_CACHE)
+        self.settings_override.enable()
+        cache.clear()
+
+    def tearDown(self):
+        variant_pool.wait()
+        self.settings_override.disable()
+        self.directory.cleanup()
+
+    @staticmethod
+    def render(template, **context):
+        return Template('{% load pictures %}' + template).render(Context(context))
+
+    def test_images_are_stored_once_under_their_hash(self):
+        """
+        Parameters:
+            self
+        Tests that storing the same image twice gives the same link and one file, that a different image gets a
+        different link, and that files that aren't images are turned away
+        """
+        first = store(png(500, 250))
+        self.assertTrue(first.startswith(image_url()))
+        self.assertEqual(store(png(500, 250)), first)
+        self.assertNotEqual(store(png(500, 250, colour=(255, 0, 0))), first)
+        self.assertEqual(StoredImage.objects.count(), 2)
+        self.assertTrue(os.path.exists(os.path.join(self.directory.name, first[len(image_url()):])))
+        with self.assertRaises(ValueError):
+            store(b'<html>not an image</html>')
+
+    def test_images_are_served_with_a_long_cache(self):
+        """
+        Parameters:
+            self
+        Tests that a stored image is served with a year long, immutable Cache-Control header, and that names that
+        aren't stored images aren't found
+        """
+        data = png(40, 20)
+        response = self.client.get(store(data))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], CACHE_CONTROL)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(b''.join(response.streaming_content), data)
+        self.assertEqual(self.client.get(image_url() + '0' * 32 + '.png').status_code, 404)
+        self.assertEqual(self.client.get(image_url() + 'settings.py').status_code, 404)
+
+    def test_picture_lists_the_variants(self):
+        """
+        Parameters:
+            self
+        Tests that the picture tag lists a stored image's WebP and fallback variants for 1x and 2x screens (or every
+        variant, given sizes), and shows links to other sites as they are
+        """
+        photo = image_url() + 'a' * 32 + '_500.jpg'
+        html = self.render('{% picture link 96 id="avatar" %}', link=photo)
+        self.assertIn('<source type="image/webp" srcset="%s-96.webp 1x, %s-192.webp 2x">'
+                      % (image_url() + 'a' * 32, image_url() + 'a' * 32), html)
+        self.assertIn('<img src="%s-96.jpg"' % (image_url() + 'a' * 32), html)
+        self.assertIn('id="avatar"', html)
+        html = self.render('{% picture link sizes="100vw" %}', link=image_url() + 'b' * 32 + '_300.png')
+        self.assertIn('%s-300.png 300w' % (image_url() + 'b' * 32), html)
+        self.assertIn('sizes="100vw"', html)
+        self.assertEqual(self.render('{% picture link 96 %}', link='https://i.imgur.com/fhrZmo9.png'),
+                         '<img src="https://i.imgur.com/fhrZmo9.png">')
+
+    def test_streak_images_use_their_stored_copies(self):
+        """
+        Parameters:
+            self
+        Tests that once a streak image has been copied into the store, users are shown the copy
+        """
+        user = User.objects.create_user(username='grower', password='x')
+        UserInfo.objects.create(user=user, avatarId=Avatar.objects.create(imageName='a.png', avatarTitle='A'))
+        self.assertEqual(get_streak_image(user.pk, 'profile'), STREAK_IMAGES[0])
+        copy = store(png(64, 64), source=STREAK_IMAGES[0])
+        self.assertEqual(get_streak_image(user.pk, 'profile'), copy)
+
+    def test_avatars_can_be_uploaded_in_the_admin(self):
+        """
+        Parameters:
+            self
+        Tests that an avatar added in the admin with an uploaded image links to its stored copy
+        """
+        self.client.force_login(User.objects.create_superuser(username='keeper', password='x'))
+        upload = SimpleUploadedFile('fish.png', png(120, 120), content_type='image/png')
+        response = self.client.post(reverse('admin:exSeed_avatar_add'), {'avatarTitle': 'Fish', 'upload': upload})
+        self.assertEqual(response.status_code, 302)
+        link = Avatar.objects.get(avatarTitle='Fish').imageName
+        self.assertEqual(link, image_url() + StoredImage.objects.get().name)
+        upload = SimpleUploadedFile('fish.png', b'not an image', content_type='image/png')
+        response = self.client.post(reverse('admin:exSeed_avatar_add'), {'avatarTitle': 'Bad', 'upload': upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Avatar.objects.filter(avatarTitle='Bad').exists())
+
+    @unittest.skipIf(Image is None, "Pillow isn't installed")
+    def test_variants_are_made_in_the_background(self):
+        """
+        Parameters:
+            self
+        Tests that storing an image makes its WebP and PNG variants, and that a variant that is missing is made when
+        it is asked for
+        """
+        link = store(png(500, 250))
+        self.assertTrue(variant_pool.wait(10))
+        digest = link[len(image_url()):].split('_')[0]
+        for width in (96, 192, 384):
+            for variant_format in ('webp', 'png'):
+                self.assertTrue(os.path.exists(os.path.join(self.directory.name, '%s-%d.%s'
+                                                            % (digest, width, variant_format))))
+        os.remove(os.path.join(self.directory.name, digest + '-192.webp'))
+        response = self.client.get(image_url() + digest + '-192.webp')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        with Image.open(io.BytesIO(b''.join(response.streaming_content))) as variant:
+            self.assertEqual(variant.size, (192, 96))
+        self.assertEqual(self.client.get(image_url() + digest + '-200.webp').status_code, 404)
@@ -20,6 +20,8 @@ urlpatterns = [
     path("leaderboard", views.leaderboard, name="leaderboard"), 
     path("profile", views.profile_page, name ="profile"),
     path("compass", views.compass, name="compass"),
+    path("nearest_spots", views.nearest_spots, name="nearest_spots"),
+    path("live", views.live_updates, name="live"),
     path("profile", views.profile_page, name="profile"),
     path("change_profile_picture", views.change_profile_picture, name ="change_profile_picture"),
     path("graph", views.graph, name="graph_test"),
@@ -29,6 +31,9 @@ urlpatterns = [
     path("take_pledge", views.take_pledge, name="takePledge"),
     path("privacy_policy", views.privacy_policy, name="privacy_policy"),
     path("about",  TemplateView.as_view(template_name='about.html'), name ="about page"),
+    path("export/<dataset>", views.export_data, name="export"),
+    path("metrics", views.metrics, name="metrics"),
+    path("images/<str:name>", views.image, name="image"),
 
 
     path('password-reset/', PasswordResetView.as_view(template_name='registration/password_reset_form.html'), name='password_reset'),
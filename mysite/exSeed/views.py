@@ -2,19 +2,82 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Avg
+from django.db.models.functions import ExtractHour
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import PasswordResetForm
+from django.contrib.admin.views.decorators import staff_member_required
+from django.views.decorators.http import require_POST
+from django.http import StreamingHttpResponse, HttpResponseBadRequest, JsonResponse, HttpResponse, HttpResponseForbidden
+from django.http import FileResponse, Http404
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 
 from .forms import SignupForm, ProfilePictureForm
-from .models import Spot, UserInfo, SpotRecord, Avatar, UserRegister
+from .models import Spot, UserInfo, SpotRecord, Avatar, UserRegister, GameEvent, Campus, default_campus_id
 import random
-from user_agents import parse
-import datetime
+import functools
+import user_agents
 from .extra import extra_dictionary
+from .export import stream_export, parse_date
+from .importer import default_avatar, DEFAULT_TITLE
+from .geo import is_at_spot, parse_position, geofence_radius, get_spot_index
+from .recommender import assign_spot_of_the_day
+from .caching import cache_per_user, user_version, get_versions, campus_versions
+from .campuses import campus_of
+from .decorators import async_login_required
+from . import clock, events, live
+from .metrics import render_metrics, span
+from .ratelimit import rate_limit
+from .deletion import request_deletion
+from .images import sources, is_stored, local_link, image_file, CACHE_CONTROL
+
+MAX_NEAREST_SPOTS = 50  # The most spots nearest_spots will return in one response
+LEADERBOARD_AVATAR_WIDTH = 96  # The width avatars are shown at on the leaderboard, as in leaderboard_row.html
+# The streak images, from stage one to stage twelve +. 'python manage.py store_images' copies them into the image store
+STREAK_IMAGES = [
+    "https://i.imgur.com/V0r8Ftw.png",  # stage one
+    "https://i.imgur.com/9VZtO9X.png",  # stage two
+    "https://i.imgur.com/3zJQoI3.png",  # stage three
+    "https://i.imgur.com/pweVVh2.png",  # stage four
+    "https://i.imgur.com/6jzElXg.png",  # stage five
+    "https://i.imgur.com/nHUmeOw.png",  # stage six
+    "https://i.imgur.com/Yg5CGvc.png",  # stage seven
+    "https://i.imgur.com/BCPvB1V.png",  # stage eight
+    "https://i.imgur.com/8FxfFdV.png",  # stage nine
+    "https://i.imgur.com/WS9jEuH.png",  # stage ten
+    "https://i.imgur.com/IgO05pc.png",  # stage eleven
+    "https://i.imgur.com/d1Jz3G8.png"  # stage twelve +
+]
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_user_agent(user_agent_string):
+    return user_agents.parse(user_agent_string)
+
+
+def parse(user_agent_string):
+    """Works out the browser and device from a user agent string, timed as the 'ua' Server-Timing span
+
+    Parsing runs a long list of regular expressions, and every page parses the user agent to check it is on a phone.
+    Most requests come from a few browsers, so results are remembered for the most recent user agent strings.
+
+    Args:
+        user_agent_string (str): The User-Agent header
+
+    Returns:
+        user_agents.parsers.UserAgent: The parsed user agent. It is shared, so mustn't be changed
+    """
+    with span('ua'):
+        return _parse_user_agent(user_agent_string)
+
 
 # Create your views here.
+@rate_limit('signup')
 def signup(request):
     """
     View for '/signup': Registers a user in the django.contrib.auth user table
@@ -37,38 +100,18 @@ def signup(request):
     if request.method == 'POST':
         form = SignupForm(request.POST)
         if form.is_valid():
-            form.save()
+            user_account = form.save()
             account_username = form.cleaned_data.get('username')
-            account_email = form.cleaned_data.get('email')
             raw_password = form.cleaned_data.get('password1')
 
-            # Create a record in additional user info as long as there isn't already a record then
-            try:
-                user_account = User.objects.get(username=account_username)
-                # Fills the userInfo record with data
-                try:
-                    userinfo = UserInfo.objects.create(
-                        user=user_account,  # Links new user to new data in UserInfo
-                        title='Sapling',  # Placeholder default title
-                        avatarId=Avatar.objects.get(avatarTitle='Emotionless Default')
-                    )
-                    # Saves the record into the table
-                    userinfo.save()
-                except:
-                    Avatar.objects.create(
-                        imageName='https://i.imgur.com/fhrZmo9.png',
-                        avatarTitle='Emotionless Default'
-                    )
-                    UserInfo.objects.create(
-                        user=user_account,  # Links new user to new data in UserInfo
-                        title='Sapling',  # Placeholder default title
-                        avatarId=Avatar.objects.get(avatarTitle='Emotionless Default')
-                    )
-
-                    pass
-            except:
-                # Here a fail would only a occur if there was that user was already in UserInfo
-                pass
+            # Creates the user's additional info, with the default avatar (added the first time anyone signs up)
+            UserInfo.objects.create(
+                user=user_account,  # Links new user to new data in UserInfo
+                title=DEFAULT_TITLE,  # Placeholder default title
+                avatarId=default_avatar(),
+                # Only asked for when there is more than one campus, otherwise the default campus is used
+                campus=form.cleaned_data.get('campus') or Campus.objects.get(pk=default_campus_id()),
+            )
             user = authenticate(username=account_username, password=raw_password)
             login(request, user)
             return redirect('pledge')
@@ -129,27 +172,36 @@ def logout_request(request):
 
 
 @login_required()
+@require_POST
 def delete_request(request, username):
     """
-    View for '/delete/<username>': Registers a user in the django.contrib.auth user table
+    View for '/delete/<username>': Queues an account to be deleted (see deletion.py). The account is marked inactive
+    straight away, and its data is removed in the background, so the request doesn't wait on a large delete. Users can
+    only delete their own account; staff can delete anyone's
     :param request:
             The Django-supplied web request that contains information about the current request to see this view
     :param username:
-            Username of the user deleting their account
+            Username of the account to delete
     :return redirect()
-            Redirects the user to '/' where they will be able to see the spot of the day
-    @author: Sam Tebbet
+            Redirects to '/', which sends a user who deleted their own account to the log in page
     """
-    try:
-        user = User.objects.get(username=username)
-        user.delete()
-    except Exception as e:
-        messages.error(request, f"Failed to delete user: {e}")
+    if username != request.user.username and not request.user.is_staff:
+        return HttpResponseForbidden()
+    user = User.objects.filter(username=username).first()
+    if user is None:
+        messages.error(request, "Failed to delete user: no account called %s" % username)
+        return redirect('home')
+    request_deletion(user, request.user)
+    if user.pk == request.user.pk:
+        logout(request)
+    messages.success(request, "The account %s will be deleted shortly" % username)
     return redirect('home')
 
 
-@login_required()
-def home_page(request):
+@async_login_required
+@cache_per_user('home', lambda request: [*campus_versions('spot', campus_of(request.user.pk)),
+                                         user_version(request.user.pk)])
+async def home_page(request):
     """
     This view facilitates the display of the profile page at exseed.duckdns.org/
     param: request (HTTP_REQUEST): The Django-supplied web request that contains information about the current request to see this view
@@ -164,6 +216,9 @@ def home_page(request):
             description (str) : The description for the current spot of the day.
             latitude (int) : The latitude coordinate of the current spot of the day.
             longitude (int) : The longitude coordinate of the current spot of the day.
+            geofence_radius (int) : How close (in metres) the user must be to the spot to register.
+            spot_record_id (int), spot_version (str) : Identify the spot card, for caching it. spot_record_id is None,
+                and the rest are left out, when the user's campus has no spots yet.
 
     @author: Benjamin & Sam Tebbet
     """
@@ -174,46 +229,28 @@ def home_page(request):
         return render(request, 'QRCodePage.html')
 
     if not request.user.is_superuser:
-        if not UserInfo.objects.get(user__pk=request.user.pk).hasTakenPledge:
+        if not (await UserInfo.objects.aget(user__pk=request.user.pk)).hasTakenPledge:
             return redirect('/pledge')
     # Find the date of today
-    today = datetime.date.today()
+    today = clock.today()
+    campus = await sync_to_async(campus_of)(request.user.pk)
+
+    # Gets today's spot on the user's campus, choosing one from the recommended candidates if one hasn't been assigned
+    # yet. This may have to create the day's record in a transaction, which the async ORM can't do, so it is run in a
+    # thread
+    spot_record = await sync_to_async(assign_spot_of_the_day)(today, campus)
+    if spot_record is None:
+        # The campus has no spots yet (e.g. it has just been added), so there is nothing to register at
+        return render(request, 'home.html', {'spot_record_id': None})
+    spot = spot_record.sId
 
-    # Checks if there is a spot for today and if not a new one will be assigned
-    try:
-        spot = SpotRecord.objects.get(spotDay=today).sId
-    except:
-        # This clause is entered when there is no spot set to today
-        yesterday = today - datetime.timedelta(days=1)
-        # Continuously checks for a new spot until it finds one that is not the same as yesterdays
-        while True:
-            # pick a random spot
-            spot = random.choice(Spot.objects.all())
-            # check if that is the same as yesterday and if so get a new one
-            try:
-                if spot.pk != SpotRecord.objects.get(spotDay=yesterday).sId.pk:
-                    break
-            except:
-                # This case is entered when there is no spot assigned to yesterday
-                # In this case, there is no concern for picking yesterday's spot, since it doesn't exist
-                break
-        # Assigns the new spot of the day as the new chosen one
-        SpotRecord(sId=spot, spotDay=today).save()
-
-        # ADD STREAK STUFF HERE
-        '''
-        yesterdaysRegister = UserInfo.objects.filter(~Q(lastSpotRegister=yesterday))
-        yesterdaysRegister.update(currentStreak=0)
-        for item in yesterdaysRegister:
-            item.save()
-        '''
     # Assigns the values of today's spot so they can be rendered into the website
     spot_name = spot.name
     image = spot.imageName
     description = spot.desc
     latitude = spot.latitude
     longitude = spot.longitude
-    average_stars, background_colours = graph()
+    average_stars, background_colours = await graph(spot_record)
     fact = random.choice(extra_dictionary['facts'])
 
     page_contents = {'file_path': image,
@@ -223,15 +260,24 @@ def home_page(request):
                      'spot_longitude': longitude,
                      "spot_data": average_stars,
                      "colours": background_colours,
-                     "fact": fact
+                     "fact": fact,
+                     "geofence_radius": geofence_radius(),
+                     "attendance": spot_record.attendance,
+                     # Identify the spot card, which the template caches as it is the same for every user
+                     "spot_record_id": spot_record.pk,
+                     "spot_version": '.'.join(str(version) for version in
+                                              await sync_to_async(get_versions)(campus_versions('spot', campus)))
                      }
 
     return render(request, 'home.html', page_contents)
 
 
-@login_required()
-def leaderboard(request):
-    """This view facilitates the display of the leaderboard at exseed.duckdns.org/leaderboard
+@async_login_required
+@cache_per_user('leaderboard', lambda request: [*campus_versions('scoreboard', campus_of(request.user.pk)),
+                                                user_version(request.user.pk)])
+async def leaderboard(request):
+    """This view facilitates the display of the leaderboard at exseed.duckdns.org/leaderboard. Users are ranked against
+    the other users on their campus
 
     Args: request (HTTP_REQUEST): The Django-supplied web request that contains information about the current request
     to see this view
@@ -243,8 +289,11 @@ def leaderboard(request):
         request (HTTP_REQUEST): Passes on request data to the webpage
         'leaderboard.html' (str): The string name of the desired html doc the page_contents should be displayed on
         page_contents (library): A library of information to be displayed on the leaderboard webpage
-            new_leaderboard_data ([rank,score,pfp,name,title]): Contains user data to go on leaderboard
+            new_leaderboard_data ([rank,score,pfp,name,title]): Contains user data to go on leaderboard, split into the
+                top five (TopResults) and the rows around the current user (UserResults)
             lb_type (str): Tells the webpage which type of leaderboard is being rendered
+            campus (int), scoreboard_version (str): Identify the campus's leaderboard and its current state, for
+                caching the top five
 
     @author: Rowan N
     """
@@ -255,7 +304,7 @@ def leaderboard(request):
         return render(request, 'QRCodePage.html')
 
     if not request.user.is_superuser:
-        if not UserInfo.objects.get(user__pk=request.user.pk).hasTakenPledge:
+        if not (await UserInfo.objects.aget(user__pk=request.user.pk)).hasTakenPledge:
             return redirect('/pledge')
 
     # This block determines which sort of leaderboard is desired (streak or overall points)
@@ -274,7 +323,11 @@ def leaderboard(request):
         # such has redirected to a valid url value (the streak leaderboard)
     # This block contains all required data to process, refine and display leaderboard data
     user = request.user.pk  # Gets the current users user id
-    top_rankings = UserInfo.objects.order_by(sort_column, other)[:5]  # Top 5 users
+    campus = await sync_to_async(campus_of)(user)
+    # select_related fetches each record's user and avatar in the same query, rather than one query per row. Only the
+    # user's campus is ranked, which reads the campus's rows of the (campus, score) index in order
+    ranked = UserInfo.objects.filter(campus_id=campus).select_related('user', 'avatarId').order_by(sort_column, other)
+    top_rankings = ranked[:5]  # Top 5 users
     user_in_top_five = False  # If user is in top five, only top five should be shown
     user_in_top_seven = False  # If the user is in the top seven, then there needn't be a '...' and then their position
     user_position = None  # Keeps track of current user's position on the table. This is NOT the user rank on the table
@@ -289,9 +342,9 @@ def leaderboard(request):
     above_name = None
 
     # If the user is within the top 5, only the top 5 need be shown
-    for record in top_rankings:
+    async for record in top_rankings:
         position, buffer = position_buffer_calc(position, buffer, record, column_name, prev_position_score)
-        if user == record.user.pk:
+        if user == record.user_id:
             user_in_top_five = True  # User found in top 5, so no additional_rankings required
             user_position = position + buffer  # The users index in the ordered table
         prev_position_score = getattr(record, column_name)  # Saves previous rank's score
@@ -299,12 +352,12 @@ def leaderboard(request):
 
     # Elif the user is within the top 7, gather only their record and any above (so if 6, get only 6)
     if not user_in_top_five:
-        six_and_seven = UserInfo.objects.order_by(sort_column, other)[5:7]  # The database records for users in
+        six_and_seven = ranked[5:7]  # The database records for users in
         # positions 6 and 7
-        for record in six_and_seven:
+        async for record in six_and_seven:
             position, buffer = position_buffer_calc(position, buffer, record, column_name, prev_position_score)
             additional_rankings.append([position, getattr(record, column_name), record.avatarId.imageName, record.user.username, record.title])
-            if user == record.user.pk:
+            if user == record.user_id:
                 user_in_top_seven = True
                 user_position = position + buffer
                 for item in additional_rankings:
@@ -315,10 +368,12 @@ def leaderboard(request):
     # Else, get the user's record, and their neighbours (one above, one below)
     if not user_in_top_seven and not user_in_top_five:
         additional_rankings = []  # Clears any additional data recorded during six_and_seven analysis
-        remainder = UserInfo.objects.order_by(sort_column, other)[7:]  # The rest of the database to search through
+        # The rest of the database to search through. Only the ids and scores are needed to find the user's position
+        remainder = (UserInfo.objects.filter(campus_id=campus).order_by(sort_column, other)
+                     .only('user_id', column_name)[7:])
         prev_buf = None  # Keeps track of the previous buffer (used when reverting to a previous state once user found)
-        for record in remainder:
-            if user == record.user.pk:  # User has been found. Record their place in the table to get neighbour records
+        async for record in remainder:
+            if user == record.user_id:  # User has been found. Record their place in the table to get neighbour records
                 user_position = position + buffer
                 break
             prev_buf = buffer
@@ -330,7 +385,7 @@ def leaderboard(request):
         # By this point, if user_position doesn't exist, the user is NOT in the UserInfo table!!!
         if user_position is not None:  # This avoids errors if the user doesn't have a UserInfo entry (WHICH
             # SHOULD NEVER BE EXPERIENCED IF SIGNUP IMPLEMENTED AS REQUESTED)
-            adjacent = UserInfo.objects.order_by(sort_column, other)[user_position - 2:user_position + 1]
+            adjacent = ranked[user_position - 2:user_position + 1]
             # Since we have found the user, we are now going BACK a step to evaluate the rank above the user. As such
             # we need to revert the position/buffer state to how it was when evaluating the record above the user
             if prev_buf is None:  # This means the user is in eighth place, and thus no action need be taken
@@ -343,7 +398,7 @@ def leaderboard(request):
                 # and as such we can simply revert this action to go back to the previous position/buffer state
                 buffer -= 1
             counter = -1  # Counts which record we are looking at (-1 is above user, 0 is user, 1 is below user)
-            for record in adjacent:
+            async for record in adjacent:
                 if counter == -1:
                     position, buffer = position_buffer_calc(position, buffer, record, column_name,
                                                             prev_prev_position_score)  # Re-evaluates record above user
@@ -360,17 +415,24 @@ def leaderboard(request):
     # If any of these states are true, dots are not needed in the leaderboard. This data is passed to the html 
     #no_dots = user_in_top_five or user_in_top_seven or user_position is None
     # Library for all data needed in the leaderboard
+    # The top five rows are the same for every user, so the template caches them (keyed by the scoreboard version)
+    # and only renders the rows around the current user each time
     pageContent = {
         'leaderboardType': lb_type,
-        'UserResults': new_leaderboard_data,
-        'above_name': above_name
+        'TopResults': new_leaderboard_data[:5],
+        'UserResults': new_leaderboard_data[5:],
+        'above_name': above_name,
+        'campus': campus,
+        'scoreboard_version': '.'.join(str(version) for version in
+                                       await sync_to_async(get_versions)(campus_versions('scoreboard', campus)))
     }
 
     return render(request, 'leaderboard.html', pageContent)
 
 
-@login_required()
-def profile_page(request):
+@async_login_required
+@cache_per_user('profile', lambda request: ['avatars', user_version(request.user.pk)])
+async def profile_page(request):
     """This view facilitates the display of the leaderboard at exseed.duckdns.org/profile
     Args:
         request (HTTP_REQUEST): The Django-supplied web request that contains information about the current request to see this view
@@ -396,23 +458,23 @@ def profile_page(request):
         return render(request, 'QRCodePage.html')
 
     try:
-        if not UserInfo.objects.get(user__pk=request.user.pk).hasTakenPledge:
+        if not (await UserInfo.objects.aget(user__pk=request.user.pk)).hasTakenPledge:
             return redirect('/pledge')
     except:
         return render(request, 'adminInfo.html')
 
     # Takes the users information from the user and UserInfo table to be assigned to the page_contents variables.
     user = request.user.pk
-    user_info = UserInfo.objects.filter(user_id=user).values()
-    streak = user_info[0]['currentStreak']
-    title = user_info[0]['title']
-    totalScore = user_info[0]['totalPoints']
-    profile_id = user_info[0]['avatarId_id']
-    profile_image = Avatar.objects.get(id=profile_id).imageName
+    user_info = await UserInfo.objects.filter(user_id=user).values().afirst()
+    streak = user_info['currentStreak']
+    title = user_info['title']
+    totalScore = user_info['totalPoints']
+    profile_id = user_info['avatarId_id']
+    profile_image = (await Avatar.objects.aget(id=profile_id)).imageName
     all_avatars_ref = Avatar.objects.values_list('imageName')
-    all_avatars = list(all_avatars_ref)
+    all_avatars = [avatar async for avatar in all_avatars_ref]
 
-    streak_image = get_streak_image(user, 'profile')
+    streak_image = await sync_to_async(get_streak_image)(user, 'profile')
     page_contents = {
         "streak": streak,
         "total" : totalScore,
@@ -425,24 +487,27 @@ def profile_page(request):
     return render(request, 'profile.html', page_contents)
 
 
-def graph() -> tuple[list[int],list[str]]:
+async def graph(spot_record) -> tuple[list[int],list[str]]:
     """This function gathers all of todays spot's ratings, finds the average for each hour and puts all the data into an
         array for the graph. It also supplies the appropriate bar colour for each hour on the graph.
 
+    Args:
+        spot_record (SpotRecord): Today's spot of the day on the user's campus
+
     Returns:
         tuple[list[int],list[str]]: A tuple containing the list of average spot score (int) and their corresponding colours (str)
 
     @author Rowan N
     """
     # Gather all of today's star ratings
-    spot_data = UserRegister.objects.filter(srId__spotDay=datetime.date.today()).order_by('registerTime')
+    spot_data = UserRegister.objects.filter(srId=spot_record).order_by('registerTime')
     # If empty graph not wanted to be viewed, here is where we could check if spot_data had any contents and redirect
     # Array of all average values where index 0 = 9:00 and index 7 is 16:00
     average_stars = [0, 0, 0, 0, 0, 0, 0, 0]
     previous_hour = -1
     hour_total = 0
     records_in_hour = 0
-    for record in spot_data:
+    async for record in spot_data:
         hour = record.registerTime.hour
         if hour == previous_hour or previous_hour == -1:  # If the previous_hour is -1 then this is the first record
             # If hour == previous_hour, then we are still getting details from the same hour, and so totals should be added to
@@ -460,25 +525,33 @@ def graph() -> tuple[list[int],list[str]]:
     except ZeroDivisionError:
         pass  # Avoids zero division when no records are returned to spot_data
 
-    background_colours = [] # Will store the colours for each bar
-    for item in average_stars:
-        if item <= 1:
-            background_colours.append("rgb(237,28,36)")  # Worst
-        elif item <= 2:
-            background_colours.append("rgb(255,163,100)")  # Bad
-        elif item <= 3:
-            background_colours.append("rgb(255,201,14)")  # Middle
-        elif item <= 4:
-            background_colours.append("rgb(182,230,32)")  # Good
-        else:
-            background_colours.append("rgb(34,177,76)")  # Great
-
+    background_colours = [rating_colour(item) for item in average_stars] # Will store the colours for each bar
 
     return average_stars, background_colours
 
 
-@login_required()
-def compass(request):
+def rating_colour(average) -> str:
+    """The colour of a bar on the ratings graph
+
+    Args:
+        average (float): The average star rating for the hour
+
+    Returns:
+        str: The bar's colour, as a CSS rgb() value
+    """
+    if average <= 1:
+        return "rgb(237,28,36)"  # Worst
+    elif average <= 2:
+        return "rgb(255,163,100)"  # Bad
+    elif average <= 3:
+        return "rgb(255,201,14)"  # Middle
+    elif average <= 4:
+        return "rgb(182,230,32)"  # Good
+    return "rgb(34,177,76)"  # Great
+
+
+@async_login_required
+async def compass(request):
     user_agent = parse(request.META['HTTP_USER_AGENT'])
     if not user_agent.is_mobile:
         return render(request, 'QRCodePage.html')
@@ -487,17 +560,18 @@ def compass(request):
     # to the login page
 
     if not request.user.is_superuser:
-        if not UserInfo.objects.get(user__pk=request.user.pk).hasTakenPledge:
+        if not (await UserInfo.objects.aget(user__pk=request.user.pk)).hasTakenPledge:
             return redirect('/pledge')
 
     # Find the date of today
-    today = datetime.date.today()
+    today = clock.today()
 
     # Checks if there is a spot for today and if not returns the user to the home page (where one will be assigned)
-    try:
-        spot = SpotRecord.objects.filter(spotDay=today).first().sId
-    except:
+    campus = await sync_to_async(campus_of)(request.user.pk)
+    spot_record = await SpotRecord.objects.select_related('sId').filter(campus_id=campus, spotDay=today).afirst()
+    if spot_record is None:
         return redirect('/')
+    spot = spot_record.sId
 
     # Assigns the values of today's spot so they can be rendered into the website
     spot_name = spot.name
@@ -532,12 +606,10 @@ def change_profile_picture(request):
         chosen_pfp = request.POST.get('chosen_pfp')
     user = request.user.pk
 
-    # Edits the user_info table to add the id of the new profile picture
+    # Records the id of the new profile picture, which the user_stats projection (see events.py) puts in user_info
     try:
-        to_edit = UserInfo.objects.get(user_id=user)
         new_avatar = Avatar.objects.get(imageName=chosen_pfp)
-        to_edit.avatarId_id = new_avatar.id
-        to_edit.save()
+        events.record(GameEvent(kind=GameEvent.AVATAR_CHANGE, user_id=user, day=clock.today(), value=new_avatar.id))
     except:
         pass
 
@@ -545,9 +617,11 @@ def change_profile_picture(request):
 
 
 @login_required()
+@rate_limit('score')
 def addScore(request):
     """Adds score and streak to a user once they arrive at the spot. Also logs this users rating of the spot.
-        This view also implements streak resetting for users who did not attend the spot yesterday, and calculates yesterday's spots new spot average
+        Streaks of users who did not attend the spot yesterday, and yesterday's spot's average attendance, are updated by the
+        midnight jobs in maintenance.py
 
     Args:
         request (HTTP_request): The Django-supplied web request that contains information about the current request to see this view
@@ -558,6 +632,7 @@ def addScore(request):
             Users who aren't logged in are redirected to log in
             Users who got here without a POST http_request are redirected to home.html
             Users who are registering at an incorrect time are redirected to error.html, where their mistake is displayed
+            Users whose position is missing or too far from the spot are redirected to error.html, where their mistake is displayed
             Users who have already registered are redirected to error.html, where their mistake is displayed
         Non-erroneous return: Returns the user to home.html once they've been successfully registered
 
@@ -573,69 +648,53 @@ def addScore(request):
     # Ensures a user who did not get here by sending a post request from home.html gets redirected back home
     if request.method == "POST":
         user_spot_rating = int(request.POST.get('star'))
+        # The position the browser reported when the user pressed "I'm here", checked against the spot further down
+        user_location = parse_position(request.POST.get('latitude'), request.POST.get('longitude'))
     else:
-        redirect('/')
-
-    today = datetime.date.today()
-    first_register = UserInfo.objects.filter(lastSpotRegister=today)
-
-    # If the user is the first person to add a score
-    if len(first_register) == 0:
-        yesterday = today - datetime.timedelta(days=1)
-        # Gets ALL UserInfo records that have not played either yesterday or today
-        # Today is only included in case of errors, there should never actually be any users that registered today
-        yesterdaysRegister = UserInfo.objects.filter(~Q(lastSpotRegister=yesterday) & ~Q(lastSpotRegister=today))
-        yesterdaysRegister.update(currentStreak=0)  # Makes all their streaks 0
-        for item in yesterdaysRegister:
-            item.save()  # Saves each item. No bulk saving method
-
-        # This code works out the average spot attendance value
-        prev_spot = SpotRecord.objects.get(spotDay=yesterday) # Finds the spot that was SotD yesterday
-        total_spot_times = len(SpotRecord.objects.filter(sId=prev_spot.sId)) # How many times has this spot been spot of the day
-        spot = Spot.objects.get(pk=prev_spot.sId.pk)
-        if total_spot_times == 1: # If there has only been one spot instance for this spot, then the average is yesterdays attendance
-            spot.average_attendance = prev_spot.attendance
-        else: # The spot has been SotD multiple times
-            total_attendance = spot.average_attendance * (total_spot_times - 1) # 'Reverses' average to find a rough total attendance
-            total_attendance += prev_spot.attendance
-            spot.average_attendance = total_attendance / total_spot_times # Updates average with latest attendance
-            # NOTE: This system isn't the most accurate, as we could go through all spot instances to get an exact average, however
-            # this felt like an unnecessary computation when the above system does the same thing with minimal accuracy loss
-        spot.save() # Saves the new spot data
-
-    now = datetime.datetime.now()
+        return redirect('/')
+
+    # The game clock (see clock.py), which can be swapped to register outside of the real registering hours
+    now = clock.now()
+    today = now.date()
+    # Resetting streaks and updating yesterday's attendance average are done by the midnight jobs in maintenance.py
+
     nowTime = now.time()
-    #nowTime = datetime.time(12,12,12)  # Used only for the purpose of testing outside of allowed times (6am to 7pm)
 
-    if nowTime.hour < 9 or nowTime.hour > 16: # Ensures that the user cannot register outside of accepted times
+    if not clock.registering_open(nowTime): # Ensures that the user cannot register outside of accepted times
         return render(request, 'error.html', {'error': 'time'}) # Informs the user of their error
 
-    # Checks if there is a spot for today and if not returns the user to the home page (where one will be assigned)
+    # Checks if there is a spot for today on the user's campus and if not returns the user to the home page (where one
+    # will be assigned)
+    campus = campus_of(request.user.pk)
     try:
-        spot = SpotRecord.objects.get(spotDay=today)
+        spot = SpotRecord.objects.get(campus_id=campus, spotDay=today)
     except:
         return redirect('/')
 
+    # The distance check in home.html can be bypassed, so the user's position is checked again here
+    if user_location is None or not is_at_spot(spot.sId_id, *user_location):
+        return render(request, 'error.html', {'error': 'location'})
+
     try:
         register = UserRegister.objects.get(uId=request.user, srId=spot)
         # If there is no error in fetching this record then the current user has already registered
     except  :
         # Adds their score to the database
-        todays_registers = UserInfo.objects.filter(lastSpotRegister=today)
+        # Counted with the (campus, lastSpotRegister) index, as only the user's campus is playing for the same spot
+        todays_registers = UserInfo.objects.filter(campus_id=campus, lastSpotRegister=today).count()
         # Additional points are given to the earliest 4 users. First gets 5 total points, second 4, third 3, fourth 2
-        additional_points = 4 - len(todays_registers)
+        additional_points = 4 - todays_registers
         if additional_points < 0:
             additional_points = 0 # This ensures that later users do not get negative points
-        info = UserInfo.objects.get(user_id=request.user.pk)
-
-        info.totalPoints = info.totalPoints + 1 + additional_points
-        info.currentStreak = info.currentStreak + 1
-        info.lastSpotRegister = today
 
         spot.attendance = spot.attendance + 1
-        UserRegister(uId=request.user, srId=spot, spotNiceness=user_spot_rating, registerTimeEditable=nowTime).save() # Registers user at spot
-        spot.save() # Saves spot with incremented attendance
-        info.save() # Saves the new lastSpotRegister for the user
+        with transaction.atomic():
+            UserRegister(uId=request.user, srId=spot, spotNiceness=user_spot_rating, registerTime=nowTime, registerTimeEditable=nowTime).save() # Registers user at spot
+            spot.save() # Saves spot with incremented attendance
+            # The user's points, streak and lastSpotRegister are updated by the user_stats projection (see events.py)
+            events.record(GameEvent(kind=GameEvent.REGISTER, user=request.user, day=today, value=1 + additional_points))
+        # Pushes the new attendance, ratings and leaderboard to everyone watching, once the changes are saved
+        transaction.on_commit(lambda: publish_live_update(today, campus))
         return redirect('/') # Returns the user home
 
     return render(request, 'error.html', {'error': 'already'}) # Ensures the user can only register once
@@ -651,9 +710,7 @@ def change_title(request, title):
     if not user_agent.is_mobile:
         return render(request, 'QRCodePage.html')
 
-    info = UserInfo.objects.get(user_id=request.user.pk)
-    info.title = title
-    info.save()
+    events.record(GameEvent(kind=GameEvent.TITLE_CHANGE, user=request.user, day=clock.today(), text=title[:100]))
     return redirect('/profile')
 
 
@@ -688,7 +745,7 @@ def take_pledge(request):
     if request.method == "POST": # Only takes action when the user gets where with a POST request
         info = UserInfo.objects.get(user__pk=request.user.pk)
         info.hasTakenPledge = True
-        info.save() # Saves the UserInfo to record they've taken the pledge
+        info.save(update_fields=['hasTakenPledge']) # Saves the UserInfo to record they've taken the pledge
     return redirect('/')
 
 
@@ -735,20 +792,6 @@ def get_streak_image(user_pk, imageType) -> str: # FUNCTION
     user = UserInfo.objects.get(user__pk=user_pk)
 
 
-    pictures = [
-        "https://i.imgur.com/V0r8Ftw.png",  # stage one
-        "https://i.imgur.com/9VZtO9X.png",  # stage two
-        "https://i.imgur.com/3zJQoI3.png",  # stage three
-        "https://i.imgur.com/pweVVh2.png",  # stage four
-        "https://i.imgur.com/6jzElXg.png",  # stage five
-        "https://i.imgur.com/nHUmeOw.png",  # stage six
-        "https://i.imgur.com/Yg5CGvc.png",  # stage seven
-        "https://i.imgur.com/BCPvB1V.png",  # stage eight
-        "https://i.imgur.com/8FxfFdV.png",  # stage nine
-        "https://i.imgur.com/WS9jEuH.png",  # stage ten
-        "https://i.imgur.com/IgO05pc.png",  # stage eleven
-        "https://i.imgur.com/d1Jz3G8.png"  # stage twelve +
-    ]
     streak = user.currentStreak
     # Ensures streak cannot go above 5 or below 1 (to fit image constraints)
     if streak > 11:
@@ -757,7 +800,7 @@ def get_streak_image(user_pk, imageType) -> str: # FUNCTION
         streak = 1
 
 
-    return pictures[streak - 1]
+    return local_link(STREAK_IMAGES[streak - 1])  # The stored copy, once it has been copied into the image store
 
 
 def privacy_policy(request):
@@ -769,4 +812,198 @@ def privacy_policy(request):
     return render(request, 'privacy_policy.html')
 
 
+@staff_member_required
+def export_data(request, dataset):
+    """Streams one of the game's datasets to a gamekeeper as a CSV or JSONL file download
+
+    Args:
+        request (HTTP_REQUEST): The Django-supplied web request. Supports the optional GET parameters:
+            format ('csv' or 'jsonl'), start and end (dates as YYYY-MM-DD) and spot (a spot ID or name)
+        dataset (str): Which data to export. Can be 'registers', 'spotrecords' or 'userinfo'
+
+    Returns:
+        StreamingHttpResponse: The file, written out row by row so memory use does not grow with the table size
+        HttpResponseBadRequest: If the dataset, format or dates are not valid
+    """
+    export_format = request.GET.get('format', 'csv')
+    try:
+        start = parse_date(request.GET.get('start'), 'start')
+        end = parse_date(request.GET.get('end'), 'end')
+        lines = stream_export(dataset, export_format, start, end, request.GET.get('spot'))
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    file_name = "%s-%s.%s" % (dataset, clock.today().isoformat(), export_format)
+    response['Content-Disposition'] = 'attachment; filename="%s"' % file_name
+    return response
 
+
+@login_required()
+def nearest_spots(request):
+    """Lists the spots closest to a position, so users can find green spaces near them
+
+    Args:
+        request (HTTP_REQUEST): The Django-supplied web request. Takes the GET parameters latitude and longitude
+            (in degrees), and optionally k, the number of spots wanted (default 5, max MAX_NEAREST_SPOTS)
+
+    Returns:
+        JsonResponse: {"spots": [{"id", "name", "latitude", "longitude", "image", "distance"}]}, nearest first, with
+            distances in metres
+        HttpResponseBadRequest: If the position or k is not valid
+    """
+    position = parse_position(request.GET.get('latitude'), request.GET.get('longitude'))
+    if position is None:
+        return HttpResponseBadRequest("latitude and longitude must be valid co-ordinates")
+    try:
+        k = min(int(request.GET.get('k', 5)), MAX_NEAREST_SPOTS)
+    except ValueError:
+        return HttpResponseBadRequest("k must be a whole number")
+
+    # The index holds everything needed for the response, so no database query is made once it has been built
+    index = get_spot_index()
+    spots = []
+    for pk, distance in index.nearest(*position, k):
+        latitude, longitude, name, image = index.details[pk]
+        spots.append({
+            'id': pk,
+            'name': name,
+            'latitude': latitude,
+            'longitude': longitude,
+            'image': image,
+            'distance': round(distance, 1),
+        })
+    return JsonResponse({'spots': spots})
+
+
+@async_login_required
+async def live_updates(request):
+    """View for '/live': Streams live updates to the home and leaderboard pages as Server-Sent Events
+
+    Events are 'attendance' (today's attendance), 'ratings' (the graph's hourly averages and colours) and 'leaderboard'
+    (the top five of each leaderboard, in the same format as the leaderboard view's TopResults), all for the user's
+    campus. See live.py.
+
+    Args:
+        request (HTTP_REQUEST): The Django-supplied web request that contains information about the current request to
+            see this view
+
+    Returns:
+        StreamingHttpResponse: The event stream, when served by the ASGI server
+        HttpResponse: The latest events and a long retry, under WSGI (where a stream would hold a worker)
+    """
+    campus = await sync_to_async(campus_of)(request.user.pk)
+    if await live.alatest(campus) is None:
+        # Nothing has been published for the campus since the cache was last cleared
+        await sync_to_async(publish_live_update)(None, campus)
+
+    if not isinstance(request, ASGIRequest):
+        stored = await live.alatest(campus)
+        body = b'retry: %d\n\n' % live.WSGI_RETRY_MILLISECONDS + live.encode_events(stored['id'], stored['data'])
+        response = HttpResponse(body, content_type='text/event-stream')
+    else:
+        # Ends when the browser disconnects, so the hub stops counting it (see live.watch_disconnects)
+        stream = live.hub_for(campus).subscribe(request.scope.get(live.DISCONNECTED_KEY))
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stops proxies holding events back
+    return response
+
+
+def publish_live_update(today=None, campus=None):
+    """Builds a snapshot of a campus's attendance, hourly ratings and top fives for today, and sends it to every live
+    connection from that campus
+
+    Args:
+        today (datetime.date): The day to build the snapshot for. Defaults to today
+        campus (int): The campus's primary key. Defaults to the default campus
+    """
+    today = today or clock.today()
+    campus = campus or default_campus_id()
+    spot_record = SpotRecord.objects.filter(campus_id=campus, spotDay=today).values_list('pk', 'attendance').first()
+    record_pk, attendance = spot_record or (None, 0)
+
+    # The average rating for each hour from 9:00 to 16:00, as shown on the home page graph
+    averages = [0] * 8
+    hourly = (UserRegister.objects.filter(srId=record_pk).annotate(hour=ExtractHour('registerTime'))
+              .values('hour').annotate(average=Avg('spotNiceness')).order_by('hour'))
+    for row in hourly:
+        if 9 <= row['hour'] <= 16:
+            averages[row['hour'] - 9] = float(row['average'])
+
+    leaderboards = {
+        'streak': top_five("-currentStreak", "-totalPoints", campus),
+        'total': top_five("-totalPoints", "-currentStreak", campus),
+    }
+    # The variants of each stored avatar, so the page can build the same <picture> as leaderboard_row.html
+    avatars = {row[2] for rows in leaderboards.values() for row in rows}
+    leaderboards['avatars'] = {link: sources(link, LEADERBOARD_AVATAR_WIDTH) for link in avatars if is_stored(link)}
+    live.publish({
+        'attendance': attendance,
+        'ratings': {'averages': averages, 'colours': [rating_colour(item) for item in averages]},
+        'leaderboard': leaderboards,
+    }, campus)
+
+
+def top_five(sort_column, other, campus) -> list[list]:
+    """The top five rows of a campus's leaderboard, ranked the same way as the leaderboard view
+
+    Args:
+        sort_column (str): The column the leaderboard is ordered by, e.g. "-currentStreak"
+        other (str): The column ties are ordered by
+        campus (int): The campus's primary key
+
+    Returns:
+        list[list]: [position, score, avatar, username, title] for each of the top five users
+    """
+    column_name = sort_column[1:]
+    position, buffer, prev_position_score = 1, 1, None
+    rows = []
+    ranked = UserInfo.objects.filter(campus_id=campus).select_related('user', 'avatarId').order_by(sort_column, other)
+    for record in ranked[:5]:
+        position, buffer = position_buffer_calc(position, buffer, record, column_name, prev_position_score)
+        prev_position_score = getattr(record, column_name)
+        rows.append([position, prev_position_score, record.avatarId.imageName, record.user.username, record.title])
+    return rows
+
+
+def metrics(request):
+    """View for '/metrics': Every server process's request, database and cache metrics, in the Prometheus text format
+
+    Only staff can see the metrics, or a scraper sending 'Authorization: Bearer <METRICS_TOKEN>' (see settings.py).
+
+    Args:
+        request (HTTP_REQUEST): The Django-supplied web request that contains information about the current request to
+            see this view
+
+    Returns:
+        HttpResponse: The metrics, or 403 Forbidden
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    has_token = token is not None and constant_time_compare(request.headers.get('Authorization', ''), 'Bearer ' + token)
+    if not has_token and not (request.user.is_active and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def image(request, name):
+    """View for '/images/<name>': An image from the image store, or one of its variants (see images.py)
+
+    The name changes whenever the image does, so browsers are told to keep it for a year without checking it again.
+
+    Args:
+        request (HTTP_REQUEST): The Django-supplied web request that contains information about the current request to
+            see this view
+        name (str): The image or variant's file name
+
+    Returns:
+        FileResponse: The image
+        Http404: If there is no such image
+    """
+    path, content_type = image_file(name)
+    if path is None:
+        raise Http404("No such image")
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    response['Cache-Control'] = CACHE_CONTROL
+    return response
@@ -14,3 +14,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_asgi_application()
+
+# Tells live update streams when their browser disconnects (see exSeed/live.py)
+from exSeed.live import watch_disconnects  # noqa: E402, imported once Django is set up
+application = watch_disconnects(application)
+
+# Runs the daily maintenance jobs in the background (see exSeed/scheduler.py)
+from exSeed.scheduler import start_scheduler  # noqa: E402, imported once Django is set up
+start_scheduler()
@@ -58,6 +58,7 @@ CRISPY_TEMPLATE_PACK = 'bootstrap5'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 
 MIDDLEWARE = [
+    'exSeed.metrics.MetricsMiddleware',  # First, so request times include the other middleware
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -65,16 +66,24 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'exSeed.profiling.ProfilerMiddleware',  # Runs the view when profiling, skipping any process_view after it
+    'exSeed.metrics.ViewTimingMiddleware',  # Last, so only the view is inside it (for Server-Timing)
 ]
 
 ROOT_URLCONF = 'mysite.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'exSeed.metrics.TimedDjangoTemplates',  # The Django template backend, timed for Server-Timing
         'DIRS': [BASE_DIR / "templates"],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # Templates are compiled once per process and reused, rather than being read and parsed on every render
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -99,6 +108,39 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# A file based cache is shared by all of the server's processes, so a page invalidated by one process is not served
+# stale by another (see exSeed/caching.py)
+
+CACHES = {
+    'default': {
+        'BACKEND': 'exSeed.metrics.MeasuredFileBasedCache',  # The file based cache, counting hits and misses
+        'LOCATION': BASE_DIR / 'cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 20000,
+        },
+    }
+}
+
+# How long (in seconds) a cached page is kept for, if the data it was built from doesn't change first
+VIEW_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+# Sessions and authentication
+# https://docs.djangoproject.com/en/4.1/topics/http/sessions/#configuring-the-session-engine
+# Sessions are read from the cache and only fall back to the database when the cache doesn't have them. The signed
+# cookie engine ('django.contrib.sessions.backends.signed_cookies') also works, and needs no server side storage at
+# all, but a session can't then be ended from the server before it expires.
+# The logged in user is loaded from the cache too (see exSeed/backends.py), so identifying the user costs no queries.
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['exSeed.backends.CachedModelBackend']
+
+# How long (in seconds) a logged in user's details are cached for, if they aren't changed first
+USER_CACHE_TIMEOUT = 60 * 60
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -139,6 +181,15 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'mysite/static')
 ]
 
+# Avatar and spot images kept on this site (see exSeed/images.py), served at IMAGE_URL with a year long Cache-Control
+# header. With Pillow installed, each image is scaled down to IMAGE_WIDTHS (in pixels) as WebP and JPEG (or PNG), at
+# IMAGE_QUALITY, in a pool of IMAGE_WORKERS threads (None is up to 4, one per CPU)
+IMAGE_ROOT = BASE_DIR / 'images'
+IMAGE_URL = '/images/'
+IMAGE_WIDTHS = (96, 192, 384, 768)
+IMAGE_QUALITY = 80
+IMAGE_WORKERS = None
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
@@ -147,8 +198,62 @@ LOGIN_URL = '/login'
 LOGIN_REDIRECT_URL = "home"
 LOGOUT_REDIRECT_URL = "home"
 
+# The dotted path of the clock class the game reads the date and time from (see exSeed/clock.py). None is the real
+# time. 'python manage.py simulate_season' plays a season on a simulated clock to see how the daily costs grow
+GAME_CLOCK = None
+
+# How close (in metres) a user must be to the spot of the day to register their attendance
+SPOT_GEOFENCE_RADIUS = 50
+
+# Rate limits on the views that write to the database (see exSeed/ratelimit.py). Each limit is a token bucket for
+# each scope: 'user' (each logged in user, or each visitor's IP address) and 'global' (everyone at once). (requests,
+# seconds) lets that many requests through in a burst, and refills at that many every that many seconds. Buckets are
+# shared by the server's processes through files in RATE_LIMIT_DIR; if it is None, each process keeps its own
+RATE_LIMITS = {
+    'score': {'user': (5, 60), 'global': (40, 2)},  # addScore
+    'signup': {'user': (20, 60), 'global': (10, 1)},  # A campus network can sign up many students from one address
+}
+RATE_LIMIT_DIR = BASE_DIR / 'ratelimits'
+
+# Account deletions (see exSeed/deletion.py) remove a user's registers this many rows at a time, pausing for
+# ACCOUNT_DELETION_PAUSE seconds between chunks so other requests can write in the meantime
+ACCOUNT_DELETION_CHUNK_SIZE = 500
+ACCOUNT_DELETION_PAUSE = 0.05
+
+# Request metrics, shown at /metrics (see exSeed/metrics.py). Each server process writes its totals to METRICS_DIR
+# every METRICS_FLUSH_SECONDS. Prometheus can scrape /metrics by sending 'Authorization: Bearer <METRICS_TOKEN>'; if
+# METRICS_TOKEN is None, only staff can see it
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = None
+
+# Where request profiles made by staff with '?profile' are saved (see exSeed/profiling.py), and how often (in seconds)
+# '?profile=sample' samples the stack
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILER_SAMPLE_INTERVAL = 0.001
+
+# Database queries taking longer than SLOW_QUERY_THRESHOLD seconds are written to SLOW_QUERY_LOG (see
+# exSeed/slow_queries.py). 'python manage.py slow_queries' lists the worst ones
+SLOW_QUERY_THRESHOLD = 0.1
+SLOW_QUERY_LOG = BASE_DIR / 'slow_queries.log'
+
+# Whether each web server process runs the scheduled jobs (see exSeed/scheduler.py). If this is False, the jobs
+# must be run some other way, e.g. 'python manage.py run_jobs --loop' as a service, or 'python manage.py run_jobs'
+# from cron every minute
+JOB_SCHEDULER_ENABLED = True
+
+# Emails are queued and sent by a background thread, so requests don't wait for the mail server (see exSeed/mail.py)
+EMAIL_BACKEND = 'exSeed.mail.QueuedEmailBackend'
+# The backend the queue sends with. Emails are sent in batches of up to EMAIL_QUEUE_BATCH_SIZE over one connection,
+# and failures are retried up to EMAIL_QUEUE_ATTEMPTS times, backing off from EMAIL_QUEUE_RETRY_DELAY seconds
+EMAIL_QUEUE_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_QUEUE_BATCH_SIZE = 50
+EMAIL_QUEUE_ATTEMPTS = 5
+EMAIL_QUEUE_RETRY_DELAY = 2
+
 """
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+For local work, write emails to files instead of sending them:
+EMAIL_QUEUE_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = BASE_DIR / "sent_emails"
 """
 
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
 application = get_wsgi_application()
+
+# Runs the daily maintenance jobs in the background (see exSeed/scheduler.py)
+from exSeed.scheduler import start_scheduler  # noqa: E402, imported once Django is set up
+start_scheduler()